@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Product
+from .models import CapturedEmail, EmailEvent, Product
 
 
 @admin.register(Product)
@@ -20,6 +20,12 @@ class ProductAdmin(admin.ModelAdmin):
         ('Firebase Configuration', {
             'fields': ('test_tenant_id', 'prod_tenant_id')
         }),
+        ('Branding', {
+            'fields': ('logo_url', 'dashboard_url', 'welcome_sender_email', 'welcome_sender_name')
+        }),
+        ('Notifications', {
+            'fields': ('digest_window_seconds', 'sandbox_test_sends')
+        }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at')
         }),
@@ -29,3 +35,35 @@ class ProductAdmin(admin.ModelAdmin):
         """Display the DRF token for this product"""
         return obj.token.key if obj.id else 'Token will be generated after saving'
     get_token.short_description = 'API Token'
+
+
+@admin.register(CapturedEmail)
+class CapturedEmailAdmin(admin.ModelAdmin):
+    """Captured test-environment emails (read-only)"""
+    list_display = ('created_at', 'product_name', 'email_type', 'to_email', 'subject')
+    list_filter = ('product_name', 'email_type')
+    search_fields = ('to_email', 'subject', 'message_id')
+    date_hierarchy = 'created_at'
+    readonly_fields = [field.name for field in CapturedEmail._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(EmailEvent)
+class EmailEventAdmin(admin.ModelAdmin):
+    """Delivery events reported by Brevo's webhook (read-only)"""
+    list_display = ('occurred_at', 'event', 'email', 'message_id', 'tag')
+    list_filter = ('event',)
+    search_fields = ('message_id', 'email')
+    date_hierarchy = 'occurred_at'
+    readonly_fields = [field.name for field in EmailEvent._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
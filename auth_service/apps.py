@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class AuthServiceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'auth_service'
+
+    def ready(self):
+        # Register the built-in email types with the email pipeline
+        from .services import email_types  # noqa: F401
+        from . import signals  # noqa: F401
+        # Registers DB connections and pools with the fork-aware lifecycle
+        from .db import pool  # noqa: F401
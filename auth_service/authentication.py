@@ -0,0 +1,149 @@
+"""
+Authentication classes for auth_service
+"""
+from django.conf import settings
+from rest_framework.authentication import BaseAuthentication, TokenAuthentication, get_authorization_header
+from rest_framework import exceptions
+import base64
+import hmac
+
+from .services.firebase_service import FirebaseService
+from .services.product_registry import ProductRegistry
+from .utils.lazy_import import LazyModule
+
+jwt = LazyModule('jwt')
+
+
+class ProductTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication for product service accounts resolved from the
+    in-process product registry, so authenticated requests need no token or
+    user query. Unknown keys fall back to the standard database lookup.
+    """
+
+    def authenticate_credentials(self, key):
+        product = ProductRegistry.get_by_token(key)
+
+        if product is None:
+            return super().authenticate_credentials(key)
+
+        if not product.user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+
+        return (product.request_user(), key)
+
+
+class FirebaseUser:
+    """
+    Request user for an end user authenticated by a Firebase ID token
+    """
+    is_authenticated = True
+    is_anonymous = False
+    is_active = True
+
+    def __init__(self, claims, product, environment):
+        self.uid = claims['uid']
+        self.email = claims.get('email')
+        self.email_verified = claims.get('email_verified', False)
+        self.claims = claims
+        self.product = product
+        self.environment = environment
+
+    @property
+    def pk(self):
+        return self.uid
+
+    def __str__(self):
+        return self.email or self.uid
+
+
+class FirebaseIdTokenAuthentication(BaseAuthentication):
+    """
+    Authenticates end users with `Authorization: Bearer <Firebase ID token>`.
+
+    The token's tenant selects the product and environment from the registry;
+    the signature is checked against cached Google keys and revocation against
+    the per-user revocation cache, so verification is normally local.
+    """
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Invalid bearer header.')
+
+        try:
+            id_token = auth[1].decode()
+            unverified = jwt.decode(id_token, options={'verify_signature': False})
+        except (UnicodeError, jwt.exceptions.PyJWTError):
+            raise exceptions.AuthenticationFailed('Invalid token')
+
+        # Not yet verified: any JSON may sit where Firebase puts an object
+        firebase_claims = unverified.get('firebase', {})
+        if not isinstance(firebase_claims, dict):
+            raise exceptions.AuthenticationFailed('Invalid token')
+        tenant_id = firebase_claims.get('tenant')
+        match = ProductRegistry.get_by_tenant(tenant_id) if tenant_id and isinstance(tenant_id, str) else None
+        if match is None or not match[0].is_active:
+            raise exceptions.AuthenticationFailed('Unknown tenant')
+        product, environment = match
+
+        try:
+            claims = FirebaseService.verify_id_token(id_token, tenant_id, environment)
+        except ValueError as e:
+            raise exceptions.AuthenticationFailed(str(e))
+        except Exception:
+            raise exceptions.AuthenticationFailed('Token verification unavailable')
+
+        return (FirebaseUser(claims, product, environment), id_token)
+
+    def authenticate_header(self, request):
+        return self.keyword
+
+
+class BrevoWebhookCaller:
+    """
+    Request user for Brevo delivering webhook events
+    """
+    is_authenticated = True
+    is_anonymous = False
+    is_active = True
+    pk = None
+
+    def __str__(self):
+        return 'brevo-webhook'
+
+
+class BrevoWebhookAuthentication(BaseAuthentication):
+    """
+    Authenticates Brevo webhook calls: `Authorization: Bearer <BREVO_WEBHOOK_TOKEN>`
+    (the webhook's token auth) or HTTP basic auth with BREVO_WEBHOOK_USERNAME and
+    BREVO_WEBHOOK_PASSWORD (credentials in the webhook URL). With neither
+    configured every call is refused.
+    """
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Webhook credentials required.')
+        scheme, credentials = auth[0].lower(), auth[1]
+
+        if scheme == b'bearer':
+            expected = settings.BREVO_WEBHOOK_TOKEN.encode()
+        elif scheme == b'basic' and settings.BREVO_WEBHOOK_USERNAME:
+            try:
+                credentials = base64.b64decode(credentials, validate=True)
+            except ValueError:
+                raise exceptions.AuthenticationFailed('Invalid basic header.')
+            expected = f'{settings.BREVO_WEBHOOK_USERNAME}:{settings.BREVO_WEBHOOK_PASSWORD}'.encode()
+        else:
+            raise exceptions.AuthenticationFailed('Webhook credentials required.')
+
+        if not expected or not hmac.compare_digest(credentials, expected):
+            raise exceptions.AuthenticationFailed('Invalid webhook credentials.')
+        return (BrevoWebhookCaller(), None)
+
+    def authenticate_header(self, request):
+        return 'Bearer'
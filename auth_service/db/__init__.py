@@ -0,0 +1,3 @@
+"""
+Database support for auth_service (process-level connection pooling)
+"""
@@ -0,0 +1,3 @@
+"""
+Pooled variants of Django's database backends (ENGINE = 'auth_service.db.backends.<vendor>')
+"""
@@ -0,0 +1,22 @@
+"""
+PostgreSQL backend drawing connections from the process-level pool
+"""
+from django.db.backends.postgresql import base
+from psycopg2 import extensions
+
+from ...pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+
+    def _connection_is_reusable(self):
+        if self.connection.closed:
+            return False
+        status = self.connection.get_transaction_status()
+        if status == extensions.TRANSACTION_STATUS_IDLE:
+            return True
+        if status in (extensions.TRANSACTION_STATUS_INTRANS, extensions.TRANSACTION_STATUS_INERROR):
+            self.connection.rollback()
+            return True
+        # ACTIVE (query in progress) or UNKNOWN (connection lost)
+        return False
@@ -0,0 +1,14 @@
+"""
+SQLite backend drawing connections from the process-level pool (local runs and pool stress tests)
+"""
+from django.db.backends.sqlite3 import base
+
+from ...pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+
+    def _connection_is_reusable(self):
+        if self.connection.in_transaction:
+            self.connection.rollback()
+        return True
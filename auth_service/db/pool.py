@@ -0,0 +1,347 @@
+"""
+Process-level database connection pool.
+
+Django 4.2 with psycopg2 has no built-in pool: with CONN_MAX_AGE every
+worker thread keeps its own connection open, so slots grow with
+instances x workers x threads. The pooled backends in auth_service.db.backends
+instead hand out at most POOL['max_size'] connections per worker process,
+return them on close() (end of request), and make callers wait up to
+POOL['timeout'] seconds when all are busy.
+"""
+from collections import deque
+import logging
+import os
+import threading
+import time
+
+from .. import lifecycle
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    """
+    No connection became available within the pool wait timeout
+    """
+
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool of DB-API connections.
+
+    Idle connections are reused most-recently-used first (warm ones stay
+    warm), waiters are served in arrival order; connections idle longer than max_idle are closed, keeping at least
+    min_size. A pool inherited across fork() is dropped, never shared.
+    """
+
+    def __init__(self, name, min_size=1, max_size=4, timeout=5.0, max_idle=300.0):
+        if max_size < 1 or min_size > max_size:
+            raise ValueError(f"Invalid pool bounds for {name}: min_size={min_size}, max_size={max_size}")
+        self.name = name
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._waiters = deque()
+        self._size = 0
+        self._pid = os.getpid()
+        self._stats = {
+            'acquired': 0,
+            'created': 0,
+            'closed': 0,
+            'waits': 0,
+            'wait_ms_total': 0.0,
+            'timeouts': 0,
+            'peak_size': 0,
+        }
+
+    @staticmethod
+    def _close_quietly(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _check_fork(self):
+        # Connections opened by a parent process must not be used by its children
+        if self._pid != os.getpid():
+            lifecycle.abandon(*[connection for connection, _ in self._idle])
+            self._idle = deque()
+            self._waiters = deque()
+            self._size = 0
+            self._pid = os.getpid()
+            self._cond = threading.Condition()
+
+    def _prune_idle(self, now):
+        """
+        Pop idle connections past max_idle (caller holds the lock); returns them for closing
+        """
+        expired = []
+        while len(self._idle) > 0 and self._size > self.min_size:
+            connection, released_at = self._idle[0]
+            if now - released_at < self.max_idle:
+                break
+            self._idle.popleft()
+            self._size -= 1
+            expired.append(connection)
+        return expired
+
+    def acquire(self, create):
+        """
+        Borrow a connection, creating one with `create()` while below max_size
+
+        Waiters are served first-come first-served: a released connection (or
+        the slot of a discarded one) is handed straight to the longest-waiting
+        caller, so a busy pool cannot starve earlier requests.
+
+        Args:
+            create (callable): Opens a new DB-API connection
+
+        Returns:
+            Connection object
+
+        Raises:
+            PoolTimeout: If none became available within the timeout
+        """
+        self._check_fork()
+        started = time.monotonic()
+        connection = None
+        waiter = None
+
+        with self._cond:
+            expired = self._prune_idle(started)
+            self._stats['closed'] += len(expired)
+            if self._idle and not self._waiters:
+                connection, _ = self._idle.pop()
+            elif self._size < self.max_size:
+                # Reserve the slot, then connect outside the lock
+                self._size += 1
+                self._stats['peak_size'] = max(self._stats['peak_size'], self._size)
+            else:
+                waiter = {'event': threading.Event(), 'connection': None, 'slot': False}
+                self._waiters.append(waiter)
+
+        for stale in expired:
+            self._close_quietly(stale)
+
+        if waiter is not None:
+            connection = self._wait_for_handoff(waiter, started)
+
+        if connection is None:
+            try:
+                connection = create()
+            except Exception:
+                self._release_slot()
+                raise
+            with self._cond:
+                self._stats['created'] += 1
+
+        with self._cond:
+            self._stats['acquired'] += 1
+        return connection
+
+    def _wait_for_handoff(self, waiter, started):
+        """
+        Block until release() hands this waiter a connection or a free slot
+
+        Returns:
+            Connection, or None when a slot was handed over (caller creates the connection)
+        """
+        waiter['event'].wait(self.timeout)
+        with self._cond:
+            self._stats['waits'] += 1
+            self._stats['wait_ms_total'] += (time.monotonic() - started) * 1000
+            if waiter['connection'] is None and not waiter['slot']:
+                self._waiters.remove(waiter)
+                self._stats['timeouts'] += 1
+                raise PoolTimeout(
+                    f"No connection available in pool {self.name} "
+                    f"(max_size={self.max_size}) after {self.timeout}s"
+                )
+        return waiter['connection']
+
+    def _release_slot(self):
+        """
+        Give up a reserved slot: pass it to the next waiter or shrink the pool
+        """
+        with self._cond:
+            if self._waiters:
+                waiter = self._waiters.popleft()
+                waiter['slot'] = True
+                waiter['event'].set()
+            else:
+                self._size -= 1
+
+    def release(self, connection, discard=False):
+        """
+        Return a borrowed connection; discard=True closes it and frees its slot
+        """
+        if self._pid != os.getpid():
+            # Borrowed before a fork: the child must not reuse the parent's socket
+            return
+
+        if discard:
+            with self._cond:
+                self._stats['closed'] += 1
+            self._release_slot()
+            self._close_quietly(connection)
+            return
+
+        with self._cond:
+            if self._waiters:
+                waiter = self._waiters.popleft()
+                waiter['connection'] = connection
+                waiter['event'].set()
+            else:
+                self._idle.append((connection, time.monotonic()))
+
+    def close_all(self):
+        """
+        Close idle connections (in-use ones are closed when released with discard)
+        """
+        with self._cond:
+            idle = [connection for connection, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._stats['closed'] += len(idle)
+        for connection in idle:
+            self._close_quietly(connection)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            idle = len(self._idle)
+            size = self._size
+        waits = stats.pop('waits')
+        wait_ms_total = stats.pop('wait_ms_total')
+        stats.update({
+            'size': size,
+            'idle': idle,
+            'in_use': size - idle,
+            'min_size': self.min_size,
+            'max_size': self.max_size,
+            'timeout': self.timeout,
+            'waits': waits,
+            'avg_wait_ms': round(wait_ms_total / waits, 2) if waits else 0.0,
+        })
+        return stats
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, options=None):
+    """
+    Get (or create) the process-wide pool for a database alias
+
+    Args:
+        alias (str): Database alias, e.g. 'default'
+        options (dict, optional): min_size, max_size, timeout, max_idle (used on creation)
+    """
+    pool = _pools.get(alias)
+    if pool is not None:
+        return pool
+
+    with _pools_lock:
+        if alias not in _pools:
+            options = options or {}
+            _pools[alias] = ConnectionPool(
+                alias,
+                min_size=int(options.get('min_size', 1)),
+                max_size=int(options.get('max_size', 4)),
+                timeout=float(options.get('timeout', 5)),
+                max_idle=float(options.get('max_idle', 300)),
+            )
+            pool = _pools[alias]
+            logger.info(f"Connection pool for {alias}: min_size={pool.min_size}, "
+                        f"max_size={pool.max_size}, timeout={pool.timeout}s")
+        return _pools[alias]
+
+
+def pool_stats():
+    """
+    Stats for every pool in this process, keyed by database alias
+    """
+    return {alias: pool.stats() for alias, pool in list(_pools.items())}
+
+
+def close_pools():
+    """
+    Close the idle connections of every pool (shutdown)
+    """
+    for pool in list(_pools.values()):
+        pool.close_all()
+
+
+def _forget_connections():
+    """
+    After fork: drop the parent's pools and Django connections without closing them.
+    A closed psycopg2 connection sends Terminate, which would end the parent's session.
+    """
+    global _pools, _pools_lock
+    from django.db import connections
+
+    for pool in _pools.values():
+        lifecycle.abandon(*[connection for connection, _ in pool._idle])
+    _pools = {}
+    _pools_lock = threading.Lock()
+
+    for wrapper in connections.all(initialized_only=True):
+        if wrapper.connection is not None:
+            lifecycle.abandon(wrapper.connection)
+            wrapper.connection = None
+
+
+def close_connections():
+    """
+    Close this thread's Django connections and every pool (worker exit)
+    """
+    from django.db import connections
+
+    connections.close_all()
+    close_pools()
+
+
+class PooledDatabaseWrapperMixin:
+    """
+    DatabaseWrapper mixin: get_new_connection() borrows from the alias's pool
+    and _close() returns the connection instead of closing it.
+
+    Use with CONN_MAX_AGE=0 so Django releases the connection at the end of
+    every request; pool settings come from the database's POOL dict.
+    """
+
+    @property
+    def pool(self):
+        return get_pool(self.alias, self.settings_dict.get('POOL'))
+
+    def get_new_connection(self, conn_params):
+        try:
+            return self.pool.acquire(lambda: super(PooledDatabaseWrapperMixin, self).get_new_connection(conn_params))
+        except PoolTimeout as e:
+            # Surfaces as django.db.OperationalError through wrap_database_errors
+            raise self.Database.OperationalError(str(e))
+
+    def _connection_is_reusable(self):
+        """
+        Cheap check (no query): no unrecoverable errors and no open transaction.
+        Backends that can tell (and roll back) an open transaction on the raw
+        connection override this; by default only connections outside atomic
+        blocks go back to the pool
+        """
+        return not self.in_atomic_block and self.connection is not None
+
+    def _close(self):
+        if self.connection is None:
+            return
+        try:
+            reusable = not self.errors_occurred and self._connection_is_reusable()
+        except Exception:
+            reusable = False
+        self.pool.release(self.connection, discard=not reusable)
+
+
+lifecycle.register('database_connections', reset=_forget_connections, close=close_connections)
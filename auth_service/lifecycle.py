@@ -0,0 +1,89 @@
+"""
+Fork-aware lifecycle registry for long-lived, process-local resources.
+
+Modules that keep clients, connection pools, caches, background threads or
+locks at module/class level register them here once, at import time:
+
+    lifecycle.register('http_sessions', reset=_forget_sessions, close=reset_sessions)
+
+reset runs in a forked child (os.register_at_fork), so a gunicorn worker
+forked from a preloaded master never uses its parent's sockets, threads or
+(possibly held) locks: it must forget inherited state WITHOUT closing it,
+since the parent still owns those connections, and recreate its locks.
+close runs on worker exit and process shutdown (and in the master before it
+forks) and releases everything cleanly; resources are recreated lazily if
+used again afterwards.
+"""
+from collections import OrderedDict
+import atexit
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+_resources = OrderedDict()
+_lock = threading.Lock()
+# Objects inherited from the parent that must never be garbage collected here:
+# finalizers of DB connections/sockets would talk on the parent's connection
+_abandoned = []
+
+
+def register(name, reset, close=None):
+    """
+    Register a process-local resource (registering the same name again replaces it)
+
+    Args:
+        name (str): Unique resource name, e.g. 'http_sessions'
+        reset (callable): Called in a forked child; forgets inherited state and recreates locks
+        close (callable, optional): Called on worker exit / shutdown to release the resource
+    """
+    with _lock:
+        _resources[name] = (reset, close)
+
+
+def registered():
+    """
+    Names of all registered resources, in registration order
+    """
+    return list(_resources)
+
+
+def abandon(*objects):
+    """
+    Keep inherited objects alive for the life of this process so their
+    finalizers never close connections that belong to the parent
+    """
+    _abandoned.extend(o for o in objects if o is not None)
+
+
+def after_fork_in_child():
+    """
+    Reset every registered resource in a freshly forked child (registration order)
+    """
+    global _lock
+    # The parent may have been registering something at fork time
+    _lock = threading.Lock()
+
+    for name, (reset, _) in list(_resources.items()):
+        try:
+            reset()
+        except Exception as e:
+            logger.error(f"Lifecycle reset of {name} failed in pid {os.getpid()}: {e}", exc_info=True)
+
+
+def close_all():
+    """
+    Close every registered resource (reverse registration order); safe to call repeatedly
+    """
+    for name, (_, close) in reversed(list(_resources.items())):
+        if close is None:
+            continue
+        try:
+            close()
+        except Exception as e:
+            logger.warning(f"Lifecycle close of {name} failed: {e}")
+
+
+os.register_at_fork(after_in_child=after_fork_in_child)
+atexit.register(close_all)
@@ -0,0 +1,235 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+import http.client
+import json
+import os
+import random
+import shutil
+import signal
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from .gunicorn_benchmark import SETUP_SCRIPT, _free_port, Command as GunicornBenchmark
+from .smtp_transport_benchmark import _percentile
+
+TOKEN = 'webhook-load-test'
+EVENTS = ['request', 'delivered', 'delivered', 'opened', 'unique_opened', 'click', 'soft_bounce', 'hard_bounce']
+
+
+class Command(BaseCommand):
+    help = ('Replay a synthetic storm of Brevo webhook events (single and batched, with redeliveries) through '
+            'gunicorn and check every event is stored once while other requests stay fast')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=50000, help='Distinct events in the storm')
+        parser.add_argument('--clients', type=int, default=16, help='Concurrent webhook connections')
+        parser.add_argument('--max-batch', type=int, default=50, help='Largest batched webhook (events)')
+        parser.add_argument('--single-share', type=float, default=0.3, help='Share of requests with one event')
+        parser.add_argument('--redelivered', type=float, default=0.02, help='Share of events Brevo sends twice')
+        parser.add_argument('--workers', type=int, default=2, help='gunicorn workers')
+
+    def handle(self, *args, **options):
+        if shutil.which('gunicorn') is None:
+            raise CommandError('gunicorn is not installed')
+
+        tmpdir = tempfile.mkdtemp(prefix='brevo-webhook-')
+        database = os.path.join(tmpdir, 'events.sqlite3')
+        port = _free_port()
+        env = dict(
+            os.environ,
+            DJANGO_SETTINGS_MODULE='config.settings',
+            DATABASE_URL=f'sqlite:///{database}',
+            DEBUG='false',
+            ALLOWED_HOSTS='127.0.0.1,localhost',
+            LOG_LEVEL='ERROR',
+            GUNICORN_LOG_LEVEL='warning',
+            GUNICORN_WORKERS=str(options['workers']),
+            GUNICORN_MAX_REQUESTS='0',
+            PORT=str(port),
+            RATELIMIT_ENABLE='false',
+            BREVO_WEBHOOK_TOKEN=TOKEN,
+            WARMUP_ON_STARTUP='false',
+            READINESS_PROBES_ENABLED='false',
+            EMAIL_SCHEDULE_ENABLED='false',
+            EMAIL_DIGEST_ENABLED='false',
+        )
+
+        requests_ = self._storm(options)
+        total = sum(len(batch) for batch in requests_)
+        distinct = options['events']
+        self.stdout.write(self.style.WARNING(
+            f'Brevo webhook storm: {distinct} events ({total - distinct} redelivered) in {len(requests_)} requests '
+            f'from {options["clients"]} connections to {options["workers"]} gunicorn workers'
+        ))
+        self.stdout.write('=' * 84)
+
+        proc = None
+        log_path = os.path.join(tmpdir, 'gunicorn.log')
+        try:
+            subprocess.run([sys.executable, 'manage.py', 'migrate', '--noinput', '-v', '0'],
+                           cwd=settings.BASE_DIR, env=env, check=True)
+            subprocess.run([sys.executable, '-c', SETUP_SCRIPT], cwd=settings.BASE_DIR, env=env,
+                           check=True, capture_output=True)
+            with open(log_path, 'w') as log:
+                proc = subprocess.Popen(['gunicorn', '--config', 'gunicorn.conf.py'],
+                                        cwd=settings.BASE_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+            GunicornBenchmark._wait_until_ready(f'http://127.0.0.1:{port}', proc, time.monotonic())
+
+            result = self._replay(port, requests_, options['clients'])
+            stored, settle = self._wait_stored(database, distinct, timeout=60)
+        except (CommandError, OSError, subprocess.CalledProcessError) as e:
+            if os.path.exists(log_path):
+                with open(log_path) as log:
+                    self.stdout.write(log.read()[-1500:])
+            raise CommandError(f'Webhook load test failed: {e}')
+        finally:
+            if proc is not None and proc.poll() is None:
+                proc.send_signal(signal.SIGTERM)
+                try:
+                    proc.wait(timeout=30)
+                except subprocess.TimeoutExpired:
+                    proc.kill()
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+        webhook, probe = result['webhook'], result['probe']
+        self.stdout.write(f'{"events / s accepted":<30} {total / result["elapsed"]:>10.0f} '
+                          f'({total} in {result["elapsed"]:.1f}s)')
+        self.stdout.write(f'{"webhook p50 / p99 / max":<30} {_percentile(webhook, 0.5):>8.1f}ms '
+                          f'{_percentile(webhook, 0.99):>7.1f}ms {max(webhook):>7.1f}ms')
+        self.stdout.write(f'{"other requests p50 / p99":<30} {_percentile(probe, 0.5):>8.1f}ms '
+                          f'{_percentile(probe, 0.99):>7.1f}ms   ({len(probe)} /api/ready/ calls during the storm)')
+        self.stdout.write(f'{"503 (buffer full, retried)":<30} {result["busy"]:>10}')
+        self.stdout.write(f'{"errors":<30} {result["errors"]:>10}')
+        self.stdout.write(f'{"rows stored":<30} {stored:>10} (expected {distinct}, all in {settle:.1f}s after the storm)')
+        self.stdout.write('=' * 84)
+
+        problems = []
+        if result['errors']:
+            problems.append(f'{result["errors"]} requests failed')
+        if stored != distinct:
+            problems.append(f'{stored} events stored, expected {distinct}')
+        if problems:
+            raise CommandError('; '.join(problems))
+        self.stdout.write(self.style.SUCCESS('Completed!'))
+
+    @staticmethod
+    def _storm(options):
+        """
+        The requests to replay: lists of events (a one-event list is sent as a bare object)
+        """
+        now = int(time.time())
+        events = []
+        for n in range(options['events']):
+            name = EVENTS[n % len(EVENTS)]
+            event = {
+                'event': name,
+                'email': f'user{n % 5000}@example.com',
+                'id': 1000 + n,
+                'message-id': f'<{n // len(EVENTS)}.storm@smtp-relay.mailin.fr>',
+                'ts_event': now - n % 3600,
+                'subject': 'Your weekly summary',
+                'tag': 'storm',
+            }
+            if name == 'click':
+                event['link'] = f'https://example.com/{n}'
+            if name.endswith('bounce'):
+                event['reason'] = 'mailbox unavailable'
+            events.append(event)
+        events += random.sample(events, int(len(events) * options['redelivered']))
+        random.shuffle(events)
+
+        requests_ = []
+        while events:
+            size = 1 if random.random() < options['single_share'] else random.randint(2, options['max_batch'])
+            requests_.append(events[:size])
+            events = events[size:]
+        return requests_
+
+    @staticmethod
+    def _replay(port, requests_, clients):
+        webhook, probe = [], []
+        counts = {'busy': 0, 'errors': 0}
+        lock = threading.Lock()
+        pending = list(reversed(requests_))
+        done = threading.Event()
+
+        def post(conn, batch):
+            body = json.dumps(batch[0] if len(batch) == 1 else batch)
+            conn.request('POST', '/api/webhooks/brevo/', body=body, headers={
+                'Authorization': f'Bearer {TOKEN}', 'Content-Type': 'application/json',
+                'X-Forwarded-Proto': 'https',
+            })
+            response = conn.getresponse()
+            response.read()
+            return response.status
+
+        def client():
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            while True:
+                with lock:
+                    if not pending:
+                        break
+                    batch = pending.pop()
+                while True:
+                    started = time.perf_counter()
+                    try:
+                        code = post(conn, batch)
+                    except (OSError, http.client.HTTPException):
+                        conn.close()
+                        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                        code = 0
+                    with lock:
+                        webhook.append((time.perf_counter() - started) * 1000)
+                        if code == 503:
+                            counts['busy'] += 1
+                        elif code != 200:
+                            counts['errors'] += 1
+                    if code != 503:
+                        break
+                    # As Brevo would, a little later
+                    time.sleep(0.2)
+            conn.close()
+
+        def health():
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            while not done.wait(0.05):
+                started = time.perf_counter()
+                conn.request('GET', '/api/ready/', headers={'X-Forwarded-Proto': 'https'})
+                conn.getresponse().read()
+                probe.append((time.perf_counter() - started) * 1000)
+            conn.close()
+
+        prober = threading.Thread(target=health)
+        threads = [threading.Thread(target=client) for _ in range(clients)]
+        started = time.monotonic()
+        prober.start()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+        done.set()
+        prober.join()
+        return dict(counts, webhook=webhook, probe=probe, elapsed=elapsed)
+
+    @staticmethod
+    def _wait_stored(database, expected, timeout):
+        """
+        Wait for the workers' writers to store the events
+
+        Returns:
+            tuple: (rows stored, seconds waited)
+        """
+        started = time.monotonic()
+        stored = 0
+        while time.monotonic() - started < timeout:
+            with sqlite3.connect(database, timeout=30) as db:
+                stored = db.execute('SELECT COUNT(*) FROM email_events').fetchone()[0]
+            if stored >= expected:
+                break
+            time.sleep(0.25)
+        return stored, time.monotonic() - started
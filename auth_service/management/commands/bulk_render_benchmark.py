@@ -0,0 +1,100 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+import itertools
+import logging
+import os
+import time
+
+from auth_service.services import bulk_render
+
+
+class Command(BaseCommand):
+    help = 'Benchmark bulk email rendering across worker processes (renders/second, time to first email)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--emails', type=int, default=5000, help='Emails per run')
+        parser.add_argument('--workers', type=str, default='1,2,4', help='Comma-separated worker process counts')
+        parser.add_argument('--chunk-size', type=int, default=100, help='EMAIL_BULK_RENDER_CHUNK_SIZE')
+        parser.add_argument('--template', default='welcome', choices=sorted(bulk_render.RENDERERS))
+        parser.add_argument('--start-method', default='forkserver', choices=['forkserver', 'fork', 'spawn'])
+
+    def handle(self, *args, **options):
+        levels = [int(w) for w in options['workers'].split(',')]
+        cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+        link = {
+            'welcome': 'dashboard_link',
+            'verification': 'verification_link',
+            'password_reset': 'reset_link',
+        }[options['template']]
+
+        def contexts():
+            for i in range(options['emails']):
+                yield {
+                    'product_name': 'Beta Health',
+                    link: f'https://app.example.com/?u={i}',
+                    'environment': 'prod',
+                    'user_name': f'Recipient {i}',
+                }
+
+        self.stdout.write(self.style.WARNING(
+            f'Bulk render benchmark: {options["emails"]} {options["template"]} emails, chunks of '
+            f'{options["chunk_size"]}, {options["start_method"]} workers, {cores} core(s) available'
+        ))
+        self.stdout.write('=' * 84)
+        self.stdout.write(
+            f'{"workers":>7} {"startup":>9} {"first email":>12} {"total":>9} {"renders/s":>10} {"speedup":>8} {"order":>6}'
+        )
+
+        logging.disable(logging.WARNING)
+        try:
+            self._run_levels(levels, options, contexts)
+        finally:
+            logging.disable(logging.NOTSET)
+            bulk_render.shutdown_pool()
+
+        self.stdout.write('=' * 84)
+        if cores < max(levels):
+            self.stdout.write(self.style.WARNING(
+                f'Only {cores} core(s) available: runs with more workers than cores cannot scale'
+            ))
+        self.stdout.write(self.style.SUCCESS('Completed!'))
+
+    def _run_levels(self, levels, options, contexts):
+        baseline = None
+        for workers in levels:
+            with override_settings(
+                EMAIL_BULK_RENDER_WORKERS=workers,
+                EMAIL_BULK_RENDER_CHUNK_SIZE=options['chunk_size'],
+                EMAIL_BULK_RENDER_START_METHOD=options['start_method'],
+            ):
+                bulk_render.shutdown_pool()
+                # Start the processes (and preload templates) outside the timed run
+                started = time.perf_counter()
+                list(bulk_render.render_bulk(options['template'], itertools.islice(contexts(), max(workers, 1) * 2),
+                                             chunk_size=1))
+                startup = time.perf_counter() - started
+
+                first = None
+                ordered = True
+                count = 0
+                started = time.perf_counter()
+                for i, email in enumerate(bulk_render.render_bulk(options['template'], contexts())):
+                    if first is None:
+                        first = time.perf_counter() - started
+                    if 'error' in email:
+                        raise CommandError(f'Render failed: {email["error"]}')
+                    if f'Recipient {i}' not in email['html_content']:
+                        ordered = False
+                    count += 1
+                elapsed = time.perf_counter() - started
+                bulk_render.shutdown_pool()
+
+            rate = count / elapsed
+            baseline = baseline or rate
+            self.stdout.write(
+                f'{workers:>7} {startup * 1000:>7.0f}ms {first * 1000:>10.1f}ms {elapsed:>8.2f}s {rate:>10.0f} '
+                f'{rate / baseline:>7.2f}x {"ok" if ordered else "WRONG":>6}'
+            )
+            if not ordered:
+                raise CommandError(f'Results out of order with {workers} workers')
+
@@ -0,0 +1,181 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+import dj_database_url
+import os
+import tempfile
+import threading
+import time
+
+from auth_service.db.pool import _pools, _pools_lock
+
+
+class Command(BaseCommand):
+    help = 'Stress per-thread persistent connections vs the connection pool and report connection counts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database-url',
+            type=str,
+            default=None,
+            help='Postgres URL to test against (default: DATABASE_URL if Postgres, else a temporary SQLite file)'
+        )
+        parser.add_argument('--threads', type=int, default=32, help='Concurrent request threads')
+        parser.add_argument('--requests', type=int, default=50, help='Requests per thread')
+        parser.add_argument('--max-size', type=int, default=4, help='Pool max_size')
+        parser.add_argument('--timeout', type=float, default=10.0, help='Pool wait timeout (seconds)')
+        parser.add_argument('--hold-ms', type=float, default=2.0, help='Time each request holds its connection')
+
+    def handle(self, *args, **options):
+        url = options['database_url'] or os.environ.get('DATABASE_URL', '')
+        tmpdir = None
+        if not url.startswith(('postgres://', 'postgresql://')):
+            tmpdir = tempfile.TemporaryDirectory()
+            url = f'sqlite:///{os.path.join(tmpdir.name, "pool_stress.sqlite3")}'
+
+        base = dj_database_url.parse(url)
+        vendor = 'postgresql' if base['ENGINE'] == 'django.db.backends.postgresql' else 'sqlite'
+
+        self.stdout.write(self.style.WARNING(
+            f'DB pool stress: {options["threads"]} threads x {options["requests"]} requests '
+            f'({vendor}{", SQLite fallback" if tmpdir else ""})'
+        ))
+        self.stdout.write('=' * 72)
+        self.stdout.write(
+            f'{"mode":<12} {"opened":>7} {"peak open":>10} {"req/s":>9} {"p50":>8} {"p99":>8} '
+            f'{"waits":>6} {"timeouts":>9}'
+        )
+
+        try:
+            persistent = self._run('persistent', dict(base, CONN_MAX_AGE=None), vendor, options)
+            pooled = self._run('pooled', dict(
+                base,
+                ENGINE=settings.POOLED_DATABASE_ENGINES[base['ENGINE']],
+                CONN_MAX_AGE=0,
+                POOL={'min_size': 1, 'max_size': options['max_size'], 'timeout': options['timeout']},
+            ), vendor, options)
+        finally:
+            if tmpdir:
+                tmpdir.cleanup()
+
+        self.stdout.write('\n' + '=' * 72)
+        if pooled['peak_open'] > options['max_size'] or pooled['errors']:
+            raise CommandError(
+                f'Pool exceeded its bound or failed requests: peak {pooled["peak_open"]} '
+                f'(max_size {options["max_size"]}), {pooled["errors"]} errors'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Pooled peak {pooled["peak_open"]} connection(s) (bound {options["max_size"]}) vs '
+            f'{persistent["peak_open"]} with per-thread persistent connections'
+        ))
+
+    def _run(self, mode, db_settings, vendor, options):
+        alias = f'pool_stress_{mode}'
+        if vendor == 'postgresql':
+            db_settings['OPTIONS'] = dict(db_settings.get('OPTIONS', {}), application_name=alias)
+        # configure_settings fills in Django's per-database defaults (it expects a 'default' key)
+        connections.settings[alias] = connections.configure_settings({DEFAULT_DB_ALIAS: db_settings})[DEFAULT_DB_ALIAS]
+
+        opened = []
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+        done = threading.Barrier(options['threads'] + 1)
+        sampled = threading.Event()
+
+        def on_created(sender, connection, **kwargs):
+            if connection.alias == alias:
+                with lock:
+                    opened.append(1)
+
+        def worker():
+            conn = connections[alias]
+            try:
+                for _ in range(options['requests']):
+                    started = time.perf_counter()
+                    try:
+                        with conn.cursor() as cursor:
+                            cursor.execute('SELECT 1')
+                            cursor.fetchone()
+                        time.sleep(options['hold_ms'] / 1000)
+                    except Exception as e:
+                        with lock:
+                            errors.append(str(e))
+                    finally:
+                        # End of request: persistent keeps the connection, pooled returns it
+                        conn.close_if_unusable_or_obsolete()
+                    with lock:
+                        latencies.append((time.perf_counter() - started) * 1000)
+            finally:
+                done.wait()
+                sampled.wait()
+                conn.close()
+
+        connection_created.connect(on_created)
+        threads = [threading.Thread(target=worker) for _ in range(options['threads'])]
+        started = time.perf_counter()
+        try:
+            for thread in threads:
+                thread.start()
+            peak_samples = []
+            while done.n_waiting < options['threads']:
+                peak_samples.append(self._open_connections(alias, vendor, len(opened)))
+                time.sleep(0.01)
+            elapsed = time.perf_counter() - started
+            done.wait()
+            peak_samples.append(self._open_connections(alias, vendor, len(opened)))
+            sampled.set()
+            for thread in threads:
+                thread.join()
+        finally:
+            connection_created.disconnect(on_created)
+
+        pool_stats = {}
+        with _pools_lock:
+            pool = _pools.pop(alias, None)
+        if pool is not None:
+            pool_stats = pool.stats()
+            pool.close_all()
+            peak_open = pool_stats['peak_size']
+        else:
+            peak_open = max(peak_samples)
+        if vendor == 'postgresql':
+            peak_open = max(peak_samples)
+        del connections.settings[alias]
+
+        latencies.sort()
+        result = {
+            # connection_created fires on every checkout from the pool; count real connects there
+            'opened': pool_stats.get('created', len(opened)),
+            'peak_open': peak_open,
+            'errors': len(errors),
+        }
+        self.stdout.write(
+            f'{mode:<12} {result["opened"]:>7} {peak_open:>10} {len(latencies) / elapsed:>9.0f} '
+            f'{latencies[len(latencies) // 2]:>6.1f}ms {latencies[int(len(latencies) * 0.99)]:>6.1f}ms '
+            f'{pool_stats.get("waits", "-"):>6} {pool_stats.get("timeouts", "-"):>9}'
+        )
+        if errors:
+            self.stdout.write(self.style.ERROR(f'  {len(errors)} failed requests, e.g. {errors[0]}'))
+        return result
+
+    @staticmethod
+    def _open_connections(alias, vendor, opened_so_far):
+        """
+        Connections currently open for the alias: pg_stat_activity on Postgres;
+        on SQLite the pool size, or every connection opened when unpooled (they persist)
+        """
+        if vendor == 'postgresql':
+            import psycopg2
+
+            params = connections[alias].get_connection_params()
+            params['application_name'] = f'{alias}_probe'
+            with psycopg2.connect(**params) as probe, probe.cursor() as cursor:
+                cursor.execute('SELECT count(*) FROM pg_stat_activity WHERE application_name = %s', [alias])
+                count = cursor.fetchone()[0]
+            probe.close()
+            return count
+
+        pool = _pools.get(alias)
+        return pool.stats()['size'] if pool is not None else opened_so_far
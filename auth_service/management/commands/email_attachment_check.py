@@ -0,0 +1,201 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+import base64
+import json
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from .email_bulk_stream_check import _rss_mb, _worker_pid
+from .gunicorn_benchmark import SETUP_SCRIPT, UpstreamStub, _free_port, Command as GunicornBenchmark
+
+BOUNDARY = 'attachment-check-boundary'
+BLOCK = b'%PDF-1.4\n' + bytes(range(256)) * 4096
+
+
+class Command(BaseCommand):
+    help = 'Send emails with growing attachments through gunicorn and check worker memory does not grow with them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=str, default='1,32,128', help='Comma-separated attachment sizes (MB)')
+        parser.add_argument('--upstream-latency-ms', type=float, default=2.0, help='Latency of the stubbed Brevo API')
+        parser.add_argument('--max-growth-mb', type=float, default=8.0,
+                            help='Allowed extra worker RSS growth of the largest attachment over the smallest')
+
+    def handle(self, *args, **options):
+        if shutil.which('gunicorn') is None:
+            raise CommandError('gunicorn is not installed')
+
+        sizes = [int(float(mb) * 1024 * 1024) for mb in options['sizes'].split(',')]
+        stub = UpstreamStub(options['upstream_latency_ms'])
+        tmpdir = tempfile.mkdtemp(prefix='email-attachment-')
+        port = _free_port()
+        env = dict(
+            os.environ,
+            DJANGO_SETTINGS_MODULE='config.settings',
+            DATABASE_URL=f'sqlite:///{os.path.join(tmpdir, "attachments.sqlite3")}',
+            DEBUG='false',
+            ALLOWED_HOSTS='127.0.0.1,localhost',
+            LOG_LEVEL='ERROR',
+            GUNICORN_LOG_LEVEL='warning',
+            GUNICORN_WORKERS='1',
+            GUNICORN_MAX_REQUESTS='0',
+            GUNICORN_TIMEOUT='300',
+            PORT=str(port),
+            RATELIMIT_ENABLE='false',
+            EMAIL_CHECK_DELIVERABILITY='false',
+            EMAIL_ATTACHMENT_MAX_BYTES=str(max(sizes)),
+            EMAIL_ATTACHMENT_MAX_TOTAL_BYTES=str(max(sizes)),
+            EMAIL_PROVIDERS='brevo',
+            BREVO_API_KEY='attachments',
+            BREVO_API_URL=f'{stub.url}/v3',
+            BREVO_SENDER_EMAIL='attachments@example.com',
+            HUBSPOT_API_KEY='',
+            WARMUP_ON_STARTUP='false',
+            READINESS_PROBES_ENABLED='false',
+        )
+
+        self.stdout.write(self.style.WARNING(
+            f'Attachment memory check: {", ".join(f"{size / 1048576:g} MB" for size in sizes)} PDFs through one '
+            f'gunicorn worker to a Brevo stub ({options["upstream_latency_ms"]:.0f} ms)'
+        ))
+        self.stdout.write('=' * 80)
+        self.stdout.write(
+            f'{"attachment":>10} {"status":>7} {"elapsed":>9} {"MB/s":>7} {"RSS before":>11} {"RSS peak":>9} {"growth":>8}'
+        )
+
+        rows = []
+        proc = None
+        log_path = os.path.join(tmpdir, 'gunicorn.log')
+        try:
+            subprocess.run([sys.executable, 'manage.py', 'migrate', '--noinput', '-v', '0'],
+                           cwd=settings.BASE_DIR, env=env, check=True)
+            token = subprocess.run([sys.executable, '-c', SETUP_SCRIPT], cwd=settings.BASE_DIR, env=env,
+                                   check=True, capture_output=True, text=True).stdout.strip().splitlines()[-1]
+            with open(log_path, 'w') as log:
+                proc = subprocess.Popen(['gunicorn', '--config', 'gunicorn.conf.py'],
+                                        cwd=settings.BASE_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+            GunicornBenchmark._wait_until_ready(f'http://127.0.0.1:{port}', proc, time.monotonic())
+            worker = _worker_pid(proc.pid)
+
+            # Warm-up, small enough for the stub to keep: check the attachment arrives intact
+            self._post(port, token, 256 * 1024, worker)
+            self._check_payload(stub.last_brevo_body, 256 * 1024)
+            for size in sizes:
+                row = self._post(port, token, size, worker)
+                rows.append(row)
+                self.stdout.write(
+                    f'{size / 1048576:>8g}MB {row["status"]:>7} {row["elapsed"]:>8.2f}s '
+                    f'{size / 1048576 / row["elapsed"]:>7.1f} {row["before"]:>9.1f}MB {row["peak"]:>7.1f}MB '
+                    f'{row["peak"] - row["before"]:>6.1f}MB'
+                )
+        except (CommandError, OSError, subprocess.CalledProcessError) as e:
+            if os.path.exists(log_path):
+                with open(log_path) as log:
+                    self.stdout.write(log.read()[-1500:])
+            raise CommandError(f'Attachment check failed: {e}')
+        finally:
+            if proc is not None and proc.poll() is None:
+                proc.send_signal(signal.SIGTERM)
+                try:
+                    proc.wait(timeout=30)
+                except subprocess.TimeoutExpired:
+                    proc.kill()
+            stub.stop()
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+        self.stdout.write('=' * 80)
+        growth = [row['peak'] - row['before'] for row in rows]
+        if len(growth) > 1 and growth[-1] - growth[0] > options['max_growth_mb']:
+            raise CommandError(f'Worker memory grows with the attachment: {growth[0]:.1f} MB -> {growth[-1]:.1f} MB')
+        self.stdout.write(self.style.SUCCESS(
+            f'Completed! Worker memory growth {growth[0]:.1f} MB for {sizes[0] / 1048576:g} MB, '
+            f'{growth[-1]:.1f} MB for {sizes[-1] / 1048576:g} MB'
+        ))
+
+    @staticmethod
+    def _content(size):
+        """
+        The attachment's bytes, generated a block at a time
+        """
+        sent = 0
+        while sent < size:
+            block = BLOCK[:size - sent]
+            sent += len(block)
+            yield block
+
+    @classmethod
+    def _check_payload(cls, body, size):
+        if not body:
+            raise CommandError('The Brevo stub received no request body')
+        attachments = json.loads(body).get('attachment') or []
+        if len(attachments) != 1 or base64.b64decode(attachments[0]['content']) != b''.join(cls._content(size)):
+            raise CommandError('The attachment sent to Brevo does not match the upload')
+
+    @classmethod
+    def _post(cls, port, token, size, worker):
+        """
+        Upload one email with a size-byte PDF attachment (streamed, never built in memory here either)
+        """
+        fields = {'to_email': 'recipient@example.com', 'subject': 'Your report', 'html_content': '<p>Attached.</p>'}
+        head = ''.join(
+            f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'
+            for name, value in fields.items()
+        )
+        head += (
+            f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="attachments"; filename="report.pdf"\r\n'
+            f'Content-Type: application/pdf\r\n\r\n'
+        )
+        tail = f'\r\n--{BOUNDARY}--\r\n'.encode()
+        head = head.encode()
+
+        sock = socket.create_connection(('127.0.0.1', port))
+        sock.sendall((
+            f'POST /api/email/generic/ HTTP/1.1\r\n'
+            f'Host: 127.0.0.1\r\n'
+            f'Authorization: Token {token}\r\n'
+            f'X-Forwarded-Proto: https\r\n'
+            f'Content-Type: multipart/form-data; boundary={BOUNDARY}\r\n'
+            f'Content-Length: {len(head) + size + len(tail)}\r\n'
+            f'Connection: close\r\n\r\n'
+        ).encode())
+
+        peak = before = _rss_mb(worker)
+        stop = threading.Event()
+
+        def sample():
+            nonlocal peak
+            while not stop.wait(0.05):
+                peak = max(peak, _rss_mb(worker))
+
+        sampler = threading.Thread(target=sample, daemon=True)
+        started = time.monotonic()
+        sampler.start()
+        sock.sendall(head)
+        for block in cls._content(size):
+            sock.sendall(block)
+        sock.sendall(tail)
+
+        response = b''
+        while True:
+            data = sock.recv(65536)
+            if not data:
+                break
+            response += data
+        elapsed = time.monotonic() - started
+        stop.set()
+        sampler.join()
+        sock.close()
+        peak = max(peak, _rss_mb(worker))
+
+        status_line = response.split(b'\r\n', 1)[0].decode(errors='replace')
+        code = int(status_line.split()[1]) if len(status_line.split()) > 1 else 0
+        if code != 200:
+            raise CommandError(f'Send with a {size} byte attachment answered {status_line}: {response[-300:]!r}')
+        return {'status': code, 'elapsed': elapsed, 'before': before, 'peak': peak}
@@ -0,0 +1,115 @@
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+import logging
+import threading
+import time
+
+from auth_service.services.email_service import BrevoEmailService
+from .gunicorn_benchmark import UpstreamStub
+
+# (label, html for send n of sender i): the same notification to everyone, or a body per recipient
+WORKLOADS = [
+    ('same content', lambda i, n: '<p>Your weekly summary is ready.</p>'),
+    ('per-recipient', lambda i, n: f'<p>Hello user {i}-{n}, your weekly summary is ready.</p>'),
+]
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark Brevo micro-batching: upstream calls saved versus latency added per send'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=str, default='1,4,16,64', help='Comma-separated concurrent senders')
+        parser.add_argument('--sends', type=int, default=20, help='Sends per sender')
+        parser.add_argument('--upstream-latency-ms', type=float, default=50.0, help='Latency of the stubbed Brevo API')
+        parser.add_argument('--window-ms', type=int, default=10, help='EMAIL_BATCH_WINDOW_MS')
+        parser.add_argument('--max-size', type=int, default=50, help='EMAIL_BATCH_MAX_SIZE')
+
+    def handle(self, *args, **options):
+        stub = UpstreamStub(options['upstream_latency_ms'])
+        levels = [int(c) for c in options['concurrency'].split(',')]
+
+        self.stdout.write(self.style.WARNING(
+            f'Micro-batching benchmark: {options["sends"]} sends per sender, Brevo stubbed at '
+            f'{options["upstream_latency_ms"]:.0f} ms, window {options["window_ms"]} ms, max {options["max_size"]}'
+        ))
+        self.stdout.write('=' * 92)
+        self.stdout.write(
+            f'{"workload":<14} {"senders":>7} {"batching":>9} {"calls":>7} {"msgs/call":>10} '
+            f'{"p50":>9} {"p95":>9} {"sends/s":>9} {"failed":>7}'
+        )
+
+        logging.disable(logging.WARNING)
+        try:
+            for label, html in WORKLOADS:
+                for concurrency in levels:
+                    direct = None
+                    for batching in (False, True):
+                        row = self._run(stub, options, html, concurrency, batching)
+                        note = ''
+                        if direct is not None and row['calls']:
+                            note = (f'  {direct["calls"] / row["calls"]:.1f}x fewer calls, '
+                                    f'p50 {row["p50"] - direct["p50"]:+.1f} ms')
+                        direct = direct or row
+                        self.stdout.write(
+                            f'{label:<14} {concurrency:>7} {"on" if batching else "off":>9} {row["calls"]:>7} '
+                            f'{row["messages"] / max(row["calls"], 1):>10.1f} {row["p50"]:>7.1f}ms '
+                            f'{row["p95"]:>7.1f}ms {row["rate"]:>9.1f} {row["failures"]:>7}{note}'
+                        )
+        finally:
+            logging.disable(logging.NOTSET)
+            stub.stop()
+
+        self.stdout.write('=' * 92)
+        self.stdout.write(self.style.SUCCESS('Completed!'))
+
+    @staticmethod
+    def _run(stub, options, html, concurrency, batching):
+        with override_settings(
+            BREVO_API_KEY='bench',
+            BREVO_API_URL=f'{stub.url}/v3',
+            EMAIL_BATCHING_ENABLED=batching,
+            EMAIL_BATCH_WINDOW_MS=options['window_ms'],
+            EMAIL_BATCH_MAX_SIZE=options['max_size'],
+        ):
+            service = BrevoEmailService()
+        stub.counts.clear()
+        latencies = []
+        failures = []
+        lock = threading.Lock()
+
+        def sender(index):
+            for n in range(options['sends']):
+                started = time.perf_counter()
+                result = service.send_email(
+                    to_email=f'user{index}-{n}@example.com',
+                    subject='Weekly summary',
+                    html_content=html(index, n),
+                )
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                with lock:
+                    (latencies if result['success'] else failures).append(elapsed_ms)
+
+        threads = [threading.Thread(target=sender, args=(i,)) for i in range(concurrency)]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+        service.api_instance.api_client.rest_client.pool_manager.clear()
+
+        return {
+            'calls': stub.counts.get('/v3/smtp/email', 0),
+            'messages': stub.counts.get('messages', 0),
+            'p50': _percentile(latencies, 0.5),
+            'p95': _percentile(latencies, 0.95),
+            'rate': len(latencies) / elapsed,
+            'failures': len(failures),
+        }
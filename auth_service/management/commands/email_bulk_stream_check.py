@@ -0,0 +1,235 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+import json
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from .gunicorn_benchmark import SETUP_SCRIPT, UpstreamStub, _free_port, Command as GunicornBenchmark
+
+
+def _rss_mb(pid):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def _worker_pid(master_pid):
+    with open(f'/proc/{master_pid}/task/{master_pid}/children') as f:
+        children = [int(p) for p in f.read().split()]
+    if not children:
+        raise CommandError('gunicorn has no worker process')
+    return children[0]
+
+
+class Command(BaseCommand):
+    help = 'Stream NDJSON bulk sends of growing size through gunicorn and check worker memory stays flat'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=str, default='10000,100000', help='Comma-separated recipient counts')
+        parser.add_argument('--upstream-latency-ms', type=float, default=2.0, help='Latency of the stubbed Brevo API')
+        parser.add_argument('--in-flight', type=int, default=8, help='EMAIL_BULK_IN_FLIGHT')
+        parser.add_argument('--max-growth-mb', type=float, default=10.0,
+                            help='Allowed extra worker RSS growth of the largest run over the smallest')
+
+    def handle(self, *args, **options):
+        if shutil.which('gunicorn') is None:
+            raise CommandError('gunicorn is not installed')
+
+        sizes = [int(n) for n in options['lines'].split(',')]
+        stub = UpstreamStub(options['upstream_latency_ms'])
+        tmpdir = tempfile.mkdtemp(prefix='email-bulk-')
+        port = _free_port()
+        env = dict(
+            os.environ,
+            DJANGO_SETTINGS_MODULE='config.settings',
+            DATABASE_URL=f'sqlite:///{os.path.join(tmpdir, "bulk.sqlite3")}',
+            DEBUG='false',
+            ALLOWED_HOSTS='127.0.0.1,localhost',
+            LOG_LEVEL='ERROR',
+            GUNICORN_LOG_LEVEL='warning',
+            GUNICORN_WORKERS='1',
+            GUNICORN_MAX_REQUESTS='0',
+            PORT=str(port),
+            RATELIMIT_ENABLE='false',
+            EMAIL_CHECK_DELIVERABILITY='false',
+            EMAIL_BULK_IN_FLIGHT=str(options['in_flight']),
+            # Measures the streaming path: the bulk lane's concurrency cap would only make it slower
+            EMAIL_LANES_ENABLED='false',
+            BREVO_API_KEY='bulk',
+            BREVO_API_URL=f'{stub.url}/v3',
+            BREVO_SENDER_EMAIL='bulk@example.com',
+            HUBSPOT_API_KEY='',
+            WARMUP_ON_STARTUP='false',
+            READINESS_PROBES_ENABLED='false',
+        )
+
+        self.stdout.write(self.style.WARNING(
+            f'Bulk NDJSON stream check: {", ".join(str(n) for n in sizes)} recipients through one gunicorn worker, '
+            f'{options["in_flight"]} in flight, Brevo stubbed at {options["upstream_latency_ms"]:.0f} ms'
+        ))
+        self.stdout.write('=' * 96)
+        self.stdout.write(
+            f'{"recipients":>10} {"results":>8} {"sent":>8} {"elapsed":>9} {"lines/s":>8} '
+            f'{"RSS before":>11} {"RSS peak":>9} {"growth":>8}  order'
+        )
+
+        rows = []
+        proc = None
+        log_path = os.path.join(tmpdir, 'gunicorn.log')
+        try:
+            subprocess.run([sys.executable, 'manage.py', 'migrate', '--noinput', '-v', '0'],
+                           cwd=settings.BASE_DIR, env=env, check=True)
+            token = subprocess.run([sys.executable, '-c', SETUP_SCRIPT], cwd=settings.BASE_DIR, env=env,
+                                   check=True, capture_output=True, text=True).stdout.strip().splitlines()[-1]
+            with open(log_path, 'w') as log:
+                proc = subprocess.Popen(['gunicorn', '--config', 'gunicorn.conf.py'],
+                                        cwd=settings.BASE_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+            GunicornBenchmark._wait_until_ready(f'http://127.0.0.1:{port}', proc, time.monotonic())
+            worker = _worker_pid(proc.pid)
+
+            # A small warm-up run so imports and pools are not counted as growth
+            self._post(port, token, 200, worker)
+            for size in sizes:
+                row = self._post(port, token, size, worker)
+                rows.append(row)
+                self.stdout.write(
+                    f'{size:>10} {row["results"]:>8} {row["sent"]:>8} {row["elapsed"]:>8.1f}s '
+                    f'{row["results"] / row["elapsed"]:>8.0f} {row["before"]:>9.1f}MB {row["peak"]:>7.1f}MB '
+                    f'{row["peak"] - row["before"]:>6.1f}MB  {"ok" if row["ordered"] else "WRONG"}'
+                )
+        except (CommandError, OSError, subprocess.CalledProcessError) as e:
+            if os.path.exists(log_path):
+                with open(log_path) as log:
+                    self.stdout.write(log.read()[-1500:])
+            raise CommandError(f'Bulk stream check failed: {e}')
+        finally:
+            if proc is not None and proc.poll() is None:
+                proc.send_signal(signal.SIGTERM)
+                try:
+                    proc.wait(timeout=30)
+                except subprocess.TimeoutExpired:
+                    proc.kill()
+            stub.stop()
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+        self.stdout.write('=' * 96)
+        problems = []
+        for size, row in zip(sizes, rows):
+            if row['results'] != size or row['sent'] != size or not row['ordered']:
+                problems.append(f'{size} recipients: {row["results"]} results, {row["sent"]} sent, ordered={row["ordered"]}')
+        growth = [row['peak'] - row['before'] for row in rows]
+        if len(growth) > 1 and growth[-1] - growth[0] > options['max_growth_mb']:
+            problems.append(f'worker memory grows with the list: {growth[0]:.1f} MB -> {growth[-1]:.1f} MB')
+        if problems:
+            raise CommandError('; '.join(problems))
+        self.stdout.write(self.style.SUCCESS(
+            f'Completed! Worker memory growth {growth[0]:.1f} MB for {sizes[0]} recipients, '
+            f'{growth[-1]:.1f} MB for {sizes[-1]}'
+        ))
+
+    @staticmethod
+    def _post(port, token, count, worker):
+        """
+        Upload count NDJSON lines (chunked, on another thread) while reading the streamed results
+        """
+        sock = socket.create_connection(('127.0.0.1', port))
+        sock.sendall((
+            f'POST /api/email/bulk/?type=generic HTTP/1.1\r\n'
+            f'Host: 127.0.0.1\r\n'
+            f'Authorization: Token {token}\r\n'
+            f'X-Forwarded-Proto: https\r\n'
+            f'Content-Type: application/x-ndjson\r\n'
+            f'Transfer-Encoding: chunked\r\n'
+            f'Connection: close\r\n\r\n'
+        ).encode())
+
+        def upload():
+            batch = []
+            for n in range(count):
+                batch.append(json.dumps({
+                    'to_email': f'user{n}@example.com',
+                    'subject': 'Service update',
+                    'html_content': '<p>Our service hours are changing next week.</p>',
+                }))
+                if len(batch) == 500 or n == count - 1:
+                    data = ('\n'.join(batch) + '\n').encode()
+                    sock.sendall(f'{len(data):x}\r\n'.encode() + data + b'\r\n')
+                    batch = []
+            sock.sendall(b'0\r\n\r\n')
+
+        peak = before = _rss_mb(worker)
+        stop = threading.Event()
+
+        def sample():
+            nonlocal peak
+            while not stop.wait(0.1):
+                peak = max(peak, _rss_mb(worker))
+
+        uploader = threading.Thread(target=upload, daemon=True)
+        sampler = threading.Thread(target=sample, daemon=True)
+        started = time.monotonic()
+        uploader.start()
+        sampler.start()
+
+        results, ordered, totals = 0, True, {}
+        reader = sock.makefile('rb')
+        status_line = reader.readline()
+        if b' 200 ' not in status_line:
+            raise CommandError(f'Bulk send answered {status_line.decode().strip()}')
+        chunked = False
+        while True:
+            header = reader.readline().strip().lower()
+            if not header:
+                break
+            chunked = chunked or header == b'transfer-encoding: chunked'
+
+        def body_lines():
+            pending = b''
+            while True:
+                if chunked:
+                    size = int(reader.readline().split(b';')[0], 16)
+                    data = reader.read(size)
+                    reader.readline()
+                    if not size:
+                        break
+                else:
+                    data = reader.read1(65536)
+                    if not data:
+                        break
+                pending += data
+                *complete, pending = pending.split(b'\n')
+                yield from complete
+
+        for line in body_lines():
+            result = json.loads(line)
+            if result.get('done'):
+                totals = result
+                continue
+            results += 1
+            ordered = ordered and result.get('line') == results
+        elapsed = time.monotonic() - started
+        stop.set()
+        uploader.join()
+        sock.close()
+        peak = max(peak, _rss_mb(worker))
+
+        return {
+            'results': results,
+            'sent': totals.get('sent', 0),
+            'ordered': ordered,
+            'elapsed': elapsed,
+            'before': before,
+            'peak': peak,
+        }
@@ -0,0 +1,183 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from django.test import override_settings
+from unittest import mock
+import logging
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from .smtp_transport_benchmark import _percentile
+
+NOTE = re.compile(r'note-\d+')
+
+
+class Command(BaseCommand):
+    help = ('Send bursts of notifications to a product with a digest window and check every one is delivered '
+            'exactly once in fewer emails, including the windows of a worker that crashed')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipients', type=int, default=300)
+        parser.add_argument('--max-per-recipient', type=int, default=8, help='Notifications per recipient (1 to this)')
+        parser.add_argument('--duration', type=float, default=8.0, help='Seconds the notifications are spread over')
+        parser.add_argument('--window', type=int, default=3, help='Product digest window (seconds)')
+        parser.add_argument('--threads', type=int, default=8, help='Request threads adding notifications')
+        parser.add_argument('--crashed', type=int, default=100, help='Notifications left open by a crashed worker')
+        parser.add_argument('--inner', action='store_true', help='(internal) run against the current database')
+
+    def handle(self, *args, **options):
+        if options['inner']:
+            return self._run(options)
+
+        # A scratch SQLite database
+        tmpdir = tempfile.mkdtemp(prefix='email-digest-')
+        env = dict(os.environ, DATABASE_URL=f'sqlite:///{os.path.join(tmpdir, "digest.sqlite3")}', LOG_LEVEL='ERROR')
+        argv = [sys.executable, 'manage.py', 'email_digest_benchmark', '--inner']
+        for name in ('recipients', 'max_per_recipient', 'duration', 'window', 'threads', 'crashed'):
+            argv += [f'--{name.replace("_", "-")}', str(options[name])]
+        try:
+            code = subprocess.run(argv, cwd=settings.BASE_DIR, env=env).returncode
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+        if code:
+            raise CommandError('Digest benchmark failed')
+
+    def _run(self, options):
+        from django.contrib.auth.models import User
+        from django.db import connection
+        from auth_service.models import DigestItem, Product
+        from auth_service.services.email_digest import EmailDigest
+        from auth_service.services.email_pipeline import EmailPipeline
+        from auth_service.services.product_registry import ProductRegistry
+
+        call_command('migrate', verbosity=0)
+        user, _ = User.objects.get_or_create(username='digest_benchmark')
+        Product.objects.update_or_create(name='benchmark', defaults=dict(
+            user=user, display_name='Benchmark', test_tenant_id='bench-test', prod_tenant_id='bench-prod',
+            digest_window_seconds=options['window']))
+        product = ProductRegistry.load().by_name['benchmark']
+
+        # Each notification: (when, recipient, note id)
+        plan = []
+        for recipient in range(options['recipients']):
+            for _ in range(random.randint(1, options['max_per_recipient'])):
+                plan.append((random.uniform(0, options['duration']), f'user{recipient}@example.com', len(plan)))
+        plan.sort()
+
+        self.stdout.write(self.style.WARNING(
+            f'Digest benchmark: {len(plan)} notifications to {options["recipients"]} recipients over '
+            f'{options["duration"]:g}s, {options["window"]}s window, {options["threads"]} request threads, '
+            f'{options["crashed"]} left by a crashed worker'
+        ))
+        self.stdout.write('=' * 84)
+
+        emails = []
+        lock = threading.Lock()
+
+        def process(email_type, product, data, execution=None):
+            with lock:
+                # A digest shows each notification's subject and body: count it once
+                emails.append((data['to_email'], sorted(set(NOTE.findall(data['html_content'])))))
+            return {}, {'success': True, 'message_id': f'<{len(emails)}>'}
+
+        latencies = []
+
+        def add(when, recipient, note, started):
+            delay = started + when - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            begun = time.perf_counter()
+            EmailDigest.add(product, {
+                'to_email': recipient, 'environment': 'prod', 'subject': f'Update note-{note}',
+                'html_content': f'<html><body><p>Something happened (note-{note})</p></body></html>',
+            })
+            latencies.append((time.perf_counter() - begun) * 1000)
+
+        def requests(share, started):
+            try:
+                for entry in share:
+                    add(*entry, started)
+            finally:
+                connection.close()
+
+        logging.disable(logging.WARNING)
+        with override_settings(EMAIL_DIGEST_SWEEP_INTERVAL=2), mock.patch.object(EmailPipeline, 'process', process):
+            try:
+                EmailDigest.start()
+                started = time.monotonic()
+                threads = [threading.Thread(target=requests, args=(plan[n::options['threads']], started))
+                           for n in range(options['threads'])]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                added = time.monotonic() - started
+                self._wait(DigestItem, options['window'] + 10)
+                storm = len(emails)
+
+                # A worker dies with open windows: its stored notifications must go out through the sweep
+                crashed = [(0, f'crash{n % 20}@example.com', len(plan) + n) for n in range(options['crashed'])]
+                for entry in crashed:
+                    add(*entry, time.monotonic())
+                EmailDigest._stop.set()
+                EmailDigest._thread.join()
+                EmailDigest._forget_after_fork()
+                crashed_at = time.monotonic()
+                EmailDigest.start()
+                recovered = self._wait(DigestItem, options['window'] + 20) and time.monotonic() - crashed_at
+            finally:
+                EmailDigest.stop()
+                logging.disable(logging.NOTSET)
+
+        expected = {note for _, _, note in plan + crashed}
+        delivered = [note for _, notes in emails for note in notes]
+        unique = {int(note.split('-')[1]) for note in delivered}
+        remaining = DigestItem.objects.count()
+        stats = EmailDigest.snapshot()
+
+        self.stdout.write(f'{"notifications stored":<30} {len(plan):>8} in {added:.1f}s')
+        self.stdout.write(f'{"add latency p50 / p99":<30} {_percentile(latencies, 0.5):>6.2f}ms '
+                          f'{_percentile(latencies, 0.99):>6.2f}ms')
+        self.stdout.write(f'{"emails sent":<30} {storm:>8} ({storm / len(plan):.0%} of notifications, '
+                          f'{len(plan) / max(storm, 1):.1f} per email)')
+        self.stdout.write(f'{"largest digest":<30} {max(len(notes) for _, notes in emails):>8}')
+        self.stdout.write(f'{"crashed worker recovered in":<30} {recovered or 0:>7.1f}s '
+                          f'({len(emails) - storm} emails for {options["crashed"]} notifications)')
+        self.stdout.write(f'{"rows left":<30} {remaining:>8}   stats {stats}')
+        self.stdout.write('=' * 84)
+
+        problems = []
+        if unique != expected:
+            problems.append(f'{len(expected - unique)} notifications never delivered')
+        if len(delivered) != len(unique):
+            problems.append(f'{len(delivered) - len(unique)} notifications delivered twice')
+        if remaining:
+            problems.append(f'{remaining} rows left')
+        if storm >= len(plan):
+            problems.append('no emails were merged')
+        if problems:
+            self.stdout.write(self.style.ERROR('; '.join(problems)))
+            sys.exit(1)
+        self.stdout.write(self.style.SUCCESS('Completed!'))
+
+    @staticmethod
+    def _wait(model, timeout):
+        """
+        Wait until every stored notification was sent
+
+        Returns:
+            bool: False on timeout
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if not model.objects.exists():
+                return True
+            time.sleep(0.2)
+        return False
@@ -0,0 +1,222 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+from .gunicorn_benchmark import SETUP_SCRIPT, UpstreamStub, _free_port, Command as GunicornBenchmark
+
+# (label, environment overrides)
+CONFIGURATIONS = [
+    ('lanes off', {'EMAIL_LANES_ENABLED': 'false'}),
+    ('lanes on', {'EMAIL_LANES_ENABLED': 'true'}),
+]
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = 'Load test: password reset latency under a generic-mail flood, with and without priority lanes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--auth-clients', type=int, default=4, help='Concurrent password reset clients')
+        parser.add_argument('--flood-clients', type=int, default=64, help='Concurrent generic email clients')
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds per phase')
+        parser.add_argument('--upstream-latency-ms', type=float, default=100.0, help='Latency of each stubbed upstream call')
+        parser.add_argument('--workers', type=int, default=2, help='gunicorn workers')
+
+    def handle(self, *args, **options):
+        if shutil.which('gunicorn') is None:
+            raise CommandError('gunicorn is not installed')
+
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.primitives.asymmetric import rsa
+
+        stub = UpstreamStub(options['upstream_latency_ms'])
+        tmpdir = tempfile.mkdtemp(prefix='email-lanes-')
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        pem = key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        ).decode()
+
+        env = dict(
+            os.environ,
+            DJANGO_SETTINGS_MODULE='config.settings',
+            DATABASE_URL=f'sqlite:///{os.path.join(tmpdir, "lanes.sqlite3")}',
+            DEBUG='false',
+            ALLOWED_HOSTS='127.0.0.1,localhost',
+            LOG_LEVEL='ERROR',
+            GUNICORN_LOG_LEVEL='warning',
+            GUNICORN_WORKERS=str(options['workers']),
+            RATELIMIT_ENABLE='false',
+            RATE_LIMIT_PER_HOUR='100000000/hour',
+            EMAIL_CHECK_DELIVERABILITY='false',
+            EMAIL_RESEND_COOLDOWN='0',
+            FIREBASE_CLIENT='lean',
+            FIREBASE_PROD_PROJECT_ID='lanes-project',
+            FIREBASE_PROD_PRIVATE_KEY=pem.replace('\n', '\\n'),
+            FIREBASE_PROD_CLIENT_EMAIL='lanes@lanes-project.iam.gserviceaccount.com',
+            FIREBASE_PROD_TOKEN_URI=f'{stub.url}/token',
+            IDENTITY_TOOLKIT_URL=f'{stub.url}/v1',
+            BREVO_API_KEY='lanes',
+            BREVO_API_URL=f'{stub.url}/v3',
+            BREVO_SENDER_EMAIL='lanes@example.com',
+            HUBSPOT_API_KEY='',
+            READINESS_PROBES_ENABLED='false',
+        )
+
+        try:
+            subprocess.run([sys.executable, 'manage.py', 'migrate', '--noinput', '-v', '0'],
+                           cwd=settings.BASE_DIR, env=env, check=True)
+            token = subprocess.run([sys.executable, '-c', SETUP_SCRIPT], cwd=settings.BASE_DIR, env=env,
+                                   check=True, capture_output=True, text=True).stdout.strip().splitlines()[-1]
+
+            self.stdout.write(self.style.WARNING(
+                f'Email lane load test: {options["auth_clients"]} password reset clients, then the same with '
+                f'{options["flood_clients"]} generic email clients flooding; upstreams stubbed at '
+                f'{options["upstream_latency_ms"]:.0f} ms, {options["duration"]:.0f}s per phase'
+            ))
+            self.stdout.write('=' * 100)
+            self.stdout.write(
+                f'{"configuration":<12} {"phase":<9} {"resets":>7} {"p50":>9} {"p95":>9} {"p99":>9} {"errors":>7} '
+                f'{"generic/s":>10} {"503s":>7}'
+            )
+
+            results = {}
+            for label, overrides in CONFIGURATIONS:
+                results[label] = self._run_configuration(label, dict(env, **overrides), token, options, tmpdir)
+        finally:
+            stub.stop()
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+        self.stdout.write('=' * 100)
+        lanes = results.get('lanes on')
+        if not lanes:
+            raise CommandError('Load test did not complete')
+        baseline, flood = lanes['baseline']['p95'], lanes['flood']['p95']
+        ratio = flood / baseline if baseline else 0
+        message = f'Password reset p95 with lanes: {baseline:.0f} ms idle, {flood:.0f} ms under flood ({ratio:.2f}x)'
+        self.stdout.write((self.style.SUCCESS if ratio <= 1.5 else self.style.ERROR)(message))
+
+    def _run_configuration(self, label, env, token, options, tmpdir):
+        port = _free_port()
+        env['PORT'] = str(port)
+        base = f'http://127.0.0.1:{port}'
+        log_path = os.path.join(tmpdir, f'gunicorn-{port}.log')
+        with open(log_path, 'w') as log:
+            proc = subprocess.Popen(
+                ['gunicorn', '--config', 'gunicorn.conf.py'],
+                cwd=settings.BASE_DIR, env=env, stdout=log, stderr=subprocess.STDOUT
+            )
+        phases = {}
+        try:
+            GunicornBenchmark._wait_until_ready(base, proc, time.monotonic())
+            for phase, flood_clients in (('baseline', 0), ('flood', options['flood_clients'])):
+                phases[phase] = stats = self._load(base, token, options, flood_clients)
+                self.stdout.write(
+                    f'{label:<12} {phase:<9} {stats["count"]:>7} {stats["p50"]:>7.0f}ms {stats["p95"]:>7.0f}ms '
+                    f'{stats["p99"]:>7.0f}ms {stats["errors"]:>7} {stats["generic_rate"]:>10.1f} {stats["rejected"]:>7}'
+                )
+            lanes = requests.get(f'{base}/api/email/lanes/', headers=self._headers(token), timeout=5).json()
+            if lanes.get('lanes', {}).get('enabled'):
+                for name, lane in lanes['lanes']['lanes'].items():
+                    self.stdout.write(
+                        f'{"":<12} lane {name:<8} admitted {lane["admitted"]:>6}  rejected {lane["rejected"]:>6}  '
+                        f'wait p95 {lane["wait_ms"]["p95"]:>7.1f} ms (one worker)'
+                    )
+        except (CommandError, requests.RequestException) as e:
+            proc.kill()
+            with open(log_path) as log:
+                output = log.read()
+            self.stdout.write(self.style.ERROR(f'{label:<12} failed: {e}\n{output[-1500:]}'))
+        finally:
+            if proc.poll() is None:
+                proc.send_signal(signal.SIGTERM)
+                try:
+                    proc.wait(timeout=30)
+                except subprocess.TimeoutExpired:
+                    proc.kill()
+        return phases
+
+    @staticmethod
+    def _headers(token):
+        return {
+            'Authorization': f'Token {token}',
+            'Content-Type': 'application/json',
+            'X-Forwarded-Proto': 'https',
+        }
+
+    def _load(self, base, token, options, flood_clients):
+        latencies = []
+        counts = {'errors': 0, 'generic': 0, 'rejected': 0}
+        lock = threading.Lock()
+        stop = threading.Event()
+        headers = self._headers(token)
+
+        def reset_client(index):
+            session = requests.Session()
+            body = json.dumps({'email': f'user{index}@example.com', 'environment': 'prod'})
+            while not stop.is_set():
+                started = time.perf_counter()
+                try:
+                    ok = session.post(f'{base}/api/email/password-reset/', data=body, headers=headers,
+                                      timeout=60).status_code == 200
+                except requests.RequestException:
+                    ok = False
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                with lock:
+                    if ok:
+                        latencies.append(elapsed_ms)
+                    else:
+                        counts['errors'] += 1
+
+        def flood_client(index):
+            session = requests.Session()
+            body = json.dumps({'to_email': f'list{index}@example.com', 'subject': 'News', 'html_content': '<p>News</p>'})
+            while not stop.is_set():
+                try:
+                    response = session.post(f'{base}/api/email/generic/', data=body, headers=headers, timeout=60)
+                except requests.RequestException:
+                    continue
+                with lock:
+                    if response.status_code == 200:
+                        counts['generic'] += 1
+                    elif response.status_code == 503:
+                        counts['rejected'] += 1
+                if response.status_code == 503:
+                    # Bulk senders are expected to honour Retry-After
+                    stop.wait(float(response.headers.get('Retry-After') or 1))
+
+        threads = [threading.Thread(target=reset_client, args=(i,)) for i in range(options['auth_clients'])]
+        threads += [threading.Thread(target=flood_client, args=(i,)) for i in range(flood_clients)]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        stop.wait(options['duration'])
+        stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        return {
+            'count': len(latencies),
+            'p50': _percentile(latencies, 0.5),
+            'p95': _percentile(latencies, 0.95),
+            'p99': _percentile(latencies, 0.99),
+            'errors': counts['errors'],
+            'generic_rate': counts['generic'] / elapsed,
+            'rejected': counts['rejected'],
+        }
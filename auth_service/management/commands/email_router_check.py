@@ -0,0 +1,217 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+import logging
+import socket
+import socketserver
+import threading
+import time
+
+from auth_service.services import smtp_transport
+from auth_service.services.email_providers import EmailRouter
+from auth_service.services.email_service import BrevoEmailService
+from .gunicorn_benchmark import UpstreamStub
+
+
+class SmtpSink:
+    """
+    Minimal local SMTP server that accepts every message and keeps it in memory.
+
+    rtt_ms simulates network round trips: replies are held back that long each
+    time the sink has answered everything the client sent so far (so pipelined
+    commands share one round trip, as on a real link).
+    """
+
+    def __init__(self, latency_ms=0, rtt_ms=0, pipelining=True):
+        self.latency_ms = latency_ms
+        self.rtt_ms = rtt_ms
+        self.pipelining = pipelining
+        self.messages = []
+        self.connections = 0
+        self._sockets = set()
+        self._lock = threading.Lock()
+        sink = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                with sink._lock:
+                    sink.connections += 1
+                    sink._sockets.add(self.request)
+                try:
+                    self.session()
+                except OSError:
+                    pass
+                finally:
+                    with sink._lock:
+                        sink._sockets.discard(self.request)
+
+            def session(self):
+                sock = self.request
+                buffer = bytearray()
+                position = 0
+                replies = ['220 sink ESMTP']
+                data, lines = False, []
+                while True:
+                    end = buffer.find(b'\n', position)
+                    if end < 0:
+                        if replies:
+                            time.sleep(sink.rtt_ms / 1000)
+                            sock.sendall(''.join(f'{reply}\r\n' for reply in replies).encode())
+                            replies = []
+                        del buffer[:position]
+                        position = 0
+                        chunk = sock.recv(65536)
+                        if not chunk:
+                            return
+                        buffer += chunk
+                        continue
+                    line = bytes(buffer[position:end + 1])
+                    position = end + 1
+
+                    if data:
+                        if line.rstrip(b'\r\n') == b'.':
+                            data = False
+                            time.sleep(sink.latency_ms / 1000)
+                            with sink._lock:
+                                sink.messages.append(b''.join(lines))
+                            lines = []
+                            replies.append('250 OK queued')
+                        else:
+                            lines.append(line)
+                        continue
+                    command = line[:4].upper()
+                    if command == b'EHLO':
+                        replies += ['250-sink', '250-PIPELINING', '250 8BITMIME'] if sink.pipelining else ['250 sink']
+                    elif command == b'DATA':
+                        data = True
+                        replies.append('354 End data with <CR><LF>.<CR><LF>')
+                    elif command == b'QUIT':
+                        sock.sendall(''.join(f'{reply}\r\n' for reply in replies + ['221 Bye']).encode())
+                        return
+                    else:
+                        # HELO, MAIL, RCPT, RSET, NOOP
+                        replies.append('250 OK')
+
+        class Server(socketserver.ThreadingTCPServer):
+            daemon_threads = True
+            allow_reuse_address = True
+            request_queue_size = 256
+
+        self.server = Server(('127.0.0.1', 0), Handler)
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def disconnect(self):
+        """
+        Drop every open session (as a relay does with idle connections)
+        """
+        with self._lock:
+            sockets = list(self._sockets)
+        for sock in sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def stop(self):
+        self.server.shutdown()
+
+
+class Command(BaseCommand):
+    help = 'Exercise the email router (Brevo stub + local SMTP sink): routing, failover, hedging and recovery'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sends', type=int, default=10, help='Sends per scenario')
+        parser.add_argument('--hedge-ms', type=int, default=200, help='EMAIL_ROUTER_HEDGE_MS')
+
+    def handle(self, *args, **options):
+        stub = UpstreamStub(30)
+        sink = SmtpSink(latency_ms=30)
+        overrides = dict(
+            EMAIL_PROVIDERS=['brevo', 'smtp'],
+            EMAIL_ROUTER_WINDOW_SECONDS=2,
+            EMAIL_ROUTER_HEDGE_MS=options['hedge_ms'],
+            EMAIL_BATCHING_ENABLED=False,
+            BREVO_API_KEY='check',
+            BREVO_API_URL=f'{stub.url}/v3',
+            BREVO_SENDER_EMAIL='check@example.com',
+            EMAIL_HOST='127.0.0.1',
+            EMAIL_PORT=sink.port,
+            EMAIL_USE_TLS=False,
+            EMAIL_USE_SSL=False,
+            EMAIL_HOST_USER='',
+            EMAIL_HOST_PASSWORD='',
+        )
+
+        self.stdout.write(self.style.WARNING(
+            f'Email router check: brevo stub and SMTP sink at 30 ms, hedge after {options["hedge_ms"]} ms'
+        ))
+        self.stdout.write('=' * 84)
+        self.stdout.write(f'{"scenario":<34} {"hedged":>6} {"brevo":>6} {"smtp":>6} {"failed":>7} {"p50":>9} {"max":>9}')
+
+        failures = []
+        logging.disable(logging.CRITICAL)
+        try:
+            with override_settings(**overrides):
+                EmailRouter.reset()
+                BrevoEmailService.close_instance()
+                smtp_transport.close_pools()
+
+                def scenario(label, hedge, expect, brevo_latency_ms=None, brevo_status=201):
+                    stub.brevo_latency_ms = brevo_latency_ms
+                    stub.brevo_status = brevo_status
+                    delivered = stub.counts.get('messages', 0) + len(sink.messages)
+                    counts, latencies = self._sends(options['sends'], hedge)
+                    delivered = stub.counts.get('messages', 0) + len(sink.messages) - delivered
+                    self.stdout.write(
+                        f'{label:<34} {"yes" if hedge else "no":>6} {counts["brevo"]:>6} {counts["smtp"]:>6} '
+                        f'{counts["failed"]:>7} {latencies[len(latencies) // 2]:>7.0f}ms {latencies[-1]:>7.0f}ms'
+                    )
+                    if (expect and counts[expect] < options['sends'] - 1) or counts['failed']:
+                        failures.append(f'{label}: expected delivery via {expect}, got {counts}')
+                    if delivered != options['sends']:
+                        failures.append(f'{label}: {delivered} messages delivered for {options["sends"]} sends')
+
+                scenario('healthy', False, 'brevo')
+                # Connected but slow: the hedge must not race a second copy through SMTP
+                # (the router then prefers the faster SMTP relay, so either provider may deliver)
+                scenario('brevo slow (1 s), auth hedged', True, None, brevo_latency_ms=1000)
+                EmailRouter.reset()
+                scenario('brevo down (HTTP 503), failover', False, 'smtp', brevo_status=503)
+                ranked = [provider.name for provider in EmailRouter.ranked()]
+                self.stdout.write(f'{"":<34} ranked after outage: {", ".join(ranked)}')
+                if ranked[0] != 'smtp':
+                    failures.append(f'brevo still preferred after outage: {ranked}')
+                time.sleep(2.5)
+                scenario('brevo recovered (window expired)', False, 'brevo')
+                stats = EmailRouter.stats()
+            BrevoEmailService.close_instance()
+            smtp_transport.close_pools()
+            EmailRouter.reset()
+        finally:
+            logging.disable(logging.NOTSET)
+            stub.stop()
+            sink.stop()
+
+        self.stdout.write('=' * 84)
+        for name, provider in stats.items():
+            self.stdout.write(f'{name:<8} {provider}')
+        self.stdout.write(f'SMTP sink received {len(sink.messages)} messages, Brevo stub {stub.counts.get("messages", 0)}')
+        if failures:
+            raise CommandError('; '.join(failures))
+        self.stdout.write(self.style.SUCCESS('Completed! Routing, failover, hedging and recovery behave as expected'))
+
+    @staticmethod
+    def _sends(count, hedge):
+        counts = {'brevo': 0, 'smtp': 0, 'failed': 0}
+        latencies = []
+        for n in range(count):
+            started = time.perf_counter()
+            result = EmailRouter.send({
+                'to_email': f'user{n}@example.com',
+                'subject': 'Router check',
+                'html_content': '<p>Router check</p>',
+                'text_content': 'Router check',
+            }, hedge=hedge)
+            latencies.append((time.perf_counter() - started) * 1000)
+            counts[result['provider'] if result['success'] else 'failed'] += 1
+        return counts, sorted(latencies)
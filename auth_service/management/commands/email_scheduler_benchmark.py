@@ -0,0 +1,174 @@
+from datetime import timedelta
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from django.test import override_settings
+from django.utils import timezone
+from unittest import mock
+import logging
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from .smtp_transport_benchmark import _percentile
+
+
+class Command(BaseCommand):
+    help = ('Fill a scratch scheduled_emails table with many far-future sends and check the scheduler '
+            'only loads the near window, fires due sends on time and exactly as often as expected')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pending', type=int, default=200000, help='Sends scheduled 1 hour to 30 days ahead')
+        parser.add_argument('--due', type=int, default=3000, help='Sends due within --due-within seconds')
+        parser.add_argument('--due-within', type=int, default=20)
+        parser.add_argument('--stale-leases', type=int, default=50,
+                            help='Due sends leased by a worker that died (their lease has expired)')
+        parser.add_argument('--horizon', type=int, default=60, help='EMAIL_SCHEDULE_HORIZON_SECONDS')
+        parser.add_argument('--load-interval', type=int, default=5, help='EMAIL_SCHEDULE_LOAD_INTERVAL')
+        parser.add_argument('--inner', action='store_true', help='(internal) run against the current database')
+
+    def handle(self, *args, **options):
+        if options['inner']:
+            return self._run(options)
+
+        # A scratch SQLite database: the benchmark writes hundreds of thousands of rows
+        tmpdir = tempfile.mkdtemp(prefix='email-schedule-')
+        env = dict(os.environ, DATABASE_URL=f'sqlite:///{os.path.join(tmpdir, "schedule.sqlite3")}', LOG_LEVEL='ERROR')
+        argv = [sys.executable, 'manage.py', 'email_scheduler_benchmark', '--inner']
+        for name in ('pending', 'due', 'due_within', 'stale_leases', 'horizon', 'load_interval'):
+            argv += [f'--{name.replace("_", "-")}', str(options[name])]
+        try:
+            code = subprocess.run(argv, cwd=settings.BASE_DIR, env=env).returncode
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+        if code:
+            raise CommandError('Scheduler benchmark failed')
+
+    def _run(self, options):
+        from django.contrib.auth.models import User
+        from django.db import connection
+        from django.db.models import Q
+        from auth_service.models import Product, ScheduledEmail
+        from auth_service.services.email_pipeline import EmailPipeline
+        from auth_service.services.email_scheduler import EmailScheduler
+
+        call_command('migrate', verbosity=0)
+        user, _ = User.objects.get_or_create(username='schedule_benchmark')
+        Product.objects.update_or_create(name='benchmark', defaults=dict(
+            user=user, display_name='Benchmark', test_tenant_id='bench-test', prod_tenant_id='bench-prod'))
+
+        self.stdout.write(self.style.WARNING(
+            f'Scheduler benchmark: {options["pending"]} far-future sends, {options["due"]} due within '
+            f'{options["due_within"]}s, {options["stale_leases"]} with expired leases; horizon '
+            f'{options["horizon"]}s, loads every {options["load_interval"]}s'
+        ))
+        self.stdout.write('=' * 84)
+
+        started = time.perf_counter()
+        now = timezone.now()
+        rows = [self._row(f'later{n}', now + timedelta(seconds=random.uniform(3600, 30 * 86400)))
+                for n in range(options['pending'])]
+        ScheduledEmail.objects.bulk_create(rows, batch_size=2000)
+
+        # Near rows last, so their due times are not spent storing the others
+        now = timezone.now()
+        rows = [self._row(f'due{n}', now + timedelta(seconds=2 + random.uniform(0, options['due_within'])))
+                for n in range(options['due'])]
+        for n in range(options['stale_leases']):
+            row = self._row(f'stale{n}', now - timedelta(seconds=30))
+            row.claimed_by, row.lease_until = 'dead-worker:1/0', now - timedelta(seconds=1)
+            rows.append(row)
+        # Due, but leased by a live worker: must be left alone
+        for n in range(10):
+            row = self._row(f'leased{n}', now + timedelta(seconds=3))
+            row.claimed_by, row.lease_until = 'other-worker:1/0', now + timedelta(hours=1)
+            rows.append(row)
+        ScheduledEmail.objects.bulk_create(rows, batch_size=2000)
+        inserted = time.perf_counter() - started
+        total = ScheduledEmail.objects.count()
+        self.stdout.write(f'{"rows stored":<28} {total:>10} in {inserted:.1f}s ({total / inserted:.0f} rows/s)')
+
+        horizon = timezone.now() + timedelta(seconds=options['horizon'])
+        plan = (ScheduledEmail.objects.filter(status='pending', due_at__lt=horizon)
+                .filter(Q(lease_until__isnull=True) | Q(lease_until__lt=timezone.now()))
+                .order_by('due_at').values_list('pk', flat=True)[:2000].explain())
+        self.stdout.write(f'{"window query plan":<28} {plan.strip()}')
+        del rows
+
+        fired = []
+        lock = threading.Lock()
+
+        def process(email_type, product, data, execution=None):
+            with lock:
+                fired.append((data['to_email'], time.time() - data['due']))
+            return {}, {'success': True, 'message_id': f'<{data["to_email"]}>'}
+
+        expected = options['due'] + options['stale_leases']
+        held_peak = 0
+        with override_settings(EMAIL_SCHEDULE_HORIZON_SECONDS=options['horizon'],
+                               EMAIL_SCHEDULE_LOAD_INTERVAL=options['load_interval']), \
+                mock.patch.object(EmailPipeline, 'process', process):
+            logging.disable(logging.WARNING)
+            EmailScheduler.start()
+            deadline = time.monotonic() + options['due_within'] + options['load_interval'] + 30
+            try:
+                while time.monotonic() < deadline:
+                    held_peak = max(held_peak, EmailScheduler.snapshot()['held'])
+                    with lock:
+                        if len(fired) >= expected:
+                            break
+                    time.sleep(0.1)
+                # Let the last batch be recorded and anything wrongly due show up
+                time.sleep(2 * EmailScheduler.TICK)
+            finally:
+                EmailScheduler.stop()
+                logging.disable(logging.NOTSET)
+        stats = EmailScheduler.snapshot()
+        connection.close()
+
+        recipients = [recipient for recipient, _ in fired]
+        lateness = [late * 1000 for recipient, late in fired if recipient.startswith('due')]
+        remaining = ScheduledEmail.objects.filter(status='pending').count()
+        wrong = [r for r in recipients if r.startswith(('later', 'leased'))]
+        duplicates = len(recipients) - len(set(recipients))
+
+        self.stdout.write(f'{"fired":<28} {len(fired):>10} (expected {expected})')
+        self.stdout.write(f'{"peak held in the wheel":<28} {held_peak:>10} (of {total} stored)')
+        self.stdout.write(f'{"window loads":<28} {stats["load_queries"]:>10} (last {stats["last_load_ms"]} ms)')
+        self.stdout.write(f'{"lateness p50 / p99 / max":<28} {_percentile(lateness, 0.5):>8.0f}ms '
+                          f'{_percentile(lateness, 0.99):>6.0f}ms {max(lateness or [0]):>6.0f}ms')
+        self.stdout.write(f'{"rows left pending":<28} {remaining:>10} (expected {total - expected})')
+        self.stdout.write('=' * 84)
+
+        problems = []
+        if len(set(recipients)) != expected:
+            problems.append(f'{len(set(recipients))} of {expected} due sends fired')
+        if duplicates:
+            problems.append(f'{duplicates} sends fired twice')
+        if wrong:
+            problems.append(f'{len(wrong)} sends fired early or despite another lease')
+        if remaining != total - expected:
+            problems.append(f'{remaining} rows left pending, expected {total - expected}')
+        if held_peak > options['due'] + options['stale_leases'] + 10:
+            problems.append(f'{held_peak} rows held in memory: far-future sends were loaded')
+        if problems:
+            self.stdout.write(self.style.ERROR('; '.join(problems)))
+            sys.exit(1)
+        self.stdout.write(self.style.SUCCESS('Completed!'))
+
+    @staticmethod
+    def _row(recipient, due_at):
+        from auth_service.models import ScheduledEmail
+
+        return ScheduledEmail(
+            product_name='benchmark',
+            email_type='generic',
+            payload={'to_email': recipient, 'subject': 'Reminder', 'html_content': '<p>Reminder</p>',
+                     'environment': 'prod', 'due': due_at.timestamp()},
+            due_at=due_at,
+        )
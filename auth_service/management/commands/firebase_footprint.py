@@ -0,0 +1,114 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+import json
+import os
+import subprocess
+import sys
+
+# Runs in a fresh interpreter: load the app like a worker, then bring up one Firebase client.
+# A throwaway RSA key stands in for the service account so no network access is needed.
+PROBE_SCRIPT = r'''
+import json, os, sys, time
+
+def rss_mb():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+import config.wsgi  # noqa: F401
+from django.urls import get_resolver
+get_resolver().url_patterns
+base_rss = rss_mb()
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+pem = key.private_bytes(
+    serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+).decode()
+creds = {
+    'type': 'service_account', 'project_id': 'footprint-probe', 'private_key': pem,
+    'private_key_id': 'probe', 'client_email': 'probe@footprint-probe.iam.gserviceaccount.com',
+    'token_uri': 'https://oauth2.googleapis.com/token',
+}
+modules_before = len(sys.modules)
+
+started = time.perf_counter()
+if sys.argv[1] == 'admin':
+    import firebase_admin
+    from firebase_admin import auth, credentials
+    app = firebase_admin.initialize_app(credentials.Certificate(creds), name='probe')
+    app.credential.get_credential()
+else:
+    from auth_service.services.identity_toolkit import IdentityToolkitClient
+    client = IdentityToolkitClient.from_service_account(creds)
+    client.token_source._signed_assertion()
+elapsed = (time.perf_counter() - started) * 1000
+
+print(json.dumps({
+    'client_init_ms': elapsed,
+    'base_rss_mb': base_rss,
+    'rss_mb': rss_mb(),
+    'modules_loaded': len(sys.modules) - modules_before,
+    'grpc_loaded': 'grpc' in sys.modules,
+}))
+'''
+
+
+class Command(BaseCommand):
+    help = 'Report per-worker RSS and import/init time of the lean vs firebase_admin Firebase clients'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=3,
+            help='Workers per instance used for the per-instance total'
+        )
+        parser.add_argument(
+            '--runs',
+            type=int,
+            default=3,
+            help='Fresh processes per client'
+        )
+
+    def handle(self, *args, **options):
+        if not os.path.exists('/proc/self/statm'):
+            raise CommandError('RSS measurement requires /proc (Linux)')
+
+        self.stdout.write(self.style.WARNING('Firebase client footprint (fresh process per run)'))
+        self.stdout.write('=' * 72)
+        self.stdout.write(
+            f'{"client":<8} {"init+import":>12} {"worker RSS":>11} {"client RSS":>11} '
+            f'{"modules":>8} {"x" + str(options["workers"]) + " workers":>11}  grpc'
+        )
+
+        results = {}
+        for client in ('lean', 'admin'):
+            runs = [self._probe(client) for _ in range(options['runs'])]
+            runs.sort(key=lambda r: r['rss_mb'])
+            median = runs[len(runs) // 2]
+            results[client] = median
+            self.stdout.write(
+                f'{client:<8} {median["client_init_ms"]:10.1f}ms {median["rss_mb"]:9.1f}MB '
+                f'{median["rss_mb"] - median["base_rss_mb"]:9.1f}MB {median["modules_loaded"]:>8} '
+                f'{median["rss_mb"] * options["workers"]:9.1f}MB  {"yes" if median["grpc_loaded"] else "no"}'
+            )
+
+        saved = (results['admin']['rss_mb'] - results['lean']['rss_mb']) * options['workers']
+        self.stdout.write('\n' + '=' * 72)
+        self.stdout.write(self.style.SUCCESS(
+            f'Lean client saves {results["admin"]["client_init_ms"] - results["lean"]["client_init_ms"]:.0f} ms '
+            f'of import/init and {saved:.1f} MB RSS per instance ({options["workers"]} workers)'
+        ))
+
+    def _probe(self, client):
+        env = dict(os.environ, WARMUP_ON_STARTUP='false')
+        proc = subprocess.run(
+            [sys.executable, '-c', PROBE_SCRIPT, client],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True
+        )
+        try:
+            return json.loads(proc.stdout.strip().splitlines()[-1])
+        except (IndexError, ValueError):
+            raise CommandError(f'{client} probe failed:\n{proc.stderr[-2000:]}')
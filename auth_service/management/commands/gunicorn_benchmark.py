@@ -0,0 +1,344 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import importlib.util
+import json
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+# (label, gunicorn env overrides, optional package the worker class needs)
+CONFIGURATIONS = [
+    ('gthread 3x4 (previous CMD)', {'GUNICORN_WORKERS': '3', 'GUNICORN_THREADS': '4', 'GUNICORN_PRELOAD': 'false'}, None),
+    ('gthread auto', {}, None),
+    ('gthread auto, preload', {'GUNICORN_PRELOAD': 'true'}, None),
+    ('gevent auto, preload', {'GUNICORN_WORKER_CLASS': 'gevent', 'GUNICORN_PRELOAD': 'true'}, 'gevent'),
+    ('uvicorn auto, preload', {'GUNICORN_WORKER_CLASS': 'uvicorn', 'GUNICORN_PRELOAD': 'true'}, 'uvicorn'),
+]
+
+SETUP_SCRIPT = r'''
+import os, django
+django.setup()
+from django.contrib.auth.models import User
+from rest_framework.authtoken.models import Token
+from auth_service.models import Product
+user, _ = User.objects.get_or_create(username='benchmark_service')
+Product.objects.update_or_create(name='benchmark', defaults=dict(
+    user=user, display_name='Benchmark', test_tenant_id='bench-test', prod_tenant_id='bench-prod'))
+print(Token.objects.get_or_create(user=user)[0].key)
+'''
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _pss_mb(pid):
+    """
+    Proportional set size of a process and its children (shared pages split between them)
+    """
+    total = 0
+    pids = [pid]
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            pids += [int(p) for p in f.read().split()]
+    except OSError:
+        pass
+    for p in pids:
+        try:
+            with open(f'/proc/{p}/smaps_rollup') as f:
+                for line in f:
+                    if line.startswith('Pss:'):
+                        total += int(line.split()[1])
+        except OSError:
+            pass
+    return total / 1024
+
+
+class _StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Bursts of concurrent clients overflow the default listen backlog of 5
+    request_queue_size = 256
+
+
+class UpstreamStub:
+    """
+    Local stand-in for Google OAuth, Identity Toolkit and Brevo with a fixed response latency.
+    brevo_latency_ms / brevo_status can be changed while it runs to simulate a Brevo slowdown or outage.
+    Request bodies over MAX_BODY_BYTES (attachments) are read through without being kept;
+    last_brevo_body holds the latest Brevo request body that was kept.
+    """
+    MAX_BODY_BYTES = 4 * 1024 * 1024
+
+    def __init__(self, latency_ms):
+        stub = self
+        self.latency_ms = latency_ms
+        self.brevo_latency_ms = None
+        self.brevo_status = 201
+        self.last_brevo_body = None
+        counts = self.counts = {}
+        lock = threading.Lock()
+
+        def count(key, n=1):
+            with lock:
+                counts[key] = counts.get(key, 0) + n
+                return counts[key]
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body are separate writes: without this, delayed ACKs add ~40 ms per response
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, code, body):
+                payload = json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_HEAD(self):
+                self.send_response(200)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def _read_body(self, length):
+                if length <= stub.MAX_BODY_BYTES:
+                    return self.rfile.read(length)
+                while length > 0:
+                    data = self.rfile.read(min(length, 65536))
+                    if not data:
+                        break
+                    length -= len(data)
+                count('large_bodies')
+                return b''
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self._read_body(length)
+                call = count(self.path)
+                brevo = self.path.startswith('/v3/smtp/email')
+                if brevo and body:
+                    stub.last_brevo_body = body
+                latency_ms = stub.brevo_latency_ms if brevo and stub.brevo_latency_ms is not None else stub.latency_ms
+                time.sleep(latency_ms / 1000)
+                if self.path.startswith('/token'):
+                    return self._reply(200, {'access_token': 'stub-token', 'expires_in': 3600})
+                if 'accounts:sendOobCode' in self.path:
+                    email = json.loads(body or b'{}').get('email')
+                    return self._reply(200, {'oobLink': f'https://stub.invalid/action?oobCode=1&email={email}'})
+                if brevo and stub.brevo_status >= 400:
+                    return self._reply(stub.brevo_status, {'code': 'stub_error', 'message': 'Simulated Brevo failure'})
+                if brevo:
+                    versions = json.loads(body or b'{}').get('messageVersions')
+                    if versions:
+                        count('messages', len(versions))
+                        return self._reply(201, {'messageIds': [
+                            f'<stub-{call}.{i}@brevo>' for i in range(len(versions))
+                        ]})
+                    count('messages')
+                    return self._reply(201, {'messageId': f'<stub-{call}@brevo>'})
+                self._reply(404, {})
+
+        self.server = _StubServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+
+
+class Command(BaseCommand):
+    help = 'Benchmark gunicorn worker configurations (gunicorn.conf.py) against local upstream stubs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=32, help='Concurrent client connections')
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds of load per configuration')
+        parser.add_argument('--upstream-latency-ms', type=float, default=50.0, help='Latency of each stubbed upstream call')
+        parser.add_argument(
+            '--only',
+            type=str,
+            default=None,
+            help='Comma-separated substrings selecting configurations by label'
+        )
+
+    def handle(self, *args, **options):
+        if shutil.which('gunicorn') is None:
+            raise CommandError('gunicorn is not installed')
+
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.primitives.asymmetric import rsa
+
+        stub = UpstreamStub(options['upstream_latency_ms'])
+        tmpdir = tempfile.mkdtemp(prefix='gunicorn-bench-')
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        pem = key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        ).decode()
+
+        env = dict(
+            os.environ,
+            DJANGO_SETTINGS_MODULE='config.settings',
+            DATABASE_URL=f'sqlite:///{os.path.join(tmpdir, "bench.sqlite3")}',
+            DEBUG='false',
+            ALLOWED_HOSTS='127.0.0.1,localhost',
+            LOG_LEVEL='WARNING',
+            GUNICORN_LOG_LEVEL='warning',
+            RATELIMIT_ENABLE='false',
+            RATE_LIMIT_PER_HOUR='100000000/hour',
+            EMAIL_CHECK_DELIVERABILITY='false',
+            FIREBASE_CLIENT='lean',
+            FIREBASE_PROD_PROJECT_ID='bench-project',
+            FIREBASE_PROD_PRIVATE_KEY=pem.replace('\n', '\\n'),
+            FIREBASE_PROD_CLIENT_EMAIL='bench@bench-project.iam.gserviceaccount.com',
+            FIREBASE_PROD_TOKEN_URI=f'{stub.url}/token',
+            IDENTITY_TOOLKIT_URL=f'{stub.url}/v1',
+            BREVO_API_KEY='bench',
+            BREVO_API_URL=f'{stub.url}/v3',
+            BREVO_SENDER_EMAIL='bench@example.com',
+            HUBSPOT_API_KEY='',
+            READINESS_PROBES_ENABLED='false',
+        )
+
+        try:
+            subprocess.run([sys.executable, 'manage.py', 'migrate', '--noinput', '-v', '0'],
+                           cwd=settings.BASE_DIR, env=env, check=True)
+            token = subprocess.run([sys.executable, '-c', SETUP_SCRIPT], cwd=settings.BASE_DIR, env=env,
+                                   check=True, capture_output=True, text=True).stdout.strip().splitlines()[-1]
+
+            self.stdout.write(self.style.WARNING(
+                f'gunicorn benchmark: POST /api/email/password-reset/ (token, sendOobCode and Brevo stubbed at '
+                f'{options["upstream_latency_ms"]:.0f} ms), {options["concurrency"]} clients x {options["duration"]:.0f}s'
+            ))
+            self.stdout.write('=' * 96)
+            self.stdout.write(
+                f'{"configuration":<28} {"boot":>6} {"PSS":>8} {"req/s":>8} {"p50":>8} {"p99":>9} {"errors":>7}  workers'
+            )
+
+            selected = CONFIGURATIONS
+            if options['only']:
+                wanted = [w.strip() for w in options['only'].split(',')]
+                selected = [c for c in CONFIGURATIONS if any(w in c[0] for w in wanted)]
+
+            for label, overrides, package in selected:
+                if package and importlib.util.find_spec(package) is None:
+                    self.stdout.write(f'{label:<28} {"skipped: " + package + " not installed":>48}')
+                    continue
+                self._run_configuration(label, dict(env, **overrides), token, options, tmpdir)
+        finally:
+            stub.stop()
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+        self.stdout.write('=' * 96)
+        self.stdout.write(self.style.SUCCESS(f'Upstream calls served by stubs: {stub.counts}'))
+
+    def _run_configuration(self, label, env, token, options, tmpdir):
+        port = _free_port()
+        env['PORT'] = str(port)
+        base = f'http://127.0.0.1:{port}'
+        # A file, not a pipe: an unread pipe fills up and blocks the workers' log writes
+        log_path = os.path.join(tmpdir, f'gunicorn-{port}.log')
+        started = time.monotonic()
+        with open(log_path, 'w') as log:
+            proc = subprocess.Popen(
+                ['gunicorn', '--config', 'gunicorn.conf.py'],
+                cwd=settings.BASE_DIR, env=env, stdout=log, stderr=subprocess.STDOUT
+            )
+        try:
+            boot_s = self._wait_until_ready(base, proc, started)
+            workers_line = self._describe_workers(proc.pid)
+            latencies, errors, elapsed = self._load(base, token, options)
+            pss = _pss_mb(proc.pid)
+        except CommandError as e:
+            proc.kill()
+            with open(log_path) as log:
+                output = log.read()
+            self.stdout.write(self.style.ERROR(f'{label:<28} failed: {e}\n{output[-1500:]}'))
+            return
+        finally:
+            if proc.poll() is None:
+                proc.send_signal(signal.SIGTERM)
+                try:
+                    proc.wait(timeout=30)
+                except subprocess.TimeoutExpired:
+                    proc.kill()
+
+        latencies.sort()
+        count = len(latencies)
+        p50 = latencies[count // 2] if count else 0
+        p99 = latencies[min(count - 1, int(count * 0.99))] if count else 0
+        self.stdout.write(
+            f'{label:<28} {boot_s:>5.1f}s {pss:>6.0f}MB {count / elapsed:>8.1f} {p50:>6.1f}ms {p99:>7.1f}ms '
+            f'{errors:>7}  {workers_line}'
+        )
+
+    @staticmethod
+    def _wait_until_ready(base, proc, started, timeout=60):
+        while time.monotonic() - started < timeout:
+            if proc.poll() is not None:
+                raise CommandError(f'gunicorn exited with {proc.returncode}')
+            try:
+                if requests.get(f'{base}/api/ready/', headers={'X-Forwarded-Proto': 'https'}, timeout=1).status_code == 200:
+                    return time.monotonic() - started
+            except requests.RequestException:
+                pass
+            time.sleep(0.1)
+        raise CommandError('gunicorn did not become ready')
+
+    @staticmethod
+    def _describe_workers(pid):
+        try:
+            with open(f'/proc/{pid}/task/{pid}/children') as f:
+                return f'{len(f.read().split())} processes'
+        except OSError:
+            return '?'
+
+    @staticmethod
+    def _load(base, token, options):
+        latencies = []
+        errors = [0]
+        lock = threading.Lock()
+        deadline = time.monotonic() + options['duration']
+        headers = {
+            'Authorization': f'Token {token}',
+            'Content-Type': 'application/json',
+            'X-Forwarded-Proto': 'https',
+        }
+
+        def client(index):
+            session = requests.Session()
+            body = json.dumps({'email': f'user{index}@example.com', 'environment': 'prod'})
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                try:
+                    response = session.post(f'{base}/api/email/password-reset/', data=body, headers=headers, timeout=30)
+                    ok = response.status_code == 200
+                except requests.RequestException:
+                    ok = False
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                with lock:
+                    if ok:
+                        latencies.append(elapsed_ms)
+                    else:
+                        errors[0] += 1
+
+        started = time.monotonic()
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(options['concurrency'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return latencies, errors[0], time.monotonic() - started
@@ -0,0 +1,126 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+import json
+import os
+import subprocess
+import sys
+
+IMPORT_TARGET = 'config.wsgi'
+
+
+class Command(BaseCommand):
+    help = 'Profile cold-start import cost of the WSGI app (python -X importtime) and enforce the import budget'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=25,
+            help='Number of most expensive imports to show'
+        )
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Fail if the import exceeds IMPORT_TIME_BUDGET_MS or loads a deferred SDK'
+        )
+        parser.add_argument(
+            '--budget-ms',
+            type=float,
+            help='Override IMPORT_TIME_BUDGET_MS for --check'
+        )
+        parser.add_argument(
+            '--runs',
+            type=int,
+            default=5,
+            help='Fresh processes used to measure wall-clock import time'
+        )
+
+    def handle(self, *args, **options):
+        if options['check']:
+            self.check_budget(options.get('budget_ms') or settings.IMPORT_TIME_BUDGET_MS, options['runs'])
+        else:
+            self.profile(options['top'])
+
+    def _env(self):
+        # Measure imports only: the warm-up thread deliberately loads the SDKs
+        return dict(os.environ, WARMUP_ON_STARTUP='false', DJANGO_SETTINGS_MODULE='config.settings')
+
+    def profile(self, top):
+        """Print the most expensive imports by cumulative and self time"""
+        proc = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {IMPORT_TARGET}'],
+            cwd=settings.BASE_DIR, env=self._env(), capture_output=True, text=True
+        )
+        if proc.returncode != 0:
+            raise CommandError(f'Importing {IMPORT_TARGET} failed:\n{proc.stderr[-2000:]}')
+
+        rows = []
+        for line in proc.stderr.splitlines():
+            # Format: "import time:   self [us] | cumulative | imported package"
+            parts = line[len('import time:'):].split('|') if line.startswith('import time:') else []
+            if len(parts) != 3:
+                continue
+            try:
+                self_us, cumulative_us = int(parts[0]), int(parts[1])
+            except ValueError:
+                continue  # header row
+            rows.append((parts[2].rstrip(), self_us, cumulative_us))
+
+        target = next((r for r in rows if r[0].strip() == IMPORT_TARGET), None)
+
+        self.stdout.write(self.style.WARNING(f'Import profile for {IMPORT_TARGET}'))
+        self.stdout.write('=' * 72)
+        if target:
+            self.stdout.write(f'Total cumulative import time: {target[2] / 1000:.1f} ms ({len(rows)} modules)')
+
+        self.stdout.write(f'\nTop {top} by cumulative time:')
+        self.stdout.write(f'{"cumulative":>12} {"self":>10}  module')
+        for name, self_us, cumulative_us in sorted(rows, key=lambda r: r[2], reverse=True)[:top]:
+            self.stdout.write(f'{cumulative_us / 1000:10.1f}ms {self_us / 1000:8.1f}ms  {name}')
+
+        self.stdout.write(f'\nTop {top} by self time:')
+        for name, self_us, cumulative_us in sorted(rows, key=lambda r: r[1], reverse=True)[:top]:
+            self.stdout.write(f'{self_us / 1000:10.1f}ms  {name.strip()}')
+
+        deferred = [m for m in settings.IMPORT_DEFERRED_MODULES if any(r[0].strip() == m for r in rows)]
+        if deferred:
+            self.stdout.write(self.style.ERROR(f'\n✗ Deferred SDKs imported at load: {", ".join(deferred)}'))
+        else:
+            self.stdout.write(self.style.SUCCESS('\n✓ No deferred SDKs imported at load'))
+
+    def check_budget(self, budget_ms, runs):
+        """Fail (non-zero exit) when importing the WSGI app exceeds the budget"""
+        script = (
+            'import sys, time, json\n'
+            't = time.perf_counter()\n'
+            f'import {IMPORT_TARGET}\n'
+            'elapsed = (time.perf_counter() - t) * 1000\n'
+            f'deferred = [m for m in {list(settings.IMPORT_DEFERRED_MODULES)!r} if m in sys.modules]\n'
+            'print(json.dumps([elapsed, deferred]))\n'
+        )
+
+        timings = []
+        deferred = set()
+        for _ in range(runs):
+            proc = subprocess.run(
+                [sys.executable, '-c', script],
+                cwd=settings.BASE_DIR, env=self._env(), capture_output=True, text=True
+            )
+            if proc.returncode != 0:
+                raise CommandError(f'Importing {IMPORT_TARGET} failed:\n{proc.stderr[-2000:]}')
+            elapsed, loaded = json.loads(proc.stdout.strip().splitlines()[-1])
+            timings.append(elapsed)
+            deferred.update(loaded)
+
+        median = sorted(timings)[len(timings) // 2]
+        self.stdout.write(
+            f'Import {IMPORT_TARGET}: median {median:.1f} ms over {runs} runs '
+            f'(min {min(timings):.1f}, max {max(timings):.1f}); budget {budget_ms:.0f} ms'
+        )
+
+        if deferred:
+            raise CommandError(f'Deferred SDKs imported at load: {", ".join(sorted(deferred))}')
+        if median > budget_ms:
+            raise CommandError(f'Import time {median:.1f} ms exceeds budget of {budget_ms:.0f} ms')
+
+        self.stdout.write(self.style.SUCCESS('✓ Import time within budget'))
@@ -0,0 +1,112 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+import json
+import os
+import subprocess
+import sys
+
+# Runs in a fresh interpreter so every measurement starts truly cold
+PROBE_SCRIPT = r'''
+import json, os, sys, time
+t0 = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+import config.wsgi  # noqa: F401
+t_import = time.perf_counter()
+
+warmup = None
+if os.environ.get('WARMUP_ON_STARTUP', '').lower() == 'true':
+    from auth_service.warmup import WarmupState
+    while WarmupState.status in ('cold', 'warming'):
+        time.sleep(0.005)
+    warmup = WarmupState.as_dict()
+t_ready = time.perf_counter()
+
+from django.test import Client
+client = Client(HTTP_HOST=sys.argv[2])
+latencies = []
+for _ in range(2):
+    started = time.perf_counter()
+    response = client.get(sys.argv[1], secure=True)
+    latencies.append((time.perf_counter() - started) * 1000)
+
+print(json.dumps({
+    'import_ms': (t_import - t0) * 1000,
+    'ready_ms': (t_ready - t0) * 1000,
+    'status_code': response.status_code,
+    'first_request_ms': latencies[0],
+    'second_request_ms': latencies[1],
+    'warmup': warmup,
+}))
+'''
+
+
+class Command(BaseCommand):
+    help = 'Measure cold vs warm-started first-request latency in fresh processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            type=str,
+            default='/api/password/reset-form/?token=startup-probe&product=Beta%20Health',
+            help='Path to request (default renders a branded page)'
+        )
+        parser.add_argument(
+            '--runs',
+            type=int,
+            default=3,
+            help='Number of fresh processes per mode'
+        )
+
+    def handle(self, *args, **options):
+        host = next((h for h in settings.ALLOWED_HOSTS if not h.startswith('.') and h != '*'), 'localhost')
+
+        self.stdout.write(self.style.WARNING('Measuring startup latency'))
+        self.stdout.write('=' * 60)
+        self.stdout.write(f'Path: {options["path"]}  Runs per mode: {options["runs"]}')
+
+        results = {}
+        for mode, warm in (('cold', 'false'), ('warm', 'true')):
+            runs = [self._probe(options['path'], host, warm) for _ in range(options['runs'])]
+            runs = [r for r in runs if r]
+            if not runs:
+                self.stdout.write(self.style.ERROR(f'✗ All {mode} runs failed'))
+                continue
+            results[mode] = runs
+            self._report(mode, runs)
+
+        if 'cold' in results and 'warm' in results:
+            cold = self._median([r['first_request_ms'] for r in results['cold']])
+            warm = self._median([r['first_request_ms'] for r in results['warm']])
+            self.stdout.write('\n' + '=' * 60)
+            self.stdout.write(self.style.SUCCESS(
+                f'First request: cold {cold:.1f} ms vs warm {warm:.1f} ms '
+                f'({cold - warm:+.1f} ms moved out of the request path)'
+            ))
+
+    def _probe(self, path, host, warm):
+        env = dict(os.environ, WARMUP_ON_STARTUP=warm)
+        proc = subprocess.run(
+            [sys.executable, '-c', PROBE_SCRIPT, path, host],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True
+        )
+        try:
+            return json.loads(proc.stdout.strip().splitlines()[-1])
+        except (IndexError, ValueError):
+            self.stdout.write(self.style.ERROR(f'✗ Probe failed: {proc.stderr.strip()[-500:]}'))
+            return None
+
+    @staticmethod
+    def _median(values):
+        values = sorted(values)
+        return values[len(values) // 2]
+
+    def _report(self, mode, runs):
+        self.stdout.write(f'\n{mode.upper()} (median of {len(runs)}):')
+        self.stdout.write(f'  Import config.wsgi:    {self._median([r["import_ms"] for r in runs]):8.1f} ms')
+        self.stdout.write(f'  Ready to serve:        {self._median([r["ready_ms"] for r in runs]):8.1f} ms')
+        self.stdout.write(f'  First request:         {self._median([r["first_request_ms"] for r in runs]):8.1f} ms')
+        self.stdout.write(f'  Second request:        {self._median([r["second_request_ms"] for r in runs]):8.1f} ms')
+        self.stdout.write(f'  Status code:           {runs[-1]["status_code"]}')
+        if runs[-1].get('warmup'):
+            for name, step in runs[-1]['warmup']['steps'].items():
+                self.stdout.write(f'    {name:<20} {step["status"]:<8} {step["ms"]:8.1f} ms')
@@ -46,6 +46,10 @@ class Command(BaseCommand):
                         'display_name': config['name'],
                         'test_tenant_id': config['test_tenant_id'],
                         'prod_tenant_id': config['prod_tenant_id'],
+                        'logo_url': config.get('logo_url', ''),
+                        'dashboard_url': config.get('dashboard_url', ''),
+                        'welcome_sender_email': config.get('welcome_sender', {}).get('email', ''),
+                        'welcome_sender_name': config.get('welcome_sender', {}).get('name', ''),
                         'is_active': True
                     }
                 )
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+import time
+
+from auth_service.services.email_scheduler import EmailScheduler
+
+
+class Command(BaseCommand):
+    help = 'Run the scheduled-send scheduler in the foreground (gunicorn workers run it themselves)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stats-interval', type=int, default=60, help='Seconds between stats lines (0: none)')
+
+    def handle(self, *args, **options):
+        EmailScheduler.start()
+        self.stdout.write(self.style.SUCCESS('Email scheduler running, Ctrl-C to stop'))
+        try:
+            while True:
+                time.sleep(options['stats_interval'] or 3600)
+                if options['stats_interval']:
+                    self.stdout.write(str(EmailScheduler.snapshot()))
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Stopping: finishing sends in progress and releasing the rest'))
+        finally:
+            EmailScheduler.stop()
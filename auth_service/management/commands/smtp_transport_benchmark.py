@@ -0,0 +1,145 @@
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+import itertools
+import logging
+import threading
+import time
+
+from auth_service.services import smtp_transport
+from auth_service.services.email_service import BrevoEmailService
+from .email_router_check import SmtpSink
+from .gunicorn_benchmark import UpstreamStub
+
+HTML = '<html><body><h2>Your weekly summary</h2>' + '<p>Lorem ipsum dolor sit amet.</p>' * 40 + '</body></html>'
+
+# (label, transport): how each send reaches the relay or API
+TRANSPORTS = [
+    ('HTTP API', 'api'),
+    ('SMTP, connection per email', 'django'),
+    ('SMTP pool', 'pool'),
+    ('SMTP pool, pipelined', 'pipelined'),
+]
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark Brevo sends over the HTTP API versus pooled, pipelined SMTP against a local sink (messages/second)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=300, help='Messages per run')
+        parser.add_argument('--concurrency', type=str, default='1,4,16', help='Comma-separated concurrent senders')
+        parser.add_argument('--rtt-ms', type=float, default=10.0, help='Simulated round trip to the SMTP relay')
+        parser.add_argument('--api-latency-ms', type=float, default=40.0,
+                            help='Latency of one stubbed HTTP API call (one round trip plus processing)')
+        parser.add_argument('--pool-size', type=int, default=4, help='EMAIL_SMTP_POOL_SIZE')
+
+    def handle(self, *args, **options):
+        stub = UpstreamStub(options['api_latency_ms'])
+        levels = [int(c) for c in options['concurrency'].split(',')]
+
+        self.stdout.write(self.style.WARNING(
+            f'SMTP transport benchmark: {options["messages"]} messages per run, SMTP sink round trip '
+            f'{options["rtt_ms"]:.0f} ms, HTTP API call {options["api_latency_ms"]:.0f} ms, '
+            f'pool of {options["pool_size"]} connections'
+        ))
+        self.stdout.write('=' * 92)
+        self.stdout.write(
+            f'{"transport":<28} {"senders":>7} {"msgs/s":>8} {"p50":>9} {"p95":>9} {"connections":>12} {"failed":>7}'
+        )
+
+        logging.disable(logging.WARNING)
+        try:
+            for concurrency in levels:
+                for label, transport in TRANSPORTS:
+                    row = self._run(stub, options, transport, concurrency)
+                    self.stdout.write(
+                        f'{label:<28} {concurrency:>7} {row["rate"]:>8.1f} {row["p50"]:>7.1f}ms '
+                        f'{row["p95"]:>7.1f}ms {row["connections"]:>12} {row["failures"]:>7}'
+                    )
+                self.stdout.write('-' * 92)
+        finally:
+            logging.disable(logging.NOTSET)
+            stub.stop()
+
+        self.stdout.write(self.style.SUCCESS('Completed!'))
+
+    @staticmethod
+    def _run(stub, options, transport, concurrency):
+        sink = SmtpSink(rtt_ms=options['rtt_ms'], pipelining=transport != 'pool')
+        overrides = dict(
+            BREVO_API_KEY='bench',
+            BREVO_API_URL=f'{stub.url}/v3',
+            BREVO_SENDER_EMAIL='bench@example.com',
+            BREVO_TRANSPORT='api' if transport == 'api' else 'smtp',
+            BREVO_SMTP_HOST='127.0.0.1',
+            BREVO_SMTP_PORT=sink.port,
+            BREVO_SMTP_LOGIN='',
+            BREVO_SMTP_USE_TLS=False,
+            EMAIL_HOST='127.0.0.1',
+            EMAIL_PORT=sink.port,
+            EMAIL_HOST_USER='',
+            EMAIL_USE_TLS=False,
+            EMAIL_USE_SSL=False,
+            EMAIL_BATCHING_ENABLED=False,
+            EMAIL_SMTP_POOL_SIZE=options['pool_size'],
+            EMAIL_SMTP_MAX_MESSAGES=1000,
+        )
+        counter = itertools.count()
+        latencies = []
+        failures = []
+        lock = threading.Lock()
+
+        with override_settings(**overrides):
+            smtp_transport.close_pools()
+            service = BrevoEmailService()
+
+            def send(n):
+                if transport == 'django':
+                    # What the SMTP provider used to do: Django's backend, one connection per email
+                    from django.core.mail import EmailMultiAlternatives, get_connection
+                    email = EmailMultiAlternatives('Weekly summary', 'Your weekly summary', 'bench@example.com',
+                                                   [f'user{n}@example.com'])
+                    email.attach_alternative(HTML, 'text/html')
+                    try:
+                        get_connection('django.core.mail.backends.smtp.EmailBackend').send_messages([email])
+                        return True
+                    except Exception:
+                        return False
+                return service.send_email(f'user{n}@example.com', 'Weekly summary', HTML)['success']
+
+            def sender():
+                while True:
+                    n = next(counter)
+                    if n >= options['messages']:
+                        return
+                    started = time.perf_counter()
+                    ok = send(n)
+                    elapsed_ms = (time.perf_counter() - started) * 1000
+                    with lock:
+                        (latencies if ok else failures).append(elapsed_ms)
+
+            threads = [threading.Thread(target=sender) for _ in range(concurrency)]
+            started = time.monotonic()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.monotonic() - started
+            smtp_transport.close_pools()
+            service.api_instance.api_client.rest_client.pool_manager.clear()
+
+        sink.stop()
+        return {
+            'rate': len(latencies) / elapsed,
+            'p50': _percentile(latencies, 0.5),
+            'p95': _percentile(latencies, 0.95),
+            # The HTTP API keeps its own keep-alive pool (not counted here)
+            'connections': sink.connections if transport != 'api' else '-',
+            'failures': len(failures),
+        }
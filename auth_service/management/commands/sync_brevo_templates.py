@@ -0,0 +1,118 @@
+from django.core.management.base import BaseCommand, CommandError
+from datetime import datetime, timezone
+import json
+
+from auth_service.services.brevo_templates import MANAGED_TEMPLATES, BrevoTemplates, build
+from auth_service.services.email_service import BrevoEmailService, sib_api_v3_sdk, sib_rest
+from auth_service.services.product_registry import ProductRegistry
+from auth_service.utils.email_templates import EmailTemplateRenderer
+
+# Sample per-send values used to compare request payload sizes
+SAMPLE_LINK = 'https://auth.example.com/__/auth/action?mode=resetPassword&oobCode=' + 'x' * 96 + '&tenantId=tenant-1'
+
+
+class Command(BaseCommand):
+    help = 'Upload the email templates to Brevo per product and update the local template map'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--product', action='append', default=None, help='Only sync this product (repeatable)')
+        parser.add_argument('--dry-run', action='store_true', help='Show what would change without calling Brevo')
+        parser.add_argument('--force', action='store_true', help='Re-upload templates even if their version is unchanged')
+
+    def handle(self, *args, **options):
+        ProductRegistry.load()
+        products = [p for p in ProductRegistry.snapshot().products if p.is_active]
+        if options['product']:
+            products = [p for p in products if p.name in options['product']]
+        if not products:
+            raise CommandError('No matching active products')
+
+        mapping = json.loads(json.dumps(BrevoTemplates.load()))
+        api = None if options['dry_run'] else BrevoEmailService.get_instance().api_instance
+
+        self.stdout.write(self.style.WARNING(
+            f'Syncing {len(MANAGED_TEMPLATES)} templates for {len(products)} products '
+            f'to {BrevoTemplates.path()}{" (dry run)" if options["dry_run"] else ""}'
+        ))
+        self.stdout.write('=' * 72)
+
+        counts = {'created': 0, 'updated': 0, 'unchanged': 0, 'failed': 0}
+        for product in products:
+            for key in MANAGED_TEMPLATES:
+                built = build(key, product)
+                entry = mapping.get(product.name, {}).get(key)
+
+                if entry and entry.get('version') == built['version'] and not options['force']:
+                    action = 'unchanged'
+                elif options['dry_run']:
+                    action = 'updated' if entry else 'created'
+                else:
+                    try:
+                        template_id = self._upload(api, built, entry)
+                    except sib_rest.ApiException as e:
+                        counts['failed'] += 1
+                        self.stdout.write(self.style.ERROR(f'✗ {product.name}/{key}: {e.status} {e.reason}'))
+                        continue
+                    action = 'updated' if entry else 'created'
+                    mapping.setdefault(product.name, {})[key] = {
+                        'template_id': template_id,
+                        'version': built['version'],
+                        'synced_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                    }
+
+                counts[action] += 1
+                template_id = mapping.get(product.name, {}).get(key, {}).get('template_id', '-')
+                rendered, params = self._payload_sizes(key, product)
+                style = self.style.SUCCESS if action != 'unchanged' else (lambda text: text)
+                self.stdout.write(style(
+                    f'  {product.name:<20} {key:<15} {action:<10} id={template_id:<6} '
+                    f'payload {rendered:>6}B -> {params:>4}B'
+                ))
+
+        if not options['dry_run'] and (counts['created'] or counts['updated']):
+            BrevoTemplates.save(mapping)
+
+        self.stdout.write('=' * 72)
+        summary = ', '.join(f'{k}: {v}' for k, v in counts.items())
+        if counts['failed']:
+            raise CommandError(f'Template sync incomplete ({summary})')
+        self.stdout.write(self.style.SUCCESS(f'Completed! {summary}'))
+
+    @staticmethod
+    def _upload(api, built, entry):
+        fields = dict(
+            template_name=built['name'],
+            subject=built['subject'],
+            html_content=built['html_content'],
+            tag='auth_service',
+            is_active=True,
+        )
+        if entry:
+            api.update_smtp_template(entry['template_id'], sib_api_v3_sdk.UpdateSmtpTemplate(
+                sender=sib_api_v3_sdk.UpdateSmtpTemplateSender(**built['sender']), **fields
+            ))
+            return entry['template_id']
+        response = api.create_smtp_template(sib_api_v3_sdk.CreateSmtpTemplate(
+            sender=sib_api_v3_sdk.CreateSmtpTemplateSender(**built['sender']), **fields
+        ))
+        return response.id
+
+    @staticmethod
+    def _payload_sizes(key, product):
+        """
+        Bytes of email content per send: rendered subject/html/text vs template params
+        """
+        name = product.display_name
+        if key == 'password_reset':
+            content = EmailTemplateRenderer.render_password_reset_email(name, SAMPLE_LINK, 'prod', 'Ada')
+            params = {'reset_link': SAMPLE_LINK}
+        elif key == 'verification':
+            content = EmailTemplateRenderer.render_verification_email(name, SAMPLE_LINK, 'prod', 'Ada')
+            params = {'verification_link': SAMPLE_LINK}
+        else:
+            content = EmailTemplateRenderer.render_welcome_email(name, SAMPLE_LINK, 'prod', 'Ada')
+            params = {}
+        params.update({'user_name': 'Ada', 'environment': 'prod',
+                       'environment_label': EmailTemplateRenderer.get_environment_label('prod')})
+        rendered = len(json.dumps(content).encode())
+        return rendered, len(json.dumps({'templateId': 1, 'params': params}).encode())
@@ -2,7 +2,7 @@
 Middleware for auth_service
 """
 from django.utils.deprecation import MiddlewareMixin
-from .models import Product
+from .services.product_registry import ProductRegistry
 import logging
 
 logger = logging.getLogger(__name__)
@@ -22,11 +22,12 @@ class ProductAuthenticationMiddleware(MiddlewareMixin):
 
         if hasattr(request, 'user') and request.user.is_authenticated:
             try:
-                # Try to get the product associated with the authenticated user
-                request.product = Product.objects.get(user=request.user)
-                logger.debug(f"Product {request.product.name} attached to request for user {request.user.username}")
-            except Product.DoesNotExist:
-                logger.warning(f"No product found for authenticated user {request.user.username}")
+                # Resolve the product from the in-process registry (no per-request query)
+                request.product = ProductRegistry.get_by_user_id(request.user.id)
+                if request.product is None:
+                    logger.warning(f"No product found for authenticated user {request.user.username}")
+                else:
+                    logger.debug(f"Product {request.product.name} attached to request for user {request.user.username}")
             except Exception as e:
                 logger.error(f"Error attaching product to request: {e}")
 
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_service', '0003_delete_emaillog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='dashboard_url',
+            field=models.URLField(blank=True, help_text='Product dashboard/login link (blank uses the default)', max_length=500),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='logo_url',
+            field=models.URLField(blank=True, help_text='Logo used in emails and pages (blank uses the default)', max_length=500),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='welcome_sender_email',
+            field=models.EmailField(blank=True, help_text='Custom sender for welcome emails (blank uses the default)', max_length=254),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='welcome_sender_name',
+            field=models.CharField(blank=True, max_length=200),
+        ),
+    ]
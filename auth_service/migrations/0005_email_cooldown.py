@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_service', '0004_product_branding'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailCooldown',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_name', models.CharField(max_length=100)),
+                ('email_type', models.CharField(max_length=50)),
+                ('environment', models.CharField(max_length=10)),
+                ('recipient_hash', models.CharField(help_text='SHA-256 of the lowercased recipient address', max_length=64)),
+                ('message_id', models.CharField(blank=True, max_length=255)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'db_table': 'email_cooldowns',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='emailcooldown',
+            constraint=models.UniqueConstraint(fields=('product_name', 'email_type', 'environment', 'recipient_hash'), name='unique_email_cooldown'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-19 00:14
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_service', '0006_scheduled_email'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='digest_window_seconds',
+            field=models.PositiveIntegerField(default=0, help_text='Merge generic emails to the same recipient within this many seconds into one digest (0: off)'),
+        ),
+        migrations.CreateModel(
+            name='DigestItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_name', models.CharField(max_length=100)),
+                ('environment', models.CharField(max_length=10)),
+                ('recipient', models.CharField(help_text='Lowercased recipient address', max_length=254)),
+                ('subject', models.CharField(max_length=255)),
+                ('html_content', models.TextField()),
+                ('text_content', models.TextField(blank=True)),
+                ('flush_at', models.DateTimeField()),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('claimed_by', models.CharField(blank=True, max_length=100)),
+                ('lease_until', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'email_digest_items',
+                'indexes': [models.Index(fields=['product_name', 'environment', 'recipient'], name='digest_item_recipient'), models.Index(fields=['flush_at'], name='digest_item_flush')],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-19 00:18
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_service', '0007_email_digest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='sandbox_test_sends',
+            field=models.BooleanField(default=False, help_text='Capture test-environment emails in the sandbox instead of sending them'),
+        ),
+        migrations.CreateModel(
+            name='CapturedEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_name', models.CharField(max_length=100)),
+                ('email_type', models.CharField(max_length=50)),
+                ('message_id', models.CharField(max_length=255)),
+                ('to_email', models.CharField(max_length=254)),
+                ('subject', models.CharField(blank=True, max_length=255)),
+                ('html_content', models.TextField(blank=True)),
+                ('text_content', models.TextField(blank=True)),
+                ('template_id', models.PositiveIntegerField(blank=True, help_text='Brevo template the email would have used', null=True)),
+                ('params', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True)),
+                ('sender', models.JSONField(blank=True, null=True)),
+                ('attachments', models.JSONField(blank=True, default=list, help_text='Name, content type and size of each attachment')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'sandbox_emails',
+                'indexes': [models.Index(fields=['product_name', 'created_at'], name='sandbox_email_product')],
+            },
+        ),
+    ]
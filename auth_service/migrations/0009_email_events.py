@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-19 00:21
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_service', '0008_email_sandbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('message_id', models.CharField(max_length=255)),
+                ('event', models.CharField(max_length=32)),
+                ('email', models.CharField(blank=True, max_length=254)),
+                ('occurred_at', models.DateTimeField()),
+                ('tag', models.CharField(blank=True, max_length=255)),
+                ('reason', models.TextField(blank=True)),
+                ('link', models.TextField(blank=True)),
+                ('payload', models.JSONField(help_text='The event as Brevo sent it')),
+                ('received_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'email_events',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='emailevent',
+            constraint=models.UniqueConstraint(fields=('message_id', 'event', 'occurred_at'), name='unique_email_event'),
+        ),
+    ]
@@ -1,4 +1,6 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
 from rest_framework.authtoken.models import Token
 
@@ -19,6 +21,16 @@ class Product(models.Model):
     display_name = models.CharField(max_length=200)
     test_tenant_id = models.CharField(max_length=255)
     prod_tenant_id = models.CharField(max_length=255)
+    logo_url = models.URLField(max_length=500, blank=True, help_text='Logo used in emails and pages (blank uses the default)')
+    dashboard_url = models.URLField(max_length=500, blank=True, help_text='Product dashboard/login link (blank uses the default)')
+    welcome_sender_email = models.EmailField(blank=True, help_text='Custom sender for welcome emails (blank uses the default)')
+    welcome_sender_name = models.CharField(max_length=200, blank=True)
+    digest_window_seconds = models.PositiveIntegerField(
+        default=0, help_text='Merge generic emails to the same recipient within this many seconds into one digest (0: off)'
+    )
+    sandbox_test_sends = models.BooleanField(
+        default=False, help_text='Capture test-environment emails in the sandbox instead of sending them'
+    )
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -46,3 +58,150 @@ class Product(models.Model):
             return Token.objects.get(user=self.user)
         except Token.DoesNotExist:
             return Token.objects.create(user=self.user)
+
+
+class EmailCooldown(models.Model):
+    """
+    Latest send per (product, email type, environment, recipient), shared by all
+    workers so repeated "resend" requests are answered with the message already sent.
+    An empty message_id marks a send that is still in flight.
+    """
+    product_name = models.CharField(max_length=100)
+    email_type = models.CharField(max_length=50)
+    environment = models.CharField(max_length=10)
+    recipient_hash = models.CharField(max_length=64, help_text='SHA-256 of the lowercased recipient address')
+    message_id = models.CharField(max_length=255, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        db_table = 'email_cooldowns'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['product_name', 'email_type', 'environment', 'recipient_hash'],
+                name='unique_email_cooldown'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.product_name}/{self.email_type}/{self.environment} until {self.expires_at}"
+
+
+class ScheduledEmail(models.Model):
+    """
+    An email to send later (send_at), stored as its validated request data.
+    Rows are deleted once sent. A worker loading a row into its timing wheel
+    leases it (claimed_by / lease_until); once the lease has passed without the
+    row being sent or released, another worker takes it over.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('failed', 'Failed'),
+    ]
+
+    product_name = models.CharField(max_length=100)
+    email_type = models.CharField(max_length=50)
+    payload = models.JSONField(encoder=DjangoJSONEncoder, help_text='Validated request data, without send_at')
+    due_at = models.DateTimeField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    claimed_by = models.CharField(max_length=100, blank=True)
+    lease_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'scheduled_emails'
+        indexes = [
+            # Loading the next window is a range scan over pending rows by due time
+            models.Index(fields=['status', 'due_at'], name='scheduled_email_due'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_name}/{self.email_type} due {self.due_at} ({self.status})"
+
+
+class DigestItem(models.Model):
+    """
+    A generic email waiting to be merged into its recipient's digest. Rows are
+    deleted once their digest was sent. The worker sending a digest leases the
+    recipient's rows (claimed_by / lease_until); flush_at is when the digest
+    window closes, so rows a dead worker left behind are found and sent.
+    """
+    product_name = models.CharField(max_length=100)
+    environment = models.CharField(max_length=10)
+    recipient = models.CharField(max_length=254, help_text='Lowercased recipient address')
+    subject = models.CharField(max_length=255)
+    html_content = models.TextField()
+    text_content = models.TextField(blank=True)
+    flush_at = models.DateTimeField()
+    attempts = models.PositiveIntegerField(default=0)
+    claimed_by = models.CharField(max_length=100, blank=True)
+    lease_until = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'email_digest_items'
+        indexes = [
+            models.Index(fields=['product_name', 'environment', 'recipient'], name='digest_item_recipient'),
+            # The sweep for digests left behind is a range scan by window end
+            models.Index(fields=['flush_at'], name='digest_item_flush'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_name}/{self.environment} digest item for {self.recipient}"
+
+
+class CapturedEmail(models.Model):
+    """
+    A test-environment email captured by the sandbox instead of being sent
+    (products with sandbox_test_sends). Only the newest
+    EMAIL_SANDBOX_MAX_PER_PRODUCT are kept per product.
+    """
+    product_name = models.CharField(max_length=100)
+    email_type = models.CharField(max_length=50)
+    message_id = models.CharField(max_length=255)
+    to_email = models.CharField(max_length=254)
+    subject = models.CharField(max_length=255, blank=True)
+    html_content = models.TextField(blank=True)
+    text_content = models.TextField(blank=True)
+    template_id = models.PositiveIntegerField(null=True, blank=True, help_text='Brevo template the email would have used')
+    params = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    sender = models.JSONField(null=True, blank=True)
+    attachments = models.JSONField(default=list, blank=True, help_text='Name, content type and size of each attachment')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'sandbox_emails'
+        indexes = [
+            models.Index(fields=['product_name', 'created_at'], name='sandbox_email_product'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_name}/{self.email_type} to {self.to_email} at {self.created_at}"
+
+
+class EmailEvent(models.Model):
+    """
+    A delivery event Brevo reported for a sent email (delivered, opened, hard_bounce, ...),
+    keyed by the message_id the send returned. Redelivered webhooks are ignored.
+    """
+    message_id = models.CharField(max_length=255)
+    event = models.CharField(max_length=32)
+    email = models.CharField(max_length=254, blank=True)
+    occurred_at = models.DateTimeField()
+    tag = models.CharField(max_length=255, blank=True)
+    reason = models.TextField(blank=True)
+    link = models.TextField(blank=True)
+    payload = models.JSONField(help_text='The event as Brevo sent it')
+    received_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'email_events'
+        constraints = [
+            # Also the index for looking a message's events up
+            models.UniqueConstraint(fields=['message_id', 'event', 'occurred_at'], name='unique_email_event'),
+        ]
+
+    def __str__(self):
+        return f"{self.event} for {self.message_id} at {self.occurred_at}"
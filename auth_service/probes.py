@@ -0,0 +1,173 @@
+"""
+Background dependency probes for the readiness endpoint.
+
+Each probe (database, Firebase OAuth tokens, Brevo, HubSpot) runs on a
+schedule in a background thread and its last result is cached in-process,
+so /api/ready/ answers from memory and load-balancer or cron traffic never
+turns into upstream calls. A probe still in flight is never started again.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+import logging
+import threading
+import time
+
+from . import lifecycle
+
+logger = logging.getLogger(__name__)
+
+
+def _probe_database():
+    from django.db import connection
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+    finally:
+        # Background thread: hand the connection back (pool) instead of keeping it per thread
+        connection.close()
+
+
+def _probe_firebase(environment):
+    def probe():
+        from .warmup import _firebase_configured
+        if not _firebase_configured(environment):
+            return 'skipped'
+        from .services.firebase_service import FirebaseService
+        # Cached until near expiry, so this only reaches Google about once an hour
+        FirebaseService._get_access_token(environment)
+    return probe
+
+
+def _probe_brevo():
+    if not settings.BREVO_API_KEY:
+        return 'skipped'
+    from .services.email_service import BrevoEmailService
+    api_client = BrevoEmailService.get_instance().api_instance.api_client
+    # Any HTTP response means Brevo is reachable over the client's pooled connection
+    api_client.rest_client.pool_manager.request(
+        'HEAD', api_client.configuration.host, timeout=settings.READINESS_PROBE_TIMEOUT
+    )
+
+
+def _probe_hubspot():
+    if not settings.HUBSPOT_API_KEY:
+        return 'skipped'
+    from .services.http_client import get_session
+    get_session('hubspot').head('https://api.hubapi.com/', timeout=settings.READINESS_PROBE_TIMEOUT)
+
+
+# (name, callable, required) - a failing or stale required probe makes the process not ready
+PROBES = [
+    ('database', _probe_database, True),
+    ('firebase_test', _probe_firebase('test'), False),
+    ('firebase_prod', _probe_firebase('prod'), False),
+    ('brevo', _probe_brevo, False),
+    ('hubspot', _probe_hubspot, False),
+]
+
+
+class ProbeRunner:
+    """
+    Process-wide probe scheduler and result cache
+    """
+    _lock = threading.Lock()
+    _thread = None
+    _executor = None
+    _in_flight = set()
+    results = {}
+
+    @classmethod
+    def _run_probe(cls, name, probe):
+        started = time.monotonic()
+        try:
+            outcome = probe() or 'ok'
+            result = {'status': outcome}
+        except Exception as e:
+            logger.warning(f"Readiness probe {name} failed: {e}")
+            result = {'status': 'failed', 'error': str(e)}
+        result['latency_ms'] = round((time.monotonic() - started) * 1000, 1)
+        result['checked_at'] = time.time()
+
+        with cls._lock:
+            cls.results[name] = result
+            cls._in_flight.discard(name)
+
+    @classmethod
+    def run_once(cls):
+        """
+        Start every probe that is not already running (non-blocking)
+        """
+        for name, probe, _ in PROBES:
+            with cls._lock:
+                if name in cls._in_flight:
+                    continue
+                cls._in_flight.add(name)
+            cls._executor.submit(cls._run_probe, name, probe)
+
+    @classmethod
+    def _loop(cls):
+        interval = settings.READINESS_PROBE_INTERVAL
+        while True:
+            try:
+                cls.run_once()
+            except Exception as e:
+                logger.error(f"Readiness probe scheduling failed: {e}", exc_info=True)
+            time.sleep(interval)
+
+    @classmethod
+    def start(cls):
+        """
+        Start the scheduler in this process unless it is already running
+        """
+        if cls._thread is not None and cls._thread.is_alive():
+            return
+        with cls._lock:
+            if cls._thread is not None and cls._thread.is_alive():
+                return
+            cls._executor = ThreadPoolExecutor(max_workers=len(PROBES), thread_name_prefix='readiness-probe')
+            cls._in_flight = set()
+            cls._thread = threading.Thread(target=cls._loop, name='readiness-probes', daemon=True)
+            cls._thread.start()
+
+    @classmethod
+    def _forget_after_fork(cls):
+        # Scheduler threads do not survive fork, and results describe the parent's connections
+        cls._lock = threading.Lock()
+        cls._thread = None
+        cls._executor = None
+        cls._in_flight = set()
+        cls.results = {}
+
+    @classmethod
+    def snapshot(cls):
+        """
+        Cached probe results with staleness
+
+        Returns:
+            tuple: (checks dict, list of failing required probes, list of failing optional probes)
+        """
+        now = time.time()
+        max_age = settings.READINESS_PROBE_MAX_AGE
+        with cls._lock:
+            results = {name: dict(result) for name, result in cls.results.items()}
+
+        checks = {}
+        failing_required = []
+        failing_optional = []
+        for name, _, required in PROBES:
+            result = results.get(name, {'status': 'pending'})
+            if 'checked_at' in result:
+                result['age_s'] = round(now - result['checked_at'], 1)
+                if result['age_s'] > max_age and result['status'] != 'skipped':
+                    result['status'] = 'stale'
+            result['required'] = required
+            checks[name] = result
+
+            if result['status'] not in ('ok', 'skipped'):
+                (failing_required if required else failing_optional).append(name)
+        return checks, failing_required, failing_optional
+
+
+lifecycle.register('readiness_probes', reset=ProbeRunner._forget_after_fork)
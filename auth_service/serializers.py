@@ -1,25 +1,67 @@
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
 from rest_framework import serializers
 from email_validator import validate_email, EmailNotValidError
+import time
+
+from .models import CapturedEmail
+from .services.email_attachments import attachment_errors
+from .services.email_scheduler import EmailScheduler
+
+
+class ScheduledSendSerializer(serializers.Serializer):
+    """Optional send_at: a future time (ISO 8601) schedules the email instead of sending it now"""
+    send_at = serializers.DateTimeField(required=False, allow_null=True, default=None)
+
+    def validate_send_at(self, value):
+        """Refuse later sends no scheduler would deliver, and limit how far ahead an email can be scheduled"""
+        if value is None or value.timestamp() - time.time() < EmailScheduler.TICK:
+            # Due now: sent straight away
+            return value
+        if not EmailScheduler.available():
+            raise serializers.ValidationError('Scheduled sends are not enabled on this deployment')
+        max_days = getattr(settings, 'EMAIL_SCHEDULE_MAX_DAYS', 30)
+        if value > timezone.now() + timedelta(days=max_days):
+            raise serializers.ValidationError(f'Emails can be scheduled at most {max_days} days ahead')
+        return value
 
 
-class GenericEmailSerializer(serializers.Serializer):
+class GenericEmailSerializer(ScheduledSendSerializer):
     """Serializer for generic email sending"""
     to_email = serializers.EmailField(required=True)
     subject = serializers.CharField(required=True, max_length=255)
     html_content = serializers.CharField(required=True)
     text_content = serializers.CharField(required=False, allow_blank=True)
     environment = serializers.ChoiceField(choices=['test', 'prod'], default='prod')
+    # false: send now even when the product merges its notifications into digests
+    digest = serializers.BooleanField(required=False, default=True)
+    # multipart/form-data uploads (services/email_attachments.py)
+    attachments = serializers.ListField(child=serializers.FileField(), required=False, default=list)
 
     def validate_to_email(self, value):
         """Validate email format"""
         try:
-            validate_email(value)
+            validate_email(value, check_deliverability=settings.EMAIL_CHECK_DELIVERABILITY)
         except EmailNotValidError as e:
             raise serializers.ValidationError(str(e))
         return value
 
+    def validate_attachments(self, value):
+        """Enforce attachment count, size and content type limits"""
+        errors = attachment_errors(value)
+        if errors:
+            raise serializers.ValidationError(errors)
+        return value
+
+    def validate(self, attrs):
+        if attrs.get('send_at') and attrs.get('attachments'):
+            # Uploads only live as long as the request
+            raise serializers.ValidationError({'send_at': ['Emails with attachments cannot be scheduled']})
+        return attrs
 
-class PasswordResetSerializer(serializers.Serializer):
+
+class PasswordResetSerializer(ScheduledSendSerializer):
     """Serializer for password reset request"""
     email = serializers.EmailField(required=True)
     environment = serializers.ChoiceField(choices=['test', 'prod'], default='prod')
@@ -28,13 +70,13 @@ class PasswordResetSerializer(serializers.Serializer):
     def validate_email(self, value):
         """Validate email format"""
         try:
-            validate_email(value)
+            validate_email(value, check_deliverability=settings.EMAIL_CHECK_DELIVERABILITY)
         except EmailNotValidError as e:
             raise serializers.ValidationError(str(e))
         return value
 
 
-class ForgotPasswordSerializer(serializers.Serializer):
+class ForgotPasswordSerializer(ScheduledSendSerializer):
     """Serializer for forgot password request"""
     email = serializers.EmailField(required=True)
     environment = serializers.ChoiceField(choices=['test', 'prod'], default='prod')
@@ -43,28 +85,30 @@ class ForgotPasswordSerializer(serializers.Serializer):
     def validate_email(self, value):
         """Validate email format"""
         try:
-            validate_email(value)
+            validate_email(value, check_deliverability=settings.EMAIL_CHECK_DELIVERABILITY)
         except EmailNotValidError as e:
             raise serializers.ValidationError(str(e))
         return value
 
 
-class EmailVerificationSerializer(serializers.Serializer):
+class EmailVerificationSerializer(ScheduledSendSerializer):
     """Serializer for email verification request"""
     email = serializers.EmailField(required=True)
     environment = serializers.ChoiceField(choices=['test', 'prod'], default='prod')
     user_name = serializers.CharField(required=False, allow_blank=True)
+    # Overrides EMAIL_VERIFICATION_SKIP_VERIFIED for this request
+    skip_if_verified = serializers.BooleanField(required=False, allow_null=True, default=None)
 
     def validate_email(self, value):
         """Validate email format"""
         try:
-            validate_email(value)
+            validate_email(value, check_deliverability=settings.EMAIL_CHECK_DELIVERABILITY)
         except EmailNotValidError as e:
             raise serializers.ValidationError(str(e))
         return value
 
 
-class WelcomeEmailSerializer(serializers.Serializer):
+class WelcomeEmailSerializer(ScheduledSendSerializer):
     """Serializer for welcome email request"""
     email = serializers.EmailField(required=True)
     environment = serializers.ChoiceField(choices=['test', 'prod'], default='prod')
@@ -73,7 +117,7 @@ class WelcomeEmailSerializer(serializers.Serializer):
     def validate_email(self, value):
         """Validate email format"""
         try:
-            validate_email(value)
+            validate_email(value, check_deliverability=settings.EMAIL_CHECK_DELIVERABILITY)
         except EmailNotValidError as e:
             raise serializers.ValidationError(str(e))
         return value
@@ -85,6 +129,32 @@ class VerifyEmailConfirmationSerializer(serializers.Serializer):
     environment = serializers.ChoiceField(choices=['test', 'prod'], default='prod')
 
 
+class SandboxEmailQuerySerializer(serializers.Serializer):
+    """Filters for listing captured sandbox emails (newest first)"""
+    to_email = serializers.CharField(required=False)
+    email_type = serializers.CharField(required=False)
+    search = serializers.CharField(required=False, help_text='Text contained in the subject')
+    since = serializers.DateTimeField(required=False)
+    before_id = serializers.IntegerField(required=False, min_value=1, help_text='Next page: id of the last email seen')
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=500, default=50)
+
+
+class CapturedEmailSerializer(serializers.ModelSerializer):
+    """A captured sandbox email with its content"""
+
+    class Meta:
+        model = CapturedEmail
+        fields = ['id', 'email_type', 'message_id', 'to_email', 'subject', 'html_content', 'text_content',
+                  'template_id', 'params', 'sender', 'attachments', 'created_at']
+
+
+class CapturedEmailSummarySerializer(CapturedEmailSerializer):
+    """A captured sandbox email without its content (listings)"""
+
+    class Meta(CapturedEmailSerializer.Meta):
+        fields = ['id', 'email_type', 'message_id', 'to_email', 'subject', 'template_id', 'attachments', 'created_at']
+
+
 class EmailResponseSerializer(serializers.Serializer):
     """Serializer for email operation response"""
     success = serializers.BooleanField()
@@ -0,0 +1,229 @@
+"""
+Brevo-managed copies of the email templates.
+
+`manage.py sync_brevo_templates` uploads emails/*.html to Brevo once per
+product: the product's name and logo are baked in, everything that changes
+per send (links, user name, environment) becomes a Brevo {{ params.* }}
+placeholder. Brevo template ids and a hash of what was uploaded are kept in
+the BREVO_TEMPLATE_MAP file.
+
+With EMAIL_SEND_MODE='template' the pipeline then sends only template_id +
+params, and only while the local template still hashes to the synced
+version: an edited (or re-branded) template falls back to the rendered HTML
+until the next sync instead of going out stale.
+"""
+from collections import namedtuple
+from django.conf import settings
+from django.template import engines
+from django.template.loader import get_template
+import hashlib
+import json
+import logging
+import os
+import re
+
+from ..utils.email_templates import EmailTemplateRenderer
+
+logger = logging.getLogger(__name__)
+
+ManagedTemplate = namedtuple('ManagedTemplate', ['file', 'subject', 'params', 'uses_welcome_sender'])
+
+# key -> template; params are the per-send variables, every other variable is baked in per product
+MANAGED_TEMPLATES = {
+    'password_reset': ManagedTemplate(
+        file='emails/password_reset_email.html',
+        subject=EmailTemplateRenderer.SUBJECTS['password_reset'],
+        params=('reset_link', 'user_name', 'environment', 'environment_label'),
+        uses_welcome_sender=False,
+    ),
+    'verification': ManagedTemplate(
+        file='emails/verification_email.html',
+        subject=EmailTemplateRenderer.SUBJECTS['verification'],
+        params=('verification_link', 'user_name', 'environment', 'environment_label'),
+        uses_welcome_sender=False,
+    ),
+    'welcome': ManagedTemplate(
+        file='emails/welcome_email.html',
+        subject=EmailTemplateRenderer.SUBJECTS['welcome'],
+        params=('user_name', 'environment', 'environment_label'),
+        uses_welcome_sender=True,
+    ),
+}
+
+_TAG_RE = re.compile(r'({{.*?}}|{%.*?%})', re.S)
+
+
+def _verbatim(text):
+    return '{% verbatim %}' + text + '{% endverbatim %}'
+
+
+def to_brevo_source(source, params):
+    """
+    Rewrite references to per-send params in a Django template as Brevo syntax
+    (protected by {% verbatim %}), leaving the rest for Django to render
+
+    Args:
+        source (str): Django template source
+        params (iterable): Variable names supplied per send
+
+    Raises:
+        ValueError: If a param is used in a construct Brevo's template language cannot take as-is
+    """
+    params = set(params)
+    output = []
+    # One entry per open {% if %}: True when it tests a param (kept for Brevo)
+    open_ifs = []
+
+    for part in _TAG_RE.split(source):
+        if part.startswith('{{'):
+            expression = part[2:-2].strip()
+            if expression in params:
+                output.append(_verbatim(f'{{{{ params.{expression} }}}}'))
+                continue
+            if expression.split('|')[0].strip() in params:
+                raise ValueError(f"Filters on params are not supported: {part}")
+        elif part.startswith('{%'):
+            tokens = part[2:-2].split()
+            tag = tokens[0] if tokens else ''
+            if tag == 'if':
+                for_brevo = any(token in params for token in tokens[1:])
+                if for_brevo and len(tokens) != 2:
+                    raise ValueError(f"Only plain {{% if param %}} tests are supported: {part}")
+                open_ifs.append(for_brevo)
+                if for_brevo:
+                    output.append(_verbatim(f'{{% if params.{tokens[1]} %}}'))
+                    continue
+            elif tag in ('else', 'elif', 'endif'):
+                if not open_ifs:
+                    raise ValueError(f"Unbalanced {part}")
+                for_brevo = open_ifs.pop() if tag == 'endif' else open_ifs[-1]
+                if for_brevo:
+                    if tag == 'elif':
+                        raise ValueError(f"{{% elif %}} on params is not supported: {part}")
+                    output.append(_verbatim(part))
+                    continue
+            elif any(token.split('|')[0] in params for token in tokens[1:]):
+                raise ValueError(f"Tag {tag} on params is not supported: {part}")
+        output.append(part)
+
+    if open_ifs:
+        raise ValueError("Unclosed {% if %} in template")
+    return ''.join(output)
+
+
+def template_sender(key, product):
+    """
+    Sender stored with the Brevo template (same as the pipeline's sender policy)
+    """
+    if MANAGED_TEMPLATES[key].uses_welcome_sender and product.welcome_sender:
+        return dict(product.welcome_sender)
+    return {'name': settings.BREVO_SENDER_NAME, 'email': settings.BREVO_SENDER_EMAIL}
+
+
+def build(key, product):
+    """
+    Build the Brevo copy of a managed template for one product
+
+    Returns:
+        dict: name, subject, sender, html_content and version (content hash)
+    """
+    spec = MANAGED_TEMPLATES[key]
+    source = get_template(spec.file).template.source
+    html_content = engines['django'].from_string(to_brevo_source(source, spec.params)).render({
+        'product_name': product.display_name,
+        'product_logo_url': product.logo_url,
+    })
+    subject = spec.subject.format(product_name=product.display_name)
+    sender = template_sender(key, product)
+
+    digest = hashlib.sha256()
+    for value in (subject, json.dumps(sender, sort_keys=True), html_content):
+        digest.update(value.encode())
+        digest.update(b'\0')
+
+    return {
+        'name': f'auth-service {product.name} {key}',
+        'subject': subject,
+        'sender': sender,
+        'html_content': html_content,
+        'version': digest.hexdigest()[:16],
+    }
+
+
+class BrevoTemplates:
+    """
+    Process-wide view of the template map: which products/templates can be sent by id
+    """
+    _mapping = None
+    # (product name, key, display name, logo, sender) -> local version
+    _versions = {}
+    _warned = set()
+
+    @classmethod
+    def path(cls):
+        return settings.BREVO_TEMPLATE_MAP
+
+    @classmethod
+    def load(cls):
+        """
+        Read the template map (empty if the file does not exist)
+        """
+        try:
+            with open(cls.path()) as f:
+                cls._mapping = json.load(f)
+        except FileNotFoundError:
+            cls._mapping = {}
+        cls._versions = {}
+        cls._warned = set()
+        return cls._mapping
+
+    @classmethod
+    def mapping(cls):
+        if cls._mapping is None:
+            cls.load()
+        return cls._mapping
+
+    @classmethod
+    def save(cls, mapping):
+        """
+        Write the template map atomically
+        """
+        tmp_path = f'{cls.path()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(mapping, f, indent=2, sort_keys=True)
+            f.write('\n')
+        os.replace(tmp_path, cls.path())
+        cls._mapping = mapping
+        cls._versions = {}
+        cls._warned = set()
+
+    @classmethod
+    def local_version(cls, key, product):
+        cache_key = (product.name, key, product.display_name, product.logo_url,
+                     json.dumps(template_sender(key, product), sort_keys=True))
+        version = cls._versions.get(cache_key)
+        if version is None:
+            version = cls._versions[cache_key] = build(key, product)['version']
+        return version
+
+    @classmethod
+    def resolve(cls, product, key):
+        """
+        Brevo template id for a product's managed template, or None if it must be rendered locally
+        (not synced yet, or the local template/branding changed since the last sync)
+        """
+        entry = cls.mapping().get(product.name, {}).get(key)
+        if not entry:
+            return None
+        try:
+            current = cls.local_version(key, product)
+        except Exception as e:
+            logger.error(f"Could not build Brevo template {key} for {product.name}: {e}")
+            return None
+        if current != entry.get('version'):
+            if (product.name, key) not in cls._warned:
+                cls._warned.add((product.name, key))
+                logger.warning(f"Brevo template {key} for {product.name} is out of date "
+                               f"(run sync_brevo_templates); sending rendered HTML")
+            return None
+        return entry['template_id']
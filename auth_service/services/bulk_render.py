@@ -0,0 +1,175 @@
+"""
+CPU-parallel rendering of personalized emails for bulk campaigns.
+
+Rendering a template is pure Python and holds the GIL, so a worker's threads
+render one email at a time however many cores the host has. render_bulk
+shards recipient contexts across a process pool instead:
+    - contexts are cut into chunks of EMAIL_BULK_RENDER_CHUNK_SIZE and sent to
+      EMAIL_BULK_RENDER_WORKERS processes (0: one per core);
+    - each process sets up Django once and preloads the compiled email
+      templates and the product registry;
+    - results come back as a generator in input order, with at most two
+      chunks per process in flight, so the caller can start sending the first
+      emails while later ones are still rendering, and memory stays bounded
+      however long the campaign is.
+
+With a single worker (or a single core) everything renders in-process.
+"""
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from django.conf import settings
+import itertools
+import logging
+import multiprocessing
+import os
+import threading
+
+from .. import lifecycle
+
+logger = logging.getLogger(__name__)
+
+# Template name -> EmailTemplateRenderer method; each context holds that method's keyword arguments
+RENDERERS = {
+    'verification': 'render_verification_email',
+    'welcome': 'render_welcome_email',
+    'password_reset': 'render_password_reset_email',
+}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _renderer(template):
+    from ..utils.email_templates import EmailTemplateRenderer
+
+    if template not in RENDERERS:
+        raise ValueError(f"Unknown bulk email template: {template}")
+    return getattr(EmailTemplateRenderer, RENDERERS[template])
+
+
+def _init_worker():
+    import django
+
+    if not settings.configured or not django.apps.apps.ready:
+        django.setup()
+
+    from .. import warmup
+    from .product_registry import ProductRegistry
+
+    warmup._warm_templates()
+    try:
+        ProductRegistry.snapshot()
+    except Exception as e:
+        # Renders fall back to the default branding, as they do in-process
+        logger.warning(f"Bulk render worker {os.getpid()} could not load the product registry: {e}")
+
+
+def _render(render, context):
+    try:
+        return render(**context)
+    except Exception as e:
+        return {'error': str(e)}
+
+
+def _render_chunk(template, contexts):
+    render = _renderer(template)
+    return [_render(render, context) for context in contexts]
+
+
+def worker_count():
+    workers = getattr(settings, 'EMAIL_BULK_RENDER_WORKERS', 0)
+    return workers if workers > 0 else (os.cpu_count() or 1)
+
+
+def get_pool():
+    """
+    Get the process-wide render pool, creating it on first use
+
+    Returns:
+        ProcessPoolExecutor: The pool, or None when rendering in-process (one worker)
+    """
+    workers = worker_count()
+    if workers <= 1:
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _create_pool(workers)
+    return _pool
+
+
+def _create_pool(workers):
+    global _pool
+    # forkserver: workers start from a clean process, not a fork of a threaded gunicorn worker
+    method = getattr(settings, 'EMAIL_BULK_RENDER_START_METHOD', 'forkserver')
+    _pool = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context(method),
+        initializer=_init_worker,
+    )
+    logger.info(f"Started bulk render pool: {workers} {method} processes")
+
+
+def render_bulk(template, contexts, chunk_size=None):
+    """
+    Render one email per context, in parallel across processes
+
+    Args:
+        template (str): 'verification', 'welcome' or 'password_reset'
+        contexts (iterable): Keyword arguments for the template's renderer, one dict per email
+            (e.g. product_name, dashboard_link, environment, user_name); consumed lazily
+        chunk_size (int, optional): Contexts per task, default EMAIL_BULK_RENDER_CHUNK_SIZE
+
+    Yields:
+        dict: 'subject', 'html_content', 'text_content' (or 'error') per context, in input order
+    """
+    render = _renderer(template)
+    chunk_size = chunk_size or getattr(settings, 'EMAIL_BULK_RENDER_CHUNK_SIZE', 100)
+    contexts = iter(contexts)
+    pool = get_pool()
+    if pool is None:
+        for context in contexts:
+            yield _render(render, context)
+        return
+
+    chunks = iter(lambda: list(itertools.islice(contexts, chunk_size)), [])
+    pending = deque(pool.submit(_render_chunk, template, chunk)
+                    for chunk in itertools.islice(chunks, 2 * worker_count()))
+    try:
+        while pending:
+            try:
+                results = pending.popleft().result()
+            except BrokenProcessPool:
+                shutdown_pool()
+                raise
+            # Keep the workers busy while the caller consumes this chunk
+            for chunk in itertools.islice(chunks, 1):
+                pending.append(pool.submit(_render_chunk, template, chunk))
+            yield from results
+    finally:
+        # The caller stopped early: do not render the rest
+        for future in pending:
+            future.cancel()
+
+
+def shutdown_pool():
+    """
+    Stop the render processes (worker exit and shutdown); the next bulk render starts new ones
+    """
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _forget_pool():
+    global _pool, _pool_lock
+    # The render processes are the parent's children
+    lifecycle.abandon(_pool)
+    _pool = None
+    _pool_lock = threading.Lock()
+
+
+lifecycle.register('bulk_render', reset=_forget_pool, close=shutdown_pool)
@@ -0,0 +1,220 @@
+"""
+Streaming bulk sends: NDJSON in, one NDJSON result line per recipient out.
+
+A JSON array of recipients has to be parsed whole before the first email can
+go out, and its results held until the last one is sent. BulkSend instead
+reads the request body one line at a time (one JSON object per recipient, in
+the email type's request format), and:
+    - hands each line to a worker that parses, validates, renders and sends
+      it through the email pipeline (lanes, cooldowns, provider routing),
+      or stores it for later when it has a send_at;
+    - keeps at most 2 x EMAIL_BULK_IN_FLIGHT lines in progress: once that many
+      are pending, reading stops until the oldest has its result, so a slow
+      upstream slows the upload down (TCP backpressure) instead of buffering;
+    - streams the results back in input order as they complete, then a final
+      {"done": true, ...} line with the totals.
+Memory use therefore depends on EMAIL_BULK_IN_FLIGHT, not on the list size.
+
+Clients should read the response while they upload (results start flowing
+before the body has been read completely).
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import connection
+from django.http import StreamingHttpResponse
+from rest_framework.response import Response
+from rest_framework import status
+import json
+import logging
+import time
+
+from .email_lanes import LaneSaturated
+from .email_pipeline import EmailPipeline, get_email_type
+from .email_scheduler import EmailScheduler
+from .product_registry import ProductRegistry
+
+logger = logging.getLogger(__name__)
+
+NDJSON_CONTENT_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+
+class BulkSend:
+    """
+    NDJSON bulk sends through the email pipeline with bounded in-flight work
+    """
+
+    @classmethod
+    def handle(cls, request):
+        """
+        Stream a bulk send for an API request (POST /api/email/bulk/?type=<email type>)
+        """
+        if request.content_type.split(';')[0].strip() not in NDJSON_CONTENT_TYPES:
+            return Response({
+                'success': False,
+                'message': 'Bulk sends take application/x-ndjson: one JSON object per line'
+            }, status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+        name = request.query_params.get('type', 'generic')
+        if name not in getattr(settings, 'EMAIL_BULK_TYPES', ['generic']):
+            return Response({
+                'success': False,
+                'message': f'Email type {name} cannot be sent in bulk'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        product = ProductRegistry.get_by_user_id(request.user.id)
+        if product is None:
+            return Response({
+                'success': False,
+                'message': 'User is not associated with a product'
+            }, status=status.HTTP_403_FORBIDDEN)
+
+        email_type = get_email_type(name)
+        logger.info(f"Bulk {email_type.label} send started by {product.display_name}")
+
+        response = StreamingHttpResponse(
+            cls.stream(email_type, product, cls.lines(cls._body(request))),
+            content_type='application/x-ndjson'
+        )
+        response['Cache-Control'] = 'no-cache'
+        # Let reverse proxies pass result lines through as they are produced
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    @staticmethod
+    def _body(request):
+        django_request = request._request
+        if django_request.META.get('CONTENT_LENGTH'):
+            return django_request
+        # Chunked upload: the server de-chunks wsgi.input, Django only reads Content-Length bodies
+        return django_request.META['wsgi.input']
+
+    @staticmethod
+    def lines(body):
+        """
+        Read a body one line at a time (None for a line over EMAIL_BULK_MAX_LINE_BYTES, which is skipped)
+        """
+        limit = getattr(settings, 'EMAIL_BULK_MAX_LINE_BYTES', 65536)
+        while True:
+            line = body.readline(limit + 1)
+            if not line:
+                return
+            if len(line) > limit and not line.endswith(b'\n'):
+                while line and not line.endswith(b'\n'):
+                    line = body.readline(limit)
+                yield None
+                continue
+            yield line
+
+    @classmethod
+    def stream(cls, email_type, product, lines):
+        """
+        Send one email per line and yield an NDJSON result line per email, in input order
+
+        Args:
+            email_type (EmailType): Type whose serializer validates each line
+            product (ProductInfo): Sending product
+            lines (iterable): Raw request lines (bytes), consumed lazily
+
+        Yields:
+            bytes: One JSON result per non-empty line, then the totals
+        """
+        in_flight = max(1, getattr(settings, 'EMAIL_BULK_IN_FLIGHT', 8))
+        totals = {'lines': 0, 'sent': 0, 'scheduled': 0, 'pending': 0, 'failed': 0, 'invalid': 0}
+        executor = ThreadPoolExecutor(max_workers=in_flight, thread_name_prefix='email-bulk')
+        pending = deque()
+        started = time.monotonic()
+        try:
+            for number, line in enumerate(lines, 1):
+                if line is not None and not line.strip():
+                    continue
+                pending.append(executor.submit(cls._send_line, email_type, product, number, line))
+                # As many queued as running, so workers never wait on the client reading results
+                if len(pending) >= 2 * in_flight:
+                    yield cls._result_line(pending.popleft().result(), totals)
+            while pending:
+                yield cls._result_line(pending.popleft().result(), totals)
+
+            logger.info(
+                f"Bulk {email_type.label} send by {product.display_name} done in "
+                f"{time.monotonic() - started:.1f}s: {totals}"
+            )
+            yield (json.dumps(dict(totals, done=True)) + '\n').encode()
+        finally:
+            # Client gone: lines not started yet are dropped
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _result_line(result, totals):
+        totals['lines'] += 1
+        if 'errors' in result:
+            totals['invalid'] += 1
+        elif result.get('scheduled'):
+            totals['scheduled'] += 1
+        elif result.get('pending'):
+            totals['pending'] += 1
+        elif result['success']:
+            totals['sent'] += 1
+        else:
+            totals['failed'] += 1
+        return (json.dumps(result) + '\n').encode()
+
+    @classmethod
+    def _send_line(cls, email_type, product, number, line):
+        try:
+            return cls._line_result(email_type, product, number, line)
+        finally:
+            # Sandbox captures, schedules and cooldowns write from this pool thread, which ends with the
+            # request: hand its connection back (to the pool, with DATABASE_POOL) after every line
+            connection.close()
+
+    @classmethod
+    def _line_result(cls, email_type, product, number, line):
+        if line is None:
+            return {'line': number, 'success': False, 'errors': {'line': ['Line too long']}}
+        try:
+            payload = json.loads(line)
+        except ValueError as e:
+            return {'line': number, 'success': False, 'errors': {'line': [f'Invalid JSON: {e}']}}
+        if not isinstance(payload, dict):
+            return {'line': number, 'success': False, 'errors': {'line': ['Expected a JSON object']}}
+
+        serializer = email_type.serializer_class(data=payload)
+        if not serializer.is_valid():
+            return {'line': number, 'success': False, 'errors': serializer.errors}
+        data = serializer.validated_data
+        recipient = data[email_type.recipient_field]
+
+        try:
+            if EmailPipeline.is_scheduled(data):
+                scheduled = EmailScheduler.schedule(email_type, product, data, data['send_at'])
+                return {'line': number, 'recipient': recipient, 'success': True, 'message_id': None,
+                        'scheduled': True, 'scheduled_id': scheduled.pk}
+            result = cls._process(email_type, product, data)
+        except Exception as e:
+            logger.warning(f"Bulk {email_type.label} email to {recipient} failed: {e}")
+            return {'line': number, 'recipient': recipient, 'success': False, 'error': str(e)}
+
+        if not result['success']:
+            return {'line': number, 'recipient': recipient, 'success': False, 'error': result.get('error')}
+        response = {'line': number, 'recipient': recipient, 'success': True, 'message_id': result.get('message_id')}
+        for flag in ('skipped', 'coalesced', 'pending'):
+            if result.get(flag):
+                response[flag] = True
+        response.update(result.get('extra', {}))
+        return response
+
+    @staticmethod
+    def _process(email_type, product, data):
+        # A saturated lane is backpressure, not a failure: wait for a slot (up to EMAIL_PIPELINE_TIMEOUT)
+        deadline = time.monotonic() + getattr(settings, 'EMAIL_PIPELINE_TIMEOUT', 30)
+        delay = 0.05
+        while True:
+            try:
+                _, result = EmailPipeline.process(email_type, product, data, execution='sync')
+                return result
+            except LaneSaturated as e:
+                if time.monotonic() + delay > deadline:
+                    raise
+                time.sleep(delay)
+                delay = min(delay * 2, e.retry_after)
@@ -0,0 +1,319 @@
+"""
+Email attachments with per-request memory bounded independent of their size.
+
+Attachments are uploaded to POST /api/email/generic/ as multipart/form-data
+files named 'attachments' and never held whole in memory:
+    - AttachmentUploadHandler writes each upload to a SpooledTemporaryFile
+      (in memory up to EMAIL_ATTACHMENT_SPOOL_BYTES, then a temporary file)
+      as it arrives, and enforces EMAIL_ATTACHMENT_MAX_FILES,
+      EMAIL_ATTACHMENT_MAX_BYTES, EMAIL_ATTACHMENT_MAX_TOTAL_BYTES and
+      EMAIL_ATTACHMENT_CONTENT_TYPES (declared type, file extension and
+      leading bytes) while streaming: a rejected file is not stored at all;
+    - base64_chunks encodes a file a window at a time. Files from
+      EMAIL_ATTACHMENT_MMAP_BYTES are memory-mapped, and each window's pages
+      are dropped from the mapping once encoded, so a large file is never
+      resident in the worker either;
+    - JsonAttachmentBody is a file-like Brevo API request body that encodes
+      the attachments while the HTTP client sends it (Content-Length is known
+      upfront). The SMTP transport writes the same chunks into the DATA stream.
+
+Uploaded files are deleted when the request ends, so emails with attachments
+are always sent before the response (never queued).
+"""
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+import base64
+import io
+import json
+import mimetypes
+import mmap
+import tempfile
+
+FIELD_NAME = 'attachments'
+
+# Raw bytes per encoded window: whole pages (so they can be released from a mapping)
+# and a multiple of 57, so base64 output splits into whole 76-character MIME lines
+WINDOW = 57 * mmap.PAGESIZE
+
+# Leading bytes every file of a content type starts with
+_SIGNATURES = {
+    'application/pdf': (b'%PDF-',),
+    'image/png': (b'\x89PNG\r\n\x1a\n',),
+    'image/jpeg': (b'\xff\xd8\xff',),
+    'image/gif': (b'GIF87a', b'GIF89a'),
+    # Office Open XML documents are zip archives
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document': (b'PK\x03\x04',),
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': (b'PK\x03\x04',),
+    'application/vnd.openxmlformats-officedocument.presentationml.presentation': (b'PK\x03\x04',),
+}
+
+
+def _megabytes(size):
+    return f'{size / (1024 * 1024):g} MB'
+
+
+def check_content_type(file_name, content_type):
+    """
+    Check an upload's declared content type against the allowed types and its file name
+
+    Returns:
+        str: Why the file is refused, or None
+    """
+    allowed = getattr(settings, 'EMAIL_ATTACHMENT_CONTENT_TYPES', [])
+    if content_type not in allowed:
+        return f'{file_name}: content type {content_type or "(none)"} is not allowed'
+    guessed, _ = mimetypes.guess_type(file_name or '', strict=False)
+    if guessed is None:
+        return f'{file_name}: file name has no recognised extension'
+    if guessed != content_type:
+        return f'{file_name}: file extension does not match content type {content_type}'
+    return None
+
+
+def check_leading_bytes(file_name, content_type, data):
+    """
+    Check the first bytes of an upload against its content type
+
+    Returns:
+        str: Why the file is refused, or None
+    """
+    signatures = _SIGNATURES.get(content_type)
+    if signatures is not None and not data.startswith(signatures):
+        return f'{file_name}: content is not {content_type}'
+    if content_type.startswith('text/') and b'\0' in data:
+        return f'{file_name}: content is not text'
+    return None
+
+
+class AttachmentUpload(UploadedFile):
+    """
+    An uploaded attachment, spooled in memory or to a temporary file
+
+    error is set (and nothing is stored) when the upload was refused.
+    """
+
+    def __init__(self, file, name, content_type, size, charset=None, error=None, on_disk=False):
+        super().__init__(file, name, content_type, size, charset)
+        self.error = error
+        self.on_disk = on_disk
+
+
+class AttachmentUploadHandler(FileUploadHandler):
+    """
+    Spools uploaded attachments as they stream in, enforcing the attachment limits
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.spool_bytes = getattr(settings, 'EMAIL_ATTACHMENT_SPOOL_BYTES', 256 * 1024)
+        self.max_bytes = getattr(settings, 'EMAIL_ATTACHMENT_MAX_BYTES', 10 * 1024 * 1024)
+        self.max_total = getattr(settings, 'EMAIL_ATTACHMENT_MAX_TOTAL_BYTES', 20 * 1024 * 1024)
+        self.max_files = getattr(settings, 'EMAIL_ATTACHMENT_MAX_FILES', 10)
+        self.files = 0
+        self.total = 0
+        self.spool = None
+        self.received = 0
+        self.error = None
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self.received = 0
+        self.spool = None
+        if field_name != FIELD_NAME:
+            self.error = f'{self.file_name}: only "{FIELD_NAME}" can be uploaded'
+            return
+        self.files += 1
+        if self.files > self.max_files:
+            self.error = f'{self.file_name}: at most {self.max_files} attachments per email'
+            return
+        self.error = check_content_type(self.file_name, self.content_type)
+        if self.error is None:
+            self.spool = tempfile.SpooledTemporaryFile(max_size=self.spool_bytes, prefix='email-attachment-')
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.error is not None:
+            # Refused: read past the rest of the file without keeping it
+            return None
+        if start == 0:
+            self.error = check_leading_bytes(self.file_name, self.content_type, raw_data)
+        if self.error is None and self.received > self.max_bytes:
+            self.error = f'{self.file_name}: attachments are limited to {_megabytes(self.max_bytes)}'
+        if self.error is None and self.total + self.received > self.max_total:
+            self.error = f'{self.file_name}: attachments are limited to {_megabytes(self.max_total)} per email'
+        if self.error is not None:
+            self.spool.close()
+            self.spool = None
+            return None
+        self.spool.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        if self.error is not None:
+            return AttachmentUpload(io.BytesIO(), self.file_name, self.content_type, self.received,
+                                    self.charset, error=self.error)
+        self.total += file_size
+        self.spool.seek(0)
+        upload = AttachmentUpload(self.spool, self.file_name, self.content_type, file_size, self.charset,
+                                  on_disk=file_size > self.spool_bytes)
+        self.spool = None
+        return upload
+
+    def upload_interrupted(self):
+        if self.spool is not None:
+            self.spool.close()
+            self.spool = None
+
+
+def use_attachment_uploads(request):
+    """
+    Spool the request's multipart uploads with AttachmentUploadHandler (before request.data is read)
+    """
+    django_request = getattr(request, '_request', request)
+    django_request.upload_handlers = [AttachmentUploadHandler(django_request)]
+
+
+def attachment_errors(files):
+    """
+    Check uploaded attachments against the limits (serializer field validation)
+
+    Returns:
+        list: One message per problem, empty when the files can be sent
+    """
+    max_files = getattr(settings, 'EMAIL_ATTACHMENT_MAX_FILES', 10)
+    max_bytes = getattr(settings, 'EMAIL_ATTACHMENT_MAX_BYTES', 10 * 1024 * 1024)
+    max_total = getattr(settings, 'EMAIL_ATTACHMENT_MAX_TOTAL_BYTES', 20 * 1024 * 1024)
+
+    errors = []
+    for upload in files:
+        error = getattr(upload, 'error', None)
+        if error is None and upload.size > max_bytes:
+            error = f'{upload.name}: attachments are limited to {_megabytes(max_bytes)}'
+        if error is None:
+            error = check_content_type(upload.name, upload.content_type)
+        if error is not None:
+            errors.append(error)
+    if len(files) > max_files:
+        errors.append(f'At most {max_files} attachments per email')
+    if not errors and sum(upload.size for upload in files) > max_total:
+        errors.append(f'Attachments are limited to {_megabytes(max_total)} per email')
+    return errors
+
+
+def encoded_length(size, wrap=False):
+    """
+    Length of size bytes once base64-encoded (wrap: as 76-character CRLF-terminated MIME lines)
+    """
+    length = 4 * -(-size // 3)
+    if wrap:
+        length += 2 * -(-length // 76)
+    return length
+
+
+def _windows(upload):
+    if upload.on_disk and upload.size >= getattr(settings, 'EMAIL_ATTACHMENT_MMAP_BYTES', 1024 * 1024):
+        yield from _mapped_windows(upload.file.fileno())
+        return
+    upload.file.seek(0)
+    yield from iter(lambda: upload.file.read(WINDOW), b'')
+
+
+def _mapped_windows(fileno):
+    view = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+    try:
+        view.madvise(mmap.MADV_SEQUENTIAL)
+        with memoryview(view) as data:
+            for start in range(0, len(data), WINDOW):
+                with data[start:start + WINDOW] as window:
+                    yield window
+                # Encoded: drop the pages from this process (they stay in the page cache)
+                view.madvise(mmap.MADV_DONTNEED, start, min(WINDOW, len(data) - start))
+    finally:
+        view.close()
+
+
+def base64_chunks(upload, wrap=False):
+    """
+    Base64-encode an upload one window at a time
+
+    Args:
+        upload (UploadedFile): Attachment (re-read from the start on every call)
+        wrap (bool): 76-character lines ending in CRLF (MIME), else one unbroken string (JSON)
+
+    Yields:
+        bytes: Encoded chunks, which concatenate to the encoding of the whole file
+    """
+    for window in _windows(upload):
+        if wrap:
+            yield base64.encodebytes(window).replace(b'\n', b'\r\n')
+        else:
+            yield base64.b64encode(window)
+
+
+class JsonAttachmentBody:
+    """
+    File-like JSON request body: payload plus an attachment list whose contents are
+    base64-encoded from the uploads as the body is read
+
+    Args:
+        payload (dict): JSON object without the attachments
+        attachments (list): Uploads, sent as [{"name", "content"}] under field
+        field (str): Attachment list key
+    """
+
+    def __init__(self, payload, attachments, field='attachment'):
+        head = json.dumps(payload)[:-1]
+        segments = [f'{head}{", " if payload else ""}"{field}": ['.encode()]
+        for index, upload in enumerate(attachments):
+            segments.append(f'{", " if index else ""}{{"name": {json.dumps(upload.name)}, "content": "'.encode())
+            segments.append(upload)
+            segments.append(b'"}')
+        segments.append(b']}')
+        self._segments = segments
+        self._length = sum(
+            len(segment) if isinstance(segment, bytes) else encoded_length(segment.size)
+            for segment in segments
+        )
+        self.seek(0)
+
+    def __len__(self):
+        return self._length
+
+    def _generate(self):
+        for segment in self._segments:
+            if isinstance(segment, bytes):
+                yield segment
+            else:
+                yield from base64_chunks(segment)
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            rest = [self._chunk[self._offset:]] + list(self._chunks)
+            self._chunk, self._offset = b'', 0
+            data = b''.join(rest)
+            self._position += len(data)
+            return data
+        while self._offset >= len(self._chunk):
+            self._chunk = next(self._chunks, None)
+            self._offset = 0
+            if self._chunk is None:
+                self._chunk = b''
+                return b''
+        data = self._chunk[self._offset:self._offset + size]
+        self._offset += len(data)
+        self._position += len(data)
+        return data
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        # Only rewinding is supported (the HTTP client retrying a request)
+        if offset != 0 or whence != io.SEEK_SET:
+            raise io.UnsupportedOperation('JsonAttachmentBody can only be rewound to the start')
+        self._chunks = self._generate()
+        self._chunk = b''
+        self._offset = 0
+        self._position = 0
+        return 0
@@ -0,0 +1,143 @@
+"""
+Adaptive micro-batching of concurrent single sends.
+
+Brevo can send several messages in one send_transac_email call when they
+share their content (sender, html/text or template) and differ only in
+recipient, subject, params and reply-to (messageVersions). Under load many
+request threads send exactly that (the same notification to many users, or
+one template with per-user params), each as its own upstream call.
+
+When a send overlaps another send with the same content (or such sends
+overlapped within the last second), it becomes a batch leader: it waits up
+to EMAIL_BATCH_WINDOW_MS (or until EMAIL_BATCH_MAX_SIZE sends joined), makes
+one upstream call for everything collected and hands each waiting thread its
+own result. A lone send, or one whose content nothing else shares (a
+per-recipient body), goes out directly, so there is no added latency where
+batching cannot help.
+"""
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class _Batch:
+    __slots__ = ('items', 'results', 'full', 'done')
+
+    def __init__(self, item):
+        self.items = [item]
+        self.results = None
+        self.full = threading.Event()
+        self.done = threading.Event()
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent sends with the same batch key into one upstream call
+    """
+    # A key keeps opening batches for this many seconds after its sends last overlapped
+    RECENT_SECONDS = 1.0
+    RECENT_MAX_KEYS = 4096
+
+    def __init__(self, send_batch, window_ms=10, max_size=50):
+        """
+        Args:
+            send_batch (callable): send_batch(key, items) -> list of result dicts, one per item in order
+            window_ms (float): Longest time a batch leader waits for others to join
+            max_size (int): Sends per batch (a full batch is sent at once)
+        """
+        self.send_batch = send_batch
+        self.window = window_ms / 1000
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._open = {}
+        # key -> sends in progress / when its sends last overlapped
+        self._active = {}
+        self._recent = {}
+        self.stats = {'direct': 0, 'batches': 0, 'batched_messages': 0, 'upstream_calls': 0}
+
+    def submit(self, key, item, send_direct):
+        """
+        Send one message, batched with concurrent sends of the same key when busy
+
+        Args:
+            key (hashable): What batched messages must have in common
+            item: Per-message data passed to send_batch
+            send_direct (callable): Sends this message alone -> result dict
+
+        Returns:
+            dict: This message's result
+        """
+        now = time.monotonic()
+        with self._lock:
+            overlapping = key in self._active
+            self._active[key] = self._active.get(key, 0) + 1
+            if overlapping:
+                self._remember(key, now)
+            batch = self._open.get(key)
+            if batch is not None:
+                role = 'follower'
+                index = len(batch.items)
+                batch.items.append(item)
+                if len(batch.items) >= self.max_size:
+                    del self._open[key]
+                    batch.full.set()
+            elif self.max_size > 1 and now - self._recent.get(key, float('-inf')) < self.RECENT_SECONDS:
+                role = 'leader'
+                index = 0
+                batch = self._open[key] = _Batch(item)
+            else:
+                role = 'direct'
+                self.stats['direct'] += 1
+                self.stats['upstream_calls'] += 1
+
+        try:
+            if role == 'direct':
+                return send_direct()
+            if role == 'leader':
+                self._lead(key, batch, send_direct)
+            else:
+                batch.done.wait()
+            return batch.results[index]
+        finally:
+            with self._lock:
+                self._active[key] -= 1
+                if not self._active[key]:
+                    del self._active[key]
+
+    def _remember(self, key, now):
+        # Called with the lock held
+        self._recent[key] = now
+        if len(self._recent) > self.RECENT_MAX_KEYS:
+            horizon = now - self.RECENT_SECONDS
+            self._recent = {k: t for k, t in self._recent.items() if t >= horizon}
+            if len(self._recent) > self.RECENT_MAX_KEYS:
+                self._recent = {key: now}
+
+    def _lead(self, key, batch, send_direct):
+        batch.full.wait(self.window)
+        with self._lock:
+            if self._open.get(key) is batch:
+                del self._open[key]
+            items = list(batch.items)
+            self.stats['upstream_calls'] += 1
+            if len(items) > 1:
+                self.stats['batches'] += 1
+                self.stats['batched_messages'] += len(items)
+            else:
+                self.stats['direct'] += 1
+
+        try:
+            if len(items) == 1:
+                # Nobody joined within the window
+                batch.results = [send_direct()]
+            else:
+                batch.results = self.send_batch(key, items)
+        except Exception as e:
+            logger.error(f"Batched send of {len(items)} emails raised: {e}", exc_info=True)
+            batch.results = [{'success': False, 'error': str(e)}] * len(items)
+        finally:
+            if batch.results is None or len(batch.results) != len(items):
+                batch.results = [{'success': False, 'error': 'Batched send returned no result'}] * len(items)
+            batch.done.set()
@@ -0,0 +1,361 @@
+"""
+Notification digests: generic emails to one recipient merged into a single send.
+
+Products that send many small notifications opt in with a digest window
+(Product.digest_window_seconds). A generic email from such a product is not
+sent right away:
+    - it is stored as a row in email_digest_items (so it survives a crash or
+      deploy) and the request is answered 202;
+    - the worker that received it tracks the recipient's open window in a
+      bounded in-memory buffer (at most EMAIL_DIGEST_MAX_GROUPS windows): the
+      first email to a recipient opens the window, later ones join it;
+    - a timer thread closes windows as they end (or once EMAIL_DIGEST_MAX_ITEMS
+      emails joined) and sends everything stored for the recipient through the
+      email pipeline as one digest, or as the email itself when only one came.
+A digest covers the recipient's rows from every worker: the sending worker
+leases them all, and a worker whose window for the same recipient ends later
+finds nothing left to send. Every EMAIL_DIGEST_SWEEP_INTERVAL seconds each
+worker also sends the windows nobody holds (a dead worker's, or those beyond
+the buffer bound). Rows are deleted once their digest was sent.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+import heapq
+import itertools
+import logging
+import os
+import socket
+import threading
+import time
+
+from .. import lifecycle
+from .email_lanes import LaneSaturated
+from .email_scheduler import WRITE_BATCH, _chunks
+from .product_registry import ProductRegistry
+
+logger = logging.getLogger(__name__)
+
+# Windows claimed per sweep
+SWEEP_LIMIT = 1000
+
+
+class EmailDigest:
+    """
+    Process-wide digest buffer (open windows, timer thread, send pool)
+    """
+    TICK = 1.0
+
+    _lock = threading.Lock()
+    _stop = threading.Event()
+    _thread = None
+    _executor = None
+    # (product name, environment, recipient) -> [window end (epoch), emails joined]
+    _windows = {}
+    # (window end, key) heap; entries whose window was closed early or sent are skipped
+    _deadlines = []
+    _worker_id = None
+    _claims = itertools.count()
+    _next_sweep = 0.0
+    stats = {'buffered': 0, 'digests': 0, 'singles': 0, 'merged': 0, 'retried': 0, 'dropped': 0, 'swept': 0}
+
+    @staticmethod
+    def _setting(name, default):
+        return getattr(settings, name, default)
+
+    @classmethod
+    def running(cls):
+        return cls._thread is not None and cls._thread.is_alive()
+
+    @staticmethod
+    def window(product, data):
+        """
+        Seconds a generic email waits for its recipient's digest (0: send it now, always with EMAIL_DIGEST_ENABLED off)
+        """
+        if not getattr(settings, 'EMAIL_DIGEST_ENABLED', False):
+            return 0
+        if not product.digest_window or not data.get('digest', True) or data.get('attachments'):
+            return 0
+        return product.digest_window
+
+    @classmethod
+    def add(cls, product, data):
+        """
+        Store a generic email for its recipient's digest
+
+        Args:
+            product (ProductInfo): Sending product
+            data (dict): Validated generic email data
+
+        Returns:
+            datetime: When the digest is due, or None when the email is to be sent now
+                (no digest window, or no digest timer in this process)
+        """
+        from ..models import DigestItem
+
+        window = cls.window(product, data)
+        if window <= 0 or not cls.running():
+            return None
+
+        key = (product.name, data.get('environment', 'prod'), data['to_email'].lower())
+        now = time.time()
+        with cls._lock:
+            held = cls._windows.get(key)
+        flush_at = held[0] if held else now + window
+        item = DigestItem.objects.create(
+            product_name=key[0],
+            environment=key[1],
+            recipient=key[2],
+            subject=data['subject'],
+            html_content=data['html_content'],
+            text_content=data.get('text_content') or '',
+            flush_at=datetime.fromtimestamp(flush_at, tz=dt_timezone.utc),
+        )
+
+        with cls._lock:
+            held = cls._windows.get(key)
+            if held is None and len(cls._windows) < cls._setting('EMAIL_DIGEST_MAX_GROUPS', 10000):
+                # Beyond the bound the row waits for the sweep instead
+                held = cls._windows[key] = [flush_at, 0]
+                heapq.heappush(cls._deadlines, (flush_at, key))
+            if held is not None:
+                held[1] += 1
+                if held[1] >= cls._setting('EMAIL_DIGEST_MAX_ITEMS', 50) and held[0] > now:
+                    held[0] = now
+                    heapq.heappush(cls._deadlines, (now, key))
+            cls.stats['buffered'] += 1
+        logger.info(f"Generic email to {data['to_email']} held for {product.display_name}'s digest (#{item.pk})")
+        return item.flush_at
+
+    @classmethod
+    def _due(cls, now):
+        """
+        Close the windows that have ended
+
+        Returns:
+            list: Their keys
+        """
+        due = []
+        with cls._lock:
+            while cls._deadlines and cls._deadlines[0][0] <= now:
+                flush_at, key = heapq.heappop(cls._deadlines)
+                held = cls._windows.get(key)
+                if held is not None and held[0] == flush_at:
+                    del cls._windows[key]
+                    due.append(key)
+        return due
+
+    @classmethod
+    def _abandoned(cls):
+        """
+        Recipients with stored emails whose window ended a sweep interval ago without being sent
+
+        Returns:
+            list: Their keys
+        """
+        from ..models import DigestItem
+
+        now = timezone.now()
+        cutoff = now - timedelta(seconds=cls._setting('EMAIL_DIGEST_SWEEP_INTERVAL', 30))
+        keys = set(
+            DigestItem.objects
+            .filter(flush_at__lt=cutoff)
+            .filter(Q(lease_until__isnull=True) | Q(lease_until__lt=now))
+            .values_list('product_name', 'environment', 'recipient')
+            .distinct()[:SWEEP_LIMIT]
+        )
+        with cls._lock:
+            keys.difference_update(cls._windows)
+        cls.stats['swept'] += len(keys)
+        return list(keys)
+
+    @classmethod
+    def _send(cls, key):
+        """
+        Lease every stored email to a recipient and send them as one (send pool thread)
+        """
+        from ..models import DigestItem
+
+        product_name, environment, recipient = key
+        stored = DigestItem.objects.filter(product_name=product_name, environment=environment, recipient=recipient)
+        now = timezone.now()
+        token = f'{cls._worker_id}/{next(cls._claims)}'
+        try:
+            # Conditional on the lease being free, so two workers never send the same emails
+            claimed = stored.filter(Q(lease_until__isnull=True) | Q(lease_until__lt=now)).update(
+                claimed_by=token,
+                lease_until=now + timedelta(seconds=cls._setting('EMAIL_DIGEST_LEASE_SECONDS', 120))
+            )
+            if not claimed:
+                return
+            items = list(stored.filter(claimed_by=token).order_by('created_at', 'pk'))
+            outcome, error, retry_after = cls._deliver(product_name, environment, recipient, items)
+            cls._record(recipient, items, outcome, error, retry_after)
+        except Exception as e:
+            # The lease expires and the sweep sends them
+            logger.error(f"Digest for {recipient} raised: {e}", exc_info=True)
+        finally:
+            # Pool thread: hand the connection back instead of keeping it per thread
+            connection.close()
+
+    @classmethod
+    def _deliver(cls, product_name, environment, recipient, items):
+        """
+        Send the stored emails as one digest (or the email itself when there is only one)
+
+        Returns:
+            tuple: (outcome, error, retry_after): outcome 'sent', 'retry' (counts as an attempt),
+                'busy' (lane saturated, does not) or 'failed' (permanent)
+        """
+        from ..utils.email_templates import EmailTemplateRenderer
+        from .email_pipeline import EmailPipeline
+
+        product = ProductRegistry.get_by_name(product_name)
+        if product is None:
+            return 'failed', f"Unknown product {product_name}", None
+
+        notifications = [
+            {'subject': item.subject, 'html_content': item.html_content, 'text_content': item.text_content}
+            for item in items
+        ]
+        if len(notifications) == 1:
+            content = notifications[0]
+        else:
+            content = EmailTemplateRenderer.render_digest_email(product.display_name, notifications, environment)
+        data = {
+            'to_email': recipient,
+            'environment': environment,
+            'subject': content['subject'],
+            'html_content': content['html_content'],
+            'text_content': content['text_content'],
+            'digest': False,
+        }
+        try:
+            _, result = EmailPipeline.process('generic', product, data, execution='sync')
+        except LaneSaturated as e:
+            return 'busy', str(e), e.retry_after
+        except Exception as e:
+            logger.error(f"Digest for {recipient} raised: {e}", exc_info=True)
+            return 'retry', str(e), None
+        if result is None or result.get('success'):
+            return 'sent', None, None
+        return 'retry', result.get('error') or 'Send failed', None
+
+    @classmethod
+    def _record(cls, recipient, items, outcome, error, retry_after):
+        """
+        Delete sent emails; retry the others with backoff or drop them after EMAIL_DIGEST_MAX_ATTEMPTS
+        """
+        from ..models import DigestItem
+
+        ids = [item.pk for item in items]
+        if outcome == 'sent':
+            for chunk in _chunks(ids, WRITE_BATCH):
+                DigestItem.objects.filter(pk__in=chunk).delete()
+            cls.stats['singles' if len(ids) == 1 else 'digests'] += 1
+            cls.stats['merged'] += len(ids) if len(ids) > 1 else 0
+            return
+
+        attempts = max(item.attempts for item in items) + (0 if outcome == 'busy' else 1)
+        if outcome == 'failed' or attempts >= cls._setting('EMAIL_DIGEST_MAX_ATTEMPTS', 5):
+            logger.error(f"Dropping {len(ids)} digest email(s) to {recipient} after {attempts} attempt(s): {error}")
+            for chunk in _chunks(ids, WRITE_BATCH):
+                DigestItem.objects.filter(pk__in=chunk).delete()
+            cls.stats['dropped'] += len(ids)
+            return
+
+        delay = retry_after if outcome == 'busy' else min(60 * 2 ** (attempts - 1), 3600)
+        logger.warning(f"Digest for {recipient} not sent, retrying in {delay}s: {error}")
+        # Still leased until the retry is due, then the sweep picks it up
+        retry_at = timezone.now() + timedelta(seconds=delay)
+        for chunk in _chunks(ids, WRITE_BATCH):
+            DigestItem.objects.filter(pk__in=chunk).update(attempts=attempts, claimed_by='', lease_until=retry_at)
+        cls.stats['retried'] += 1
+
+    @classmethod
+    def _run(cls):
+        sweep_interval = cls._setting('EMAIL_DIGEST_SWEEP_INTERVAL', 30)
+        while not cls._stop.is_set():
+            now = time.time()
+            try:
+                due = cls._due(now)
+                if now >= cls._next_sweep:
+                    cls._next_sweep = now + sweep_interval
+                    due.extend(cls._abandoned())
+                for key in due:
+                    cls._executor.submit(cls._send, key)
+            except Exception as e:
+                logger.error(f"Email digest tick failed: {e}", exc_info=True)
+            finally:
+                connection.close()
+            cls._stop.wait(cls.TICK - time.time() % cls.TICK)
+
+    @classmethod
+    def start(cls):
+        """
+        Start the digest timer in this process unless it is already running
+        """
+        if cls.running():
+            return
+        with cls._lock:
+            if cls.running():
+                return
+            cls._worker_id = f'{socket.gethostname()}:{os.getpid()}'
+            cls._windows = {}
+            cls._deadlines = []
+            # The first sweep waits an interval: workers starting together do not all scan at once
+            cls._next_sweep = time.time() + cls._setting('EMAIL_DIGEST_SWEEP_INTERVAL', 30)
+            cls._stop = threading.Event()
+            cls._executor = ThreadPoolExecutor(
+                max_workers=cls._setting('EMAIL_DIGEST_WORKERS', 2), thread_name_prefix='email-digest'
+            )
+            cls._thread = threading.Thread(target=cls._run, name='email-digest', daemon=True)
+            cls._thread.start()
+        logger.info(f"Email digest timer started in {cls._worker_id}")
+
+    @classmethod
+    def stop(cls, timeout=10):
+        """
+        Stop the digest timer and finish the digests being sent. Open windows stay
+        stored and are sent by another worker's sweep once they end.
+        """
+        thread, executor = cls._thread, cls._executor
+        if thread is None:
+            return
+        cls._stop.set()
+        thread.join(timeout)
+        executor.shutdown(wait=True, cancel_futures=True)
+        with cls._lock:
+            held = len(cls._windows)
+            cls._windows = {}
+            cls._deadlines = []
+        if held:
+            logger.info(f"Left {held} open digest windows to the sweep")
+        cls._thread = None
+        cls._executor = None
+
+    @classmethod
+    def snapshot(cls):
+        """
+        Counters, plus the windows open in this process
+        """
+        with cls._lock:
+            held = len(cls._windows)
+        return dict(cls.stats, windows=held, running=cls.running())
+
+    @classmethod
+    def _forget_after_fork(cls):
+        # The parent's threads do not survive fork; its windows are stored and swept
+        cls._lock = threading.Lock()
+        cls._stop = threading.Event()
+        cls._thread = None
+        cls._executor = None
+        cls._windows = {}
+        cls._deadlines = []
+        cls._worker_id = None
+
+
+lifecycle.register('email_digest', reset=EmailDigest._forget_after_fork, close=EmailDigest.stop)
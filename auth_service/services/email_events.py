@@ -0,0 +1,361 @@
+"""
+Brevo delivery events (webhooks) with batched writes.
+
+Brevo reports what happened to each sent email (request, delivered, opened,
+click, soft_bounce, hard_bounce, spam, blocked, ...) by POSTing to
+/api/webhooks/brevo/: one event per request, or a JSON array of events when
+the webhook is batched. Bursts reach thousands of events per second, so the
+webhook never writes to the database itself:
+    - EmailEvents.ingest parses the events and appends them to a fixed-size
+      per-worker ring buffer (EMAIL_EVENTS_BUFFER_SIZE) under a lock, and
+      answers at once. When the buffer cannot take a whole request the webhook
+      answers 503, so Brevo delivers the events again later instead of them
+      being dropped; a request larger than the whole buffer could never fit
+      and is refused with 413;
+    - a writer thread drains the buffer every EMAIL_EVENTS_FLUSH_INTERVAL
+      seconds, or as soon as EMAIL_EVENTS_FLUSH_SIZE events are waiting, with
+      one COPY into a staging table and one INSERT ... ON CONFLICT DO NOTHING
+      per batch on PostgreSQL (bulk INSERTs elsewhere) into email_events;
+    - events Brevo redelivers are ignored by the (message_id, event,
+      occurred_at) unique constraint;
+    - a batch the database keeps refusing (e.g. a NUL character PostgreSQL
+      rejects) is retried EMAIL_EVENTS_MAX_RETRIES times, then split in
+      halves, one write per flush, until the events refused on their own are
+      logged and dropped, instead of blocking every newer event behind it.
+Events still buffered are written when the worker exits; a worker killed
+outright loses at most the last flush interval.
+"""
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+import csv
+import io
+import json
+import logging
+import threading
+import time
+
+from .. import lifecycle
+
+logger = logging.getLogger(__name__)
+
+# Columns written per event, in order
+COLUMNS = ('message_id', 'event', 'email', 'occurred_at', 'tag', 'reason', 'link', 'payload', 'received_at')
+
+
+class RingBuffer:
+    """
+    Fixed-capacity FIFO over a preallocated list: appends and drains never allocate per item
+    and a full buffer refuses new items instead of growing (callers hold the lock)
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._items = [None] * capacity
+        self._head = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def extend(self, items):
+        """
+        Append all items, or none when they do not fit
+
+        Returns:
+            bool: Whether the items were appended
+        """
+        if len(items) > self.capacity - self._size:
+            return False
+        tail = (self._head + self._size) % self.capacity
+        for item in items:
+            self._items[tail] = item
+            tail = tail + 1 if tail + 1 < self.capacity else 0
+        self._size += len(items)
+        return True
+
+    def drain(self, limit):
+        """
+        Remove and return up to limit items, oldest first
+        """
+        count = min(limit, self._size)
+        end = self._head + count
+        if end <= self.capacity:
+            items = self._items[self._head:end]
+            self._items[self._head:end] = [None] * count
+        else:
+            items = self._items[self._head:] + self._items[:end - self.capacity]
+            self._items[self._head:] = [None] * (self.capacity - self._head)
+            self._items[:end - self.capacity] = [None] * (end - self.capacity)
+        self._head = end % self.capacity
+        self._size -= count
+        return items
+
+
+def _occurred_at(event):
+    """
+    When the event happened: ts_event (seconds), ts_epoch (milliseconds) or ts, else now
+    """
+    for key, scale in (('ts_event', 1), ('ts_epoch', 1000), ('ts', 1)):
+        value = event.get(key)
+        if isinstance(value, (int, float)) and value > 0:
+            return datetime.fromtimestamp(value / scale, tz=dt_timezone.utc)
+    return timezone.now()
+
+
+def parse_event(event):
+    """
+    Turn one Brevo webhook event into a row
+
+    Returns:
+        tuple: Values for COLUMNS, or None when the event has no event name or message id
+    """
+    if not isinstance(event, dict):
+        return None
+    name = event.get('event')
+    message_id = event.get('message-id') or event.get('message_id')
+    if not isinstance(name, str) or not name or not isinstance(message_id, str) or not message_id:
+        return None
+    return (
+        message_id[:255],
+        name[:32],
+        str(event.get('email') or '')[:254],
+        _occurred_at(event),
+        str(event.get('tag') or '')[:255],
+        str(event.get('reason') or ''),
+        str(event.get('link') or ''),
+        event,
+        timezone.now(),
+    )
+
+
+class EmailEvents:
+    """
+    Process-wide event buffer and its writer thread
+    """
+    _lock = threading.Lock()
+    _wake = threading.Event()
+    _stop = threading.Event()
+    _buffer = None
+    _thread = None
+    # Batches whose write failed, as [rows, failures], written again before anything newer
+    _retry = None
+    stats = {'accepted': 0, 'rejected': 0, 'invalid': 0, 'written': 0, 'dropped': 0, 'flushes': 0,
+             'failed_flushes': 0, 'last_flush_ms': 0.0}
+
+    @staticmethod
+    def _setting(name, default):
+        return getattr(settings, name, default)
+
+    @classmethod
+    def capacity(cls):
+        """
+        Most events one webhook request can bring: the size of the buffer
+        """
+        return cls._setting('EMAIL_EVENTS_BUFFER_SIZE', 20000)
+
+    @classmethod
+    def ingest(cls, events):
+        """
+        Buffer webhook events for the writer thread
+
+        Args:
+            events (list): Brevo event objects
+
+        Returns:
+            tuple: (accepted, invalid) counts; accepted is None when the buffer is full (retry later)
+        """
+        rows = [parse_event(event) for event in events]
+        valid = [row for row in rows if row is not None]
+        invalid = len(rows) - len(valid)
+
+        cls._ensure_started()
+        with cls._lock:
+            if not cls._buffer.extend(valid):
+                cls.stats['rejected'] += len(valid)
+                accepted = None
+            else:
+                cls.stats['accepted'] += len(valid)
+                accepted = len(valid)
+            cls.stats['invalid'] += invalid
+            waiting = len(cls._buffer)
+        if accepted is None:
+            logger.warning(f"Email event buffer full ({waiting} waiting), refusing {len(valid)} events")
+        elif waiting >= cls._setting('EMAIL_EVENTS_FLUSH_SIZE', 2000):
+            cls._wake.set()
+        return accepted, invalid
+
+    @classmethod
+    def _ensure_started(cls):
+        if cls._thread is not None:
+            return
+        with cls._lock:
+            if cls._thread is not None:
+                return
+            cls._buffer = RingBuffer(cls.capacity())
+            cls._retry = []
+            cls._wake = threading.Event()
+            cls._stop = threading.Event()
+            cls._thread = threading.Thread(target=cls._run, name='email-events', daemon=True)
+            cls._thread.start()
+
+    @classmethod
+    def _run(cls):
+        interval = cls._setting('EMAIL_EVENTS_FLUSH_INTERVAL', 1.0)
+        while not cls._stop.is_set():
+            cls._wake.wait(interval)
+            cls._wake.clear()
+            try:
+                cls.flush()
+            except Exception as e:
+                logger.error(f"Email event flush failed: {e}", exc_info=True)
+            finally:
+                connection.close()
+
+    @classmethod
+    def flush(cls):
+        """
+        Write everything buffered so far, a batch at a time
+
+        Returns:
+            int: Events written
+        """
+        batch_size = cls._setting('EMAIL_EVENTS_FLUSH_SIZE', 2000)
+        written = 0
+        while True:
+            if cls._retry:
+                rows, failures = cls._retry.pop(0)
+            else:
+                with cls._lock:
+                    rows = cls._buffer.drain(batch_size) if cls._buffer is not None else []
+                failures = 0
+            if not rows:
+                return written
+
+            started = time.monotonic()
+            try:
+                cls._write(rows)
+            except DatabaseError as e:
+                cls.stats['failed_flushes'] += 1
+                cls._failed(rows, failures + 1, e)
+                return written
+            written += len(rows)
+            cls.stats['written'] += len(rows)
+            cls.stats['flushes'] += 1
+            cls.stats['last_flush_ms'] = round((time.monotonic() - started) * 1000, 1)
+
+    @classmethod
+    def _failed(cls, rows, failures, error):
+        """
+        Keep a batch whose write failed, to be written before newer events on the next flush.
+        Past EMAIL_EVENTS_MAX_RETRIES failures it is split in halves, each tried once per flush,
+        so the rows the database refuses (a NUL character, a value out of range) end up alone
+        and are dropped rather than holding everything else back forever
+        """
+        max_retries = cls._setting('EMAIL_EVENTS_MAX_RETRIES', 5)
+        if failures < max_retries:
+            logger.error(f"Could not write {len(rows)} email events (attempt {failures}), retrying: {error}")
+            cls._retry.insert(0, [rows, failures])
+        elif len(rows) > 1:
+            half = len(rows) // 2
+            logger.error(f"Could not write {len(rows)} email events after {failures} attempts, "
+                         f"splitting the batch: {error}")
+            cls._retry[:0] = [[rows[:half], max_retries - 1], [rows[half:], max_retries - 1]]
+        else:
+            message_id, event = rows[0][:2]
+            cls.stats['dropped'] += 1
+            logger.error(f"Dropping email event {event} for {message_id} after {failures} failed writes: {error}")
+
+    @classmethod
+    def _write(cls, rows):
+        if connection.vendor == 'postgresql':
+            cls._copy(rows)
+            return
+        from ..models import EmailEvent
+
+        EmailEvent.objects.bulk_create(
+            [EmailEvent(**dict(zip(COLUMNS, row))) for row in rows],
+            batch_size=500,
+            ignore_conflicts=True
+        )
+
+    @staticmethod
+    def _copy(rows):
+        """
+        PostgreSQL: COPY the rows into a per-session staging table, then move the new ones over
+        """
+        from ..models import EmailEvent
+
+        table = connection.ops.quote_name(EmailEvent._meta.db_table)
+        columns = ', '.join(COLUMNS)
+        data = io.StringIO()
+        # Every value quoted: an unquoted empty CSV field would be read as NULL
+        writer = csv.writer(data, quoting=csv.QUOTE_ALL)
+        for row in rows:
+            writer.writerow([
+                value.isoformat() if isinstance(value, datetime)
+                else json.dumps(value) if isinstance(value, dict)
+                else value
+                for value in row
+            ])
+        data.seek(0)
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMP TABLE IF NOT EXISTS email_events_staging '
+                f'(LIKE {table} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS'
+            )
+            with connection.wrap_database_errors:
+                cursor.copy_expert(f'COPY email_events_staging ({columns}) FROM STDIN WITH (FORMAT csv)', data)
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) SELECT {columns} FROM email_events_staging ON CONFLICT DO NOTHING'
+            )
+
+    @classmethod
+    def close(cls, timeout=10):
+        """
+        Stop the writer thread and write what is still buffered (worker exit)
+        """
+        thread = cls._thread
+        if thread is None:
+            return
+        cls._stop.set()
+        cls._wake.set()
+        thread.join(timeout)
+        try:
+            cls.flush()
+        except Exception as e:
+            logger.warning(f"Could not write buffered email events: {e}")
+        finally:
+            connection.close()
+        waiting = len(cls._buffer) + cls._retrying()
+        if waiting:
+            logger.warning(f"Exiting with {waiting} email events unwritten")
+        cls._thread = None
+
+    @classmethod
+    def snapshot(cls):
+        """
+        Counters, plus the events waiting in this process
+        """
+        with cls._lock:
+            waiting = len(cls._buffer) if cls._buffer is not None else 0
+        return dict(cls.stats, waiting=waiting + cls._retrying())
+
+    @classmethod
+    def _retrying(cls):
+        return sum(len(rows) for rows, _ in cls._retry or [])
+
+    @classmethod
+    def _forget_after_fork(cls):
+        # The writer thread does not survive fork; the parent's buffered events are its own
+        cls._lock = threading.Lock()
+        cls._wake = threading.Event()
+        cls._stop = threading.Event()
+        cls._buffer = None
+        cls._thread = None
+        cls._retry = None
+
+
+lifecycle.register('email_events', reset=EmailEvents._forget_after_fork, close=EmailEvents.close)
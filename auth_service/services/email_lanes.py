@@ -0,0 +1,379 @@
+"""
+Priority lanes for outbound email.
+
+Every send is admitted by one per-process scheduler before it may call Brevo,
+so a burst of bulk product notifications cannot take the worker threads and
+upstream connections that password resets and verifications need:
+    - each email type belongs to a lane ('auth', 'default', 'bulk'); lanes
+      share EMAIL_LANE_CAPACITY concurrent sends by weight (weighted fair
+      queuing, stride scheduling) and each lane has its own concurrency limit;
+    - inside a lane every product is its own flow with an equal share and at
+      most EMAIL_LANE_PRODUCT_LIMIT sends in flight, so one product's campaign
+      does not starve the others;
+    - in-request callers (sync / threaded execution) wait for a slot while
+      holding a request thread, so each lane only lets EMAIL_LANE_WAITERS of
+      them wait; beyond that the request is answered 503 at once;
+    - background jobs (queued execution) wait in the same scheduler, up to
+      EMAIL_PIPELINE_QUEUE_SIZE per lane.
+Per-lane queue depth, in-flight count and wait times are kept for metrics.
+"""
+from collections import deque, namedtuple
+from django.conf import settings
+import logging
+import threading
+import time
+
+from .. import lifecycle
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LANE = 'default'
+
+LaneSpec = namedtuple('LaneSpec', ['name', 'weight', 'limit', 'waiters', 'backlog'])
+
+
+class LaneSaturated(Exception):
+    """
+    A lane cannot take more work right now (waiting room or backlog full, or no slot within the timeout)
+    """
+
+    def __init__(self, lane, message, retry_after=1):
+        super().__init__(message)
+        self.lane = lane
+        self.retry_after = retry_after
+
+
+class _Ticket:
+    __slots__ = ('lane', 'product', 'job', 'event', 'enqueued_at', 'granted')
+
+    def __init__(self, lane, product, job):
+        self.lane = lane
+        self.product = product
+        # Background job to run, or None for a caller blocked on event
+        self.job = job
+        self.event = threading.Event() if job is None else None
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+
+
+class _Flow:
+    __slots__ = ('tickets', 'pass_', 'in_flight')
+
+    def __init__(self, pass_):
+        self.tickets = deque()
+        self.pass_ = pass_
+        self.in_flight = 0
+
+
+class _Lane:
+    # Recent admission waits kept for the percentiles in stats()
+    WAIT_SAMPLES = 1024
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.stride = 1.0 / spec.weight
+        self.pass_ = 0.0
+        # Pass of the flow served last: where a newly active product starts
+        self.vtime = 0.0
+        self.flows = {}
+        self.depth = 0
+        self.waiting = 0
+        self.queued = 0
+        self.in_flight = 0
+        self.counts = {'admitted': 0, 'rejected': 0, 'timed_out': 0}
+        self.waits = deque(maxlen=self.WAIT_SAMPLES)
+
+
+class LaneScheduler:
+    """
+    Weighted fair admission of sends across lanes and products under a shared concurrency budget
+    """
+
+    def __init__(self, lanes, capacity, product_limit=0):
+        """
+        Args:
+            lanes (iterable): LaneSpec per lane; a DEFAULT_LANE spec is required
+            capacity (int): Concurrent sends allowed across all lanes
+            product_limit (int): Concurrent sends per product within a lane (0 means no limit)
+        """
+        self.capacity = capacity
+        self.product_limit = product_limit
+        self._lanes = {spec.name: _Lane(spec) for spec in lanes}
+        if DEFAULT_LANE not in self._lanes:
+            raise ValueError(f"Lane configuration needs a '{DEFAULT_LANE}' lane")
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        # Pass of the lane served last: where a newly backlogged lane starts
+        self._vtime = 0.0
+        # Granted background jobs waiting for a worker thread
+        self._ready = deque()
+        self._unfinished = 0
+
+    def _lane(self, name):
+        return self._lanes.get(name) or self._lanes[DEFAULT_LANE]
+
+    def _enqueue(self, lane, product, job):
+        flow = lane.flows.get(product)
+        if flow is None:
+            flow = lane.flows[product] = _Flow(lane.vtime)
+        elif not flow.tickets:
+            flow.pass_ = max(flow.pass_, lane.vtime)
+        if not lane.depth:
+            # Idle lanes do not bank credit while they have nothing to send
+            lane.pass_ = max(lane.pass_, self._vtime)
+
+        ticket = _Ticket(lane.spec.name, product, job)
+        flow.tickets.append(ticket)
+        lane.depth += 1
+        return ticket
+
+    def _eligible_flow(self, lane):
+        best = None
+        for flow in lane.flows.values():
+            if not flow.tickets:
+                continue
+            if self.product_limit and flow.in_flight >= self.product_limit:
+                continue
+            if best is None or flow.pass_ < best.pass_:
+                best = flow
+        return best
+
+    def _dispatch(self):
+        """
+        Grant free slots to waiting tickets in weighted fair order (called with the lock held)
+        """
+        woke_workers = False
+        while self._in_flight < self.capacity:
+            chosen = None
+            for lane in self._lanes.values():
+                if not lane.depth or lane.in_flight >= lane.spec.limit:
+                    continue
+                if chosen is not None and lane.pass_ >= chosen[0].pass_:
+                    continue
+                flow = self._eligible_flow(lane)
+                if flow is not None:
+                    chosen = (lane, flow)
+            if chosen is None:
+                break
+
+            lane, flow = chosen
+            ticket = flow.tickets.popleft()
+            lane.depth -= 1
+            self._vtime = lane.pass_
+            lane.pass_ += lane.stride
+            lane.vtime = flow.pass_
+            flow.pass_ += 1
+
+            self._in_flight += 1
+            lane.in_flight += 1
+            flow.in_flight += 1
+            lane.counts['admitted'] += 1
+            lane.waits.append(time.monotonic() - ticket.enqueued_at)
+            ticket.granted = True
+
+            if ticket.job is None:
+                lane.waiting -= 1
+                ticket.event.set()
+            else:
+                lane.queued -= 1
+                self._ready.append(ticket)
+                woke_workers = True
+
+        if woke_workers:
+            self._cond.notify_all()
+
+    def _drop_idle_flow(self, lane, product):
+        flow = lane.flows.get(product)
+        if flow is not None and not flow.tickets and not flow.in_flight:
+            del lane.flows[product]
+
+    def _release(self, ticket):
+        lane = self._lane(ticket.lane)
+        self._in_flight -= 1
+        lane.in_flight -= 1
+        lane.flows[ticket.product].in_flight -= 1
+        self._drop_idle_flow(lane, ticket.product)
+        self._dispatch()
+
+    def run(self, lane_name, product, fn, timeout=None):
+        """
+        Run fn on the calling thread once the lane admits it
+
+        Args:
+            lane_name (str): Lane of the email type (unknown lanes use DEFAULT_LANE)
+            product (str): Product name (fair share within the lane)
+            fn (callable): The send
+            timeout (float, optional): Longest wait for a slot
+
+        Raises:
+            LaneSaturated: If the lane's waiting room is full or no slot freed up in time
+        """
+        with self._cond:
+            lane = self._lane(lane_name)
+            if lane.waiting >= lane.spec.waiters:
+                lane.counts['rejected'] += 1
+                raise LaneSaturated(lane.spec.name, f"Too many {lane.spec.name} emails waiting to be sent")
+            ticket = self._enqueue(lane, product, None)
+            lane.waiting += 1
+            self._dispatch()
+
+        if not ticket.event.wait(timeout):
+            with self._cond:
+                if not ticket.granted:
+                    lane.flows[product].tickets.remove(ticket)
+                    lane.depth -= 1
+                    lane.waiting -= 1
+                    lane.counts['timed_out'] += 1
+                    self._drop_idle_flow(lane, product)
+                    raise LaneSaturated(lane.spec.name, f"No {lane.spec.name} send slot within {timeout}s")
+
+        try:
+            return fn()
+        finally:
+            with self._cond:
+                self._release(ticket)
+
+    def enqueue(self, lane_name, product, job):
+        """
+        Queue a background job; a worker runs it once the lane admits it (see next_job)
+
+        Raises:
+            LaneSaturated: If the lane's backlog is full
+        """
+        with self._cond:
+            lane = self._lane(lane_name)
+            if lane.queued >= lane.spec.backlog:
+                lane.counts['rejected'] += 1
+                raise LaneSaturated(lane.spec.name, f"The {lane.spec.name} email backlog is full", retry_after=5)
+            self._enqueue(lane, product, job)
+            lane.queued += 1
+            self._unfinished += 1
+            self._dispatch()
+
+    def next_job(self):
+        """
+        Block until a background job is admitted; the worker must call finish() afterwards
+        """
+        with self._cond:
+            while not self._ready:
+                self._cond.wait()
+            return self._ready.popleft()
+
+    def finish(self, ticket):
+        with self._cond:
+            self._unfinished -= 1
+            self._release(ticket)
+            self._cond.notify_all()
+
+    def drain(self, timeout):
+        """
+        Wait up to timeout seconds for background jobs to finish
+
+        Returns:
+            int: Jobs still unfinished
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._unfinished:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return self._unfinished
+
+    def stats(self):
+        """
+        Queue depth, concurrency and admission wait times per lane
+        """
+        with self._cond:
+            lanes = {}
+            for name, lane in self._lanes.items():
+                waits = sorted(lane.waits)
+                count = len(waits)
+                lanes[name] = dict({
+                    'weight': lane.spec.weight,
+                    'limit': lane.spec.limit,
+                    'depth': lane.depth,
+                    'waiting': lane.waiting,
+                    'queued': lane.queued,
+                    'in_flight': lane.in_flight,
+                    'products': len(lane.flows),
+                    'wait_ms': {
+                        'avg': round(sum(waits) / count * 1000, 1) if count else 0.0,
+                        'p50': round(waits[count // 2] * 1000, 1) if count else 0.0,
+                        'p95': round(waits[min(count - 1, int(count * 0.95))] * 1000, 1) if count else 0.0,
+                        'max': round(waits[-1] * 1000, 1) if count else 0.0,
+                    },
+                }, **lane.counts)
+            return {
+                'enabled': True,
+                'capacity': self.capacity,
+                'in_flight': self._in_flight,
+                'lanes': lanes,
+            }
+
+
+def lane_specs():
+    """
+    Lane configuration from settings (EMAIL_LANE_WEIGHTS / _LIMITS / _WAITERS)
+    """
+    capacity = getattr(settings, 'EMAIL_LANE_CAPACITY', 8)
+    weights = getattr(settings, 'EMAIL_LANE_WEIGHTS', {}) or {}
+    limits = getattr(settings, 'EMAIL_LANE_LIMITS', {}) or {}
+    waiters = getattr(settings, 'EMAIL_LANE_WAITERS', {}) or {}
+    backlog = getattr(settings, 'EMAIL_PIPELINE_QUEUE_SIZE', 1000)
+
+    names = [DEFAULT_LANE] + sorted((set(weights) | set(limits) | set(waiters)) - {DEFAULT_LANE})
+    return [
+        LaneSpec(
+            name=name,
+            weight=max(1, int(weights.get(name, 1))),
+            limit=max(1, int(limits.get(name, capacity))),
+            waiters=max(0, int(waiters.get(name, capacity))),
+            backlog=backlog,
+        )
+        for name in names
+    ]
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """
+    The process-wide lane scheduler, or None when EMAIL_LANES_ENABLED is off
+    """
+    global _scheduler
+
+    if not getattr(settings, 'EMAIL_LANES_ENABLED', False):
+        return None
+    if _scheduler is not None:
+        return _scheduler
+
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LaneScheduler(
+                lane_specs(),
+                capacity=getattr(settings, 'EMAIL_LANE_CAPACITY', 8),
+                product_limit=getattr(settings, 'EMAIL_LANE_PRODUCT_LIMIT', 0),
+            )
+        return _scheduler
+
+
+def lane_stats():
+    """
+    Metrics of this process's scheduler
+    """
+    scheduler = get_scheduler()
+    return scheduler.stats() if scheduler is not None else {'enabled': False}
+
+
+def _forget_scheduler():
+    global _scheduler, _scheduler_lock
+    # Waiting callers and queued jobs belong to the parent's threads
+    _scheduler = None
+    _scheduler_lock = threading.Lock()
+
+
+lifecycle.register('email_lanes', reset=_forget_scheduler)
@@ -0,0 +1,632 @@
+"""
+Unified email pipeline: declarative email types and a shared send engine
+"""
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from rest_framework.response import Response
+from rest_framework import status
+from django.db import DatabaseError, connection
+import logging
+import queue
+import threading
+import time
+
+from .. import lifecycle
+from .email_digest import EmailDigest
+from .email_providers import EmailRouter
+from .email_sandbox import EmailSandbox
+from .email_lanes import DEFAULT_LANE, LaneSaturated, get_scheduler
+from .email_scheduler import EmailScheduler
+from .brevo_templates import BrevoTemplates
+from .product_registry import ProductRegistry
+from .resend_cooldown import CooldownStore
+
+logger = logging.getLogger(__name__)
+
+
+class EmailType:
+    """
+    Declarative configuration for one kind of outbound email.
+
+    Each stage is a callable receiving the pipeline context dict:
+        precheck(ctx) -> dict | None          (optional, a dict skips the send and becomes the result)
+        cooldown                              (True: repeats to the same recipient within the
+                                               EMAIL_RESEND_COOLDOWN window reuse the message already sent)
+        link_generator(ctx) -> str            (optional, stored in ctx['link'])
+        renderer(ctx) -> dict                 (subject, html_content, text_content)
+        template / template_params(ctx) -> dict
+                                              (optional Brevo-managed template key and its per-send
+                                               params, used instead of renderer when EMAIL_SEND_MODE='template')
+        sender_policy(ctx) -> dict | None     (custom sender, None uses the default)
+        lane                                  (priority lane the send is scheduled in, see email_lanes.py)
+        digest                                (True: held for the recipient's digest when the product has a
+                                               digest window, see email_digest.py)
+        post_hooks: [hook(ctx) -> dict]       (run after a successful send, merged into response data)
+    """
+
+    def __init__(self, name, label, serializer_class, renderer, recipient_field='email',
+                 link_generator=None, sender_policy=None, post_hooks=None,
+                 response_fields=('environment',), requires_user=False,
+                 execution=None, messages=None, precheck=None, cooldown=False,
+                 template=None, template_params=None, lane=DEFAULT_LANE, digest=False):
+        self.name = name
+        self.label = label
+        self.serializer_class = serializer_class
+        self.renderer = renderer
+        self.recipient_field = recipient_field
+        self.link_generator = link_generator
+        self.sender_policy = sender_policy
+        self.post_hooks = list(post_hooks or [])
+        self.response_fields = tuple(response_fields)
+        self.requires_user = requires_user
+        self.execution = execution
+        self.precheck = precheck
+        self.cooldown = cooldown
+        self.template = template
+        self.template_params = template_params
+        self.lane = lane
+        self.digest = digest
+
+        title = label.capitalize()
+        self.messages = {
+            'success': f'{title} email sent successfully to {{environment_label}}',
+            'queued': f'{title} email queued for delivery to {{environment_label}}',
+            'scheduled': f'{title} email scheduled for delivery to {{environment_label}}',
+            'digested': f"{title} email added to the recipient's digest in {{environment_label}}",
+            'skipped': f'{title} email not needed in {{environment_label}}',
+            'coalesced': f'{title} email already sent recently in {{environment_label}}',
+            'pending': f'{title} email to this recipient is already being sent in {{environment_label}}',
+            'busy': f'Too many {label} emails in progress in {{environment_label}}, retry shortly',
+            'failure': f'Failed to send {label} email in {{environment_label}}',
+            'error': f'An error occurred while sending {label} email in {{environment_label}}',
+        }
+        self.messages.update(messages or {})
+
+    def __repr__(self):
+        return f'<EmailType {self.name}>'
+
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def register_email_type(email_type):
+    """
+    Register an email type so the pipeline can resolve it by name
+    """
+    with _registry_lock:
+        _registry[email_type.name] = email_type
+    return email_type
+
+
+def get_email_type(name):
+    """
+    Look up a registered email type by name
+    """
+    try:
+        return _registry[name]
+    except KeyError:
+        raise LookupError(f"Unknown email type: {name}")
+
+
+def registered_email_types():
+    """
+    Return a snapshot of all registered email types
+    """
+    return dict(_registry)
+
+
+def run_in_lane(flow, fn, timeout):
+    """
+    Run fn on the calling thread once the lane scheduler admits its (lane, product) flow
+    """
+    scheduler = get_scheduler()
+    if scheduler is None or flow is None:
+        return fn()
+    return scheduler.run(*flow, fn, timeout=timeout)
+
+
+class SyncExecution:
+    """
+    Runs the delivery job inline on the request thread
+    """
+    name = 'sync'
+    waits_for_result = True
+
+    def submit(self, job, flow=None):
+        return run_in_lane(flow, job, getattr(settings, 'EMAIL_PIPELINE_TIMEOUT', 30))
+
+
+class SandboxExecution:
+    """
+    Runs captured (sandbox) sends inline, without lane admission: they use no
+    upstream connection, so they neither wait for nor hold production capacity
+    """
+    name = 'sandbox'
+    waits_for_result = True
+
+    def submit(self, job, flow=None):
+        return job()
+
+
+class ThreadedExecution:
+    """
+    Runs the delivery job on a shared thread pool; the caller waits for the
+    result up to a timeout. Keeps slow upstream calls off the request thread budget.
+    """
+    name = 'threaded'
+    waits_for_result = True
+
+    def __init__(self, max_workers=8, timeout=30):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='email-pipeline')
+
+    def submit(self, job, flow=None):
+        # Admitted on the request thread, so the pool only ever runs sends that hold a slot
+        return run_in_lane(flow, lambda: self._executor.submit(self._run, job).result(timeout=self.timeout),
+                           self.timeout)
+
+    @staticmethod
+    def _run(job):
+        try:
+            return job()
+        finally:
+            # Cooldown releases and sandbox captures write from this pool thread, which outlives the
+            # request: hand its connection back (to the pool, with DATABASE_POOL) after every job
+            connection.close()
+
+    def close(self):
+        # Let in-flight sends finish; callers are waiting on them
+        self._executor.shutdown(wait=True)
+
+
+class QueuedExecution:
+    """
+    Hands the delivery job to background workers and returns immediately.
+    Results are only logged, the caller receives a 202 Accepted response.
+    With a lane scheduler the backlog is kept per lane and product and
+    workers take jobs in weighted fair order instead of FIFO.
+    """
+    name = 'queued'
+    waits_for_result = False
+
+    def __init__(self, workers=2, maxsize=1000, timeout=30, scheduler=None):
+        self.timeout = timeout
+        self._scheduler = scheduler
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._workers = []
+        for i in range(workers):
+            target = self._run_scheduled if scheduler is not None else self._run
+            worker = threading.Thread(target=target, name=f'email-queue-{i}', daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, job, flow=None):
+        if self._scheduler is not None:
+            # Raises LaneSaturated when the lane's backlog is full
+            self._scheduler.enqueue(*(flow or (DEFAULT_LANE, '')), job)
+            return None
+        # Raises queue.Full when the backlog is saturated so the request fails fast
+        self._queue.put_nowait(job)
+        return None
+
+    @staticmethod
+    def _deliver(job):
+        try:
+            result = job()
+            if not result.get('success'):
+                logger.warning(f"Queued email delivery failed: {result.get('error')}")
+        except Exception as e:
+            logger.error(f"Queued email delivery raised: {e}", exc_info=True)
+        finally:
+            # Same for the queue workers, which run for the life of the process
+            connection.close()
+
+    def _run_scheduled(self):
+        while True:
+            ticket = self._scheduler.next_job()
+            try:
+                self._deliver(ticket.job)
+            finally:
+                self._scheduler.finish(ticket)
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self._deliver(job)
+            finally:
+                self._queue.task_done()
+
+    def close(self, timeout=None):
+        """
+        Wait (up to timeout seconds) for queued jobs to be delivered before the process exits
+        """
+        timeout = self.timeout if timeout is None else timeout
+        if self._scheduler is not None:
+            undelivered = self._scheduler.drain(timeout)
+            if undelivered:
+                logger.warning(f"Exiting with {undelivered} queued emails undelivered")
+            return
+        deadline = time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.warning(f"Exiting with {self._queue.unfinished_tasks} queued emails undelivered")
+                    return
+                self._queue.all_tasks_done.wait(remaining)
+
+
+_executions = {}
+_executions_lock = threading.Lock()
+
+
+def get_execution(name=None):
+    """
+    Return the shared execution strategy for the given name (defaults to settings)
+    """
+    name = name or getattr(settings, 'EMAIL_PIPELINE_EXECUTION', 'sync')
+    execution = _executions.get(name)
+    if execution is not None:
+        return execution
+
+    with _executions_lock:
+        if name not in _executions:
+            if name == 'sync':
+                _executions[name] = SyncExecution()
+            elif name == 'sandbox':
+                _executions[name] = SandboxExecution()
+            elif name == 'threaded':
+                _executions[name] = ThreadedExecution(
+                    max_workers=getattr(settings, 'EMAIL_PIPELINE_WORKERS', 8),
+                    timeout=getattr(settings, 'EMAIL_PIPELINE_TIMEOUT', 30),
+                )
+            elif name == 'queued':
+                _executions[name] = QueuedExecution(
+                    workers=getattr(settings, 'EMAIL_PIPELINE_WORKERS', 8),
+                    maxsize=getattr(settings, 'EMAIL_PIPELINE_QUEUE_SIZE', 1000),
+                    timeout=getattr(settings, 'EMAIL_PIPELINE_TIMEOUT', 30),
+                    scheduler=get_scheduler(),
+                )
+            else:
+                raise ValueError(f"Unknown email pipeline execution strategy: {name}")
+        return _executions[name]
+
+
+def _forget_executions():
+    global _executions, _executions_lock, _registry_lock
+    # Worker threads do not survive fork; queued jobs stay with the parent
+    _executions = {}
+    _executions_lock = threading.Lock()
+    _registry_lock = threading.Lock()
+
+
+def close_executions():
+    """
+    Drain and stop the execution strategies' background workers (worker exit)
+    """
+    with _executions_lock:
+        executions = list(_executions.values())
+        _executions.clear()
+    for execution in executions:
+        close = getattr(execution, 'close', None)
+        if close is not None:
+            close()
+
+
+lifecycle.register('email_executions', reset=_forget_executions, close=close_executions)
+
+
+class EmailPipeline:
+    """
+    Shared engine behind every email endpoint:
+    validate -> product -> link -> render -> sender -> send -> post hooks -> response
+    """
+
+    @staticmethod
+    def get_environment_label(environment):
+        """Get the environment label used in API responses"""
+        return "test environment" if environment == "test" else "production environment"
+
+    @classmethod
+    def build_context(cls, email_type, product, data):
+        """
+        Build the pipeline context for validated request data
+        """
+        environment = data.get('environment', 'prod')
+        return {
+            'email_type': email_type,
+            'product': product,
+            'product_name': product.display_name,
+            'data': data,
+            'recipient': data[email_type.recipient_field],
+            'user_name': data.get('user_name'),
+            'environment': environment,
+            'environment_label': cls.get_environment_label(environment),
+            'sandbox': EmailSandbox.applies(product, environment),
+        }
+
+    @classmethod
+    def prepare(cls, ctx):
+        """
+        Run the link, render and sender stages, filling in the context
+        """
+        email_type = ctx['email_type']
+
+        if email_type.link_generator:
+            ctx['link'] = email_type.link_generator(ctx)
+
+        content = None
+        if email_type.template and getattr(settings, 'EMAIL_SEND_MODE', 'html') == 'template':
+            # Brevo renders its stored copy: only the template id and a few params are sent
+            template_id = BrevoTemplates.resolve(ctx['product'], email_type.template)
+            if template_id:
+                content = {'template_id': template_id, 'params': email_type.template_params(ctx)}
+        ctx['content'] = content or email_type.renderer(ctx)
+        ctx['sender'] = email_type.sender_policy(ctx) if email_type.sender_policy else None
+        return ctx
+
+    @classmethod
+    def deliver(cls, ctx):
+        """
+        Send the prepared email and run post hooks on success
+
+        Returns:
+            dict: Send result with success status, message_id and hook data
+        """
+        email_type = ctx['email_type']
+        content = ctx['content']
+
+        message = {
+            'to_email': ctx['recipient'],
+            'subject': content.get('subject'),
+            'html_content': content.get('html_content'),
+            'text_content': content.get('text_content'),
+            'template_id': content.get('template_id'),
+            'params': content.get('params'),
+            'sender': ctx.get('sender'),
+            'attachments': content.get('attachments'),
+            # Providers without Brevo's stored templates render the email locally
+            'render': lambda: email_type.renderer(ctx),
+        }
+        if ctx['sandbox']:
+            # Test traffic of a sandboxed product: stored, not sent (and no post hooks such as HubSpot)
+            return EmailSandbox.capture(ctx, message)
+
+        # Password resets and verifications move on quickly from a provider that cannot be reached
+        result = EmailRouter.send(message, hedge=email_type.lane == 'auth')
+
+        if result['success']:
+            logger.info(
+                f"{email_type.label.capitalize()} email sent successfully to {ctx['recipient']} "
+                f"by {ctx['product_name']} via {result.get('provider')}"
+            )
+            extra = {'provider': result.get('provider')}
+            for hook in email_type.post_hooks:
+                extra.update(hook(ctx) or {})
+            result['extra'] = extra
+        else:
+            logger.warning(f"Failed to send {email_type.label} email: {result.get('error')}")
+
+        return result
+
+    @classmethod
+    def process(cls, email_type, product, data, execution=None):
+        """
+        Run the full pipeline for already-validated data (no HTTP involved)
+
+        Args:
+            email_type (EmailType | str): Email type or its registered name
+            product (ProductInfo): Sending product from the product registry
+            data (dict): Validated serializer data
+            execution (str, optional): Execution strategy override
+
+        Returns:
+            tuple: (context dict, send result dict or None when queued)
+        """
+        if isinstance(email_type, str):
+            email_type = get_email_type(email_type)
+
+        ctx = cls.build_context(email_type, product, data)
+
+        if email_type.precheck:
+            # Answered without any upstream send (e.g. address already verified)
+            skipped = email_type.precheck(ctx)
+            if skipped:
+                ctx['execution'] = 'skipped'
+                return ctx, dict(skipped, success=True, skipped=True)
+
+        ctx['lane'] = email_type.lane
+        flow = (email_type.lane, product.name)
+
+        window = CooldownStore.window(email_type.name) if email_type.cooldown else 0
+        if window <= 0:
+            cls.prepare(ctx)
+            strategy = cls._strategy(email_type, ctx, execution)
+            ctx['execution'] = strategy.name
+            return ctx, strategy.submit(lambda: cls.deliver(ctx), flow=flow)
+
+        # Repeats within the cooldown get the message already sent (no link, render or send)
+        key = CooldownStore.key(product.name, email_type.name, ctx['environment'], ctx['recipient'])
+        coalesced = CooldownStore.acquire(key, window)
+        if coalesced is not None:
+            ctx['execution'] = 'coalesced'
+            return ctx, coalesced
+
+        def job():
+            result = None
+            try:
+                result = cls.deliver(ctx)
+                return result
+            finally:
+                CooldownStore.release(key, window, result)
+
+        try:
+            cls.prepare(ctx)
+            strategy = cls._strategy(email_type, ctx, execution)
+            ctx['execution'] = strategy.name
+            return ctx, strategy.submit(job, flow=flow)
+        except Exception:
+            # Not sent (unknown user, queue full, lane saturated, ...): free the key for the next attempt
+            CooldownStore.release(key, window, None)
+            raise
+
+    @staticmethod
+    def _strategy(email_type, ctx, execution):
+        if ctx['sandbox']:
+            return get_execution('sandbox')
+        strategy = get_execution(execution or email_type.execution)
+        if ctx['content'].get('attachments') and not strategy.waits_for_result:
+            # Uploaded attachments are deleted when the request ends: send before answering
+            strategy = get_execution('sync')
+        return strategy
+
+    @classmethod
+    def handle(cls, email_type, request):
+        """
+        Run the pipeline for an API request and build the HTTP response
+        """
+        if isinstance(email_type, str):
+            email_type = get_email_type(email_type)
+
+        serializer = email_type.serializer_class(data=request.data)
+
+        if not serializer.is_valid():
+            return Response({
+                'success': False,
+                'message': 'Invalid request data',
+                'errors': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+
+        # Get product for the authenticated user from the in-process registry
+        product = ProductRegistry.get_by_user_id(request.user.id)
+        if product is None:
+            return Response({
+                'success': False,
+                'message': 'User is not associated with a product'
+            }, status=status.HTTP_403_FORBIDDEN)
+
+        environment_label = cls.get_environment_label(data.get('environment', 'prod'))
+        messages = {key: value.format(environment_label=environment_label)
+                    for key, value in email_type.messages.items()}
+
+        if cls.is_scheduled(data):
+            return cls._schedule(email_type, product, data, messages)
+
+        if email_type.digest and EmailDigest.window(product, data) > 0:
+            try:
+                digest_at = EmailDigest.add(product, data)
+            except DatabaseError as e:
+                return cls._error_response(email_type, messages, e)
+            if digest_at is not None:
+                return cls._accepted(email_type, product, data, messages['digested'],
+                                     {'digested': True, 'digest_at': digest_at.isoformat()})
+
+        try:
+            ctx, result = cls.process(email_type, product, data)
+
+            response_data = {'message_id': result.get('message_id') if result else None}
+            for field in email_type.response_fields:
+                response_data[field] = ctx[field]
+
+            if result is None:
+                response_data['queued'] = True
+                return Response({
+                    'success': True,
+                    'message': messages['queued'],
+                    'data': response_data
+                }, status=status.HTTP_202_ACCEPTED)
+
+            if result['success'] and result.get('pending'):
+                # Coalesced into a send that has no outcome yet: in progress, not sent
+                response_data.update(result.get('extra', {}))
+                return Response({
+                    'success': True,
+                    'message': messages['pending'],
+                    'data': response_data
+                }, status=status.HTTP_202_ACCEPTED)
+
+            if result['success']:
+                response_data.update(result.get('extra', {}))
+                return Response({
+                    'success': True,
+                    'message': messages[
+                        'skipped' if result.get('skipped') else 'coalesced' if result.get('coalesced') else 'success'
+                    ],
+                    'data': response_data
+                }, status=status.HTTP_200_OK)
+
+            return Response({
+                'success': False,
+                'message': messages['failure'],
+                'error': result.get('error')
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        except LaneSaturated as e:
+            logger.warning(f"{email_type.label.capitalize()} email rejected, lane {e.lane} saturated: {e}")
+            response = Response({
+                'success': False,
+                'message': messages['busy'],
+                'error': str(e)
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            response['Retry-After'] = str(e.retry_after)
+            return response
+
+        except ValueError as e:
+            if not email_type.requires_user:
+                return cls._error_response(email_type, messages, e)
+            logger.warning(f"User not found for {email_type.label}: {e}")
+            return Response({
+                'success': False,
+                'message': str(e)
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        except Exception as e:
+            return cls._error_response(email_type, messages, e)
+
+    @staticmethod
+    def is_scheduled(data):
+        """
+        Whether validated data asks for a later send (send_at at least a scheduler tick ahead)
+        """
+        send_at = data.get('send_at')
+        return send_at is not None and send_at.timestamp() - time.time() >= EmailScheduler.TICK
+
+    @classmethod
+    def _schedule(cls, email_type, product, data, messages):
+        try:
+            scheduled = EmailScheduler.schedule(email_type, product, data, data['send_at'])
+        except DatabaseError as e:
+            return cls._error_response(email_type, messages, e)
+
+        return cls._accepted(email_type, product, data, messages['scheduled'], {
+            'scheduled': True, 'scheduled_id': scheduled.pk, 'send_at': scheduled.due_at.isoformat()
+        })
+
+    @classmethod
+    def _accepted(cls, email_type, product, data, message, extra):
+        """
+        202 response for an email stored to send later
+        """
+        response_data = dict({'message_id': None}, **extra)
+        ctx = cls.build_context(email_type, product, data)
+        for field in email_type.response_fields:
+            response_data[field] = ctx[field]
+        return Response({
+            'success': True,
+            'message': message,
+            'data': response_data
+        }, status=status.HTTP_202_ACCEPTED)
+
+    @staticmethod
+    def _error_response(email_type, messages, error):
+        logger.error(f"Error sending {email_type.label} email: {error}", exc_info=True)
+        return Response({
+            'success': False,
+            'message': messages['error'],
+            'error': str(error)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
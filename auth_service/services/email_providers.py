@@ -0,0 +1,235 @@
+"""
+Email providers and the router that picks between them.
+
+A provider turns a message dict (to_email, subject, html_content,
+text_content, template_id, params, sender, reply_to, attachments) into a send result
+({'success', 'message_id' | 'error'}). Brevo is one backend, any SMTP relay
+(EMAIL_HOST, over pooled connections) another (EMAIL_PROVIDERS lists those in
+use, in order of preference).
+
+EmailRouter keeps a rolling window (EMAIL_ROUTER_WINDOW_SECONDS) of latency
+and errors per provider and sends to the healthiest one:
+    - providers failing more than EMAIL_ROUTER_MAX_ERROR_RATE of their recent
+      sends are tried last (they recover once their failures age out);
+    - otherwise the faster provider wins when average latencies differ by
+      more than EMAIL_ROUTER_LATENCY_BUCKET_MS, else the configured order;
+    - a failed send fails over to the next provider;
+    - hedged sends (auth emails) give the first provider EMAIL_ROUTER_HEDGE_MS
+      to accept a connection and move on to the next one if it cannot. Only
+      one provider is ever sending a message: once connected, the first
+      provider's send runs to completion and a message it may have delivered
+      is never raced by a second copy.
+The result records the provider that delivered.
+"""
+from collections import deque
+from django.conf import settings
+import logging
+import threading
+import time
+
+from .. import lifecycle
+from . import smtp_transport
+from .email_service import BrevoEmailService
+
+logger = logging.getLogger(__name__)
+
+
+class BrevoProvider:
+    name = 'brevo'
+
+    def send(self, message, connect_timeout=None):
+        return BrevoEmailService.get_instance().send_email(
+            to_email=message['to_email'],
+            subject=message.get('subject'),
+            html_content=message.get('html_content'),
+            text_content=message.get('text_content'),
+            template_id=message.get('template_id'),
+            params=message.get('params'),
+            reply_to=message.get('reply_to'),
+            sender=message.get('sender'),
+            attachments=message.get('attachments'),
+            connect_timeout=connect_timeout,
+        )
+
+
+class SmtpProvider:
+    """
+    Sends through the SMTP relay at EMAIL_HOST / EMAIL_PORT over pooled connections
+
+    Not django.core.mail: its SMTP backend opens and authenticates a connection
+    per email, and cannot bound the connect separately for hedging. smtp_transport
+    reads the same EMAIL_* settings.
+    """
+    name = 'smtp'
+
+    def send(self, message, connect_timeout=None):
+        content = message
+        if message.get('template_id'):
+            # Brevo-managed templates only exist at Brevo: render the email locally instead
+            render = message.get('render')
+            if render is None:
+                return {'success': False, 'error': 'SMTP cannot send a Brevo template without a local renderer'}
+            content = render()
+
+        sender = message.get('sender') or {'name': settings.BREVO_SENDER_NAME, 'email': settings.BREVO_SENDER_EMAIL}
+        return smtp_transport.send_message(
+            'smtp', sender, message['to_email'], content['subject'], content['html_content'],
+            content.get('text_content'), message.get('reply_to'), message.get('attachments'), connect_timeout
+        )
+
+
+PROVIDERS = {
+    'brevo': BrevoProvider,
+    'smtp': SmtpProvider,
+}
+
+
+class ProviderHealth:
+    """
+    Rolling window of one provider's send outcomes
+    """
+    MAX_SAMPLES = 500
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=self.MAX_SAMPLES)
+        self.totals = {'sent': 0, 'failed': 0, 'hedged': 0}
+
+    def record(self, latency, ok):
+        with self._lock:
+            self._samples.append((time.monotonic(), latency, ok))
+            self.totals['sent' if ok else 'failed'] += 1
+
+    def snapshot(self, window):
+        """
+        Returns:
+            tuple: (samples, error rate, average latency in ms) over the last window seconds
+        """
+        horizon = time.monotonic() - window
+        with self._lock:
+            while self._samples and self._samples[0][0] < horizon:
+                self._samples.popleft()
+            samples = list(self._samples)
+        if not samples:
+            return 0, 0.0, 0.0
+        errors = sum(1 for _, _, ok in samples if not ok)
+        latency = sum(latency for _, latency, _ in samples) / len(samples)
+        return len(samples), errors / len(samples), latency * 1000
+
+
+class EmailRouter:
+    """
+    Process-wide provider selection, failover and hedging
+    """
+    # Too few recent sends to call a provider unhealthy
+    MIN_SAMPLES = 5
+
+    _providers = None
+    _health = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def providers(cls):
+        if cls._providers is None:
+            with cls._lock:
+                if cls._providers is None:
+                    names = getattr(settings, 'EMAIL_PROVIDERS', None) or ['brevo']
+                    unknown = [name for name in names if name not in PROVIDERS]
+                    if unknown:
+                        raise ValueError(f"Unknown email providers: {', '.join(unknown)}")
+                    cls._health = {name: ProviderHealth() for name in names}
+                    cls._providers = [PROVIDERS[name]() for name in names]
+        return cls._providers
+
+    @classmethod
+    def ranked(cls):
+        """
+        Providers from healthiest to least healthy
+        """
+        window = getattr(settings, 'EMAIL_ROUTER_WINDOW_SECONDS', 60)
+        max_error_rate = getattr(settings, 'EMAIL_ROUTER_MAX_ERROR_RATE', 0.5)
+        bucket = max(1, getattr(settings, 'EMAIL_ROUTER_LATENCY_BUCKET_MS', 250))
+
+        def rank(indexed):
+            index, provider = indexed
+            samples, error_rate, latency_ms = cls._health[provider.name].snapshot(window)
+            unhealthy = samples >= cls.MIN_SAMPLES and error_rate > max_error_rate
+            return unhealthy, int(latency_ms // bucket), index
+
+        return [provider for _, provider in sorted(enumerate(cls.providers()), key=rank)]
+
+    @classmethod
+    def _attempt(cls, provider, message, connect_timeout=None):
+        started = time.monotonic()
+        try:
+            result = provider.send(message, connect_timeout=connect_timeout)
+        except Exception as e:
+            logger.error(f"Email provider {provider.name} raised: {e}", exc_info=True)
+            result = {'success': False, 'error': str(e)}
+        cls._health[provider.name].record(time.monotonic() - started, bool(result.get('success')))
+        return dict(result, provider=provider.name)
+
+    @classmethod
+    def send(cls, message, hedge=False):
+        """
+        Send a message through the healthiest provider, failing over (and hedging) as configured
+
+        Args:
+            message (dict): to_email, subject, html_content, text_content, template_id, params,
+                sender, reply_to, attachments and optionally render() -> content for providers without templates
+            hedge (bool): Move on to the next provider if the first cannot connect within
+                EMAIL_ROUTER_HEDGE_MS (time-critical emails)
+
+        Returns:
+            dict: Send result, with the delivering (or last tried) provider
+        """
+        ranked = cls.ranked()
+        delay = getattr(settings, 'EMAIL_ROUTER_HEDGE_MS', 0) / 1000
+        hedged = hedge and delay > 0 and len(ranked) > 1
+
+        result = None
+        for position, provider in enumerate(ranked):
+            connect_timeout = delay if hedged and position == 0 else None
+            result = cls._attempt(provider, message, connect_timeout)
+            if result['success']:
+                if hedged and position > 0:
+                    cls._health[provider.name].totals['hedged'] += 1
+                    result['hedged'] = True
+                return result
+            logger.warning(f"Email provider {provider.name} failed, trying the next one: {result.get('error')}")
+        return result
+
+    @classmethod
+    def stats(cls):
+        """
+        Rolling latency / error rate and totals per provider, healthiest first
+        """
+        window = getattr(settings, 'EMAIL_ROUTER_WINDOW_SECONDS', 60)
+        stats = {}
+        for provider in cls.ranked():
+            samples, error_rate, latency_ms = cls._health[provider.name].snapshot(window)
+            stats[provider.name] = dict({
+                'samples': samples,
+                'error_rate': round(error_rate, 3),
+                'latency_ms': round(latency_ms, 1),
+            }, **cls._health[provider.name].totals)
+        return stats
+
+    @classmethod
+    def reset(cls):
+        """
+        Forget providers and health (settings changed)
+        """
+        with cls._lock:
+            cls._providers = None
+            cls._health = {}
+
+    @classmethod
+    def _forget_after_fork(cls):
+        # Health is re-learned per process
+        cls._lock = threading.Lock()
+        cls._providers = None
+        cls._health = {}
+
+
+lifecycle.register('email_router', reset=EmailRouter._forget_after_fork)
@@ -0,0 +1,111 @@
+"""
+Sandbox for test-environment traffic.
+
+For products with sandbox_test_sends, an email requested with
+environment="test" is rendered as usual (links come from the product's
+Firebase test tenant) but never sent: EmailPipeline.deliver hands it to
+EmailSandbox.capture, which stores it in sandbox_emails and answers with a
+local message id. Captured sends:
+    - run inline on the request thread ('sandbox' execution): no lane
+      admission, execution queue, provider routing or Brevo/SMTP connection
+      pool is involved, so they neither wait behind nor slow down production;
+    - skip the email type's post hooks (no HubSpot contact sync);
+    - are kept per product up to EMAIL_SANDBOX_MAX_PER_PRODUCT, oldest
+      pruned first, and can be listed, searched, read and cleared through
+      /api/sandbox/emails/ (or browsed in the admin).
+"""
+from django.conf import settings
+import itertools
+import logging
+import socket
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+class EmailSandbox:
+    """
+    Captures test-environment emails of sandboxed products
+    """
+    _captures = itertools.count(1)
+
+    @staticmethod
+    def applies(product, environment):
+        """
+        Whether an email from product in environment is captured instead of sent
+        """
+        return environment == 'test' and bool(product.sandbox)
+
+    @classmethod
+    def capture(cls, ctx, message):
+        """
+        Store a prepared email instead of sending it
+
+        Args:
+            ctx (dict): Pipeline context
+            message (dict): The message EmailPipeline.deliver would have sent
+
+        Returns:
+            dict: Send result with success status, message_id and the captured row id
+        """
+        from ..models import CapturedEmail
+
+        html_content, text_content = message.get('html_content'), message.get('text_content')
+        if html_content is None:
+            # Brevo-managed template: keep the local rendering so the capture can be read
+            rendered = message['render']()
+            html_content, text_content = rendered.get('html_content'), rendered.get('text_content')
+            subject = message.get('subject') or rendered.get('subject')
+        else:
+            subject = message.get('subject')
+
+        message_id = f'<sandbox-{uuid.uuid4().hex}@{socket.gethostname()}>'
+        captured = CapturedEmail.objects.create(
+            product_name=ctx['product'].name,
+            email_type=ctx['email_type'].name,
+            message_id=message_id,
+            to_email=message['to_email'],
+            subject=subject or '',
+            html_content=html_content or '',
+            text_content=text_content or '',
+            template_id=message.get('template_id'),
+            params=message.get('params'),
+            sender=message.get('sender'),
+            attachments=[
+                {'name': upload.name, 'content_type': upload.content_type, 'size': upload.size}
+                for upload in message.get('attachments') or []
+            ],
+        )
+        logger.info(
+            f"{ctx['email_type'].label.capitalize()} email to {message['to_email']} captured in the sandbox "
+            f"for {ctx['product_name']} (#{captured.pk})"
+        )
+
+        if next(cls._captures) % getattr(settings, 'EMAIL_SANDBOX_PRUNE_EVERY', 100) == 0:
+            cls.prune(ctx['product'].name)
+
+        return {
+            'success': True,
+            'message_id': message_id,
+            'extra': {'provider': 'sandbox', 'sandbox': True, 'captured_id': captured.pk},
+        }
+
+    @staticmethod
+    def prune(product_name):
+        """
+        Delete a product's captures beyond the newest EMAIL_SANDBOX_MAX_PER_PRODUCT
+
+        Returns:
+            int: Captures deleted
+        """
+        from ..models import CapturedEmail
+
+        keep = getattr(settings, 'EMAIL_SANDBOX_MAX_PER_PRODUCT', 1000)
+        captured = CapturedEmail.objects.filter(product_name=product_name)
+        oldest_kept = captured.order_by('-pk').values_list('pk', flat=True)[keep - 1:keep].first()
+        if oldest_kept is None:
+            return 0
+        deleted, _ = captured.filter(pk__lt=oldest_kept).delete()
+        if deleted:
+            logger.info(f"Pruned {deleted} sandbox emails of {product_name}")
+        return deleted
@@ -0,0 +1,442 @@
+"""
+Scheduled sends: emails requested with a future send_at.
+
+A scheduled email is a row in scheduled_emails (its validated request data and
+due time), so it survives restarts and deploys. Each worker process runs an
+EmailScheduler that never scans the table on a timer tick:
+    - every EMAIL_SCHEDULE_LOAD_INTERVAL seconds it claims the pending rows due
+      within the next EMAIL_SCHEDULE_HORIZON_SECONDS (one range query on the
+      (status, due_at) index, at most EMAIL_SCHEDULE_LOAD_LIMIT rows) by
+      leasing them to itself, and puts them in an in-process hierarchical
+      timing wheel; sends far in the future stay in the table only;
+    - the wheel ticks every second and hands due emails to a small thread pool
+      that runs them through the email pipeline (prechecks, cooldowns, lanes
+      and provider routing apply at send time);
+    - outcomes are recorded once per tick in batches: one DELETE for the sent
+      rows, and failed ones are rescheduled with backoff (up to
+      EMAIL_SCHEDULE_MAX_ATTEMPTS) or marked failed.
+Delivery is at-least-once: a row is deleted only after its email was sent, so
+a worker dying between the two (or holding a row past its lease) means another
+worker sends it again once the lease expires. Rows loaded but not yet due are
+released on a clean worker exit.
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+import itertools
+import json
+import logging
+import os
+import socket
+import threading
+import time
+
+from .. import lifecycle
+from .email_lanes import LaneSaturated
+from .product_registry import ProductRegistry
+
+logger = logging.getLogger(__name__)
+
+# Rows per DELETE / IN (...) list: stays under SQLite's bound parameter limit
+WRITE_BATCH = 500
+
+
+class TimingWheel:
+    """
+    Hierarchical timing wheel: O(1) insert and expiry, however many entries are pending.
+
+    Level n has `slots` buckets covering slots**n ticks each. An entry goes into the
+    lowest level whose range covers its delay and moves down a level each time the
+    clock reaches its bucket, until it expires from level 0.
+    """
+
+    def __init__(self, tick=1.0, slots=64, levels=3, now=None):
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self._wheels = [[[] for _ in range(slots)] for _ in range(levels)]
+        self._overdue = []
+        self._current = int((time.time() if now is None else now) // tick)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def span(self):
+        """
+        Furthest delay (seconds) an entry can be added with
+        """
+        return self.tick * self.slots ** self.levels
+
+    def add(self, when, item):
+        """
+        Add an item due at epoch time when (already due items expire on the next advance)
+        """
+        # Rounded up: an item never expires before its time
+        target = -int(-when // self.tick)
+        if target - self._current >= self.slots ** self.levels:
+            raise ValueError(f"Entry due in {when - time.time():.0f}s is beyond the wheel's {self.span:.0f}s")
+        self._place(target, item)
+        self._size += 1
+
+    def _place(self, target, item):
+        delay = target - self._current
+        if delay <= 0:
+            self._overdue.append(item)
+            return
+        for level in range(self.levels):
+            if delay < self.slots ** (level + 1):
+                self._wheels[level][(target // self.slots ** level) % self.slots].append((target, item))
+                return
+
+    def advance(self, now):
+        """
+        Move the clock to epoch time now
+
+        Returns:
+            list: Items that became due, earliest tick first
+        """
+        due, self._overdue = self._overdue, []
+        target = int(now // self.tick)
+        while self._current < target:
+            self._current += 1
+            # Higher levels first: their entries may land in the bucket expiring now
+            for level in range(self.levels - 1, 0, -1):
+                span = self.slots ** level
+                if self._current % span == 0:
+                    index = (self._current // span) % self.slots
+                    bucket, self._wheels[level][index] = self._wheels[level][index], []
+                    for entry_target, item in bucket:
+                        self._place(entry_target, item)
+            index = self._current % self.slots
+            bucket, self._wheels[0][index] = self._wheels[0][index], []
+            due.extend(self._overdue)
+            self._overdue = []
+            due.extend(item for _, item in bucket)
+        self._size -= len(due)
+        return due
+
+
+class EmailScheduler:
+    """
+    Process-wide scheduled-send runner (timing wheel, loader, send pool)
+    """
+    TICK = 1.0
+
+    _lock = threading.Lock()
+    _stop = threading.Event()
+    _thread = None
+    _executor = None
+    _wheel = None
+    # Row id -> entry for rows leased into this process's wheel or being sent
+    _loaded = {}
+    _done = deque()
+    _worker_id = None
+    _loads = itertools.count()
+    _next_load = 0.0
+    stats = {'loaded': 0, 'sent': 0, 'retried': 0, 'failed': 0, 'load_queries': 0, 'last_load_ms': 0.0}
+
+    @staticmethod
+    def _setting(name, default):
+        return getattr(settings, name, default)
+
+    @classmethod
+    def running(cls):
+        return cls._thread is not None and cls._thread.is_alive()
+
+    @classmethod
+    def available(cls):
+        """
+        Whether this process takes scheduled sends: EMAIL_SCHEDULE_ENABLED and its scheduler running
+        (gunicorn workers start it; runserver, serverless and one-off processes do not)
+        """
+        return cls._setting('EMAIL_SCHEDULE_ENABLED', False) and cls.running()
+
+    @classmethod
+    def schedule(cls, email_type, product, data, send_at):
+        """
+        Store an email to send at send_at
+
+        Args:
+            email_type (EmailType): Registered email type
+            product (ProductInfo): Sending product
+            data (dict): Validated request data (send_at is dropped)
+            send_at (datetime): When to send (timezone-aware)
+
+        Returns:
+            ScheduledEmail: The stored row
+        """
+        from ..models import ScheduledEmail
+
+        # Through JSON now, so a send loaded here sees the same data as one loaded from the table
+        payload = json.loads(json.dumps(
+            {key: value for key, value in data.items() if key not in ('send_at', 'attachments')},
+            cls=DjangoJSONEncoder
+        ))
+        row = ScheduledEmail(product_name=product.name, email_type=email_type.name, payload=payload, due_at=send_at)
+
+        # Due within the loaded window: lease it straight into this process's wheel
+        horizon = timezone.now() + timedelta(seconds=cls._setting('EMAIL_SCHEDULE_HORIZON_SECONDS', 300))
+        local = (cls.running() and send_at < horizon
+                 and len(cls._loaded) < cls._setting('EMAIL_SCHEDULE_MAX_LOADED', 20000))
+        if local:
+            row.claimed_by = cls._worker_id
+            row.lease_until = horizon + timedelta(seconds=cls._setting('EMAIL_SCHEDULE_LEASE_SECONDS', 300))
+        row.save()
+        if local:
+            cls._add(cls._entry(row.pk, row.product_name, row.email_type, row.payload, row.due_at, row.attempts))
+        logger.info(f"{email_type.label.capitalize()} email to {data[email_type.recipient_field]} "
+                    f"scheduled for {send_at.isoformat()} by {product.display_name} (#{row.pk})")
+        return row
+
+    @staticmethod
+    def _entry(pk, product_name, email_type, payload, due_at, attempts):
+        return {
+            'id': pk,
+            'product_name': product_name,
+            'email_type': email_type,
+            'payload': payload,
+            'due': due_at.timestamp(),
+            'attempts': attempts,
+        }
+
+    @classmethod
+    def _add(cls, entry):
+        with cls._lock:
+            if entry['id'] in cls._loaded:
+                return
+            cls._loaded[entry['id']] = entry
+            cls._wheel.add(entry['due'], entry)
+            cls.stats['loaded'] += 1
+
+    @classmethod
+    def _load(cls):
+        """
+        Lease the pending rows due within the horizon into the wheel
+
+        Returns:
+            bool: True when the load was cut short by EMAIL_SCHEDULE_LOAD_LIMIT (load again next tick)
+        """
+        from ..models import ScheduledEmail
+
+        limit = min(cls._setting('EMAIL_SCHEDULE_LOAD_LIMIT', 2000),
+                    cls._setting('EMAIL_SCHEDULE_MAX_LOADED', 20000) - len(cls._loaded))
+        if limit <= 0:
+            return False
+
+        started = time.monotonic()
+        now = timezone.now()
+        horizon = now + timedelta(seconds=cls._setting('EMAIL_SCHEDULE_HORIZON_SECONDS', 300))
+        candidates = list(
+            ScheduledEmail.objects
+            .filter(status='pending', due_at__lt=horizon)
+            .filter(Q(lease_until__isnull=True) | Q(lease_until__lt=now))
+            .order_by('due_at')
+            .values_list('pk', flat=True)[:limit]
+        )
+        claimed = []
+        if candidates:
+            # Conditional on the lease still being free, so concurrent workers never both claim a row
+            token = f'{cls._worker_id}/{next(cls._loads)}'
+            lease_until = horizon + timedelta(seconds=cls._setting('EMAIL_SCHEDULE_LEASE_SECONDS', 300))
+            for chunk in _chunks(candidates, WRITE_BATCH):
+                ScheduledEmail.objects.filter(pk__in=chunk).filter(
+                    Q(lease_until__isnull=True) | Q(lease_until__lt=now)
+                ).update(claimed_by=token, lease_until=lease_until)
+                claimed.extend(ScheduledEmail.objects.filter(pk__in=chunk, claimed_by=token).values_list(
+                    'pk', 'product_name', 'email_type', 'payload', 'due_at', 'attempts'
+                ))
+            for row in claimed:
+                cls._add(cls._entry(*row))
+
+        cls.stats['load_queries'] += 1
+        cls.stats['last_load_ms'] = round((time.monotonic() - started) * 1000, 1)
+        if claimed:
+            logger.info(f"Loaded {len(claimed)} scheduled emails due before {horizon.isoformat()}")
+        return len(candidates) >= limit
+
+    @classmethod
+    def _send(cls, entry):
+        """
+        Send one due email (send pool thread)
+
+        Returns:
+            tuple: (entry, outcome, error, retry_after): outcome 'sent', 'retry' (counts as an attempt),
+                'busy' (lane saturated, does not) or 'failed' (permanent)
+        """
+        from .email_pipeline import EmailPipeline
+
+        try:
+            product = ProductRegistry.get_by_name(entry['product_name'])
+            if product is None:
+                return entry, 'failed', f"Unknown product {entry['product_name']}", None
+            _, result = EmailPipeline.process(entry['email_type'], product, entry['payload'], execution='sync')
+        except LaneSaturated as e:
+            return entry, 'busy', str(e), e.retry_after
+        except (LookupError, ValueError) as e:
+            # Unknown email type or user: sending again will not help
+            return entry, 'failed', str(e), None
+        except Exception as e:
+            logger.error(f"Scheduled email #{entry['id']} raised: {e}", exc_info=True)
+            return entry, 'retry', str(e), None
+        finally:
+            # Pool thread: hand the connection back instead of keeping it per thread
+            connection.close()
+
+        if result is None or result.get('success'):
+            return entry, 'sent', None, None
+        return entry, 'retry', result.get('error') or 'Send failed', None
+
+    @classmethod
+    def _fire(cls, entries):
+        for entry in entries:
+            future = cls._executor.submit(cls._send, entry)
+            # Cancelled on shutdown: the row stays loaded and is released by stop()
+            future.add_done_callback(lambda f: f.cancelled() or cls._done.append(f.result()))
+
+    @classmethod
+    def _flush(cls):
+        """
+        Record finished sends: one DELETE for the sent rows, reschedule or fail the others
+        """
+        from ..models import ScheduledEmail
+
+        finished = []
+        while cls._done:
+            finished.append(cls._done.popleft())
+        if not finished:
+            return
+
+        sent = [entry['id'] for entry, outcome, _, _ in finished if outcome == 'sent']
+        for chunk in _chunks(sent, WRITE_BATCH):
+            ScheduledEmail.objects.filter(pk__in=chunk).delete()
+
+        max_attempts = cls._setting('EMAIL_SCHEDULE_MAX_ATTEMPTS', 5)
+        now = timezone.now()
+        for entry, outcome, error, retry_after in finished:
+            if outcome == 'sent':
+                continue
+            attempts = entry['attempts'] + (0 if outcome == 'busy' else 1)
+            row = ScheduledEmail.objects.filter(pk=entry['id'])
+            if outcome == 'failed' or attempts >= max_attempts:
+                logger.warning(f"Scheduled email #{entry['id']} failed after {attempts} attempt(s): {error}")
+                row.update(status='failed', attempts=attempts, last_error=error or '', claimed_by='', lease_until=None)
+                cls.stats['failed'] += 1
+                continue
+            delay = retry_after if outcome == 'busy' else min(60 * 2 ** (attempts - 1), 3600)
+            row.update(due_at=now + timedelta(seconds=delay), attempts=attempts, last_error=error or '',
+                       claimed_by='', lease_until=None)
+            cls.stats['retried'] += 1
+
+        with cls._lock:
+            for entry, _, _, _ in finished:
+                cls._loaded.pop(entry['id'], None)
+        cls.stats['sent'] += len(sent)
+
+    @classmethod
+    def _run(cls):
+        load_interval = cls._setting('EMAIL_SCHEDULE_LOAD_INTERVAL', 30)
+        while not cls._stop.is_set():
+            now = time.time()
+            try:
+                if now >= cls._next_load:
+                    backlog = cls._load()
+                    cls._next_load = now if backlog else now + load_interval
+                with cls._lock:
+                    due = cls._wheel.advance(now)
+                cls._fire(due)
+                cls._flush()
+            except Exception as e:
+                logger.error(f"Email scheduler tick failed: {e}", exc_info=True)
+            finally:
+                connection.close()
+            cls._stop.wait(cls.TICK - time.time() % cls.TICK)
+
+    @classmethod
+    def start(cls):
+        """
+        Start the scheduler in this process unless it is already running
+        """
+        if cls.running():
+            return
+        with cls._lock:
+            if cls.running():
+                return
+            cls._worker_id = f'{socket.gethostname()}:{os.getpid()}'
+            cls._wheel = TimingWheel(tick=cls.TICK)
+            horizon = cls._setting('EMAIL_SCHEDULE_HORIZON_SECONDS', 300)
+            if horizon >= cls._wheel.span:
+                raise ValueError(f"EMAIL_SCHEDULE_HORIZON_SECONDS must be below {cls._wheel.span:.0f}")
+            cls._loaded = {}
+            cls._done = deque()
+            cls._next_load = 0.0
+            cls._stop = threading.Event()
+            cls._executor = ThreadPoolExecutor(
+                max_workers=cls._setting('EMAIL_SCHEDULE_WORKERS', 4), thread_name_prefix='email-schedule'
+            )
+            cls._thread = threading.Thread(target=cls._run, name='email-scheduler', daemon=True)
+            cls._thread.start()
+        logger.info(f"Email scheduler started in {cls._worker_id}")
+
+    @classmethod
+    def stop(cls, timeout=10):
+        """
+        Stop the scheduler: finish the sends in progress, record them and release the rows not yet due
+        """
+        from ..models import ScheduledEmail
+
+        thread, executor = cls._thread, cls._executor
+        if thread is None:
+            return
+        cls._stop.set()
+        thread.join(timeout)
+        executor.shutdown(wait=True, cancel_futures=True)
+        try:
+            cls._flush()
+            with cls._lock:
+                unsent = list(cls._loaded)
+                cls._loaded = {}
+            for chunk in _chunks(unsent, WRITE_BATCH):
+                ScheduledEmail.objects.filter(pk__in=chunk, status='pending').update(claimed_by='', lease_until=None)
+            if unsent:
+                logger.info(f"Released {len(unsent)} scheduled emails for other workers")
+        except Exception as e:
+            # Their leases expire on their own
+            logger.warning(f"Could not release scheduled emails: {e}")
+        finally:
+            connection.close()
+        cls._thread = None
+        cls._executor = None
+
+    @classmethod
+    def snapshot(cls):
+        """
+        Counters, plus the rows held in this process's wheel
+        """
+        return dict(cls.stats, held=len(cls._loaded), running=cls.running())
+
+    @classmethod
+    def _forget_after_fork(cls):
+        # The parent's threads do not survive fork and its leases stay its own
+        cls._lock = threading.Lock()
+        cls._stop = threading.Event()
+        cls._thread = None
+        cls._executor = None
+        cls._wheel = None
+        cls._loaded = {}
+        cls._done = deque()
+        cls._worker_id = None
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+lifecycle.register('email_scheduler', reset=EmailScheduler._forget_after_fork, close=EmailScheduler.stop)
@@ -1,7 +1,17 @@
-import sib_api_v3_sdk
-from sib_api_v3_sdk.rest import ApiException
 from django.conf import settings
+import json
 import logging
+import threading
+
+from .. import lifecycle
+from ..utils.lazy_import import LazyModule
+from . import smtp_transport
+from .email_attachments import JsonAttachmentBody
+from .email_batcher import MicroBatcher
+
+# The Brevo SDK loads hundreds of generated model modules; import it on first use
+sib_api_v3_sdk = LazyModule('sib_api_v3_sdk')
+sib_rest = LazyModule('sib_api_v3_sdk.rest')
 
 logger = logging.getLogger(__name__)
 
@@ -10,10 +20,14 @@ class BrevoEmailService:
     """
     Service class to handle email sending via Brevo (formerly Sendinblue)
     """
+    _instance = None
+    _instance_lock = threading.Lock()
 
     def __init__(self):
         configuration = sib_api_v3_sdk.Configuration()
         configuration.api_key['api-key'] = settings.BREVO_API_KEY
+        if settings.BREVO_API_URL:
+            configuration.host = settings.BREVO_API_URL
         self.api_instance = sib_api_v3_sdk.TransactionalEmailsApi(
             sib_api_v3_sdk.ApiClient(configuration)
         )
@@ -21,11 +35,50 @@ class BrevoEmailService:
             "name": settings.BREVO_SENDER_NAME,
             "email": settings.BREVO_SENDER_EMAIL
         }
+        # 'api' (HTTPS) or 'smtp' (Brevo's SMTP relay over pooled connections, for emails without a template)
+        self.transport = getattr(settings, 'BREVO_TRANSPORT', 'api')
+        self.batcher = None
+        if getattr(settings, 'EMAIL_BATCHING_ENABLED', False):
+            self.batcher = MicroBatcher(
+                self._send_batch,
+                window_ms=getattr(settings, 'EMAIL_BATCH_WINDOW_MS', 10),
+                max_size=getattr(settings, 'EMAIL_BATCH_MAX_SIZE', 50),
+            )
+
+    @classmethod
+    def get_instance(cls):
+        """
+        Get the shared service instance so the underlying API client and its
+        connection pool are reused across requests
+        """
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    @classmethod
+    def close_instance(cls):
+        """
+        Close the shared instance's connection pool (worker exit); the next call creates a new one
+        """
+        with cls._instance_lock:
+            instance, cls._instance = cls._instance, None
+        if instance is not None:
+            instance.api_instance.api_client.rest_client.pool_manager.clear()
+
+    @classmethod
+    def _forget_instance(cls):
+        # After fork: the inherited pool's sockets belong to the parent
+        lifecycle.abandon(cls._instance)
+        cls._instance = None
+        cls._instance_lock = threading.Lock()
 
     def send_email(self, to_email, subject, html_content, text_content=None,
-                   template_id=None, params=None, reply_to=None, sender=None):
+                   template_id=None, params=None, reply_to=None, sender=None, attachments=None,
+                   connect_timeout=None):
         """
-        Send an email using Brevo API
+        Send an email using Brevo API (or Brevo's SMTP relay when BREVO_TRANSPORT='smtp')
 
         Args:
             to_email (str): Recipient email address
@@ -36,14 +89,47 @@ class BrevoEmailService:
             params (dict, optional): Template parameters
             reply_to (str, optional): Reply-to email address
             sender (dict, optional): Custom sender {email, name}. Uses default if None
+            attachments (list, optional): Uploaded files (see email_attachments.py)
+            connect_timeout (float, optional): Seconds to wait for a connection to Brevo before failing,
+                so the caller can try another provider (sent on its own, never batched)
 
         Returns:
             dict: Response from Brevo API containing message_id
         """
-        try:
-            # Use custom sender if provided, otherwise use default
-            email_sender = sender if sender else self.sender
+        # Use custom sender if provided, otherwise use default
+        email_sender = sender if sender else self.sender
+
+        if self.transport == 'smtp' and not template_id:
+            # Stored templates are only reachable through the API
+            return smtp_transport.send_message('brevo', email_sender, to_email, subject, html_content,
+                                               text_content, reply_to, attachments, connect_timeout)
+
+        if attachments:
+            return self._send_with_attachments(to_email, subject, html_content, text_content,
+                                               template_id, params, reply_to, email_sender, attachments,
+                                               connect_timeout)
+
+        def send_direct():
+            return self._send_one(to_email, subject, html_content, text_content,
+                                  template_id, params, reply_to, email_sender, connect_timeout)
+
+        if self.batcher is None or connect_timeout is not None:
+            return send_direct()
 
+        # Sends can share a call when everything but recipient, subject, params and reply-to matches
+        key = (
+            email_sender.get('name'),
+            email_sender.get('email'),
+            template_id,
+            None if template_id else html_content,
+            None if template_id else text_content,
+        )
+        item = {'to_email': to_email, 'subject': subject, 'params': params, 'reply_to': reply_to}
+        return self.batcher.submit(key, item, send_direct)
+
+    def _send_one(self, to_email, subject, html_content, text_content, template_id, params, reply_to, email_sender,
+                  connect_timeout=None):
+        try:
             send_smtp_email = sib_api_v3_sdk.SendSmtpEmail(
                 to=[{"email": to_email}],
                 sender=email_sender,
@@ -62,7 +148,10 @@ class BrevoEmailService:
             if reply_to:
                 send_smtp_email.reply_to = {"email": reply_to}
 
-            api_response = self.api_instance.send_transac_email(send_smtp_email)
+            options = {}
+            if connect_timeout is not None:
+                options['_request_timeout'] = (connect_timeout, None)
+            api_response = self.api_instance.send_transac_email(send_smtp_email, **options)
 
             logger.info(f"Email sent successfully to {to_email}. Message ID: {api_response.message_id}")
 
@@ -71,7 +160,7 @@ class BrevoEmailService:
                 'message_id': api_response.message_id
             }
 
-        except ApiException as e:
+        except sib_rest.ApiException as e:
             error_msg = f"Exception when calling Brevo API: {e}"
             logger.error(error_msg)
             return {
@@ -86,6 +175,130 @@ class BrevoEmailService:
                 'error': str(e)
             }
 
+    def _send_with_attachments(self, to_email, subject, html_content, text_content, template_id, params,
+                               reply_to, email_sender, attachments, connect_timeout=None):
+        """
+        Send through the API with the attachments base64-encoded into the request body as it
+        is sent (the SDK would build the whole encoded payload in memory first)
+        """
+        payload = {'sender': email_sender, 'to': [{'email': to_email}], 'subject': subject}
+        if template_id:
+            payload['templateId'] = template_id
+            if params:
+                payload['params'] = params
+        else:
+            payload['htmlContent'] = html_content
+            if text_content:
+                payload['textContent'] = text_content
+        if reply_to:
+            payload['replyTo'] = {'email': reply_to}
+
+        api_client = self.api_instance.api_client
+        body = JsonAttachmentBody(payload, attachments)
+        headers = dict(
+            api_client.default_headers,
+            **{
+                'api-key': api_client.configuration.api_key['api-key'],
+                'Accept': 'application/json',
+                'Content-Type': 'application/json',
+                'Content-Length': str(len(body)),
+            }
+        )
+        options = {}
+        if connect_timeout is not None:
+            options['timeout'] = sib_rest.urllib3.Timeout(connect=connect_timeout, read=None)
+        try:
+            response = api_client.rest_client.pool_manager.request(
+                'POST', f'{api_client.configuration.host}/smtp/email', body=body, headers=headers, **options
+            )
+            if not 200 <= response.status <= 299:
+                raise sib_rest.ApiException(http_resp=sib_rest.RESTResponse(response))
+            message_id = json.loads(response.data or b'{}').get('messageId')
+
+            logger.info(
+                f"Email with {len(attachments)} attachment(s) sent successfully to {to_email}. Message ID: {message_id}"
+            )
+            return {
+                'success': True,
+                'message_id': message_id
+            }
+
+        except sib_rest.ApiException as e:
+            logger.error(f"Exception when calling Brevo API: {e}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+        except Exception as e:
+            logger.error(f"Unexpected error sending email with attachments: {e}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+    def _send_batch(self, key, items):
+        """
+        Send messages sharing sender and content in one call (one message version each)
+
+        Returns:
+            list: Result dict per item, in order
+        """
+        sender_name, sender_email, template_id, html_content, text_content = key
+        sender = {"name": sender_name, "email": sender_email} if sender_name else {"email": sender_email}
+        versions = []
+        for item in items:
+            version = sib_api_v3_sdk.SendSmtpEmailMessageVersions(
+                to=[{"email": item['to_email']}],
+                subject=item['subject'],
+                params=item['params'],
+            )
+            if item['reply_to']:
+                version.reply_to = {"email": item['reply_to']}
+            versions.append(version)
+
+        send_smtp_email = sib_api_v3_sdk.SendSmtpEmail(
+            sender=sender,
+            subject=items[0]['subject'],
+            message_versions=versions,
+        )
+        if template_id:
+            send_smtp_email.template_id = template_id
+        else:
+            send_smtp_email.html_content = html_content
+            if text_content:
+                send_smtp_email.text_content = text_content
+
+        try:
+            api_response = self.api_instance.send_transac_email(send_smtp_email)
+        except sib_rest.ApiException as e:
+            if e.status == 400:
+                # One bad recipient rejects the whole batch: send them one by one
+                logger.warning(f"Batch of {len(items)} emails rejected by Brevo, sending individually: {e}")
+                return [
+                    self._send_one(item['to_email'], item['subject'], html_content, text_content, template_id,
+                                   item['params'], item['reply_to'], sender)
+                    for item in items
+                ]
+            logger.error(f"Exception when calling Brevo API for a batch of {len(items)} emails: {e}")
+            return [{'success': False, 'error': str(e)}] * len(items)
+
+        message_ids = api_response.message_ids
+        if not message_ids or len(message_ids) != len(items):
+            if len(items) == 1 and api_response.message_id:
+                message_ids = [api_response.message_id]
+            else:
+                # Sent, but which id belongs to which recipient is unknown: never hand one id to all of them
+                logger.warning(
+                    f"Brevo returned {len(message_ids or [])} message ids for a batch of {len(items)} emails; "
+                    f"reporting them as unknown"
+                )
+                message_ids = [None] * len(items)
+        logger.info(f"Batch of {len(items)} emails sent successfully in one call")
+        return [
+            {'success': True, 'message_id': message_id, 'batch_size': len(items)}
+            for message_id in message_ids
+        ]
+
     def send_generic_email(self, to_email, subject, html_content, text_content=None):
         """
         Send a generic email
@@ -216,3 +429,6 @@ class BrevoEmailService:
             html_content=html_content,
             text_content=text_content
         )
+
+
+lifecycle.register('brevo_client', reset=BrevoEmailService._forget_instance, close=BrevoEmailService.close_instance)
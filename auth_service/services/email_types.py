@@ -0,0 +1,230 @@
+"""
+Built-in email types served by the email pipeline
+"""
+from django.conf import settings
+import logging
+
+from ..serializers import (
+    GenericEmailSerializer,
+    PasswordResetSerializer,
+    ForgotPasswordSerializer,
+    EmailVerificationSerializer,
+    WelcomeEmailSerializer,
+)
+from ..utils.email_templates import EmailTemplateRenderer
+from .email_pipeline import EmailType, register_email_type
+from .firebase_service import FirebaseService
+from .identity_toolkit import UserNotFound
+from .user_cache import get_coalescer
+
+logger = logging.getLogger(__name__)
+
+
+# Prechecks
+
+def skip_if_verified(ctx):
+    """
+    Skip verification emails for addresses Firebase already reports as verified.
+
+    Uses the cached (and batched) profile lookup, so repeats and double-clicks
+    cost no token fetch, sendOobCode call, render or Brevo send.
+    """
+    enabled = ctx['data'].get('skip_if_verified')
+    if enabled is None:
+        enabled = getattr(settings, 'EMAIL_VERIFICATION_SKIP_VERIFIED', False)
+    if not enabled:
+        return None
+
+    user = get_coalescer().get_user_by_email(
+        ctx['recipient'],
+        tenant_id=ctx['product'].get_tenant_id(ctx['environment']),
+        environment=ctx['environment']
+    )
+    if user is None:
+        raise UserNotFound(f"User with email {ctx['recipient']} not found")
+    if not user.get('email_verified'):
+        return None
+
+    logger.info(f"Skipping verification email for already verified {ctx['recipient']} ({ctx['product_name']})")
+    return {'message_id': None, 'extra': {'already_verified': True}}
+
+
+# Link generators
+
+def password_reset_link(ctx):
+    """Generate a tenant-scoped Firebase password reset link"""
+    return FirebaseService.generate_password_reset_link(
+        email=ctx['recipient'],
+        tenant_id=ctx['product'].get_tenant_id(ctx['environment']),
+        environment=ctx['environment']
+    )
+
+
+def email_verification_link(ctx):
+    """Generate a tenant-scoped Firebase email verification link"""
+    return FirebaseService.generate_email_verification_link(
+        email=ctx['recipient'],
+        tenant_id=ctx['product'].get_tenant_id(ctx['environment']),
+        environment=ctx['environment']
+    )
+
+
+def dashboard_link(ctx):
+    """Get the product's dashboard link (generic dashboard for the environment if it has none)"""
+    return EmailTemplateRenderer.get_product_dashboard_link(ctx['product'], ctx['environment'])
+
+
+# Renderers
+
+def render_generic(ctx):
+    """Generic emails carry caller-supplied content"""
+    data = ctx['data']
+    return {
+        'subject': data['subject'],
+        'html_content': data['html_content'],
+        'text_content': data.get('text_content'),
+        'attachments': data.get('attachments') or [],
+    }
+
+
+def render_password_reset(ctx):
+    return EmailTemplateRenderer.render_password_reset_email(
+        product_name=ctx['product_name'],
+        reset_link=ctx['link'],
+        environment=ctx['environment'],
+        user_name=ctx['user_name']
+    )
+
+
+def render_verification(ctx):
+    return EmailTemplateRenderer.render_verification_email(
+        product_name=ctx['product_name'],
+        verification_link=ctx['link'],
+        environment=ctx['environment'],
+        user_name=ctx['user_name']
+    )
+
+
+def render_welcome(ctx):
+    return EmailTemplateRenderer.render_welcome_email(
+        product_name=ctx['product_name'],
+        dashboard_link=ctx['link'],
+        environment=ctx['environment'],
+        user_name=ctx['user_name']
+    )
+
+
+# Brevo template params (per-send values; product branding is baked into the synced template)
+
+def template_params(link_param=None):
+    """Build the params function for a Brevo-managed template (see services/brevo_templates.py)"""
+    def params(ctx):
+        values = {
+            'user_name': ctx['user_name'] or '',
+            'environment': ctx['environment'],
+            'environment_label': EmailTemplateRenderer.get_environment_label(ctx['environment']),
+        }
+        if link_param:
+            values[link_param] = ctx['link']
+        return values
+    return params
+
+
+# Sender policies
+
+def welcome_sender(ctx):
+    """Custom sender for Beta Health welcome emails"""
+    return EmailTemplateRenderer.get_welcome_email_sender(ctx['product_name'])
+
+
+# Post hooks
+
+def sync_hubspot_contact(ctx):
+    """Add user to HubSpot CRM (Beta Health only)"""
+    from .hubspot_service import HubSpotService
+
+    hubspot_result = HubSpotService.create_or_update_contact(
+        email=ctx['recipient'],
+        name=ctx['user_name'],
+        product_name=ctx['product_name']
+    )
+    logger.info(f"HubSpot sync result: {hubspot_result}")
+    return {'hubspot_synced': hubspot_result.get('success', False)}
+
+
+GENERIC = register_email_type(EmailType(
+    name='generic',
+    label='generic',
+    serializer_class=GenericEmailSerializer,
+    renderer=render_generic,
+    recipient_field='to_email',
+    response_fields=(),
+    lane='bulk',
+    digest=True,
+    messages={
+        'success': 'Email sent successfully',
+        'queued': 'Email queued for delivery',
+        'scheduled': 'Email scheduled for delivery',
+        'digested': "Email added to the recipient's digest",
+        'busy': 'Too many emails in progress, retry shortly',
+        'failure': 'Failed to send email',
+        'error': 'An error occurred while sending email',
+    },
+))
+
+PASSWORD_RESET = register_email_type(EmailType(
+    name='password_reset',
+    label='password reset',
+    serializer_class=PasswordResetSerializer,
+    link_generator=password_reset_link,
+    renderer=render_password_reset,
+    template='password_reset',
+    template_params=template_params('reset_link'),
+    requires_user=True,
+    cooldown=True,
+    lane='auth',
+))
+
+FORGOT_PASSWORD = register_email_type(EmailType(
+    name='forgot_password',
+    label='forgot password',
+    serializer_class=ForgotPasswordSerializer,
+    link_generator=password_reset_link,
+    renderer=render_password_reset,
+    template='password_reset',
+    template_params=template_params('reset_link'),
+    requires_user=True,
+    cooldown=True,
+    lane='auth',
+))
+
+VERIFICATION = register_email_type(EmailType(
+    name='verification',
+    label='verification',
+    serializer_class=EmailVerificationSerializer,
+    precheck=skip_if_verified,
+    link_generator=email_verification_link,
+    renderer=render_verification,
+    template='verification',
+    template_params=template_params('verification_link'),
+    response_fields=('product_name', 'environment'),
+    requires_user=True,
+    cooldown=True,
+    lane='auth',
+    messages={
+        'skipped': 'Email address is already verified in {environment_label}',
+    },
+))
+
+WELCOME = register_email_type(EmailType(
+    name='welcome',
+    label='welcome',
+    serializer_class=WelcomeEmailSerializer,
+    link_generator=dashboard_link,
+    renderer=render_welcome,
+    template='welcome',
+    template_params=template_params(),
+    sender_policy=welcome_sender,
+    post_hooks=[sync_hubspot_contact],
+    response_fields=('product_name', 'environment'),
+))
@@ -1,9 +1,17 @@
-import firebase_admin
-from firebase_admin import credentials, auth
 from django.conf import settings
 import logging
-import json
-import requests
+import sys
+import threading
+
+from .. import lifecycle
+from ..utils.lazy_import import LazyModule
+from .identity_toolkit import IdentityToolkitClient, AdminCredentialTokenSource, LOOKUP_BATCH_SIZE, UserNotFound
+from .user_cache import MISS, UserLookupCache
+
+# firebase_admin pulls in google-cloud/grpc; import it on first use, not at module load
+firebase_admin = LazyModule('firebase_admin')
+credentials = LazyModule('firebase_admin.credentials')
+auth = LazyModule('firebase_admin.auth')
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +23,8 @@ class FirebaseService:
     """
     _test_app = None
     _prod_app = None
+    _clients = {}
+    _clients_lock = threading.Lock()
 
     @classmethod
     def _initialize_app(cls, environment='test'):
@@ -81,10 +91,83 @@ class FirebaseService:
             logger.error(f"Error initializing Firebase app for {environment}: {e}")
             raise
 
+    @staticmethod
+    def uses_lean_client():
+        """
+        True when the lean Identity Toolkit client is selected (FIREBASE_CLIENT='lean')
+        """
+        return getattr(settings, 'FIREBASE_CLIENT', 'lean') == 'lean'
+
+    @classmethod
+    def get_client(cls, environment='test'):
+        """
+        Get the Identity Toolkit client for the specified environment.
+
+        The lean client signs service-account JWTs itself and never imports
+        firebase_admin; the 'admin' fallback takes tokens from the firebase_admin app.
+        """
+        client = cls._clients.get(environment)
+        if client is not None:
+            return client
+
+        with cls._clients_lock:
+            client = cls._clients.get(environment)
+            if client is None:
+                if cls.uses_lean_client():
+                    cred_dict = settings.FIREBASE_PROD_CONFIG if environment == 'prod' else settings.FIREBASE_TEST_CONFIG
+                    label = 'production' if environment == 'prod' else 'test'
+
+                    required_fields = ['project_id', 'private_key', 'client_email']
+                    missing_fields = [f for f in required_fields if not cred_dict.get(f)]
+                    if missing_fields:
+                        logger.error(f"Missing Firebase {label} credentials: {', '.join(missing_fields)}")
+                        raise ValueError(f"Missing Firebase {label} config fields: {', '.join(missing_fields)}")
+
+                    client = IdentityToolkitClient.from_service_account(cred_dict)
+                else:
+                    app = cls.get_app(environment)
+                    client = IdentityToolkitClient(app.project_id, AdminCredentialTokenSource(app))
+                cls._clients[environment] = client
+                logger.info(f"Identity Toolkit client ready for {environment} ({settings.FIREBASE_CLIENT})")
+        return client
+
+    @classmethod
+    def _forget_clients(cls):
+        """
+        After fork: drop the parent's clients, apps and lock without closing their connections
+        """
+        lifecycle.abandon(cls._test_app, cls._prod_app, *cls._clients.values())
+        admin = sys.modules.get('firebase_admin')
+        if admin is not None:
+            # Unregister the inherited apps so _initialize_app can create this process's own
+            admin._apps_lock = threading.RLock()
+            for name in ('test', 'prod'):
+                admin._apps.pop(name, None)
+        cls._test_app = None
+        cls._prod_app = None
+        cls._clients = {}
+        cls._clients_lock = threading.Lock()
+
+    @classmethod
+    def close_clients(cls):
+        """
+        Release clients and Firebase apps (worker exit); they are recreated on next use
+        """
+        with cls._clients_lock:
+            cls._clients = {}
+            apps = [app for app in (cls._test_app, cls._prod_app) if app is not None]
+            cls._test_app = None
+            cls._prod_app = None
+        for app in apps:
+            try:
+                firebase_admin.delete_app(app)
+            except ValueError:
+                pass
+
     @classmethod
     def _get_access_token(cls, environment='test'):
         """
-        Get OAuth2 access token for Firebase REST API calls
+        Get OAuth2 access token for Firebase REST API calls (cached until near expiry)
 
         Args:
             environment (str): 'test' or 'prod'
@@ -93,14 +176,20 @@ class FirebaseService:
             str: Access token
         """
         try:
-            app = cls.get_app(environment)
-            # Get credentials from the app and fetch access token
-            access_token = app.credential.get_access_token().access_token
-            return access_token
+            return cls.get_client(environment).token_source.get_token()
         except Exception as e:
             logger.error(f"Error getting access token: {e}")
             raise
 
+    @staticmethod
+    def _raise_if_known_missing(email, tenant_id, environment):
+        """
+        Short-circuit link generation for addresses recently confirmed not to exist
+        """
+        if UserLookupCache.is_known_missing(environment, tenant_id, email):
+            logger.warning(f"User not found (cached): {email} in tenant {tenant_id}")
+            raise UserNotFound(f"User with email {email} not found")
+
     @classmethod
     def generate_password_reset_link(cls, email, tenant_id, environment='test'):
         """
@@ -114,49 +203,14 @@ class FirebaseService:
         Returns:
             str: Password reset link
         """
+        cls._raise_if_known_missing(email, tenant_id, environment)
         try:
-            # Get access token (this also initializes the app if needed)
-            access_token = cls._get_access_token(environment)
-
-            # Use Firebase Identity Platform REST API for tenant-scoped operations
-            url = f"https://identitytoolkit.googleapis.com/v1/accounts:sendOobCode"
-
-            headers = {
-                'Authorization': f'Bearer {access_token}',
-                'Content-Type': 'application/json'
-            }
-
-            params = {}
-            if tenant_id:
-                params['tenantId'] = tenant_id
-
-            payload = {
-                'requestType': 'PASSWORD_RESET',
-                'email': email,
-                'returnOobLink': True  # Get the link in the response instead of sending email
-            }
-
-            response = requests.post(url, headers=headers, params=params, json=payload)
-
-            if response.status_code == 200:
-                result = response.json()
-                link = result.get('oobLink')
-                logger.info(f"Password reset link generated for {email} in {environment} environment (tenant_id: {tenant_id})")
-                return link
-            else:
-                error_data = response.json()
-                error_message = error_data.get('error', {}).get('message', 'Unknown error')
-
-                # Handle specific error cases
-                if 'EMAIL_NOT_FOUND' in error_message or 'USER_NOT_FOUND' in error_message:
-                    logger.warning(f"User not found: {email} in tenant {tenant_id}")
-                    raise ValueError(f"User with email {email} not found")
-                else:
-                    logger.error(f"Firebase API error: {error_message}")
-                    raise Exception(f"Firebase API error: {error_message}")
-
-        except ValueError:
-            # Re-raise ValueError for user not found
+            link = cls.get_client(environment).send_oob_code('PASSWORD_RESET', email, tenant_id)
+            logger.info(f"Password reset link generated for {email} in {environment} environment (tenant_id: {tenant_id})")
+            return link
+        except UserNotFound:
+            # Re-raise for user not found, remembering it for repeats (not config errors, also ValueErrors)
+            UserLookupCache.set(environment, tenant_id, email, None)
             raise
         except Exception as e:
             logger.error(f"Error generating password reset link: {e}")
@@ -175,56 +229,21 @@ class FirebaseService:
         Returns:
             str: Email verification link
         """
+        cls._raise_if_known_missing(email, tenant_id, environment)
         try:
-            # Get access token (this also initializes the app if needed)
-            access_token = cls._get_access_token(environment)
-
-            # Use Firebase Identity Platform REST API for tenant-scoped operations
-            url = f"https://identitytoolkit.googleapis.com/v1/accounts:sendOobCode"
-
-            headers = {
-                'Authorization': f'Bearer {access_token}',
-                'Content-Type': 'application/json'
-            }
-
-            params = {}
-            if tenant_id:
-                params['tenantId'] = tenant_id
-
-            payload = {
-                'requestType': 'VERIFY_EMAIL',
-                'email': email,
-                'returnOobLink': True  # Get the link in the response instead of sending email
-            }
-
-            response = requests.post(url, headers=headers, params=params, json=payload)
-
-            if response.status_code == 200:
-                result = response.json()
-                link = result.get('oobLink')
-                logger.info(f"Email verification link generated for {email} in {environment} environment (tenant_id: {tenant_id})")
-                return link
-            else:
-                error_data = response.json()
-                error_message = error_data.get('error', {}).get('message', 'Unknown error')
-
-                # Handle specific error cases
-                if 'EMAIL_NOT_FOUND' in error_message or 'USER_NOT_FOUND' in error_message:
-                    logger.warning(f"User not found: {email} in tenant {tenant_id}")
-                    raise ValueError(f"User with email {email} not found")
-                else:
-                    logger.error(f"Firebase API error: {error_message}")
-                    raise Exception(f"Firebase API error: {error_message}")
-
-        except ValueError:
-            # Re-raise ValueError for user not found
+            link = cls.get_client(environment).send_oob_code('VERIFY_EMAIL', email, tenant_id)
+            logger.info(f"Email verification link generated for {email} in {environment} environment (tenant_id: {tenant_id})")
+            return link
+        except UserNotFound:
+            # Re-raise for user not found, remembering it for repeats (not config errors, also ValueErrors)
+            UserLookupCache.set(environment, tenant_id, email, None)
             raise
         except Exception as e:
             logger.error(f"Error generating email verification link: {e}")
             raise
 
     @classmethod
-    def get_user_by_email(cls, email, tenant_id, environment='test'):
+    def get_user_by_email(cls, email, tenant_id, environment='test', use_cache=True):
         """
         Get user information by email
 
@@ -232,10 +251,33 @@ class FirebaseService:
             email (str): User's email address
             tenant_id (str): Firebase tenant ID
             environment (str): 'test' or 'prod'
+            use_cache (bool): Answer from UserLookupCache when possible
 
         Returns:
-            dict: User information
+            dict: User information (None if the user does not exist)
         """
+        if use_cache:
+            cached = UserLookupCache.get(environment, tenant_id, email)
+            if cached is not MISS:
+                return cached
+
+        user = cls._fetch_user_by_email(email, tenant_id, environment)
+        UserLookupCache.set(environment, tenant_id, email, user)
+        return user
+
+    @classmethod
+    def _fetch_user_by_email(cls, email, tenant_id, environment='test'):
+        if cls.uses_lean_client():
+            # Kept outside the admin try block: its except clauses would import firebase_admin
+            try:
+                user = cls.get_client(environment).get_user_by_email(email, tenant_id)
+            except Exception as e:
+                logger.error(f"Error fetching user: {e}")
+                raise
+            if user is None:
+                logger.warning(f"User not found: {email}")
+            return user
+
         try:
             app = cls.get_app(environment)
 
@@ -260,6 +302,52 @@ class FirebaseService:
             logger.error(f"Error fetching user: {e}")
             raise
 
+    @classmethod
+    def get_users_by_email(cls, emails, tenant_id, environment='test', use_cache=True):
+        """
+        Bulk user lookup: cached entries are answered locally, the rest are
+        fetched with one accounts:lookup call per LOOKUP_BATCH_SIZE addresses
+
+        Args:
+            emails (iterable): Email addresses
+            tenant_id (str): Firebase tenant ID
+            environment (str): 'test' or 'prod'
+            use_cache (bool): Answer from UserLookupCache when possible
+
+        Returns:
+            dict: email -> user information (None for users that do not exist)
+        """
+        results = {}
+        pending = []
+        for email in dict.fromkeys(emails):
+            cached = UserLookupCache.get(environment, tenant_id, email) if use_cache else MISS
+            if cached is MISS:
+                pending.append(email)
+            else:
+                results[email] = cached
+
+        if pending:
+            client = cls.get_client(environment)
+            for i in range(0, len(pending), LOOKUP_BATCH_SIZE):
+                batch = pending[i:i + LOOKUP_BATCH_SIZE]
+                try:
+                    records = client.lookup(emails=batch, tenant_id=tenant_id)
+                except Exception as e:
+                    logger.error(f"Error fetching {len(batch)} users: {e}")
+                    raise
+                found = {
+                    (record.get('email') or '').lower(): client.to_user_dict(record)
+                    for record in records
+                }
+                for email in batch:
+                    user = found.get(email.strip().lower())
+                    UserLookupCache.set(environment, tenant_id, email, user)
+                    results[email] = user
+            logger.info(f"Looked up {len(pending)} users in {environment} (tenant_id: {tenant_id}), "
+                        f"{len(results) - len(pending)} answered from cache")
+
+        return results
+
     @classmethod
     def confirm_password_reset(cls, token, new_password, environment='test'):
         """
@@ -312,6 +400,18 @@ class FirebaseService:
         Returns:
             dict: Decoded token
         """
+        if cls.uses_lean_client():
+            # Kept outside the admin try block: its except clauses would import firebase_admin
+            from .token_verifier import IdTokenVerifier
+            try:
+                return IdTokenVerifier.verify(id_token, tenant_id, environment)
+            except ValueError as e:
+                logger.warning(f"Firebase ID token rejected: {e}")
+                raise
+            except Exception as e:
+                logger.error(f"Error verifying token: {e}")
+                raise
+
         try:
             app = cls.get_app(environment)
 
@@ -336,3 +436,6 @@ class FirebaseService:
         except Exception as e:
             logger.error(f"Error verifying token: {e}")
             raise
+
+
+lifecycle.register('firebase_clients', reset=FirebaseService._forget_clients, close=FirebaseService.close_clients)
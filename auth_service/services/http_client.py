@@ -0,0 +1,82 @@
+"""
+Shared, pooled HTTP sessions for upstream APIs (Google Identity Toolkit, OAuth, HubSpot)
+"""
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+import logging
+import requests
+import threading
+
+from .. import lifecycle
+
+logger = logging.getLogger(__name__)
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(name):
+    """
+    Get the process-wide keep-alive session for an upstream, creating it on first use
+
+    Args:
+        name (str): Upstream name, e.g. 'identitytoolkit' or 'hubspot'
+
+    Returns:
+        requests.Session: Session with a connection pool sized for the worker's threads
+    """
+    session = _sessions.get(name)
+    if session is not None:
+        return session
+
+    with _sessions_lock:
+        session = _sessions.get(name)
+        if session is None:
+            pool_size = getattr(settings, 'HTTP_POOL_MAXSIZE', 10)
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _sessions[name] = session
+        return session
+
+
+def prime(name, url, timeout=5):
+    """
+    Open (and keep) a TLS connection to an upstream so the first real call skips the handshake
+
+    Returns:
+        bool: True if the upstream answered at all (any status code)
+    """
+    try:
+        get_session(name).head(url, timeout=timeout)
+        return True
+    except requests.exceptions.RequestException as e:
+        logger.warning(f"Could not prime connection to {url}: {e}")
+        return False
+
+
+def reset_sessions():
+    """
+    Close and forget every session (worker exit and shutdown)
+    """
+    with _sessions_lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+
+    for session in sessions:
+        try:
+            session.close()
+        except Exception:
+            pass
+
+
+def _forget_sessions():
+    global _sessions, _sessions_lock
+    # Inherited sockets belong to the parent: drop them unclosed
+    lifecycle.abandon(*_sessions.values())
+    _sessions = {}
+    _sessions_lock = threading.Lock()
+
+
+lifecycle.register('http_sessions', reset=_forget_sessions, close=reset_sessions)
@@ -5,6 +5,8 @@ import requests
 from django.conf import settings
 import logging
 
+from .http_client import get_session
+
 logger = logging.getLogger(__name__)
 
 
@@ -54,7 +56,7 @@ class HubSpotService:
             firstname = name or email.split('@')[0]
 
             # Try to create contact
-            create_response = requests.post(
+            create_response = get_session('hubspot').post(
                 'https://api.hubapi.com/crm/v3/objects/contacts',
                 headers={
                     'Content-Type': 'application/json',
@@ -83,7 +85,7 @@ class HubSpotService:
                 logger.info(f"HubSpot contact already exists for {email}, updating...")
 
                 # Search for existing contact
-                search_response = requests.post(
+                search_response = get_session('hubspot').post(
                     'https://api.hubapi.com/crm/v3/objects/contacts/search',
                     headers={
                         'Content-Type': 'application/json',
@@ -126,7 +128,7 @@ class HubSpotService:
                 contact_id = results[0].get('id')
 
                 # Update existing contact
-                update_response = requests.patch(
+                update_response = get_session('hubspot').patch(
                     f'https://api.hubapi.com/crm/v3/objects/contacts/{contact_id}',
                     headers={
                         'Content-Type': 'application/json',
@@ -0,0 +1,380 @@
+"""
+Lean Google Identity Toolkit client.
+
+Implements the few Firebase Auth operations this service needs (OAuth token
+for a service account, sendOobCode, accounts:lookup and ID token verification)
+directly over REST with PyJWT/cryptography, so the request path does not have
+to load firebase_admin and its google-cloud/grpc dependency tree.
+"""
+from django.conf import settings
+import logging
+import threading
+import time
+
+from .. import lifecycle
+from ..utils.lazy_import import LazyModule
+from .http_client import get_session
+
+jwt = LazyModule('jwt')
+x509 = LazyModule('cryptography.x509')
+
+logger = logging.getLogger(__name__)
+
+OAUTH_SCOPES = ' '.join([
+    'https://www.googleapis.com/auth/cloud-platform',
+    'https://www.googleapis.com/auth/firebase',
+    'https://www.googleapis.com/auth/identitytoolkit',
+    'https://www.googleapis.com/auth/userinfo.email',
+])
+DEFAULT_TOKEN_URI = 'https://oauth2.googleapis.com/token'
+JWT_BEARER_GRANT = 'urn:ietf:params:oauth:grant-type:jwt-bearer'
+# accounts:lookup accepts at most 100 identifiers per call
+LOOKUP_BATCH_SIZE = 100
+
+
+class UserNotFound(ValueError):
+    """
+    No account with the email exists in the tenant (as opposed to a config or API error)
+    """
+
+
+class ServiceAccountTokenSource:
+    """
+    Exchanges a signed service-account JWT for an OAuth2 access token and
+    caches it until shortly before expiry (one token fetch per hour per worker)
+    """
+    REFRESH_MARGIN = 300
+
+    def __init__(self, credentials):
+        self.client_email = credentials['client_email']
+        self.private_key = credentials['private_key']
+        self.private_key_id = credentials.get('private_key_id')
+        self.token_uri = credentials.get('token_uri') or DEFAULT_TOKEN_URI
+        self._token = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def _signed_assertion(self):
+        now = int(time.time())
+        payload = {
+            'iss': self.client_email,
+            'scope': OAUTH_SCOPES,
+            'aud': self.token_uri,
+            'iat': now,
+            'exp': now + 3600,
+        }
+        headers = {'kid': self.private_key_id} if self.private_key_id else None
+        return jwt.encode(payload, self.private_key, algorithm='RS256', headers=headers)
+
+    def get_token(self):
+        """
+        Get a valid access token, fetching a new one only when the cached one is about to expire
+        """
+        if self._token and time.time() < self._expires_at - self.REFRESH_MARGIN:
+            return self._token
+
+        with self._lock:
+            if self._token and time.time() < self._expires_at - self.REFRESH_MARGIN:
+                return self._token
+
+            response = get_session('identitytoolkit').post(
+                self.token_uri,
+                data={'grant_type': JWT_BEARER_GRANT, 'assertion': self._signed_assertion()},
+                timeout=getattr(settings, 'FIREBASE_HTTP_TIMEOUT', 10)
+            )
+            if response.status_code != 200:
+                raise Exception(f"OAuth token request failed: {response.status_code} {response.text[:200]}")
+
+            result = response.json()
+            self._token = result['access_token']
+            self._expires_at = time.time() + int(result.get('expires_in', 3600))
+            logger.info(f"Fetched OAuth access token for {self.client_email}")
+            return self._token
+
+    def invalidate(self):
+        with self._lock:
+            self._token = None
+            self._expires_at = 0.0
+
+
+class AdminCredentialTokenSource:
+    """
+    Access tokens from a firebase_admin app credential (fallback client), cached
+    the same way so the admin path does not refresh the token on every call
+    """
+    REFRESH_MARGIN = 300
+
+    def __init__(self, app):
+        self.app = app
+        self._token = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def get_token(self):
+        if self._token and time.time() < self._expires_at - self.REFRESH_MARGIN:
+            return self._token
+
+        with self._lock:
+            if self._token and time.time() < self._expires_at - self.REFRESH_MARGIN:
+                return self._token
+            access_token = self.app.credential.get_access_token()
+            self._token = access_token.access_token
+            expiry = access_token.expiry
+            self._expires_at = expiry.timestamp() if expiry else time.time() + 3600
+            return self._token
+
+    def invalidate(self):
+        with self._lock:
+            self._token = None
+            self._expires_at = 0.0
+
+
+class PublicKeyCache:
+    """
+    Google's securetoken signing certificates, keyed by kid.
+
+    Keys are kept for the Cache-Control max-age Google sends (rotations are
+    announced well ahead), so verification normally needs no network call.
+    An unknown kid forces a refetch, at most once per MIN_REFETCH_INTERVAL.
+    """
+    DEFAULT_TTL = 3600
+    MIN_REFETCH_INTERVAL = 60
+
+    def __init__(self, url):
+        self.url = url
+        self._keys = {}
+        self._expires_at = 0.0
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def _max_age(cls, cache_control):
+        for directive in (cache_control or '').split(','):
+            name, _, value = directive.strip().partition('=')
+            if name.lower() == 'max-age' and value.isdigit():
+                return int(value)
+        return cls.DEFAULT_TTL
+
+    def _fetch(self):
+        response = get_session('identitytoolkit').get(
+            self.url, timeout=getattr(settings, 'FIREBASE_HTTP_TIMEOUT', 10)
+        )
+        response.raise_for_status()
+        keys = {
+            kid: x509.load_pem_x509_certificate(pem.encode()).public_key()
+            for kid, pem in response.json().items()
+        }
+        return keys, self._max_age(response.headers.get('Cache-Control'))
+
+    def _refresh(self):
+        keys, max_age = self._fetch()
+        now = time.time()
+        self._keys = keys
+        self._fetched_at = now
+        self._expires_at = now + max_age
+        logger.info(f"Fetched {len(keys)} ID token signing keys (cache for {max_age}s)")
+
+    def get_key(self, kid):
+        now = time.time()
+        expired = now >= self._expires_at
+        unknown = kid not in self._keys and now - self._fetched_at >= self.MIN_REFETCH_INTERVAL
+
+        if expired or unknown:
+            with self._lock:
+                now = time.time()
+                if now >= self._expires_at or (
+                        kid not in self._keys and now - self._fetched_at >= self.MIN_REFETCH_INTERVAL):
+                    self._refresh()
+        return self._keys.get(kid)
+
+    @property
+    def expires_in(self):
+        return max(0.0, self._expires_at - time.time())
+
+
+_key_caches = {}
+_key_caches_lock = threading.Lock()
+
+
+def get_key_cache(url=None):
+    """
+    Get the process-wide signing key cache for a certificate URL (shared by test and prod clients)
+    """
+    url = url or settings.FIREBASE_ID_TOKEN_CERTS_URL
+    with _key_caches_lock:
+        if url not in _key_caches:
+            _key_caches[url] = PublicKeyCache(url)
+        return _key_caches[url]
+
+
+class IdentityToolkitClient:
+    """
+    Tenant-aware Identity Toolkit operations for one Firebase project
+    """
+
+    def __init__(self, project_id, token_source, key_cache=None):
+        self.project_id = project_id
+        self.token_source = token_source
+        self.key_cache = key_cache or get_key_cache()
+        self.base_url = settings.IDENTITY_TOOLKIT_URL.rstrip('/')
+
+    @classmethod
+    def from_service_account(cls, credentials):
+        """
+        Build a lean client straight from a service-account dict (FIREBASE_*_CONFIG)
+        """
+        return cls(credentials['project_id'], ServiceAccountTokenSource(credentials))
+
+    def _post(self, path, payload, params=None):
+        response = get_session('identitytoolkit').post(
+            f'{self.base_url}/{path}',
+            headers={
+                'Authorization': f'Bearer {self.token_source.get_token()}',
+                'Content-Type': 'application/json'
+            },
+            params=params or {},
+            json=payload,
+            timeout=getattr(settings, 'FIREBASE_HTTP_TIMEOUT', 10)
+        )
+        if response.status_code == 401:
+            # Token revoked or expired early: drop it so the next call refetches
+            self.token_source.invalidate()
+        return response
+
+    @staticmethod
+    def _error_message(response):
+        try:
+            return response.json().get('error', {}).get('message', 'Unknown error')
+        except ValueError:
+            return f'HTTP {response.status_code}'
+
+    def send_oob_code(self, request_type, email, tenant_id=None):
+        """
+        Generate an out-of-band action link (PASSWORD_RESET or VERIFY_EMAIL) without sending it
+
+        Returns:
+            str: The action link
+
+        Raises:
+            UserNotFound: If the user does not exist in the tenant
+        """
+        params = {'tenantId': tenant_id} if tenant_id else {}
+        response = self._post('accounts:sendOobCode', {
+            'requestType': request_type,
+            'email': email,
+            'returnOobLink': True  # Get the link in the response instead of sending email
+        }, params=params)
+
+        if response.status_code == 200:
+            return response.json().get('oobLink')
+
+        error_message = self._error_message(response)
+        if 'EMAIL_NOT_FOUND' in error_message or 'USER_NOT_FOUND' in error_message:
+            logger.warning(f"User not found: {email} in tenant {tenant_id}")
+            raise UserNotFound(f"User with email {email} not found")
+
+        logger.error(f"Firebase API error: {error_message}")
+        raise Exception(f"Firebase API error: {error_message}")
+
+    def lookup(self, emails=None, local_ids=None, tenant_id=None):
+        """
+        Look up accounts by email and/or uid (accounts:lookup)
+
+        Returns:
+            list: Raw Identity Toolkit user records (missing users are omitted)
+        """
+        payload = {}
+        if emails:
+            payload['email'] = list(emails)
+        if local_ids:
+            payload['localId'] = list(local_ids)
+        if tenant_id:
+            payload['tenantId'] = tenant_id
+
+        response = self._post(f'projects/{self.project_id}/accounts:lookup', payload)
+        if response.status_code != 200:
+            raise Exception(f"Firebase API error: {self._error_message(response)}")
+        return response.json().get('users', [])
+
+    @staticmethod
+    def to_user_dict(record):
+        """
+        Convert a raw user record to the shape FirebaseService.get_user_by_email returns
+        """
+        return {
+            'uid': record.get('localId'),
+            'email': record.get('email'),
+            'email_verified': record.get('emailVerified', False),
+            'display_name': record.get('displayName'),
+            'disabled': record.get('disabled', False),
+        }
+
+    def get_user_by_email(self, email, tenant_id=None):
+        users = self.lookup(emails=[email], tenant_id=tenant_id)
+        return self.to_user_dict(users[0]) if users else None
+
+    def verify_id_token(self, id_token, tenant_id=None, check_revoked=False):
+        """
+        Verify a Firebase ID token's signature and claims locally
+
+        Returns:
+            dict: Decoded token claims (with 'uid')
+
+        Raises:
+            ValueError: 'Invalid token', 'Token expired' or 'Token revoked'
+        """
+        try:
+            header = jwt.get_unverified_header(id_token)
+        except jwt.exceptions.PyJWTError:
+            raise ValueError("Invalid token")
+
+        key = self.key_cache.get_key(header.get('kid'))
+        if key is None or header.get('alg') != 'RS256':
+            raise ValueError("Invalid token")
+
+        try:
+            claims = jwt.decode(
+                id_token,
+                key,
+                algorithms=['RS256'],
+                audience=self.project_id,
+                issuer=f'https://securetoken.google.com/{self.project_id}',
+                options={'require': ['exp', 'iat', 'sub', 'aud', 'iss']},
+                leeway=getattr(settings, 'FIREBASE_ID_TOKEN_LEEWAY', 0)
+            )
+        except jwt.exceptions.ExpiredSignatureError:
+            raise ValueError("Token expired")
+        except jwt.exceptions.PyJWTError:
+            raise ValueError("Invalid token")
+
+        if not claims.get('sub') or len(claims['sub']) > 128:
+            raise ValueError("Invalid token")
+        if claims.get('auth_time', 0) > time.time() + 300:
+            raise ValueError("Invalid token")
+
+        token_tenant = claims.get('firebase', {}).get('tenant')
+        if tenant_id and token_tenant != tenant_id:
+            raise ValueError("Invalid token")
+
+        claims['uid'] = claims['sub']
+
+        if check_revoked:
+            users = self.lookup(local_ids=[claims['uid']], tenant_id=token_tenant)
+            if not users or users[0].get('disabled'):
+                raise ValueError("Token revoked")
+            valid_since = int(users[0].get('validSince', 0))
+            if claims['iat'] < valid_since:
+                raise ValueError("Token revoked")
+
+        return claims
+
+
+def _reset_key_caches_after_fork():
+    global _key_caches_lock
+    # The keys are plain data and stay valid; only the locks may have been held at fork
+    _key_caches_lock = threading.Lock()
+    for cache in _key_caches.values():
+        cache._lock = threading.Lock()
+
+
+lifecycle.register('signing_key_caches', reset=_reset_key_caches_after_fork)
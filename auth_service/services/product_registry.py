@@ -0,0 +1,240 @@
+"""
+Process-local, read-only snapshot of products for O(1) per-request lookups
+"""
+from collections import namedtuple
+from types import MappingProxyType
+from django.conf import settings
+import copy
+import logging
+import threading
+import time
+
+from .. import lifecycle
+
+logger = logging.getLogger(__name__)
+
+
+class ProductInfo(namedtuple('ProductInfo', [
+    'id', 'name', 'display_name', 'user_id', 'user', 'token',
+    'test_tenant_id', 'prod_tenant_id', 'is_active',
+    'logo_url', 'dashboard_url', 'welcome_sender', 'digest_window', 'sandbox',
+])):
+    """
+    Immutable product record. Mirrors the parts of the Product model the
+    request path needs, with branding defaults from PRODUCTS_CONFIG applied.
+    """
+    __slots__ = ()
+
+    def __str__(self):
+        return self.display_name
+
+    def request_user(self):
+        """
+        A copy of the product's service-account user for one request (request.user
+        must not be shared between concurrent requests)
+        """
+        return copy.copy(self.user)
+
+    def get_tenant_id(self, environment='test'):
+        """
+        Get Firebase tenant ID based on environment
+        """
+        return self.prod_tenant_id if environment == 'prod' else self.test_tenant_id
+
+
+class RegistrySnapshot:
+    """
+    One consistent, immutable generation of the registry. Lookups never
+    observe a half-loaded state because the whole snapshot is swapped at once.
+    """
+
+    def __init__(self, products, version):
+        self.version = version
+        self.products = tuple(products)
+        self.by_id = MappingProxyType({p.id: p for p in self.products})
+        self.by_user_id = MappingProxyType({p.user_id: p for p in self.products})
+        self.by_name = MappingProxyType({p.name: p for p in self.products})
+        self.by_display_name = MappingProxyType({p.display_name: p for p in self.products})
+        self.by_token = MappingProxyType({p.token: p for p in self.products if p.token})
+        by_tenant = {}
+        for p in self.products:
+            if p.test_tenant_id:
+                by_tenant[p.test_tenant_id] = (p, 'test')
+            if p.prod_tenant_id:
+                by_tenant[p.prod_tenant_id] = (p, 'prod')
+        self.by_tenant = MappingProxyType(by_tenant)
+
+
+class ProductRegistry:
+    """
+    Holds the current RegistrySnapshot. The snapshot is loaded on first use
+    (or eagerly via load()), swapped atomically when a Product changes in this
+    process (signals), and re-checked against a cheap DB version query at most
+    every PRODUCT_REGISTRY_POLL_INTERVAL seconds for changes made elsewhere.
+    """
+    _snapshot = None
+    _next_poll = 0.0
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _product_defaults(name):
+        return settings.PRODUCTS_CONFIG.get(name, {})
+
+    @classmethod
+    def _build_info(cls, product, token):
+        defaults = cls._product_defaults(product.name)
+
+        # Detached from the Product instance; requests get their own copy (ProductInfo.request_user)
+        user = copy.copy(product.user)
+        user._state.fields_cache.clear()
+
+        if product.welcome_sender_email:
+            welcome_sender = MappingProxyType({
+                'email': product.welcome_sender_email,
+                'name': product.welcome_sender_name or settings.BREVO_SENDER_NAME,
+            })
+        elif defaults.get('welcome_sender'):
+            welcome_sender = MappingProxyType(dict(defaults['welcome_sender']))
+        else:
+            welcome_sender = None
+
+        return ProductInfo(
+            id=product.id,
+            name=product.name,
+            display_name=product.display_name,
+            user_id=product.user_id,
+            user=user,
+            token=token,
+            test_tenant_id=product.test_tenant_id,
+            prod_tenant_id=product.prod_tenant_id,
+            is_active=product.is_active,
+            logo_url=product.logo_url or defaults.get('logo_url') or settings.DEFAULT_PRODUCT_LOGO_URL,
+            dashboard_url=product.dashboard_url or defaults.get('dashboard_url') or settings.DEFAULT_DASHBOARD_URL,
+            welcome_sender=welcome_sender,
+            digest_window=product.digest_window_seconds or defaults.get('digest_window_seconds', 0),
+            sandbox=product.sandbox_test_sends,
+        )
+
+    @staticmethod
+    def _db_version():
+        """
+        Cheap change marker (one small query): per product its updated_at, plus whether its
+        user is active and its token key, so a rotated or deleted token and a deactivated
+        user made by another process are picked up on the next poll
+        """
+        from ..models import Product
+
+        return tuple(
+            Product.objects.order_by('id').values_list('id', 'updated_at', 'user__is_active', 'user__auth_token__key')
+        )
+
+    @classmethod
+    def load(cls):
+        """
+        Load a fresh snapshot from the database and swap it in
+
+        Returns:
+            RegistrySnapshot: The newly installed snapshot
+        """
+        from ..models import Product
+        from rest_framework.authtoken.models import Token
+
+        version = cls._db_version()
+        products = list(Product.objects.select_related('user'))
+        tokens = dict(
+            Token.objects.filter(user_id__in=[p.user_id for p in products]).values_list('user_id', 'key')
+        )
+
+        snapshot = RegistrySnapshot(
+            [cls._build_info(p, tokens.get(p.user_id)) for p in products],
+            version
+        )
+
+        with cls._lock:
+            cls._snapshot = snapshot
+            cls._next_poll = time.monotonic() + cls._poll_interval()
+
+        logger.info(f"Product registry loaded: {len(snapshot.products)} products")
+        return snapshot
+
+    @staticmethod
+    def _poll_interval():
+        return getattr(settings, 'PRODUCT_REGISTRY_POLL_INTERVAL', 30)
+
+    @classmethod
+    def invalidate(cls):
+        """
+        Drop the current snapshot so the next lookup reloads it
+        """
+        with cls._lock:
+            cls._snapshot = None
+
+    @classmethod
+    def snapshot(cls):
+        """
+        Get the current snapshot, loading or refreshing it when needed
+        """
+        snapshot = cls._snapshot
+        if snapshot is None:
+            return cls.load()
+
+        interval = cls._poll_interval()
+        if interval and time.monotonic() >= cls._next_poll:
+            # Only one thread polls per interval; the others keep serving the current snapshot
+            with cls._lock:
+                if time.monotonic() < cls._next_poll:
+                    return cls._snapshot or snapshot
+                cls._next_poll = time.monotonic() + interval
+            try:
+                if cls._db_version() != snapshot.version:
+                    return cls.load()
+            except Exception as e:
+                logger.warning(f"Product registry poll failed, serving cached snapshot: {e}")
+
+        return snapshot
+
+    @classmethod
+    def get_by_user_id(cls, user_id):
+        return cls.snapshot().by_user_id.get(user_id)
+
+    @classmethod
+    def get_by_token(cls, key):
+        return cls.snapshot().by_token.get(key)
+
+    @classmethod
+    def get_by_tenant(cls, tenant_id):
+        """
+        Look up the product owning a Firebase tenant
+
+        Returns:
+            tuple: (ProductInfo, environment) or None
+        """
+        return cls.snapshot().by_tenant.get(tenant_id)
+
+    @classmethod
+    def get_by_name(cls, name):
+        """
+        Look up a product by its key ('beta_health') or display name ('Beta Health')
+        """
+        snapshot = cls.snapshot()
+        return snapshot.by_name.get(name) or snapshot.by_display_name.get(name)
+
+    @classmethod
+    def find(cls, name):
+        """
+        Like get_by_name, but never raises: branding lookups on public pages
+        fall back to defaults if the database is unavailable
+        """
+        try:
+            return cls.get_by_name(name)
+        except Exception as e:
+            logger.warning(f"Product registry lookup failed for {name}: {e}")
+            return None
+
+
+def _reset_registry_lock():
+    # The snapshot is immutable and stays valid in the child
+    ProductRegistry._lock = threading.Lock()
+
+
+lifecycle.register('product_registry', reset=_reset_registry_lock)
@@ -0,0 +1,249 @@
+"""
+Per-recipient resend cooldown for password reset and verification emails.
+
+Users mash "resend" buttons; the IP rate limit does not stop a flood aimed at
+one address. Within a cooldown window, repeats for the same (product, email
+type, environment, recipient) are coalesced into the message already sent:
+no Firebase link, render or Brevo send, and the caller gets that message_id.
+
+Two levels keep it cheap and correct across workers:
+    - a bounded in-process TTL cache of recent sends (no query for repeats),
+      plus in-flight dedupe so concurrent presses in one worker wait for a
+      single send instead of racing it;
+    - the email_cooldowns table, where a unique row per key is claimed
+      before sending, so other workers and instances coalesce too.
+Storage errors never block a send: the cooldown fails open.
+"""
+from cachetools import TLRUCache
+from datetime import timedelta
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, transaction
+from django.utils import timezone
+import hashlib
+import logging
+import threading
+import time
+
+from .. import lifecycle
+
+logger = logging.getLogger(__name__)
+
+
+class CooldownStore:
+    """
+    Process-wide cooldown state (memory level) in front of the EmailCooldown table
+    """
+    # A claimed row without a message_id expires on its own if its worker dies mid-send
+    CLAIM_TTL = 60
+    # Expired rows are purged at most this often per process
+    PURGE_INTERVAL = 300
+
+    _cache = None
+    _lock = threading.Lock()
+    _inflight = {}
+    _next_purge = 0.0
+    stats = {'claimed': 0, 'coalesced_memory': 0, 'coalesced_inflight': 0, 'coalesced_db': 0, 'store_errors': 0}
+
+    @staticmethod
+    def window(email_type):
+        """
+        Cooldown in seconds for an email type name (0 means disabled)
+        """
+        overrides = getattr(settings, 'EMAIL_RESEND_COOLDOWNS', {}) or {}
+        return int(overrides.get(email_type, getattr(settings, 'EMAIL_RESEND_COOLDOWN', 0)))
+
+    @staticmethod
+    def key(product_name, email_type, environment, recipient):
+        digest = hashlib.sha256(recipient.strip().lower().encode()).hexdigest()
+        return (product_name, email_type, environment, digest)
+
+    @classmethod
+    def _get_cache(cls):
+        if cls._cache is None:
+            cls._cache = TLRUCache(
+                maxsize=getattr(settings, 'EMAIL_RESEND_COOLDOWN_CACHE_SIZE', 10000),
+                ttu=lambda key, entry, now: entry['expires_at']
+            )
+        return cls._cache
+
+    @staticmethod
+    def _coalesced(message_id, expires_at):
+        """
+        Result for a coalesced request. Without a message_id the first send has no outcome
+        yet: the result is marked pending (answered 202, in progress), never as sent
+        """
+        retry_after = max(0, int(expires_at - time.time()))
+        extra = {'coalesced': True, 'retry_after': retry_after}
+        result = {'success': True, 'message_id': message_id or None, 'coalesced': True, 'extra': extra}
+        if not message_id:
+            extra['pending'] = True
+            result['pending'] = True
+        return result
+
+    @classmethod
+    def acquire(cls, key, window):
+        """
+        Decide whether this request sends or is coalesced into an earlier one
+
+        Args:
+            key (tuple): CooldownStore.key(...)
+            window (int): Cooldown in seconds
+
+        Returns:
+            dict | None: Result to answer with (coalesced), or None when the caller
+            owns the send and must call release() with its outcome
+        """
+        with cls._lock:
+            entry = cls._get_cache().get(key)
+            if entry is not None:
+                cls.stats['coalesced_memory'] += 1
+                return cls._coalesced(entry['message_id'], entry['expires_at'])
+            waiter = cls._inflight.get(key)
+            if waiter is None:
+                cls._inflight[key] = {'event': threading.Event(), 'result': None}
+
+        if waiter is not None:
+            # Same recipient already being sent to from this worker: wait for and share its outcome
+            finished = waiter['event'].wait(getattr(settings, 'EMAIL_PIPELINE_TIMEOUT', 30))
+            with cls._lock:
+                cls.stats['coalesced_inflight'] += 1
+            result = waiter['result']
+            if not finished:
+                # Still sending: in progress, not sent
+                return cls._coalesced(None, time.time() + window)
+            if result is None or not result.get('success'):
+                # The first send failed: report that failure rather than success
+                return dict(result or {'success': False, 'error': 'Email could not be sent'}, coalesced=True)
+            if result.get('coalesced'):
+                return result
+            return cls._coalesced(result.get('message_id'), time.time() + window)
+
+        if not getattr(settings, 'EMAIL_RESEND_COOLDOWN_SHARED', True):
+            return None
+
+        try:
+            existing = cls._claim_row(key)
+        except DatabaseError as e:
+            logger.warning(f"Resend cooldown store unavailable, sending without it: {e}")
+            with cls._lock:
+                cls.stats['store_errors'] += 1
+            return None
+
+        if existing is None:
+            with cls._lock:
+                cls.stats['claimed'] += 1
+            return None
+
+        # Another worker sent (or is still sending: pending) this email within the window
+        message_id, expires_at = existing
+        result = cls._coalesced(message_id, expires_at)
+        with cls._lock:
+            cls.stats['coalesced_db'] += 1
+            if message_id:
+                cls._get_cache()[key] = {'message_id': message_id, 'expires_at': expires_at}
+            waiter = cls._inflight.pop(key, None)
+        if waiter is not None:
+            waiter['result'] = result
+            waiter['event'].set()
+        return result
+
+    @classmethod
+    def _claim_row(cls, key):
+        """
+        Insert this key's row, or take over an expired one
+
+        Returns:
+            tuple | None: (message_id, expires_at epoch) of an active row owned
+            by someone else, or None when this process now owns the send
+        """
+        from ..models import EmailCooldown
+
+        product_name, email_type, environment, recipient_hash = key
+        fields = dict(product_name=product_name, email_type=email_type,
+                      environment=environment, recipient_hash=recipient_hash)
+        now = timezone.now()
+        claim_until = now + timedelta(seconds=cls.CLAIM_TTL)
+
+        try:
+            with transaction.atomic():
+                EmailCooldown.objects.create(message_id='', sent_at=None, expires_at=claim_until, **fields)
+            return None
+        except IntegrityError:
+            pass
+
+        row = EmailCooldown.objects.filter(**fields).values('pk', 'message_id', 'expires_at').first()
+        if row is None:
+            # Purged in between; the next request will claim it
+            return None
+        if row['expires_at'] > now:
+            return row['message_id'], row['expires_at'].timestamp()
+
+        # Expired: take it over unless another worker just did
+        taken = EmailCooldown.objects.filter(pk=row['pk'], expires_at=row['expires_at']).update(
+            message_id='', sent_at=None, expires_at=claim_until
+        )
+        if taken:
+            return None
+        row = EmailCooldown.objects.filter(pk=row['pk']).values('message_id', 'expires_at').first()
+        return (row['message_id'], row['expires_at'].timestamp()) if row else None
+
+    @classmethod
+    def release(cls, key, window, result):
+        """
+        Record the outcome of an acquired send: a delivered message starts the
+        cooldown, a failure frees the key so the user can retry immediately
+        """
+        delivered = bool(result and result.get('success') and result.get('message_id'))
+        expires_at = time.time() + window
+
+        with cls._lock:
+            if delivered:
+                cls._get_cache()[key] = {'message_id': result['message_id'], 'expires_at': expires_at}
+            waiter = cls._inflight.pop(key, None)
+        if waiter is not None:
+            waiter['result'] = result
+            waiter['event'].set()
+
+        if getattr(settings, 'EMAIL_RESEND_COOLDOWN_SHARED', True):
+            try:
+                cls._store_outcome(key, window, result['message_id'] if delivered else None)
+            except DatabaseError as e:
+                logger.warning(f"Could not record resend cooldown: {e}")
+                with cls._lock:
+                    cls.stats['store_errors'] += 1
+
+    @classmethod
+    def _store_outcome(cls, key, window, message_id):
+        from ..models import EmailCooldown
+
+        product_name, email_type, environment, recipient_hash = key
+        rows = EmailCooldown.objects.filter(product_name=product_name, email_type=email_type,
+                                            environment=environment, recipient_hash=recipient_hash)
+        now = timezone.now()
+        if message_id:
+            rows.update(message_id=message_id, sent_at=now, expires_at=now + timedelta(seconds=window))
+        else:
+            rows.filter(message_id='').delete()
+
+        if time.monotonic() >= cls._next_purge:
+            cls._next_purge = time.monotonic() + cls.PURGE_INTERVAL
+            EmailCooldown.objects.filter(expires_at__lt=now).delete()
+
+    @classmethod
+    def clear(cls):
+        """
+        Forget the in-process cooldowns (the shared table is left alone)
+        """
+        with cls._lock:
+            cls._get_cache().clear()
+            for k in list(cls.stats):
+                cls.stats[k] = 0
+
+    @classmethod
+    def _forget_after_fork(cls):
+        # Cached sends stay valid; in-flight waiters belong to the parent's threads
+        cls._lock = threading.Lock()
+        cls._inflight = {}
+
+
+lifecycle.register('resend_cooldown', reset=CooldownStore._forget_after_fork)
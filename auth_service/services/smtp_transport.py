@@ -0,0 +1,430 @@
+"""
+Pooled, pipelined SMTP transport.
+
+Django's SMTP backend opens a connection per email: the TCP (and TLS)
+handshake, EHLO, AUTH and QUIT cost several round trips around every
+message. SmtpPool keeps up to EMAIL_SMTP_POOL_SIZE authenticated connections
+per process and relay, and sends message after message over them:
+    - when the server supports PIPELINING (RFC 2920), MAIL FROM, RCPT TO and
+      DATA go out in one write, so a message costs two round trips;
+    - a connection is recycled after EMAIL_SMTP_MAX_MESSAGES messages or
+      EMAIL_SMTP_IDLE_SECONDS idle (relays drop idle sessions), and a send
+      that finds its pooled connection closed by the server is retried once
+      on a new one (only if the message itself had not been written yet);
+    - the MIME body of each distinct (html, text) content is encoded and
+      dot-stuffed once and reused, only the headers are built per message;
+    - attachments are base64-encoded into the DATA stream a window at a time
+      as it is written (see email_attachments.py), never as a whole message.
+
+Relays: 'brevo' is Brevo's SMTP relay (BREVO_SMTP_*, used by
+BrevoEmailService when BREVO_TRANSPORT='smtp'), 'smtp' is EMAIL_HOST (the
+router's SMTP provider).
+"""
+from collections import OrderedDict
+from django.conf import settings
+from django.utils.html import strip_tags
+from email.message import EmailMessage, MIMEPart
+from email.policy import SMTP
+from email.utils import formataddr, formatdate, make_msgid
+import logging
+import re
+import secrets
+import smtplib
+import socket
+import threading
+import time
+
+from .. import lifecycle
+from .email_attachments import base64_chunks
+
+logger = logging.getLogger(__name__)
+
+# 7bit: non-ASCII bodies are quoted-printable/base64, so relays without 8BITMIME accept them
+_POLICY = SMTP.clone(cte_type='7bit')
+_DOT_LINES = re.compile(rb'(?m)^\.')
+BODY_CACHE_SIZE = 64
+
+_bodies = OrderedDict()
+_bodies_lock = threading.Lock()
+
+# Refusals leave the session usable after RSET; anything else means a broken connection
+_REFUSALS = (smtplib.SMTPSenderRefused, smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError)
+
+
+def _encoded_body(html_content, text_content):
+    """
+    MIME body (multipart/alternative, with its Content-Type/MIME-Version headers), ready for DATA
+    """
+    key = (html_content, text_content)
+    with _bodies_lock:
+        body = _bodies.get(key)
+        if body is not None:
+            _bodies.move_to_end(key)
+            return body
+
+    part = EmailMessage(policy=_POLICY)
+    part.set_content(text_content or strip_tags(html_content))
+    part.add_alternative(html_content, subtype='html')
+    body = part.as_bytes()
+    if not body.endswith(b'\r\n'):
+        body += b'\r\n'
+    if body.startswith(b'.') or b'\n.' in body:
+        body = _DOT_LINES.sub(b'..', body)
+
+    with _bodies_lock:
+        _bodies[key] = body
+        if len(_bodies) > BODY_CACHE_SIZE:
+            _bodies.popitem(last=False)
+    return body
+
+
+def _attachment_head(upload):
+    part = MIMEPart(policy=_POLICY)
+    part['Content-Type'] = upload.content_type
+    part['Content-Transfer-Encoding'] = 'base64'
+    part.add_header('Content-Disposition', 'attachment', filename=upload.name)
+    return part.as_bytes()
+
+
+def build_message(sender, to_email, subject, html_content, text_content=None, reply_to=None, attachments=None):
+    """
+    Build a message for SmtpPool.send
+
+    Args:
+        sender (dict): {email, name}
+        attachments (list, optional): Uploaded files, added as a multipart/mixed message
+
+    Returns:
+        tuple: (Message-ID, [header bytes, body bytes, ...]) - the body is shared between messages,
+            attachments are generators encoding the file while the message is written
+    """
+    message_id = make_msgid(domain=sender['email'].rpartition('@')[2] or None)
+    headers = [
+        ('From', formataddr((sender.get('name') or '', sender['email']))),
+        ('To', to_email),
+        ('Subject', subject or ''),
+        ('Date', formatdate(localtime=True)),
+        ('Message-ID', message_id),
+    ]
+    if reply_to:
+        headers.append(('Reply-To', reply_to))
+    head = ''.join(_POLICY.header_factory(name, value).fold(policy=_POLICY) for name, value in headers)
+    body = _encoded_body(html_content, text_content)
+    if not attachments:
+        return message_id, [head.encode('ascii'), body]
+
+    boundary = f'=_{secrets.token_hex(16)}'
+    head += f'MIME-Version: 1.0\r\nContent-Type: multipart/mixed; boundary="{boundary}"\r\n\r\n'
+    parts = [head.encode('ascii'), f'--{boundary}\r\n'.encode('ascii'), body]
+    for upload in attachments:
+        parts.append(f'--{boundary}\r\n'.encode('ascii') + _attachment_head(upload))
+        parts.append(base64_chunks(upload, wrap=True))
+    parts.append(f'--{boundary}--\r\n'.encode('ascii'))
+    return message_id, parts
+
+
+class _Connection:
+    __slots__ = ('smtp', 'pipelining', 'messages', 'last_used', 'writing')
+
+    def __init__(self, smtp):
+        self.smtp = smtp
+        self.pipelining = False
+        self.messages = 0
+        self.last_used = time.monotonic()
+        # True while the message is being written: a failure then may have delivered it
+        self.writing = False
+
+
+class SmtpPool:
+    """
+    Long-lived SMTP connections to one relay, shared by the process's threads
+    """
+
+    def __init__(self, host, port, username='', password='', use_tls=False, use_ssl=False, timeout=10,
+                 size=4, max_messages=100, idle_seconds=30, pipelining=True):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+        self.size = size
+        self.max_messages = max_messages
+        self.idle_seconds = idle_seconds
+        self.pipelining = pipelining
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        # LIFO: the most recently used connection is the one most likely still open
+        self._idle = []
+        self.stats = {'connections': 0, 'reconnects': 0, 'recycled': 0, 'messages': 0, 'pipelined': 0, 'refused': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _connect(self, connect_timeout=None):
+        smtp_class = smtplib.SMTP_SSL if self.use_ssl else smtplib.SMTP
+        smtp = smtp_class(self.host, self.port, timeout=connect_timeout or self.timeout)
+        try:
+            # Envelope, message and terminator are separate writes: do not let Nagle hold them back
+            smtp.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            smtp.ehlo()
+            if self.use_tls:
+                smtp.starttls()
+                smtp.ehlo()
+            if self.username:
+                smtp.login(self.username, self.password)
+            smtp.sock.settimeout(self.timeout)
+        except Exception:
+            smtp.close()
+            raise
+        conn = _Connection(smtp)
+        conn.pipelining = self.pipelining and smtp.has_extn('pipelining')
+        self._count('connections')
+        return conn
+
+    def _checkout(self):
+        horizon = time.monotonic() - self.idle_seconds
+        stale = []
+        conn = None
+        with self._lock:
+            while self._idle:
+                candidate = self._idle.pop()
+                if candidate.last_used >= horizon:
+                    conn = candidate
+                    break
+                stale.append(candidate)
+        for candidate in stale:
+            self._close(candidate, polite=True)
+        return conn
+
+    def _checkin(self, conn):
+        conn.last_used = time.monotonic()
+        if conn.messages >= self.max_messages:
+            self._count('recycled')
+            self._close(conn, polite=True)
+            return
+        with self._lock:
+            self._idle.append(conn)
+
+    @staticmethod
+    def _close(conn, polite=False):
+        try:
+            if polite:
+                conn.smtp.quit()
+            else:
+                conn.smtp.close()
+        except Exception:
+            conn.smtp.close()
+
+    def send(self, from_addr, recipients, parts, connect_timeout=None):
+        """
+        Send one message over a pooled connection
+
+        Args:
+            from_addr (str): Envelope sender
+            recipients (list): Envelope recipients
+            parts (list): Message bytes (dot-stuffed, CRLF line endings) or iterables of them, written in order
+            connect_timeout (float, optional): Seconds to wait for a free or new connection (EMAIL_TIMEOUT if None)
+
+        Raises:
+            smtplib.SMTPException: The relay refused the message or could not be reached
+        """
+        wait = connect_timeout or self.timeout
+        if not self._slots.acquire(timeout=wait):
+            raise smtplib.SMTPException(f'No SMTP connection to {self.host} free within {wait}s')
+        try:
+            conn = self._checkout()
+            while True:
+                fresh = conn is None
+                if fresh:
+                    conn = self._connect(connect_timeout)
+                try:
+                    self._transact(conn, from_addr, recipients, parts)
+                except _REFUSALS:
+                    self._count('refused')
+                    if self._reset(conn):
+                        self._checkin(conn)
+                    else:
+                        self._close(conn)
+                    raise
+                except Exception:
+                    self._close(conn)
+                    if fresh or conn.writing:
+                        raise
+                    # The relay closed the pooled connection while it sat idle
+                    self._count('reconnects')
+                    conn = None
+                    continue
+                self._count('messages')
+                self._checkin(conn)
+                return
+        finally:
+            self._slots.release()
+
+    def _transact(self, conn, from_addr, recipients, parts):
+        smtp = conn.smtp
+        commands = [f'MAIL FROM:<{from_addr}>'] + [f'RCPT TO:<{rcpt}>' for rcpt in recipients] + ['DATA']
+        if conn.pipelining:
+            smtp.send(''.join(f'{command}\r\n' for command in commands))
+            replies = [smtp.getreply() for _ in commands]
+            self._count('pipelined')
+        else:
+            replies = []
+            for command in commands:
+                smtp.send(f'{command}\r\n')
+                replies.append(smtp.getreply())
+
+        code, response = replies[0]
+        if code != 250:
+            raise smtplib.SMTPSenderRefused(code, response, from_addr)
+        refused = {rcpt: reply for rcpt, reply in zip(recipients, replies[1:-1]) if reply[0] not in (250, 251)}
+        code, response = replies[-1]
+        if len(refused) == len(recipients):
+            if code == 354:
+                # DATA should have been rejected: end the (empty) message
+                smtp.send(b'.\r\n')
+                smtp.getreply()
+            raise smtplib.SMTPRecipientsRefused(refused)
+        if code != 354:
+            raise smtplib.SMTPDataError(code, response)
+
+        conn.writing = True
+        for part in parts:
+            if isinstance(part, bytes):
+                smtp.send(part)
+                continue
+            for chunk in part:
+                smtp.send(chunk)
+        smtp.send(b'.\r\n')
+        code, response = smtp.getreply()
+        conn.writing = False
+        conn.messages += 1
+        if code != 250:
+            raise smtplib.SMTPDataError(code, response)
+
+    @staticmethod
+    def _reset(conn):
+        try:
+            return conn.smtp.rset()[0] == 250
+        except Exception:
+            return False
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._close(conn, polite=True)
+
+    def forget(self):
+        # After fork: the inherited sockets belong to the parent
+        lifecycle.abandon(*[conn.smtp for conn in self._idle])
+        self._idle = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.size)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _relay_settings(relay):
+    if relay == 'brevo':
+        return dict(
+            host=settings.BREVO_SMTP_HOST,
+            port=settings.BREVO_SMTP_PORT,
+            username=settings.BREVO_SMTP_LOGIN,
+            password=settings.BREVO_SMTP_KEY,
+            use_tls=settings.BREVO_SMTP_USE_TLS,
+        )
+    return dict(
+        host=settings.EMAIL_HOST,
+        port=settings.EMAIL_PORT,
+        username=settings.EMAIL_HOST_USER,
+        password=settings.EMAIL_HOST_PASSWORD,
+        use_tls=settings.EMAIL_USE_TLS,
+        use_ssl=settings.EMAIL_USE_SSL,
+    )
+
+
+def get_pool(relay):
+    """
+    Get the process-wide connection pool for a relay, creating it on first use
+
+    Args:
+        relay (str): 'brevo' (Brevo's SMTP relay) or 'smtp' (EMAIL_HOST)
+
+    Returns:
+        SmtpPool: The relay's pool
+    """
+    pool = _pools.get(relay)
+    if pool is not None:
+        return pool
+
+    with _pools_lock:
+        pool = _pools.get(relay)
+        if pool is None:
+            pool = _pools[relay] = SmtpPool(
+                timeout=getattr(settings, 'EMAIL_TIMEOUT', 10),
+                size=getattr(settings, 'EMAIL_SMTP_POOL_SIZE', 4),
+                max_messages=getattr(settings, 'EMAIL_SMTP_MAX_MESSAGES', 100),
+                idle_seconds=getattr(settings, 'EMAIL_SMTP_IDLE_SECONDS', 30),
+                pipelining=getattr(settings, 'EMAIL_SMTP_PIPELINING', True),
+                **_relay_settings(relay)
+            )
+        return pool
+
+
+def send_message(relay, sender, to_email, subject, html_content, text_content=None, reply_to=None,
+                 attachments=None, connect_timeout=None):
+    """
+    Send an email over a relay's pooled connections
+
+    connect_timeout bounds the wait for a connection (see SmtpPool.send), not the send itself
+
+    Returns:
+        dict: {'success': True, 'message_id'} or {'success': False, 'error'}
+    """
+    try:
+        message_id, parts = build_message(sender, to_email, subject, html_content, text_content, reply_to,
+                                          attachments)
+        get_pool(relay).send(sender['email'], [to_email], parts, connect_timeout)
+    except Exception as e:
+        logger.error(f"SMTP send to {to_email} via {relay} failed: {e}")
+        return {'success': False, 'error': str(e)}
+
+    logger.info(f"Email sent successfully to {to_email} over SMTP ({relay}). Message ID: {message_id}")
+    return {'success': True, 'message_id': message_id}
+
+
+def pool_stats():
+    """
+    Connection and message counters per relay pool
+    """
+    return {
+        relay: dict(pool.stats, idle=len(pool._idle), size=pool.size, pipelining=pool.pipelining)
+        for relay, pool in list(_pools.items())
+    }
+
+
+def close_pools():
+    """
+    QUIT and forget every pooled connection (worker exit and shutdown)
+    """
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+def _forget_pools():
+    global _pools, _pools_lock
+    for pool in _pools.values():
+        pool.forget()
+    _pools = {}
+    _pools_lock = threading.Lock()
+
+
+lifecycle.register('smtp_pools', reset=_forget_pools, close=close_pools)
@@ -0,0 +1,214 @@
+"""
+Local Firebase ID token verification with a cached revocation check.
+
+Signatures and claims are verified locally against cached Google signing keys.
+Instead of an accounts:lookup round-trip per verification (check_revoked), each
+user's tokensValidAfterTime/disabled state is cached per uid for a configurable
+freshness window and refreshed in batches by a background thread while the
+user stays active, so steady-state verification makes no upstream calls.
+"""
+from collections import OrderedDict, defaultdict
+from django.conf import settings
+import logging
+import threading
+import time
+
+from .. import lifecycle
+from .identity_toolkit import LOOKUP_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class RevocationCache:
+    """
+    Bounded LRU of (environment, tenant_id, uid) -> revocation state.
+
+    A verification accepts a cached state younger than `freshness` seconds;
+    older or missing entries are looked up synchronously. Entries used within
+    the last freshness window are re-fetched in the background once they are
+    half that old, in accounts:lookup batches of up to 100 uids.
+    """
+
+    def __init__(self, freshness=300, max_size=10000, refresh_interval=30):
+        self.freshness = freshness
+        self.max_size = max_size
+        self.refresh_interval = refresh_interval
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._refresher = None
+        self.stats = {'hits': 0, 'misses': 0, 'background_refreshed': 0}
+
+    def _store(self, key, valid_since, disabled, last_used=None):
+        now = time.monotonic()
+        with self._lock:
+            previous = self._entries.get(key)
+            self._entries[key] = {
+                'valid_since': valid_since,
+                'disabled': disabled,
+                'fetched_at': now,
+                'last_used': last_used or (previous['last_used'] if previous else now),
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    @staticmethod
+    def _client(environment):
+        from .firebase_service import FirebaseService
+        return FirebaseService.get_client(environment)
+
+    def _fetch(self, environment, tenant_id, uids):
+        """
+        Fetch revocation state for up to 100 uids; users missing upstream are treated as revoked
+        """
+        users = self._client(environment).lookup(local_ids=uids, tenant_id=tenant_id)
+        found = {u.get('localId'): u for u in users}
+        return {
+            uid: (
+                int(found[uid].get('validSince', 0)) if uid in found else None,
+                found[uid].get('disabled', False) if uid in found else True,
+            )
+            for uid in uids
+        }
+
+    def get(self, environment, tenant_id, uid):
+        """
+        Get (valid_since, disabled) for a user, within the freshness window
+
+        Returns:
+            tuple: (valid_since seconds or None if the user no longer exists, disabled flag)
+        """
+        key = (environment, tenant_id, uid)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and now - entry['fetched_at'] < self.freshness:
+                entry['last_used'] = now
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return entry['valid_since'], entry['disabled']
+            self.stats['misses'] += 1
+
+        self._ensure_refresher()
+        valid_since, disabled = self._fetch(environment, tenant_id, [uid])[uid]
+        self._store(key, valid_since, disabled, last_used=now)
+        return valid_since, disabled
+
+    def invalidate(self, environment=None, tenant_id=None, uid=None):
+        """
+        Drop cached state (all entries when called without arguments)
+        """
+        with self._lock:
+            if uid is None:
+                self._entries.clear()
+            else:
+                self._entries.pop((environment, tenant_id, uid), None)
+
+    def refresh_due(self):
+        """
+        Re-fetch recently used entries that are past half their freshness window, in batches
+        """
+        now = time.monotonic()
+        due = defaultdict(list)
+        with self._lock:
+            for (environment, tenant_id, uid), entry in self._entries.items():
+                recently_used = now - entry['last_used'] < self.freshness
+                aging = now - entry['fetched_at'] >= self.freshness / 2
+                if recently_used and aging:
+                    due[(environment, tenant_id)].append(uid)
+
+        for (environment, tenant_id), uids in due.items():
+            for i in range(0, len(uids), LOOKUP_BATCH_SIZE):
+                batch = uids[i:i + LOOKUP_BATCH_SIZE]
+                try:
+                    states = self._fetch(environment, tenant_id, batch)
+                except Exception as e:
+                    logger.warning(f"Background revocation refresh failed for {len(batch)} users: {e}")
+                    continue
+                for uid, (valid_since, disabled) in states.items():
+                    self._store((environment, tenant_id, uid), valid_since, disabled)
+                self.stats['background_refreshed'] += len(batch)
+
+    def _ensure_refresher(self):
+        if self._refresher is not None and self._refresher.is_alive():
+            return
+        with self._lock:
+            if self._refresher is None or not self._refresher.is_alive():
+                self._refresher = threading.Thread(target=self._run, name='revocation-refresh', daemon=True)
+                self._refresher.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.refresh_interval)
+            try:
+                self.refresh_due()
+            except Exception as e:
+                logger.error(f"Revocation refresher error: {e}", exc_info=True)
+
+    def reset(self):
+        """
+        Forget all state and the refresher thread (used after fork, see lifecycle)
+        """
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._refresher = None
+
+
+class IdTokenVerifier:
+    """
+    Verifies Firebase ID tokens locally: cached signing keys for the signature,
+    RevocationCache instead of a per-call revocation round-trip
+    """
+    _revocations = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def revocations(cls):
+        if cls._revocations is None:
+            with cls._lock:
+                if cls._revocations is None:
+                    cls._revocations = RevocationCache(
+                        freshness=getattr(settings, 'FIREBASE_REVOCATION_FRESHNESS', 300),
+                        max_size=getattr(settings, 'FIREBASE_REVOCATION_CACHE_SIZE', 10000),
+                        refresh_interval=getattr(settings, 'FIREBASE_REVOCATION_REFRESH_INTERVAL', 30),
+                    )
+        return cls._revocations
+
+    @classmethod
+    def verify(cls, id_token, tenant_id=None, environment='test', check_revoked=True):
+        """
+        Verify a Firebase ID token
+
+        Args:
+            id_token (str): Firebase ID token
+            tenant_id (str, optional): Expected tenant (None accepts the token's own tenant)
+            environment (str): 'test' or 'prod' (selects the Firebase project)
+            check_revoked (bool): Enforce revocation/disabled state via the revocation cache
+
+        Returns:
+            dict: Decoded claims including 'uid'
+
+        Raises:
+            ValueError: 'Invalid token', 'Token expired' or 'Token revoked'
+        """
+        from .firebase_service import FirebaseService
+
+        claims = FirebaseService.get_client(environment).verify_id_token(id_token, tenant_id, check_revoked=False)
+
+        if check_revoked:
+            token_tenant = claims.get('firebase', {}).get('tenant')
+            valid_since, disabled = cls.revocations().get(environment, token_tenant, claims['uid'])
+            if valid_since is None or disabled or claims['iat'] < valid_since:
+                raise ValueError("Token revoked")
+
+        return claims
+
+
+def _reset_revocations_after_fork():
+    IdTokenVerifier._lock = threading.Lock()
+    if IdTokenVerifier._revocations is not None:
+        IdTokenVerifier._revocations.reset()
+
+
+lifecycle.register('revocation_cache', reset=_reset_revocations_after_fork)
@@ -0,0 +1,171 @@
+"""
+Per-tenant cache of Firebase user existence and basic profile.
+
+Keys are (environment, tenant_id, sha256(email)) so addresses probed by bots
+are not kept in memory in clear. Known-missing users are cached briefly and
+existing users longer, so repeated lookups and password resets for the same
+address are answered locally instead of costing Identity Toolkit quota.
+"""
+from cachetools import TLRUCache
+from django.conf import settings
+import hashlib
+import threading
+import time
+
+from .. import lifecycle
+
+MISS = object()
+
+
+class UserLookupCache:
+    """
+    Bounded TTL cache: profile dict for existing users, None for missing ones
+    """
+    _cache = None
+    _lock = threading.Lock()
+    stats = {'hits': 0, 'negative_hits': 0, 'misses': 0}
+
+    @staticmethod
+    def _ttu(key, value, now):
+        if value is None:
+            return now + getattr(settings, 'FIREBASE_USER_CACHE_NEGATIVE_TTL', 60)
+        return now + getattr(settings, 'FIREBASE_USER_CACHE_POSITIVE_TTL', 300)
+
+    @classmethod
+    def _get_cache(cls):
+        if cls._cache is None:
+            cls._cache = TLRUCache(
+                maxsize=getattr(settings, 'FIREBASE_USER_CACHE_SIZE', 10000),
+                ttu=cls._ttu
+            )
+        return cls._cache
+
+    @staticmethod
+    def key(environment, tenant_id, email):
+        digest = hashlib.sha256(email.strip().lower().encode()).hexdigest()
+        return (environment, tenant_id or '', digest)
+
+    @classmethod
+    def get(cls, environment, tenant_id, email):
+        """
+        Returns:
+            dict | None | MISS: Cached profile, None if the user is known not to exist,
+            or MISS when nothing (fresh) is cached
+        """
+        with cls._lock:
+            value = cls._get_cache().get(cls.key(environment, tenant_id, email), MISS)
+            if value is MISS:
+                cls.stats['misses'] += 1
+            elif value is None:
+                cls.stats['negative_hits'] += 1
+            else:
+                cls.stats['hits'] += 1
+            return value
+
+    @classmethod
+    def is_known_missing(cls, environment, tenant_id, email):
+        return cls.get(environment, tenant_id, email) is None
+
+    @classmethod
+    def set(cls, environment, tenant_id, email, profile):
+        """
+        Cache a profile dict, or None to record that the user does not exist
+        """
+        with cls._lock:
+            cls._get_cache()[cls.key(environment, tenant_id, email)] = profile
+
+    @classmethod
+    def invalidate(cls, environment, tenant_id, email):
+        with cls._lock:
+            cls._get_cache().pop(cls.key(environment, tenant_id, email), None)
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._cache = None
+            cls.stats = {'hits': 0, 'negative_hits': 0, 'misses': 0}
+
+
+class LookupCoalescer:
+    """
+    Coalesces concurrent cache-missing email lookups for the same tenant into
+    one bulk FirebaseService.get_users_by_email call.
+
+    The first caller of a window becomes the leader: it waits `window`
+    seconds for other requests to join, then resolves the whole batch and
+    hands each follower its result.
+    """
+
+    def __init__(self, window=0.005, max_batch=100):
+        self.window = window
+        self.max_batch = max_batch
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def get_user_by_email(self, email, tenant_id, environment='test'):
+        """
+        Cached user lookup; misses are batched with concurrent callers
+
+        Returns:
+            dict: User information (None if the user does not exist)
+        """
+        cached = UserLookupCache.get(environment, tenant_id, email)
+        if cached is not MISS:
+            return cached
+
+        group = (environment, tenant_id)
+        with self._lock:
+            batch = self._pending.get(group)
+            leader = batch is None or len(batch['emails']) >= self.max_batch
+            if leader:
+                batch = {'emails': {}, 'done': threading.Event(), 'results': None, 'error': None}
+                self._pending[group] = batch
+            batch['emails'].setdefault(email, None)
+
+        if not leader:
+            batch['done'].wait()
+            if batch['error'] is not None:
+                raise batch['error']
+            return batch['results'].get(email)
+
+        time.sleep(self.window)
+        with self._lock:
+            if self._pending.get(group) is batch:
+                del self._pending[group]
+
+        from .firebase_service import FirebaseService
+        try:
+            batch['results'] = FirebaseService.get_users_by_email(
+                list(batch['emails']), tenant_id, environment, use_cache=False
+            )
+        except Exception as e:
+            batch['error'] = e
+            raise
+        finally:
+            batch['done'].set()
+        return batch['results'].get(email)
+
+
+_coalescer = None
+
+
+def get_coalescer():
+    """
+    Process-wide LookupCoalescer configured from settings
+    """
+    global _coalescer
+    if _coalescer is None:
+        _coalescer = LookupCoalescer(
+            window=getattr(settings, 'FIREBASE_LOOKUP_BATCH_WINDOW_MS', 5) / 1000.0
+        )
+    return _coalescer
+
+
+def _reset_after_fork():
+    global _coalescer
+    UserLookupCache._lock = threading.Lock()
+    # Pending batches wait on the parent's threads
+    _coalescer = None
+
+
+lifecycle.register('user_lookup_cache', reset=_reset_after_fork)
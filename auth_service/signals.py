@@ -0,0 +1,24 @@
+"""
+Signal handlers for auth_service
+"""
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .models import Product
+from .services.product_registry import ProductRegistry
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+@receiver(post_save, sender=User)
+def reload_product_registry(sender, **kwargs):
+    """
+    Swap in a fresh product registry snapshot in this process once the change
+    is committed. Other workers pick it up on their next version poll.
+    """
+    transaction.on_commit(ProductRegistry.invalidate)
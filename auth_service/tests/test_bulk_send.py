@@ -0,0 +1,134 @@
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+from unittest import mock
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+
+from ..services.bulk_send import BulkSend
+from ..services.email_service import BrevoEmailService
+from .utils import EmailApiTestCase
+
+IN_FLIGHT = 8
+
+
+@override_settings(EMAIL_BULK_IN_FLIGHT=IN_FLIGHT, EMAIL_DIGEST_ENABLED=False, EMAIL_BATCHING_ENABLED=False)
+class BulkSendTests(EmailApiTestCase):
+    def _bulk(self, body, lines_read):
+        read = BulkSend.lines
+
+        def counted(body):
+            for line in read(body):
+                lines_read[0] += 1
+                yield line
+
+        with mock.patch.object(BulkSend, 'lines', staticmethod(counted)):
+            response = self.client.post('/api/email/bulk/?type=generic', body, content_type='application/x-ndjson',
+                                        secure=True, HTTP_AUTHORIZATION=self.auth)
+            self.assertEqual(response.status_code, 200)
+            # Results are checked as they stream, while the body is still being read
+            for chunk in response.streaming_content:
+                yield chunk
+
+    def test_100k_lines_stream_in_order_with_bounded_work_in_flight(self):
+        count = 100_000
+        sent = []
+        lock = threading.Lock()
+
+        def send_email(service, to_email, **kwargs):
+            with lock:
+                sent.append(to_email)
+            return {'success': True, 'message_id': f'<{to_email}>'}
+
+        body = b''.join(
+            json.dumps({'to_email': f'user{n}@example.com', 'subject': 'Hi', 'html_content': '<p>Hi</p>'}).encode()
+            + b'\n' for n in range(count)
+        )
+        lines_read = [0]
+        results = 0
+        outstanding = 0
+        # Not 100k lines of send logs
+        logging.disable(logging.INFO)
+        self.addCleanup(logging.disable, logging.NOTSET)
+        with mock.patch.object(BrevoEmailService, 'send_email', send_email):
+            for chunk in self._bulk(body, lines_read):
+                result = json.loads(chunk)
+                if result.get('done'):
+                    totals = result
+                    continue
+                results += 1
+                self.assertEqual(result['line'], results)
+                self.assertEqual(result['message_id'], f'<user{results - 1}@example.com>')
+                outstanding = max(outstanding, lines_read[0] - results)
+
+        self.assertEqual(totals['lines'], count)
+        self.assertEqual(totals['sent'], count)
+        self.assertEqual(len(sent), count)
+        self.assertEqual(len(set(sent)), count)
+        # Never more than 2 x EMAIL_BULK_IN_FLIGHT lines read ahead of their results
+        self.assertLessEqual(outstanding, 2 * IN_FLIGHT)
+
+    def test_bad_lines_get_their_own_result(self):
+        body = b'{"to_email": "a@example.com", "subject": "Hi", "html_content": "x"}\nnot json\n[1]\n\n'
+        with mock.patch.object(BrevoEmailService, 'send_email', return_value={'success': True, 'message_id': '<a>'}):
+            results = [json.loads(chunk) for chunk in self._bulk(body, [0])]
+
+        self.assertTrue(results[0]['success'])
+        self.assertIn('Invalid JSON', results[1]['errors']['line'][0])
+        self.assertEqual(results[2]['errors'], {'line': ['Expected a JSON object']})
+        self.assertEqual(results[3], {'lines': 3, 'sent': 1, 'scheduled': 0, 'pending': 0, 'failed': 0,
+                                      'invalid': 2, 'done': True})
+
+
+# A sandboxed product's test sends are captured (written) from the bulk send's pool threads
+POOLED_BULK_SCRIPT = """
+import django, json
+django.setup()
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connections
+from auth_service.db.pool import pool_stats
+from auth_service.models import Product
+from auth_service.services.bulk_send import BulkSend
+from auth_service.services.email_pipeline import get_email_type
+from auth_service.services.product_registry import ProductRegistry
+
+call_command('migrate', verbosity=0)
+user = User.objects.create(username='sandboxed_service')
+Product.objects.create(user=user, name='sandboxed', display_name='Sandboxed', test_tenant_id='t',
+                       prod_tenant_id='p', sandbox_test_sends=True)
+ProductRegistry.load()
+product = ProductRegistry.get_by_user_id(user.id)
+lines = [json.dumps({'to_email': f'user{n}@example.com', 'subject': 'Hi', 'html_content': '<p>Hi</p>',
+                     'environment': 'test'}).encode() + b'\\n' for n in range(4)]
+results = [json.loads(line) for line in BulkSend.stream(get_email_type('generic'), product, iter(lines))]
+connections.close_all()
+print(json.dumps({'results': results, 'pool': pool_stats()['default']}))
+"""
+
+
+class PooledBulkSendTests(SimpleTestCase):
+    def test_pool_threads_give_their_connections_back(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            proc = subprocess.run(
+                [sys.executable, '-c', POOLED_BULK_SCRIPT], cwd=settings.BASE_DIR, capture_output=True, text=True,
+                env=dict(
+                    os.environ,
+                    DJANGO_SETTINGS_MODULE='config.settings',
+                    DATABASE_URL=f'sqlite:///{os.path.join(tmpdir, "bulk.sqlite3")}',
+                    DATABASE_POOL='true',
+                    DATABASE_POOL_MAX_SIZE='4',
+                    EMAIL_CHECK_DELIVERABILITY='false',
+                    LOG_LEVEL='ERROR',
+                ),
+            )
+        self.assertEqual(proc.returncode, 0, proc.stderr[-2000:])
+        report = json.loads(proc.stdout.strip().splitlines()[-1])
+
+        self.assertEqual(report['results'][-1]['sent'], 4)
+        self.assertTrue(all(result.get('captured_id') for result in report['results'][:-1]))
+        self.assertEqual(report['pool']['in_use'], 0)
@@ -0,0 +1,151 @@
+from django.core.management import call_command
+from django.test import SimpleTestCase
+import io
+import itertools
+import threading
+import time
+
+from ..db.pool import ConnectionPool, PooledDatabaseWrapperMixin, PoolTimeout
+
+
+class FakeConnection:
+    _ids = itertools.count(1)
+
+    def __init__(self):
+        self.id = next(self._ids)
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def test_stress_stays_within_max_size(self):
+        pool = ConnectionPool('stress', min_size=1, max_size=4, timeout=10)
+        in_use = set()
+        peak = [0]
+        errors = []
+        lock = threading.Lock()
+
+        def worker():
+            for _ in range(100):
+                try:
+                    connection = pool.acquire(FakeConnection)
+                    with lock:
+                        self.assertNotIn(connection.id, in_use)
+                        in_use.add(connection.id)
+                        peak[0] = max(peak[0], len(in_use))
+                    time.sleep(0.0005)
+                    with lock:
+                        in_use.discard(connection.id)
+                    pool.release(connection)
+                except Exception as e:
+                    errors.append(e)
+
+        threads = [threading.Thread(target=worker) for _ in range(32)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats = pool.stats()
+        self.assertEqual(errors, [])
+        self.assertLessEqual(peak[0], 4)
+        self.assertLessEqual(stats['peak_size'], 4)
+        self.assertLessEqual(stats['created'], 4)
+        self.assertEqual(stats['acquired'], 3200)
+        self.assertEqual(stats['timeouts'], 0)
+        self.assertEqual(stats['in_use'], 0)
+
+    def test_times_out_when_exhausted(self):
+        pool = ConnectionPool('exhausted', max_size=1, timeout=0.05)
+        held = pool.acquire(FakeConnection)
+        with self.assertRaises(PoolTimeout):
+            pool.acquire(FakeConnection)
+        pool.release(held)
+        self.assertIs(pool.acquire(FakeConnection), held)
+        self.assertEqual(pool.stats()['timeouts'], 1)
+
+    def test_waiters_are_served_in_arrival_order(self):
+        pool = ConnectionPool('fifo', max_size=1, timeout=5)
+        held = pool.acquire(FakeConnection)
+        served = []
+
+        def waiter(n):
+            connection = pool.acquire(FakeConnection)
+            served.append(n)
+            pool.release(connection)
+
+        threads = []
+        for n in range(5):
+            thread = threading.Thread(target=waiter, args=(n,))
+            thread.start()
+            threads.append(thread)
+            # Each waiter queued before the next arrives
+            while len(pool._waiters) < n + 1:
+                time.sleep(0.001)
+        pool.release(held)
+        for thread in threads:
+            thread.join()
+        self.assertEqual(served, [0, 1, 2, 3, 4])
+
+    def test_discarded_connection_frees_its_slot(self):
+        pool = ConnectionPool('discard', max_size=1, timeout=0.05)
+        broken = pool.acquire(FakeConnection)
+        pool.release(broken, discard=True)
+        self.assertTrue(broken.closed)
+        fresh = pool.acquire(FakeConnection)
+        self.assertIsNot(fresh, broken)
+        self.assertEqual(pool.stats()['size'], 1)
+
+    def test_connections_are_not_shared_across_fork(self):
+        pool = ConnectionPool('fork', max_size=2)
+        inherited = pool.acquire(FakeConnection)
+        pool.release(inherited)
+        # As seen from a forked child
+        pool._pid = -1
+        self.assertIsNot(pool.acquire(FakeConnection), inherited)
+        self.assertFalse(inherited.closed)
+
+
+class MinimalWrapper(PooledDatabaseWrapperMixin):
+    """
+    Just what the mixin needs from a backend that keeps the default reuse check
+    """
+
+    def __init__(self, pool):
+        self._pool = pool
+        self.connection = pool.acquire(FakeConnection)
+        self.errors_occurred = False
+        self.in_atomic_block = False
+
+    @property
+    def pool(self):
+        return self._pool
+
+
+class PooledDatabaseWrapperTests(SimpleTestCase):
+    def test_default_reuse_check_returns_idle_connections(self):
+        pool = ConnectionPool('default-check', max_size=2)
+        wrapper = MinimalWrapper(pool)
+        wrapper._close()
+
+        self.assertFalse(wrapper.connection.closed)
+        self.assertEqual(pool.stats()['idle'], 1)
+
+    def test_default_reuse_check_discards_connections_inside_atomic_blocks(self):
+        pool = ConnectionPool('default-check-atomic', max_size=2)
+        wrapper = MinimalWrapper(pool)
+        wrapper.in_atomic_block = True
+        wrapper._close()
+
+        self.assertTrue(wrapper.connection.closed)
+        self.assertEqual(pool.stats()['size'], 0)
+
+
+class PooledBackendStressTests(SimpleTestCase):
+    def test_pooled_sqlite_backend_under_load(self):
+        out = io.StringIO()
+        # Raises CommandError if the pool exceeds max_size or a request fails
+        call_command('db_pool_stress', threads=16, requests=20, max_size=3, hold_ms=1, stdout=out)
+        self.assertIn('bound 3', out.getvalue())
@@ -0,0 +1,125 @@
+from django.test import SimpleTestCase, override_settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from unittest import mock
+import base64
+import hashlib
+import json
+import tracemalloc
+
+from ..services.email_attachments import AttachmentUploadHandler, JsonAttachmentBody
+from ..services.email_service import BrevoEmailService
+from ..services.smtp_transport import build_message
+from .utils import EmailApiTestCase
+
+SIZE = 24 * 1024 * 1024
+CHUNK = 64 * 1024
+# Python allocations allowed per request (a few encoding windows), whatever the attachment size
+BUDGET = 4 * 1024 * 1024
+PDF = b'%PDF-1.4\n'
+
+
+def pdf_chunks():
+    yield PDF + b'\0' * (CHUNK - len(PDF))
+    for _ in range(SIZE // CHUNK - 1):
+        yield b'\x8f' * CHUNK
+
+
+class Peak:
+    """
+    Peak Python memory allocated inside the block, in bytes
+    """
+
+    def __enter__(self):
+        tracemalloc.start()
+        self.start = tracemalloc.get_traced_memory()[0]
+        return self
+
+    def __exit__(self, *exc):
+        self.bytes = tracemalloc.get_traced_memory()[1] - self.start
+        tracemalloc.stop()
+
+
+@override_settings(EMAIL_ATTACHMENT_MAX_BYTES=SIZE, EMAIL_ATTACHMENT_MAX_TOTAL_BYTES=SIZE)
+class BoundedMemoryTests(SimpleTestCase):
+    def _upload(self):
+        handler = AttachmentUploadHandler()
+        handler.new_file('attachments', 'report.pdf', 'application/pdf', SIZE)
+        start = 0
+        for chunk in pdf_chunks():
+            handler.receive_data_chunk(chunk, start)
+            start += len(chunk)
+        upload = handler.file_complete(start)
+        self.addCleanup(upload.close)
+        return upload
+
+    def test_upload_is_spooled_to_disk_as_it_arrives(self):
+        with Peak() as peak:
+            upload = self._upload()
+
+        self.assertIsNone(upload.error)
+        self.assertTrue(upload.on_disk)
+        self.assertEqual(upload.size, SIZE)
+        self.assertLess(peak.bytes, BUDGET)
+
+    def test_api_body_encodes_while_it_is_read(self):
+        upload = self._upload()
+        digest = hashlib.sha256()
+
+        with Peak() as peak:
+            body = JsonAttachmentBody({'subject': 'Report'}, [upload])
+            read = 0
+            for data in iter(lambda: body.read(CHUNK), b''):
+                read += len(data)
+                digest.update(data)
+
+        self.assertEqual(read, len(body))
+        self.assertLess(peak.bytes, BUDGET)
+        expected = json.dumps({'subject': 'Report', 'attachment': [
+            {'name': 'report.pdf', 'content': base64.b64encode(b''.join(pdf_chunks())).decode()}
+        ]}).encode()
+        self.assertEqual(digest.hexdigest(), hashlib.sha256(expected).hexdigest())
+
+    def test_smtp_message_encodes_while_it_is_written(self):
+        upload = self._upload()
+        sender = {'name': 'Beta Health', 'email': 'noreply@example.com'}
+
+        with Peak() as peak:
+            _, parts = build_message(sender, 'a@example.com', 'Report', '<p>Report</p>', attachments=[upload])
+            written = 0
+            for part in parts:
+                for data in ([part] if isinstance(part, bytes) else part):
+                    written += len(data)
+
+        # The whole file, base64-encoded, went through
+        self.assertGreater(written, SIZE * 4 // 3)
+        self.assertLess(peak.bytes, BUDGET)
+
+
+class AttachmentEndpointTests(EmailApiTestCase):
+    def _post(self, *files):
+        return self.client.post('/api/email/generic/', {
+            'to_email': 'a@example.com', 'subject': 'Report', 'html_content': '<p>Report</p>',
+            'attachments': list(files),
+        }, secure=True, HTTP_AUTHORIZATION=self.auth)
+
+    def test_attachment_is_sent_with_the_email(self):
+        sent = {}
+
+        def send_email(service, to_email, **kwargs):
+            sent['names'] = [upload.name for upload in kwargs['attachments']]
+            return {'success': True, 'message_id': '<a>'}
+
+        with mock.patch.object(BrevoEmailService, 'send_email', send_email):
+            response = self._post(SimpleUploadedFile('report.pdf', PDF + b'body', 'application/pdf'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sent['names'], ['report.pdf'])
+
+    def test_disguised_file_is_refused(self):
+        with mock.patch.object(BrevoEmailService, 'send_email') as send_email:
+            response = self._post(SimpleUploadedFile('report.pdf', b'MZ\x90\x00', 'application/pdf'))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('report.pdf: content is not application/pdf', json.dumps(response.json()))
+        send_email.assert_not_called()
+
@@ -0,0 +1,71 @@
+from django.test import SimpleTestCase, override_settings
+from types import SimpleNamespace
+from unittest import mock
+import threading
+import time
+
+from ..services.email_batcher import MicroBatcher
+from ..services.email_service import BrevoEmailService
+
+KEY = ('OCM', 'noreply@example.com', None, '<p>Hi</p>', None)
+
+
+def items(count):
+    return [{'to_email': f'user{n}@example.com', 'subject': 'Hi', 'params': None, 'reply_to': None}
+            for n in range(count)]
+
+
+@override_settings(EMAIL_BATCHING_ENABLED=False, BREVO_TRANSPORT='api')
+class SendBatchTests(SimpleTestCase):
+    def _send_batch(self, count, message_id=None, message_ids=None):
+        service = BrevoEmailService()
+        service.api_instance = mock.Mock()
+        service.api_instance.send_transac_email.return_value = SimpleNamespace(
+            message_id=message_id, message_ids=message_ids
+        )
+        return service._send_batch(KEY, items(count))
+
+    def test_one_message_id_per_recipient(self):
+        results = self._send_batch(3, message_ids=['<a>', '<b>', '<c>'])
+        self.assertEqual([r['message_id'] for r in results], ['<a>', '<b>', '<c>'])
+        self.assertTrue(all(r['success'] for r in results))
+
+    def test_single_message_id_is_not_copied_to_every_recipient(self):
+        results = self._send_batch(3, message_id='<a>')
+        self.assertTrue(all(r['success'] for r in results))
+        self.assertEqual([r['message_id'] for r in results], [None, None, None])
+
+    def test_mismatched_message_ids_are_reported_unknown(self):
+        results = self._send_batch(3, message_ids=['<a>', '<b>'])
+        self.assertEqual([r['message_id'] for r in results], [None, None, None])
+
+
+class MicroBatcherTests(SimpleTestCase):
+    def test_concurrent_sends_share_a_call_and_keep_their_own_results(self):
+        calls = []
+
+        def send_batch(key, batch):
+            calls.append(len(batch))
+            return [{'success': True, 'message_id': f"<{item['to_email']}>"} for item in batch]
+
+        batcher = MicroBatcher(send_batch, window_ms=50, max_size=10)
+        # Overlapping sends of this key recently: the next ones open a batch
+        batcher._recent['k'] = time.monotonic()
+        results = {}
+
+        def send(n):
+            results[n] = batcher.submit('k', {'to_email': f'user{n}'}, lambda: {'success': True, 'message_id': 'direct'})
+
+        threads = [threading.Thread(target=send, args=(n,)) for n in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(calls, [5])
+        self.assertEqual({n: r['message_id'] for n, r in results.items()}, {n: f'<user{n}>' for n in range(5)})
+
+    def test_lone_send_goes_out_directly(self):
+        batcher = MicroBatcher(lambda key, batch: self.fail('batched'), window_ms=50)
+        result = batcher.submit('k', {}, lambda: {'success': True, 'message_id': '<1>'})
+        self.assertEqual(result['message_id'], '<1>')
@@ -0,0 +1,47 @@
+from django.test import override_settings
+from unittest import mock
+
+from ..models import DigestItem
+from ..services.email_digest import EmailDigest
+from ..services.email_service import BrevoEmailService
+from .utils import EmailApiTestCase, create_product
+
+EMAIL = {'to_email': 'a@example.com', 'subject': 'New comment', 'html_content': '<p>New comment</p>'}
+
+
+class DigestTests(EmailApiTestCase):
+    def setUp(self):
+        self.product, self.token = create_product(digest_window_seconds=60)
+        self.auth = f'Token {self.token.key}'
+        self.addCleanup(EmailDigest._windows.clear)
+        self.addCleanup(EmailDigest._deadlines.clear)
+
+    def _post(self):
+        with mock.patch.object(BrevoEmailService, 'send_email',
+                               return_value={'success': True, 'message_id': '<a>'}) as send_email:
+            response = self.post('/api/email/generic/', EMAIL)
+        return response, send_email
+
+    def test_sent_right_away_when_digests_are_off(self):
+        response, send_email = self._post()
+
+        self.assertEqual(response.status_code, 200)
+        send_email.assert_called_once()
+        self.assertFalse(DigestItem.objects.exists())
+
+    @override_settings(EMAIL_DIGEST_ENABLED=True)
+    def test_sent_right_away_without_a_digest_timer(self):
+        response, send_email = self._post()
+
+        self.assertEqual(response.status_code, 200)
+        send_email.assert_called_once()
+
+    @override_settings(EMAIL_DIGEST_ENABLED=True)
+    def test_held_for_the_digest_when_enabled(self):
+        with mock.patch.object(EmailDigest, 'running', return_value=True):
+            response, send_email = self._post()
+
+        self.assertEqual(response.status_code, 202)
+        self.assertTrue(response.json()['data']['digested'])
+        send_email.assert_not_called()
+        self.assertEqual(DigestItem.objects.get().recipient, 'a@example.com')
@@ -0,0 +1,103 @@
+from django.db import DataError
+from django.test import SimpleTestCase, TestCase, override_settings
+from unittest import mock
+import json
+
+from ..management.commands.brevo_webhook_load_test import Command as WebhookLoadTest
+from ..models import EmailEvent
+from ..services.email_events import EmailEvents, RingBuffer
+
+TOKEN = 'webhook-test'
+
+
+# The test writes the buffer itself: the writer thread never wakes during a test
+@override_settings(BREVO_WEBHOOK_TOKEN=TOKEN, EMAIL_EVENTS_BUFFER_SIZE=2000, EMAIL_EVENTS_FLUSH_SIZE=10 ** 6,
+                   EMAIL_EVENTS_FLUSH_INTERVAL=3600, RATELIMIT_ENABLE=False)
+class WebhookStormTests(TestCase):
+    def setUp(self):
+        EmailEvents.close()
+        self.addCleanup(EmailEvents.close)
+
+    def _post(self, body):
+        return self.client.post('/api/webhooks/brevo/', json.dumps(body), content_type='application/json',
+                                secure=True, HTTP_AUTHORIZATION=f'Bearer {TOKEN}')
+
+    def test_storm_is_stored_once_per_event(self):
+        distinct = 50_000
+        storm = WebhookLoadTest._storm({'events': distinct, 'redelivered': 0.02, 'single_share': 0.3,
+                                        'max_batch': 50})
+        busy = 0
+        for batch in storm:
+            response = self._post(batch[0] if len(batch) == 1 else batch)
+            if response.status_code == 503:
+                # Buffer full: Brevo retries later, by which time the writer has caught up
+                busy += 1
+                self.assertEqual(response['Retry-After'], '5')
+                EmailEvents.flush()
+                response = self._post(batch[0] if len(batch) == 1 else batch)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['accepted'], len(batch))
+        EmailEvents.flush()
+
+        self.assertGreater(busy, 0)
+        self.assertEqual(EmailEvent.objects.count(), distinct)
+        self.assertEqual(EmailEvents.snapshot()['waiting'], 0)
+
+    def test_invalid_events_are_counted_not_refused(self):
+        response = self._post([{'event': 'delivered', 'message-id': '<a@x>', 'ts_event': 1},
+                               {'event': 'delivered'}, 'junk'])
+        EmailEvents.flush()
+
+        self.assertEqual(response.json(), {'success': True, 'accepted': 1, 'invalid': 2})
+        self.assertEqual(EmailEvent.objects.get().message_id, '<a@x>')
+
+    def test_request_larger_than_the_buffer_is_refused_with_413(self):
+        events = [{'event': 'delivered', 'message-id': f'<{n}@x>', 'ts_event': 1} for n in range(2001)]
+        response = self._post(events)
+
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(EmailEvents.snapshot()['waiting'], 0)
+
+    @override_settings(EMAIL_EVENTS_MAX_RETRIES=2)
+    def test_event_the_database_refuses_is_dropped_not_retried_forever(self):
+        write = EmailEvents._write.__func__
+
+        def refuse_nul(cls, rows):
+            # What PostgreSQL does with a NUL character in a text column
+            if any('\x00' in row[0] for row in rows):
+                raise DataError('invalid byte sequence for encoding "UTF8": 0x00')
+            write(cls, rows)
+
+        events = [{'event': 'delivered', 'message-id': f'<{n}@x>', 'ts_event': 1} for n in range(8)]
+        events[5]['message-id'] = '<5\x00@x>'
+        self._post(events)
+        with mock.patch.object(EmailEvents, '_write', classmethod(refuse_nul)), \
+                self.assertLogs('auth_service.services.email_events', 'ERROR') as logs:
+            flushes = 0
+            while EmailEvents.snapshot()['waiting'] and flushes < 20:
+                EmailEvents.flush()
+                flushes += 1
+            # Then newer events are written again
+            self._post([{'event': 'opened', 'message-id': '<0@x>', 'ts_event': 2}])
+            EmailEvents.flush()
+
+        self.assertEqual(EmailEvent.objects.count(), 8)
+        self.assertNotIn('<5\x00@x>', set(EmailEvent.objects.values_list('message_id', flat=True)))
+        self.assertEqual(EmailEvents.snapshot()['dropped'], 1)
+        self.assertIn('Dropping email event delivered for <5\x00@x>', logs.output[-1])
+
+    def test_wrong_token_is_refused(self):
+        response = self.client.post('/api/webhooks/brevo/', '{}', content_type='application/json',
+                                    secure=True, HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(response.status_code, 401)
+
+
+class RingBufferTests(SimpleTestCase):
+    def test_wraps_around_and_refuses_what_does_not_fit(self):
+        buffer = RingBuffer(4)
+        self.assertTrue(buffer.extend([1, 2, 3]))
+        self.assertEqual(buffer.drain(2), [1, 2])
+        self.assertTrue(buffer.extend([4, 5, 6]))
+        self.assertFalse(buffer.extend([7]))
+        self.assertEqual(buffer.drain(10), [3, 4, 5, 6])
+        self.assertEqual(len(buffer), 0)
@@ -0,0 +1,75 @@
+from django.test import SimpleTestCase, override_settings
+import threading
+import time
+
+from ..services.email_lanes import DEFAULT_LANE, LaneSaturated, LaneScheduler, LaneSpec, get_scheduler
+
+
+def scheduler(capacity=2, product_limit=0):
+    return LaneScheduler([
+        LaneSpec('auth', weight=8, limit=2, waiters=10, backlog=10),
+        LaneSpec(DEFAULT_LANE, weight=4, limit=2, waiters=10, backlog=10),
+        LaneSpec('bulk', weight=1, limit=1, waiters=1, backlog=10),
+    ], capacity=capacity, product_limit=product_limit)
+
+
+class LaneSchedulerTests(SimpleTestCase):
+    def test_off_by_default(self):
+        self.assertIsNone(get_scheduler())
+        with override_settings(EMAIL_LANES_ENABLED=True):
+            self.assertIsNotNone(get_scheduler())
+
+    def test_lane_limit_caps_concurrent_sends(self):
+        lanes = scheduler(capacity=4)
+        running, peak = [0], [0]
+        lock = threading.Lock()
+
+        def send():
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+
+        threads = [threading.Thread(target=lanes.run, args=(DEFAULT_LANE, f'p{n % 3}', send, 5)) for n in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(peak[0], 2)
+
+    def test_full_waiting_room_is_rejected(self):
+        lanes = scheduler(capacity=1)
+        release = threading.Event()
+        holder = threading.Thread(target=lanes.run, args=('bulk', 'p', release.wait, 5))
+        holder.start()
+        time.sleep(0.02)
+        waiter = threading.Thread(target=lanes.run, args=('bulk', 'p', lambda: None, 5))
+        waiter.start()
+        time.sleep(0.02)
+        with self.assertRaises(LaneSaturated) as raised:
+            lanes.run('bulk', 'p', lambda: None, 5)
+        self.assertEqual(raised.exception.lane, 'bulk')
+        release.set()
+        holder.join()
+        waiter.join()
+
+    def test_auth_sends_overtake_queued_bulk_sends(self):
+        lanes = scheduler(capacity=1)
+        release = threading.Event()
+        order = []
+        holder = threading.Thread(target=lanes.run, args=(DEFAULT_LANE, 'p', release.wait, 5))
+        holder.start()
+        time.sleep(0.02)
+        waiters = [
+            threading.Thread(target=lanes.run, args=('bulk', 'p', lambda: order.append('bulk'), 5)),
+            threading.Thread(target=lanes.run, args=('auth', 'p', lambda: order.append('auth'), 5)),
+        ]
+        for thread in waiters:
+            thread.start()
+            time.sleep(0.02)
+        release.set()
+        for thread in [holder] + waiters:
+            thread.join()
+        self.assertEqual(order, ['auth', 'bulk'])
@@ -0,0 +1,111 @@
+from django.test import SimpleTestCase, override_settings
+from types import SimpleNamespace
+from unittest import mock
+import smtplib
+import socket
+import time
+
+from ..services import email_providers
+from ..services.email_providers import EmailRouter
+from ..services.email_service import BrevoEmailService
+from ..services.smtp_transport import SmtpPool
+
+MESSAGE = {'to_email': 'a@example.com', 'subject': 'Reset', 'html_content': '<p>Reset</p>'}
+
+
+class FakeProvider:
+    def __init__(self, name, latency=0, unreachable=False, fails=False):
+        self.name = name
+        self.latency = latency
+        self.unreachable = unreachable
+        self.fails = fails
+        self.calls = []
+
+    def send(self, message, connect_timeout=None):
+        self.calls.append(connect_timeout)
+        if self.unreachable and connect_timeout is not None:
+            return {'success': False, 'error': 'connect timed out'}
+        time.sleep(self.latency)
+        if self.fails:
+            return {'success': False, 'error': 'HTTP 503'}
+        return {'success': True, 'message_id': f'<{self.name}>'}
+
+
+@override_settings(EMAIL_PROVIDERS=['first', 'second'], EMAIL_ROUTER_HEDGE_MS=50)
+class EmailRouterTests(SimpleTestCase):
+    def _router(self, first, second):
+        EmailRouter.reset()
+        self.addCleanup(EmailRouter.reset)
+        providers = {'first': lambda: first, 'second': lambda: second}
+        patcher = mock.patch.dict(email_providers.PROVIDERS, providers)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_slow_but_connected_provider_is_not_raced(self):
+        first, second = FakeProvider('first', latency=0.3), FakeProvider('second')
+        self._router(first, second)
+
+        result = EmailRouter.send(MESSAGE, hedge=True)
+
+        self.assertEqual(result['provider'], 'first')
+        self.assertNotIn('hedged', result)
+        self.assertEqual(first.calls, [0.05])
+        self.assertEqual(second.calls, [])
+
+    def test_hedge_moves_on_when_the_first_provider_cannot_connect(self):
+        first, second = FakeProvider('first', unreachable=True), FakeProvider('second')
+        self._router(first, second)
+
+        result = EmailRouter.send(MESSAGE, hedge=True)
+
+        self.assertEqual(result['provider'], 'second')
+        self.assertTrue(result['hedged'])
+        self.assertEqual(second.calls, [None])
+        self.assertEqual(EmailRouter.stats()['second']['hedged'], 1)
+
+    def test_unhedged_send_waits_for_the_first_provider(self):
+        first, second = FakeProvider('first', unreachable=True), FakeProvider('second')
+        self._router(first, second)
+
+        result = EmailRouter.send(MESSAGE)
+
+        self.assertEqual(result['provider'], 'first')
+        self.assertEqual(first.calls, [None])
+
+    def test_failure_fails_over_once(self):
+        first, second = FakeProvider('first', fails=True), FakeProvider('second')
+        self._router(first, second)
+
+        result = EmailRouter.send(MESSAGE)
+
+        self.assertEqual(result['provider'], 'second')
+        self.assertEqual((len(first.calls), len(second.calls)), (1, 1))
+
+
+class ConnectTimeoutTests(SimpleTestCase):
+    def test_smtp_connect_timeout_bounds_a_silent_relay(self):
+        # Accepts TCP connections but never sends the SMTP greeting
+        server = socket.socket()
+        server.bind(('127.0.0.1', 0))
+        server.listen(8)
+        self.addCleanup(server.close)
+        pool = SmtpPool('127.0.0.1', server.getsockname()[1], timeout=10)
+
+        started = time.monotonic()
+        with self.assertRaises((OSError, smtplib.SMTPException)):
+            pool.send('noreply@example.com', ['a@example.com'], [b'Subject: x\r\n\r\nx\r\n'], connect_timeout=0.2)
+        self.assertLess(time.monotonic() - started, 2)
+
+    @override_settings(EMAIL_BATCHING_ENABLED=True, BREVO_TRANSPORT='api')
+    def test_brevo_connect_timeout_is_sent_alone_with_a_connect_timeout(self):
+        service = BrevoEmailService()
+        service.api_instance = mock.Mock()
+        service.api_instance.send_transac_email.return_value = SimpleNamespace(message_id='<a>')
+
+        with mock.patch.object(service.batcher, 'submit') as submit:
+            result = service.send_email('a@example.com', 'Reset', '<p>Reset</p>', connect_timeout=1.5)
+
+        submit.assert_not_called()
+        self.assertEqual(result, {'success': True, 'message_id': '<a>'})
+        _, kwargs = service.api_instance.send_transac_email.call_args
+        self.assertEqual(kwargs['_request_timeout'], (1.5, None))
@@ -0,0 +1,89 @@
+from django.test import TestCase, override_settings
+from unittest import mock
+
+from ..models import CapturedEmail
+from ..services.email_sandbox import EmailSandbox
+from ..services.email_service import BrevoEmailService
+from ..services.hubspot_service import HubSpotService
+from .utils import EmailApiTestCase, create_product
+
+
+def capture(product_name, count, **fields):
+    return [
+        CapturedEmail.objects.create(product_name=product_name, email_type='generic', message_id=f'<{n}>',
+                                     to_email=f'user{n}@example.com', subject=f'Hi {n}', **fields).pk
+        for n in range(count)
+    ]
+
+
+class SandboxSendTests(EmailApiTestCase):
+    def setUp(self):
+        self.product, self.token = create_product(sandbox_test_sends=True)
+        self.auth = f'Token {self.token.key}'
+
+    def _welcome(self, environment):
+        with mock.patch.object(BrevoEmailService, 'send_email',
+                               return_value={'success': True, 'message_id': '<brevo>'}) as send_email, \
+                mock.patch.object(HubSpotService, 'create_or_update_contact',
+                                  return_value={'success': True}) as hubspot:
+            response = self.post('/api/email/welcome/', {'email': 'a@example.com', 'environment': environment})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response, send_email, hubspot
+
+    def test_test_send_is_captured_not_sent(self):
+        response, send_email, hubspot = self._welcome('test')
+
+        send_email.assert_not_called()
+        hubspot.assert_not_called()
+        captured = CapturedEmail.objects.get()
+        self.assertEqual((captured.product_name, captured.email_type, captured.to_email),
+                         ('beta_health', 'welcome', 'a@example.com'))
+        self.assertIn('Welcome', captured.subject)
+        self.assertTrue(response.json()['data']['message_id'].startswith('<sandbox-'))
+
+    def test_prod_send_is_unaffected(self):
+        response, send_email, hubspot = self._welcome('prod')
+
+        send_email.assert_called_once()
+        hubspot.assert_called_once()
+        self.assertFalse(CapturedEmail.objects.exists())
+        self.assertEqual(response.json()['data']['message_id'], '<brevo>')
+
+
+class SandboxPruneTests(TestCase):
+    @override_settings(EMAIL_SANDBOX_MAX_PER_PRODUCT=3)
+    def test_prune_keeps_the_newest_per_product(self):
+        pks = capture('beta_health', 5)
+        others = capture('ehr', 2)
+
+        self.assertEqual(EmailSandbox.prune('beta_health'), 2)
+        self.assertEqual(sorted(CapturedEmail.objects.filter(product_name='beta_health').values_list('pk', flat=True)),
+                         pks[2:])
+        self.assertEqual(CapturedEmail.objects.filter(product_name='ehr').count(), len(others))
+        self.assertEqual(EmailSandbox.prune('beta_health'), 0)
+
+
+class SandboxApiTests(EmailApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.own = capture('beta_health', 2)
+        self.other = capture('ehr', 2)
+        create_product('ehr')
+
+    def test_list_holds_only_the_products_captures(self):
+        response = self.get('/api/sandbox/emails/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([email['id'] for email in response.json()['emails']], self.own[::-1])
+
+    def test_other_products_capture_is_not_found(self):
+        self.assertEqual(self.get(f'/api/sandbox/emails/{self.own[0]}/').status_code, 200)
+        for pk in self.other:
+            self.assertEqual(self.get(f'/api/sandbox/emails/{pk}/').status_code, 404)
+            self.assertEqual(self.get(f'/api/sandbox/emails/{pk}/html/').status_code, 404)
+
+    def test_clearing_leaves_other_products_alone(self):
+        response = self.client.delete('/api/sandbox/emails/', secure=True, HTTP_AUTHORIZATION=self.auth)
+
+        self.assertEqual(response.json()['deleted'], 2)
+        self.assertEqual(set(CapturedEmail.objects.values_list('pk', flat=True)), set(self.other))
@@ -0,0 +1,80 @@
+from datetime import timedelta
+from django.test import SimpleTestCase, override_settings
+from django.utils import timezone
+from unittest import mock
+import json
+
+from ..models import ScheduledEmail
+from ..services.email_scheduler import EmailScheduler, TimingWheel
+from ..services.email_service import BrevoEmailService
+from .utils import EmailApiTestCase
+
+
+def email(send_at):
+    return {'to_email': 'a@example.com', 'subject': 'Hi', 'html_content': '<p>Hi</p>',
+            'send_at': send_at.isoformat(), 'digest': False}
+
+
+class ScheduledSendTests(EmailApiTestCase):
+    def test_send_at_refused_when_scheduling_is_off(self):
+        response = self.post('/api/email/generic/', email(timezone.now() + timedelta(hours=1)))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('send_at', response.json()['errors'])
+        self.assertFalse(ScheduledEmail.objects.exists())
+
+    @override_settings(EMAIL_SCHEDULE_ENABLED=True)
+    def test_send_at_refused_when_no_scheduler_runs(self):
+        # runserver, Vercel: enabled, but nothing would ever send the stored row
+        response = self.post('/api/email/generic/', email(timezone.now() + timedelta(hours=1)))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ScheduledEmail.objects.exists())
+
+    @override_settings(EMAIL_SCHEDULE_ENABLED=True)
+    def test_send_at_accepted_with_a_running_scheduler(self):
+        with mock.patch.object(EmailScheduler, 'running', return_value=True):
+            response = self.post('/api/email/generic/', email(timezone.now() + timedelta(days=1)))
+
+        self.assertEqual(response.status_code, 202)
+        self.assertTrue(response.json()['data']['scheduled'])
+        self.assertEqual(ScheduledEmail.objects.get().payload['to_email'], 'a@example.com')
+
+    def test_send_at_now_is_sent_straight_away(self):
+        with mock.patch.object(BrevoEmailService, 'send_email',
+                               return_value={'success': True, 'message_id': '<a>'}) as send_email:
+            response = self.post('/api/email/generic/', email(timezone.now()))
+
+        self.assertEqual(response.status_code, 200)
+        send_email.assert_called_once()
+
+    def test_bulk_line_with_send_at_is_refused_when_scheduling_is_off(self):
+        line = json.dumps(email(timezone.now() + timedelta(hours=1))).encode() + b'\n'
+        response = self.client.post('/api/email/bulk/?type=generic', line, content_type='application/x-ndjson',
+                                    secure=True, HTTP_AUTHORIZATION=self.auth)
+        results = [json.loads(chunk) for chunk in response.streaming_content]
+
+        self.assertIn('send_at', results[0]['errors'])
+        self.assertEqual(results[-1]['invalid'], 1)
+        self.assertFalse(ScheduledEmail.objects.exists())
+
+
+class TimingWheelTests(SimpleTestCase):
+    def test_entries_expire_in_order_across_levels(self):
+        wheel = TimingWheel(tick=1, slots=4, levels=3, now=0)
+        for due in (50, 3, 17, 1):
+            wheel.add(due, due)
+
+        expired = []
+        for now in range(1, 64):
+            for item in wheel.advance(now):
+                self.assertEqual(item, now)
+                expired.append(item)
+
+        self.assertEqual(expired, [1, 3, 17, 50])
+        self.assertEqual(len(wheel), 0)
+
+    def test_entry_beyond_the_span_is_refused(self):
+        wheel = TimingWheel(tick=1, slots=4, levels=2, now=0)
+        with self.assertRaises(ValueError):
+            wheel.add(16, 'late')
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management import call_command
+from django.test import SimpleTestCase
+import io
+import json
+import os
+import subprocess
+import sys
+
+
+class ImportBudgetTests(SimpleTestCase):
+    def test_wsgi_import_within_budget(self):
+        out = io.StringIO()
+        # Raises CommandError over IMPORT_TIME_BUDGET_MS or when a deferred SDK is imported
+        call_command('import_profile', check=True, runs=3, stdout=out)
+        self.assertIn('within budget', out.getvalue())
+
+    def test_heavy_sdks_are_not_imported_at_load(self):
+        script = (
+            'import sys, json\n'
+            'import config.wsgi\n'
+            f'print(json.dumps([m for m in {list(settings.IMPORT_DEFERRED_MODULES)!r} if m in sys.modules]))\n'
+        )
+        proc = subprocess.run(
+            [sys.executable, '-c', script], cwd=settings.BASE_DIR, capture_output=True, text=True,
+            env=dict(os.environ, DJANGO_SETTINGS_MODULE='config.settings', WARMUP_ON_STARTUP='false'),
+        )
+        self.assertEqual(proc.returncode, 0, proc.stderr[-2000:])
+        self.assertEqual(json.loads(proc.stdout.strip().splitlines()[-1]), [])
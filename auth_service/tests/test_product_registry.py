@@ -0,0 +1,82 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework import exceptions
+from rest_framework.authtoken.models import Token
+from unittest import mock
+
+from ..authentication import ProductTokenAuthentication
+from ..services.email_types import dashboard_link
+from ..services.product_registry import ProductRegistry
+from ..utils.email_templates import EmailTemplateRenderer
+from .utils import create_product
+
+
+class ProductTokenAuthenticationTests(TestCase):
+    def setUp(self):
+        self.product, self.token = create_product()
+        self.auth = ProductTokenAuthentication()
+
+    def _poll(self):
+        # The next lookup re-checks the database version, as after PRODUCT_REGISTRY_POLL_INTERVAL
+        ProductRegistry._next_poll = 0.0
+
+    def test_known_token_needs_no_query(self):
+        with self.assertNumQueries(0):
+            user, key = self.auth.authenticate_credentials(self.token.key)
+        self.assertEqual(user.pk, self.product.user_id)
+        self.assertEqual(key, self.token.key)
+
+    def test_each_request_gets_its_own_user(self):
+        first, _ = self.auth.authenticate_credentials(self.token.key)
+        second, _ = self.auth.authenticate_credentials(self.token.key)
+        self.assertIsNot(first, second)
+        first.username = 'changed'
+        self.assertEqual(second.username, 'beta_health_service')
+        self.assertEqual(ProductRegistry.get_by_token(self.token.key).user.username, 'beta_health_service')
+
+    def test_token_rotated_elsewhere_is_refused_after_poll(self):
+        # Queryset updates send no signals, like a change made by another worker
+        Token.objects.filter(pk=self.token.key).update(key='rotated')
+        self._poll()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+        user, _ = self.auth.authenticate_credentials('rotated')
+        self.assertEqual(user.pk, self.product.user_id)
+
+    def test_token_deleted_elsewhere_is_refused_after_poll(self):
+        Token.objects.filter(pk=self.token.key)._raw_delete(Token.objects.db)
+        self._poll()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+
+    def test_user_deactivated_elsewhere_is_refused_after_poll(self):
+        User.objects.filter(pk=self.product.user_id).update(is_active=False)
+        self._poll()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+
+    def test_unchanged_database_keeps_the_snapshot(self):
+        snapshot = ProductRegistry.snapshot()
+        self._poll()
+        self.assertIs(ProductRegistry.snapshot(), snapshot)
+
+
+class DashboardLinkTests(TestCase):
+    def setUp(self):
+        self.product, _ = create_product(dashboard_url='https://app.beta.example/login')
+
+    def test_welcome_link_is_the_products_dashboard(self):
+        product = ProductRegistry.get_by_name('beta_health')
+        self.assertEqual(dashboard_link({'product': product, 'environment': 'test'}), 'https://app.beta.example/login')
+
+    def _verification_page_link(self, product_name):
+        with mock.patch.object(EmailTemplateRenderer, 'render_verification_success', return_value='ok') as render:
+            self.client.get('/api/email/verify-confirmation/',
+                            {'token': 't', 'product': product_name, 'environment': 'test'}, secure=True)
+        return render.call_args.kwargs['dashboard_link']
+
+    def test_verification_page_links_to_the_products_dashboard(self):
+        self.assertEqual(self._verification_page_link('Beta Health'), 'https://app.beta.example/login')
+
+    def test_unknown_product_gets_the_generic_dashboard(self):
+        self.assertEqual(self._verification_page_link('Nope'), 'https://app.example.com/dashboard?environment=test')
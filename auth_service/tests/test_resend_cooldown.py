@@ -0,0 +1,170 @@
+from datetime import timedelta
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from unittest import mock
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from ..models import EmailCooldown
+from ..services.email_service import BrevoEmailService
+from ..services.firebase_service import FirebaseService
+from ..services.resend_cooldown import CooldownStore
+from .utils import EmailApiTestCase
+
+KEY = CooldownStore.key('beta_health', 'password_reset', 'test', 'a@example.com')
+
+
+class CooldownStoreTests(TestCase):
+    def setUp(self):
+        CooldownStore.clear()
+        CooldownStore._inflight = {}
+
+    def _follow(self, results):
+        results.append(CooldownStore.acquire(KEY, 60))
+
+    def _lead_then_follow(self, outcome, **settings):
+        """
+        Acquire as the first send, start a concurrent repeat, then release with outcome
+        """
+        results = []
+        with override_settings(EMAIL_RESEND_COOLDOWN_SHARED=False, **settings):
+            self.assertIsNone(CooldownStore.acquire(KEY, 60))
+            follower = threading.Thread(target=self._follow, args=(results,))
+            follower.start()
+            # Let the repeat start waiting on the first send
+            time.sleep(0.05)
+            if outcome is not None:
+                CooldownStore.release(KEY, 60, outcome)
+            follower.join()
+        return results[0]
+
+    def test_repeat_waits_for_and_shares_the_sent_message(self):
+        result = self._lead_then_follow({'success': True, 'message_id': '<1>'})
+        self.assertTrue(result['success'])
+        self.assertEqual(result['message_id'], '<1>')
+        self.assertFalse(result.get('pending'))
+
+    def test_repeat_of_a_failed_send_is_not_reported_as_sent(self):
+        result = self._lead_then_follow({'success': False, 'error': 'Brevo down'})
+        self.assertFalse(result['success'])
+        self.assertEqual(result['error'], 'Brevo down')
+
+    def test_repeat_still_waiting_is_in_progress(self):
+        result = self._lead_then_follow(None, EMAIL_PIPELINE_TIMEOUT=0.1)
+        self.assertTrue(result['pending'])
+        self.assertIsNone(result['message_id'])
+
+    def test_send_in_progress_in_another_worker_is_pending(self):
+        EmailCooldown.objects.create(
+            product_name=KEY[0], email_type=KEY[1], environment=KEY[2], recipient_hash=KEY[3],
+            message_id='', expires_at=timezone.now() + timedelta(seconds=60)
+        )
+        result = CooldownStore.acquire(KEY, 60)
+        self.assertTrue(result['pending'])
+        self.assertIsNone(result['message_id'])
+
+    def test_send_done_in_another_worker_is_coalesced(self):
+        EmailCooldown.objects.create(
+            product_name=KEY[0], email_type=KEY[1], environment=KEY[2], recipient_hash=KEY[3],
+            message_id='<9>', sent_at=timezone.now(), expires_at=timezone.now() + timedelta(seconds=60)
+        )
+        result = CooldownStore.acquire(KEY, 60)
+        self.assertEqual(result['message_id'], '<9>')
+        self.assertFalse(result.get('pending'))
+
+
+@override_settings(EMAIL_RESEND_COOLDOWN=60)
+class ResendCooldownApiTests(EmailApiTestCase):
+    def setUp(self):
+        super().setUp()
+        CooldownStore.clear()
+
+    def test_repeat_while_first_send_in_progress_answers_202(self):
+        EmailCooldown.objects.create(
+            product_name=KEY[0], email_type=KEY[1], environment=KEY[2], recipient_hash=KEY[3],
+            message_id='', expires_at=timezone.now() + timedelta(seconds=60)
+        )
+        response = self.post('/api/email/password-reset/', {'email': 'a@example.com', 'environment': 'test'})
+        self.assertEqual(response.status_code, 202)
+        self.assertTrue(response.json()['data']['pending'])
+        self.assertIn('already being sent', response.json()['message'])
+
+    def test_repeat_after_send_answers_with_the_sent_message(self):
+        sent = []
+
+        def send(service, **kwargs):
+            sent.append(kwargs)
+            return {'success': True, 'message_id': f'<{len(sent)}>'}
+
+        with mock.patch.object(BrevoEmailService, 'send_email', send), \
+                mock.patch.object(FirebaseService, 'generate_password_reset_link',
+                                  classmethod(lambda cls, email, tenant_id, environment: 'https://x/reset?oob=1')):
+            first = self.post('/api/email/password-reset/', {'email': 'a@example.com', 'environment': 'test'})
+            second = self.post('/api/email/password-reset/', {'email': 'a@example.com', 'environment': 'test'})
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 200)
+        self.assertTrue(second.json()['data']['coalesced'])
+        self.assertEqual(second.json()['data']['message_id'], '<1>')
+        self.assertEqual(len(sent), 1)
+
+    def test_cooldown_is_off_by_default(self):
+        with self.settings(EMAIL_RESEND_COOLDOWN=0):
+            self.assertEqual(CooldownStore.window('password_reset'), 0)
+
+
+# Cooldown releases write from the executors' threads, which outlive the request
+POOLED_EXECUTION_SCRIPT = """
+import django, json
+django.setup()
+from django.core.management import call_command
+from django.db import connections
+from auth_service.db.pool import pool_stats
+from auth_service.models import EmailCooldown
+from auth_service.services.email_pipeline import QueuedExecution, ThreadedExecution
+
+call_command('migrate', verbosity=0)
+
+def job():
+    return {'success': True, 'cooldowns': EmailCooldown.objects.count()}
+
+threaded = ThreadedExecution(max_workers=4)
+results = [threaded.submit(job) for _ in range(8)]
+queued = QueuedExecution(workers=2)
+for _ in range(8):
+    queued.submit(job)
+queued.close()
+threaded.close()
+connections.close_all()
+print(json.dumps({'results': results, 'pool': pool_stats()['default']}))
+"""
+
+
+class PooledExecutionTests(SimpleTestCase):
+    def test_executor_threads_give_their_connections_back(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            proc = subprocess.run(
+                [sys.executable, '-c', POOLED_EXECUTION_SCRIPT], cwd=settings.BASE_DIR, capture_output=True,
+                text=True, timeout=60,
+                env=dict(
+                    os.environ,
+                    DJANGO_SETTINGS_MODULE='config.settings',
+                    DATABASE_URL=f'sqlite:///{os.path.join(tmpdir, "executions.sqlite3")}',
+                    DATABASE_POOL='true',
+                    DATABASE_POOL_MAX_SIZE='4',
+                    DATABASE_POOL_TIMEOUT='1',
+                    LOG_LEVEL='ERROR',
+                ),
+            )
+        self.assertEqual(proc.returncode, 0, proc.stderr[-2000:])
+        report = json.loads(proc.stdout.strip().splitlines()[-1])
+
+        self.assertEqual(len(report['results']), 8)
+        self.assertEqual(report['pool']['in_use'], 0)
+        self.assertEqual(report['pool']['timeouts'], 0)
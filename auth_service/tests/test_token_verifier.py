@@ -0,0 +1,191 @@
+from cryptography.hazmat.primitives.asymmetric import rsa
+from django.test import SimpleTestCase, TestCase
+from rest_framework import exceptions
+from rest_framework.test import APIRequestFactory
+from unittest import mock
+import jwt
+import time
+
+from ..authentication import FirebaseIdTokenAuthentication
+from ..services.firebase_service import FirebaseService
+from ..services.identity_toolkit import IdentityToolkitClient, PublicKeyCache
+from ..services.token_verifier import IdTokenVerifier, RevocationCache
+from .utils import create_product
+
+PROJECT = 'beta-health-test'
+KID = 'key-1'
+SIGNING_KEY = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+OTHER_KEY = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+def id_token(key=SIGNING_KEY, kid=KID, uid='user-1', tenant='beta_health-test', issued=None, **claims):
+    issued = int(time.time()) - 60 if issued is None else issued
+    payload = {
+        'iss': f'https://securetoken.google.com/{PROJECT}',
+        'aud': PROJECT,
+        'sub': uid,
+        'iat': issued,
+        'auth_time': issued,
+        'exp': issued + 3600,
+        'firebase': {'tenant': tenant, 'sign_in_provider': 'password'},
+    }
+    payload.update(claims)
+    return jwt.encode(payload, key, algorithm='RS256', headers={'kid': kid})
+
+
+class StaticKeys(PublicKeyCache):
+    """
+    Signing keys as if just fetched from Google
+    """
+
+    def __init__(self, keys):
+        super().__init__('https://keys.invalid')
+        self.fetches = 0
+        self.served = keys
+
+    def _fetch(self):
+        self.fetches += 1
+        return dict(self.served), 3600
+
+
+class IdTokenVerifierTests(SimpleTestCase):
+    def setUp(self):
+        self.client = IdentityToolkitClient(PROJECT, mock.Mock(), key_cache=StaticKeys({KID: SIGNING_KEY.public_key()}))
+        self.client.lookup = mock.Mock(return_value=[{'localId': 'user-1', 'validSince': '0'}])
+        patcher = mock.patch.object(FirebaseService, 'get_client', return_value=self.client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        IdTokenVerifier._revocations = RevocationCache(freshness=300, refresh_interval=3600)
+        self.addCleanup(setattr, IdTokenVerifier, '_revocations', None)
+
+    def _rejected(self, token, tenant_id='beta_health-test'):
+        with self.assertRaises(ValueError) as raised:
+            IdTokenVerifier.verify(token, tenant_id)
+        return str(raised.exception)
+
+    def test_valid_token_is_accepted_and_revocation_state_cached(self):
+        for _ in range(3):
+            claims = IdTokenVerifier.verify(id_token(), 'beta_health-test')
+
+        self.assertEqual(claims['uid'], 'user-1')
+        self.client.lookup.assert_called_once_with(local_ids=['user-1'], tenant_id='beta_health-test')
+        self.assertEqual(IdTokenVerifier.revocations().stats['hits'], 2)
+
+    def test_bad_signature_is_rejected(self):
+        self.assertEqual(self._rejected(id_token(key=OTHER_KEY)), 'Invalid token')
+
+    def test_unknown_key_is_rejected(self):
+        self.assertEqual(self._rejected(id_token(kid='key-2')), 'Invalid token')
+
+    def test_wrong_audience_is_rejected(self):
+        self.assertEqual(self._rejected(id_token(aud='other-project')), 'Invalid token')
+
+    def test_wrong_issuer_is_rejected(self):
+        self.assertEqual(self._rejected(id_token(iss='https://securetoken.google.com/other-project')),
+                         'Invalid token')
+
+    def test_token_of_another_tenant_is_rejected(self):
+        self.assertEqual(self._rejected(id_token(tenant='ehr-test')), 'Invalid token')
+
+    def test_expired_token_is_rejected(self):
+        self.assertEqual(self._rejected(id_token(issued=int(time.time()) - 7200)), 'Token expired')
+
+    def test_token_issued_before_revocation_is_rejected(self):
+        issued = int(time.time()) - 600
+        self.client.lookup.return_value = [{'localId': 'user-1', 'validSince': str(issued + 60)}]
+
+        self.assertEqual(self._rejected(id_token(issued=issued)), 'Token revoked')
+        # Signing in again after the revocation gives a token that is accepted
+        self.assertEqual(IdTokenVerifier.verify(id_token(issued=issued + 120), 'beta_health-test')['uid'], 'user-1')
+
+    def test_disabled_or_deleted_user_is_revoked(self):
+        self.client.lookup.return_value = [{'localId': 'user-1', 'validSince': '0', 'disabled': True}]
+        self.assertEqual(self._rejected(id_token()), 'Token revoked')
+
+        IdTokenVerifier.revocations().invalidate()
+        self.client.lookup.return_value = []
+        self.assertEqual(self._rejected(id_token()), 'Token revoked')
+
+
+class RevocationCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = RevocationCache(freshness=300, refresh_interval=3600)
+        self.client = mock.Mock()
+        self.client.lookup.return_value = [{'localId': 'user-1', 'validSince': '100'}]
+        patcher = mock.patch.object(RevocationCache, '_client', return_value=self.client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _age(self, seconds):
+        for entry in self.cache._entries.values():
+            entry['fetched_at'] -= seconds
+
+    def test_stale_entry_is_fetched_again(self):
+        self.assertEqual(self.cache.get('test', 't', 'user-1'), (100, False))
+        self._age(301)
+        self.client.lookup.return_value = [{'localId': 'user-1', 'validSince': '200'}]
+
+        self.assertEqual(self.cache.get('test', 't', 'user-1'), (200, False))
+        self.assertEqual(self.client.lookup.call_count, 2)
+
+    def test_recently_used_entries_are_refreshed_in_the_background(self):
+        self.cache.get('test', 't', 'user-1')
+        self.client.lookup.return_value = [{'localId': 'user-1', 'validSince': '200'}]
+
+        self.cache.refresh_due()
+        self.assertEqual(self.client.lookup.call_count, 1)
+        self._age(151)
+        self.cache.refresh_due()
+
+        self.assertEqual(self.client.lookup.call_count, 2)
+        self.assertEqual(self.cache.get('test', 't', 'user-1'), (200, False))
+        self.assertEqual(self.cache.stats['hits'], 1)
+
+
+class PublicKeyCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.keys = StaticKeys({KID: SIGNING_KEY.public_key()})
+
+    def test_keys_are_fetched_once_until_they_expire(self):
+        self.assertIsNotNone(self.keys.get_key(KID))
+        self.assertIsNotNone(self.keys.get_key(KID))
+        self.assertEqual(self.keys.fetches, 1)
+
+        self.keys._expires_at = time.time() - 1
+        self.keys.get_key(KID)
+        self.assertEqual(self.keys.fetches, 2)
+
+    def test_unknown_key_refetches_at_most_once_per_interval(self):
+        self.keys.get_key(KID)
+        self.keys.served['key-2'] = OTHER_KEY.public_key()
+
+        # Google announced a rotation moments ago: not refetched yet
+        self.assertIsNone(self.keys.get_key('key-2'))
+        self.assertEqual(self.keys.fetches, 1)
+
+        self.keys._fetched_at -= PublicKeyCache.MIN_REFETCH_INTERVAL
+        self.assertIsNotNone(self.keys.get_key('key-2'))
+        self.assertIsNone(self.keys.get_key('key-3'))
+        self.assertEqual(self.keys.fetches, 2)
+
+
+class FirebaseIdTokenAuthenticationTests(TestCase):
+    def setUp(self):
+        create_product()
+        self.factory = APIRequestFactory()
+
+    def _authenticate(self, token):
+        request = self.factory.get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        return FirebaseIdTokenAuthentication().authenticate(request)
+
+    def test_malformed_firebase_claim_is_refused(self):
+        for firebase in ('beta_health-test', ['beta_health-test'], {'tenant': ['beta_health-test']}):
+            with self.assertRaises(exceptions.AuthenticationFailed):
+                self._authenticate(id_token(firebase=firebase))
+
+    def test_tenant_selects_the_product_and_environment(self):
+        with mock.patch.object(FirebaseService, 'verify_id_token', return_value={'uid': 'user-1'}) as verify:
+            user, _ = self._authenticate(id_token())
+
+        verify.assert_called_once_with(mock.ANY, 'beta_health-test', 'test')
+        self.assertEqual((user.uid, user.product.name, user.environment), ('user-1', 'beta_health', 'test'))
@@ -0,0 +1,122 @@
+from django.test import SimpleTestCase, override_settings
+from unittest import mock
+import threading
+
+from ..services.firebase_service import FirebaseService
+from ..services.identity_toolkit import UserNotFound
+from ..services.user_cache import MISS, LookupCoalescer, UserLookupCache
+
+PROFILE = {'uid': 'u1', 'email': 'a@example.com', 'email_verified': True}
+
+
+class UserLookupCacheTests(SimpleTestCase):
+    def setUp(self):
+        UserLookupCache.clear()
+        self.addCleanup(UserLookupCache.clear)
+
+    def test_profiles_and_missing_users_are_cached_per_tenant(self):
+        UserLookupCache.set('test', 't1', 'a@example.com', PROFILE)
+        UserLookupCache.set('test', 't1', 'b@example.com', None)
+
+        self.assertEqual(UserLookupCache.get('test', 't1', ' A@Example.com '), PROFILE)
+        self.assertTrue(UserLookupCache.is_known_missing('test', 't1', 'b@example.com'))
+        self.assertIs(UserLookupCache.get('test', 't2', 'a@example.com'), MISS)
+        self.assertIs(UserLookupCache.get('prod', 't1', 'a@example.com'), MISS)
+        self.assertEqual(UserLookupCache.stats, {'hits': 1, 'negative_hits': 1, 'misses': 2})
+
+        UserLookupCache.invalidate('test', 't1', 'a@example.com')
+        self.assertIs(UserLookupCache.get('test', 't1', 'a@example.com'), MISS)
+
+    @override_settings(FIREBASE_USER_CACHE_NEGATIVE_TTL=0)
+    def test_missing_users_expire_on_their_own_ttl(self):
+        UserLookupCache.set('test', 't1', 'a@example.com', PROFILE)
+        UserLookupCache.set('test', 't1', 'b@example.com', None)
+
+        self.assertEqual(UserLookupCache.get('test', 't1', 'a@example.com'), PROFILE)
+        self.assertIs(UserLookupCache.get('test', 't1', 'b@example.com'), MISS)
+
+
+class NegativeCachingTests(SimpleTestCase):
+    def setUp(self):
+        UserLookupCache.clear()
+        self.addCleanup(UserLookupCache.clear)
+
+    def test_missing_user_is_remembered(self):
+        client = mock.Mock()
+        client.send_oob_code.side_effect = UserNotFound('User with email a@example.com not found')
+        with mock.patch.object(FirebaseService, 'get_client', return_value=client):
+            for _ in range(2):
+                with self.assertRaises(UserNotFound):
+                    FirebaseService.generate_password_reset_link('a@example.com', 't1')
+
+        client.send_oob_code.assert_called_once()
+        self.assertTrue(UserLookupCache.is_known_missing('test', 't1', 'a@example.com'))
+
+    def test_config_error_is_not_taken_for_a_missing_user(self):
+        error = ValueError('Missing Firebase test config fields: private_key')
+        with mock.patch.object(FirebaseService, 'get_client', side_effect=error):
+            with self.assertRaises(ValueError) as raised:
+                FirebaseService.generate_email_verification_link('a@example.com', 't1')
+
+        self.assertNotIsInstance(raised.exception, UserNotFound)
+        self.assertIs(UserLookupCache.get('test', 't1', 'a@example.com'), MISS)
+
+
+class LookupCoalescerTests(SimpleTestCase):
+    def setUp(self):
+        UserLookupCache.clear()
+        self.addCleanup(UserLookupCache.clear)
+
+    def _lookup_concurrently(self, coalescer, emails):
+        results = {}
+        errors = {}
+        start = threading.Barrier(len(emails))
+
+        def lookup(email):
+            start.wait()
+            try:
+                results[email] = coalescer.get_user_by_email(email, 't1')
+            except Exception as e:
+                errors[email] = e
+
+        threads = [threading.Thread(target=lookup, args=(email,)) for email in emails]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, errors
+
+    def test_concurrent_misses_share_one_bulk_lookup(self):
+        emails = [f'user{n}@example.com' for n in range(5)]
+
+        def get_users_by_email(batch, tenant_id, environment, use_cache):
+            return {email: {'email': email} if email != 'user0@example.com' else None for email in batch}
+
+        with mock.patch.object(FirebaseService, 'get_users_by_email', side_effect=get_users_by_email) as bulk:
+            results, errors = self._lookup_concurrently(LookupCoalescer(window=0.2), emails)
+
+        bulk.assert_called_once()
+        self.assertEqual(sorted(bulk.call_args.args[0]), emails)
+        self.assertEqual(errors, {})
+        self.assertIsNone(results['user0@example.com'])
+        self.assertEqual(results['user4@example.com'], {'email': 'user4@example.com'})
+
+    def test_followers_get_the_leaders_error(self):
+        emails = [f'user{n}@example.com' for n in range(3)]
+        error = RuntimeError('Firebase API error: QUOTA_EXCEEDED')
+
+        with mock.patch.object(FirebaseService, 'get_users_by_email', side_effect=error) as bulk:
+            results, errors = self._lookup_concurrently(LookupCoalescer(window=0.2), emails)
+
+        bulk.assert_called_once()
+        self.assertEqual(results, {})
+        self.assertEqual(set(errors), set(emails))
+        self.assertTrue(all(e is error for e in errors.values()))
+
+    def test_cached_users_are_answered_without_a_lookup(self):
+        UserLookupCache.set('test', 't1', 'a@example.com', PROFILE)
+
+        with mock.patch.object(FirebaseService, 'get_users_by_email') as bulk:
+            self.assertEqual(LookupCoalescer(window=0).get_user_by_email('a@example.com', 't1'), PROFILE)
+
+        bulk.assert_not_called()
@@ -0,0 +1,59 @@
+"""
+Shared fixtures for auth_service tests
+"""
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+import json
+
+from ..models import Product
+from ..services.product_registry import ProductRegistry
+
+
+def create_product(name='beta_health', **fields):
+    """
+    Create a product with its service-account user and token, and reload the registry
+
+    Returns:
+        tuple: (Product, Token)
+    """
+    user = User.objects.create(username=f'{name}_service', email=f'{name}@service.internal')
+    token = Token.objects.create(user=user)
+    defaults = dict(
+        display_name=name.replace('_', ' ').title(),
+        test_tenant_id=f'{name}-test',
+        prod_tenant_id=f'{name}-prod',
+    )
+    defaults.update(fields)
+    product = Product.objects.create(user=user, name=name, **defaults)
+    # Signal handlers reload on commit, which never comes inside a TestCase
+    ProductRegistry.load()
+    return product, token
+
+
+class EmailApiTestCase(TestCase):
+    """
+    A product with an authenticated client; DNS checks and rate limits off
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._settings = override_settings(EMAIL_CHECK_DELIVERABILITY=False, RATELIMIT_ENABLE=False)
+        cls._settings.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._settings.disable()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.product, self.token = create_product()
+        self.auth = f'Token {self.token.key}'
+
+    def post(self, path, body, **extra):
+        return self.client.post(path, json.dumps(body), content_type='application/json', secure=True,
+                                HTTP_AUTHORIZATION=self.auth, **extra)
+
+    def get(self, path, **extra):
+        return self.client.get(path, secure=True, HTTP_AUTHORIZATION=self.auth, **extra)
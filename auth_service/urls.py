@@ -6,11 +6,19 @@ from .views import (
     EmailVerificationView,
     VerifyEmailConfirmationView,
     WelcomeEmailView,
+    BulkEmailView,
     PasswordResetFormView,
     PasswordResetConfirmView,
     PasswordResetCompleteView,
     HealthCheckView,
-    PingDatabaseView
+    ReadinessView,
+    PingDatabaseView,
+    FirebaseSessionView,
+    EmailLaneStatsView,
+    EmailProviderStatsView,
+    SandboxEmailListView,
+    SandboxEmailDetailView,
+    BrevoWebhookView
 )
 
 app_name = 'auth_service'
@@ -18,8 +26,12 @@ app_name = 'auth_service'
 urlpatterns = [
     # Health check and database ping
     path('health/', HealthCheckView.as_view(), name='health'),
+    path('ready/', ReadinessView.as_view(), name='ready'),
     path('ping/', PingDatabaseView.as_view(), name='ping-database'),
 
+    # End-user authentication (Firebase ID tokens)
+    path('auth/session/', FirebaseSessionView.as_view(), name='firebase-session'),
+
     # Email endpoints
     path('email/generic/', GenericEmailView.as_view(), name='generic-email'),
     path('email/password-reset/', PasswordResetView.as_view(), name='password-reset'),
@@ -27,6 +39,17 @@ urlpatterns = [
     path('email/verification/', EmailVerificationView.as_view(), name='email-verification'),
     path('email/verify-confirmation/', VerifyEmailConfirmationView.as_view(), name='verify-confirmation'),
     path('email/welcome/', WelcomeEmailView.as_view(), name='welcome-email'),
+    path('email/bulk/', BulkEmailView.as_view(), name='bulk-email'),
+    path('email/lanes/', EmailLaneStatsView.as_view(), name='email-lanes'),
+    path('email/providers/', EmailProviderStatsView.as_view(), name='email-providers'),
+
+    # Captured test-environment emails of sandboxed products
+    path('sandbox/emails/', SandboxEmailListView.as_view(), name='sandbox-emails'),
+    path('sandbox/emails/<int:pk>/', SandboxEmailDetailView.as_view(), name='sandbox-email'),
+    path('sandbox/emails/<int:pk>/html/', SandboxEmailDetailView.as_view(as_html=True), name='sandbox-email-html'),
+
+    # Brevo callbacks
+    path('webhooks/brevo/', BrevoWebhookView.as_view(), name='brevo-webhook'),
 
     # Password reset flow pages
     path('password/reset-form/', PasswordResetFormView.as_view(), name='password-reset-form'),
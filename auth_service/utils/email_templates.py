@@ -3,28 +3,35 @@ Email template utility for rendering HTML email templates with Brevo
 """
 from django.template.loader import render_to_string
 from django.conf import settings
+from django.utils.html import strip_tags
 import logging
+import re
+
+from ..services.product_registry import ProductRegistry
 
 logger = logging.getLogger(__name__)
 
+_BODY = re.compile(r'<body[^>]*>(.*)</body>', re.IGNORECASE | re.DOTALL)
+
+
+def _body_fragment(html):
+    """The contents of an HTML document's body (or the fragment itself), for embedding in another email"""
+    match = _BODY.search(html)
+    return match.group(1) if match else html
+
 
 class EmailTemplateRenderer:
     """
     Utility class to render email templates with context variables
     """
-
-    # Product-specific logo URLs
-    PRODUCT_LOGOS = {
-        'Beta Health': 'https://oneclickmed.ng/betahealth_logo.JPG',
-        'beta_health': 'https://oneclickmed.ng/betahealth_logo.JPG',
-        # Add more product logos here as needed
-        # 'EHR': 'https://oneclickmed.ng/ehr_logo.png',
-        # 'Emergency Service': 'https://oneclickmed.ng/emergency_logo.png',
+    # Subject lines, also used for the Brevo-managed copies of the templates (services/brevo_templates.py)
+    SUBJECTS = {
+        'verification': 'Verify Your Email - {product_name}',
+        'welcome': 'Welcome to {product_name}!',
+        'password_reset': 'Password Reset - {product_name}',
+        'digest': '{count} new notifications from {product_name}',
     }
 
-    # Default OneClickMed logo
-    DEFAULT_LOGO = 'https://oneclickmed.ng/_next/image?url=%2Fassets%2Fimg%2Fonclickmedlogo.png&w=384&q=75'
-
     @staticmethod
     def get_environment_label(environment):
         """Get human-readable environment label"""
@@ -32,15 +39,28 @@ class EmailTemplateRenderer:
 
     @staticmethod
     def get_product_logo_url(product_name):
-        """Get product-specific logo URL or default"""
-        return EmailTemplateRenderer.PRODUCT_LOGOS.get(product_name, EmailTemplateRenderer.DEFAULT_LOGO)
+        """Get product-specific logo URL from the product registry or default"""
+        product = ProductRegistry.find(product_name)
+        return product.logo_url if product else settings.DEFAULT_PRODUCT_LOGO_URL
+
+    @staticmethod
+    def get_dashboard_url(product_name):
+        """Get product dashboard link from the product registry or default"""
+        product = ProductRegistry.find(product_name)
+        return product.dashboard_url if product else settings.DEFAULT_DASHBOARD_URL
+
+    @staticmethod
+    def get_product_dashboard_link(product, environment='prod'):
+        """Get a registry product's dashboard link, or the generic dashboard for the environment"""
+        if product is not None and product.dashboard_url:
+            return product.dashboard_url
+        return f"https://app.example.com/dashboard?environment={environment}"
 
     @staticmethod
     def get_welcome_email_sender(product_name):
-        """Get special sender for welcome emails - Reagan for Beta Health, default for others"""
-        if product_name in ['Beta Health', 'beta_health']:
-            return {'email': 'Reagan@oneclickmed.ng', 'name': 'Reagan Rowland - OneClick-Med'}
-        return None  # Use default from settings
+        """Get special sender for welcome emails (e.g. Reagan for Beta Health), None uses the default"""
+        product = ProductRegistry.find(product_name)
+        return dict(product.welcome_sender) if product and product.welcome_sender else None
 
     @staticmethod
     def render_verification_email(product_name, verification_link, environment='prod', user_name=None):
@@ -85,7 +105,7 @@ Important:
 This email was sent from {product_name} ({EmailTemplateRenderer.get_environment_label(environment)})
 """
 
-        subject = f"Verify Your Email - {product_name}"
+        subject = EmailTemplateRenderer.SUBJECTS['verification'].format(product_name=product_name)
 
         return {
             'subject': subject,
@@ -140,7 +160,7 @@ You're receiving this email because you created an account with {product_name}
 Environment: {EmailTemplateRenderer.get_environment_label(environment)}
 """
 
-        subject = f"Welcome to {product_name}!"
+        subject = EmailTemplateRenderer.SUBJECTS['welcome'].format(product_name=product_name)
 
         return {
             'subject': subject,
@@ -236,7 +256,7 @@ Need help? Contact our support team at support@oneclickmed.ng
 This email was sent from {product_name} ({EmailTemplateRenderer.get_environment_label(environment)})
 """
 
-        subject = f"Password Reset - {product_name}"
+        subject = EmailTemplateRenderer.SUBJECTS['password_reset'].format(product_name=product_name)
 
         return {
             'subject': subject,
@@ -244,6 +264,49 @@ This email was sent from {product_name} ({EmailTemplateRenderer.get_environment_
             'text_content': text_content.strip()
         }
 
+    @staticmethod
+    def render_digest_email(product_name, notifications, environment='prod'):
+        """
+        Render several notifications to one recipient as a single digest
+
+        Args:
+            product_name (str): Name of the product
+            notifications (list): Dicts with 'subject', 'html_content' and 'text_content', oldest first
+            environment (str): 'test' or 'prod'
+
+        Returns:
+            dict: Contains 'subject', 'html_content', 'text_content'
+        """
+        subject = EmailTemplateRenderer.SUBJECTS['digest'].format(count=len(notifications), product_name=product_name)
+        context = {
+            'subject': subject,
+            'product_name': product_name,
+            'environment': environment,
+            'environment_label': EmailTemplateRenderer.get_environment_label(environment),
+            'product_logo_url': EmailTemplateRenderer.get_product_logo_url(product_name),
+            'notifications': [
+                {'subject': notification['subject'], 'html': _body_fragment(notification['html_content'])}
+                for notification in notifications
+            ],
+        }
+
+        html_content = render_to_string('emails/digest_email.html', context)
+
+        # Text content fallback
+        sections = [
+            f"{notification['subject']}\n\n"
+            f"{(notification.get('text_content') or strip_tags(notification['html_content'])).strip()}"
+            for notification in notifications
+        ]
+        text_content = '\n\n---\n\n'.join([subject] + sections)
+        text_content += f"\n\nThis email was sent from {product_name} ({EmailTemplateRenderer.get_environment_label(environment)})"
+
+        return {
+            'subject': subject,
+            'html_content': html_content,
+            'text_content': text_content
+        }
+
     @staticmethod
     def render_password_reset_form(product_name, reset_token, environment='prod', api_url=''):
         """
@@ -0,0 +1,58 @@
+"""
+Thin facade that defers importing heavy SDKs until first attribute access
+"""
+import importlib
+import threading
+
+from .. import lifecycle
+
+_import_lock = threading.Lock()
+
+
+class LazyModule:
+    """
+    Stand-in for a module that is imported on first attribute access.
+
+    Usage:
+        firebase_admin = LazyModule('firebase_admin')
+        firebase_admin.initialize_app(...)   # imported here, not at module load
+
+    Cold paths such as /api/health/ and the static pages never pay for the
+    import; the first call that needs the SDK does (or warm-up does it at boot).
+    """
+
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            with _import_lock:
+                module = self.__dict__['_module']
+                if module is None:
+                    module = importlib.import_module(self.__dict__['_name'])
+                    self.__dict__['_module'] = module
+        return module
+
+    @property
+    def is_loaded(self):
+        return self.__dict__['_module'] is not None
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __repr__(self):
+        state = 'loaded' if self.is_loaded else 'not loaded'
+        return f"<LazyModule '{self.__dict__['_name']}' ({state})>"
+
+
+def _reset_import_lock():
+    global _import_lock
+    _import_lock = threading.Lock()
+
+
+lifecycle.register('lazy_imports', reset=_reset_import_lock)
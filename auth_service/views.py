@@ -2,379 +2,98 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.parsers import JSONParser, MultiPartParser
 from django_ratelimit.decorators import ratelimit
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 import logging
 
-from .serializers import (
-    GenericEmailSerializer,
-    PasswordResetSerializer,
-    ForgotPasswordSerializer,
-    EmailVerificationSerializer,
-    WelcomeEmailSerializer,
-    VerifyEmailConfirmationSerializer,
-    EmailResponseSerializer
-)
-from .services.email_service import BrevoEmailService
+from .authentication import BrevoWebhookAuthentication, FirebaseIdTokenAuthentication
+from .services.email_pipeline import EmailPipeline
 from .services.firebase_service import FirebaseService
-from .models import Product
 from .utils.email_templates import EmailTemplateRenderer
 from django.http import HttpResponse
 
 logger = logging.getLogger(__name__)
 
 
-@method_decorator(csrf_exempt, name='dispatch')
-@method_decorator(ratelimit(key='ip', rate='60/m', method='POST'), name='post')
-class GenericEmailView(APIView):
+class EmailPipelineView(APIView):
     """
-    API endpoint to send generic emails
-    POST /api/email/generic/
+    Base view for email endpoints served by the unified email pipeline.
+    Subclasses only declare which registered email type they send.
     """
     permission_classes = [IsAuthenticated]
+    email_type = None
 
     def post(self, request):
-        serializer = GenericEmailSerializer(data=request.data)
-
-        if not serializer.is_valid():
-            return Response({
-                'success': False,
-                'message': 'Invalid request data',
-                'errors': serializer.errors
-            }, status=status.HTTP_400_BAD_REQUEST)
-
-        data = serializer.validated_data
+        return EmailPipeline.handle(self.email_type, request)
 
-        # Get product from authenticated user
-        try:
-            product = request.user.product
-        except Product.DoesNotExist:
-            return Response({
-                'success': False,
-                'message': 'User is not associated with a product'
-            }, status=status.HTTP_403_FORBIDDEN)
 
-        try:
-            # Send email via Brevo
-            email_service = BrevoEmailService()
-            result = email_service.send_generic_email(
-                to_email=data['to_email'],
-                subject=data['subject'],
-                html_content=data['html_content'],
-                text_content=data.get('text_content')
-            )
+@method_decorator(csrf_exempt, name='dispatch')
+@method_decorator(ratelimit(key='ip', rate='60/m', method='POST'), name='post')
+class GenericEmailView(EmailPipelineView):
+    """
+    API endpoint to send generic emails
+    POST /api/email/generic/
+    JSON, or multipart/form-data with the same fields plus 'attachments' files
+    """
+    email_type = 'generic'
+    parser_classes = [JSONParser, MultiPartParser]
 
-            if result['success']:
-                logger.info(f"Generic email sent successfully to {data['to_email']} by {product.display_name}")
-                return Response({
-                    'success': True,
-                    'message': 'Email sent successfully',
-                    'data': {
-                        'message_id': result.get('message_id')
-                    }
-                }, status=status.HTTP_200_OK)
-            else:
-                logger.warning(f"Failed to send generic email to {data['to_email']}: {result.get('error')}")
-                return Response({
-                    'success': False,
-                    'message': 'Failed to send email',
-                    'error': result.get('error')
-                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    def post(self, request):
+        from .services.email_attachments import use_attachment_uploads
 
-        except Exception as e:
-            logger.error(f"Error sending generic email: {e}", exc_info=True)
-            return Response({
-                'success': False,
-                'message': 'An error occurred while sending email',
-                'error': str(e)
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        # Before request.data is parsed: uploads are spooled and checked as they arrive
+        use_attachment_uploads(request)
+        return super().post(request)
 
 
 @method_decorator(csrf_exempt, name='dispatch')
 @method_decorator(ratelimit(key='ip', rate='30/m', method='POST'), name='post')
-class PasswordResetView(APIView):
+class PasswordResetView(EmailPipelineView):
     """
     API endpoint to send password reset emails
     POST /api/email/password-reset/
     """
-    permission_classes = [IsAuthenticated]
-
-    def post(self, request):
-        serializer = PasswordResetSerializer(data=request.data)
-
-        if not serializer.is_valid():
-            return Response({
-                'success': False,
-                'message': 'Invalid request data',
-                'errors': serializer.errors
-            }, status=status.HTTP_400_BAD_REQUEST)
-
-        data = serializer.validated_data
-
-        # Get product from authenticated user
-        try:
-            product = request.user.product
-        except Product.DoesNotExist:
-            return Response({
-                'success': False,
-                'message': 'User is not associated with a product'
-            }, status=status.HTTP_403_FORBIDDEN)
-
-        environment = data['environment']
-        environment_label = "test environment" if environment == "test" else "production environment"
-
-        try:
-            # Get Firebase tenant ID
-            tenant_id = product.get_tenant_id(environment)
-
-            # Generate password reset link from Firebase
-            reset_link = FirebaseService.generate_password_reset_link(
-                email=data['email'],
-                tenant_id=tenant_id,
-                environment=environment
-            )
-
-            # Render email template
-            email_content = EmailTemplateRenderer.render_password_reset_email(
-                product_name=product.display_name,
-                reset_link=reset_link,
-                environment=environment,
-                user_name=data.get('user_name')
-            )
-
-            # Send email via Brevo
-            email_service = BrevoEmailService()
-            result = email_service.send_email(
-                to_email=data['email'],
-                subject=email_content['subject'],
-                html_content=email_content['html_content'],
-                text_content=email_content['text_content']
-            )
-
-            if result['success']:
-                logger.info(f"Password reset email sent successfully to {data['email']} by {product.display_name}")
-                return Response({
-                    'success': True,
-                    'message': f'Password reset email sent successfully to {environment_label}',
-                    'data': {
-                        'message_id': result.get('message_id'),
-                        'environment': environment
-                    }
-                }, status=status.HTTP_200_OK)
-            else:
-                logger.warning(f"Failed to send password reset email: {result.get('error')}")
-                return Response({
-                    'success': False,
-                    'message': f'Failed to send password reset email in {environment_label}',
-                    'error': result.get('error')
-                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-        except ValueError as e:
-            logger.warning(f"User not found for password reset: {e}")
-            return Response({
-                'success': False,
-                'message': str(e)
-            }, status=status.HTTP_404_NOT_FOUND)
-
-        except Exception as e:
-            logger.error(f"Error sending password reset email: {e}", exc_info=True)
-            return Response({
-                'success': False,
-                'message': f'An error occurred while sending password reset email in {environment_label}',
-                'error': str(e)
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    email_type = 'password_reset'
 
 
 @method_decorator(csrf_exempt, name='dispatch')
 @method_decorator(ratelimit(key='ip', rate='30/m', method='POST'), name='post')
-class ForgotPasswordView(APIView):
+class ForgotPasswordView(EmailPipelineView):
     """
     API endpoint to send forgot password emails (same as password reset)
     POST /api/email/forgot-password/
     """
-    permission_classes = [IsAuthenticated]
-
-    def post(self, request):
-        serializer = ForgotPasswordSerializer(data=request.data)
-
-        if not serializer.is_valid():
-            return Response({
-                'success': False,
-                'message': 'Invalid request data',
-                'errors': serializer.errors
-            }, status=status.HTTP_400_BAD_REQUEST)
-
-        data = serializer.validated_data
-
-        # Get product from authenticated user
-        try:
-            product = request.user.product
-        except Product.DoesNotExist:
-            return Response({
-                'success': False,
-                'message': 'User is not associated with a product'
-            }, status=status.HTTP_403_FORBIDDEN)
-
-        environment = data['environment']
-        environment_label = "test environment" if environment == "test" else "production environment"
-
-        try:
-            # Get Firebase tenant ID
-            tenant_id = product.get_tenant_id(environment)
-
-            # Generate password reset link from Firebase
-            reset_link = FirebaseService.generate_password_reset_link(
-                email=data['email'],
-                tenant_id=tenant_id,
-                environment=environment
-            )
-
-            # Render email template
-            email_content = EmailTemplateRenderer.render_password_reset_email(
-                product_name=product.display_name,
-                reset_link=reset_link,
-                environment=environment,
-                user_name=data.get('user_name')
-            )
-
-            # Send email via Brevo
-            email_service = BrevoEmailService()
-            result = email_service.send_email(
-                to_email=data['email'],
-                subject=email_content['subject'],
-                html_content=email_content['html_content'],
-                text_content=email_content['text_content']
-            )
-
-            if result['success']:
-                logger.info(f"Forgot password email sent successfully to {data['email']} by {product.display_name}")
-                return Response({
-                    'success': True,
-                    'message': f'Forgot password email sent successfully to {environment_label}',
-                    'data': {
-                        'message_id': result.get('message_id'),
-                        'environment': environment
-                    }
-                }, status=status.HTTP_200_OK)
-            else:
-                logger.warning(f"Failed to send forgot password email: {result.get('error')}")
-                return Response({
-                    'success': False,
-                    'message': f'Failed to send forgot password email in {environment_label}',
-                    'error': result.get('error')
-                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-        except ValueError as e:
-            logger.warning(f"User not found for forgot password: {e}")
-            return Response({
-                'success': False,
-                'message': str(e)
-            }, status=status.HTTP_404_NOT_FOUND)
-
-        except Exception as e:
-            logger.error(f"Error sending forgot password email: {e}", exc_info=True)
-            return Response({
-                'success': False,
-                'message': f'An error occurred while sending forgot password email in {environment_label}',
-                'error': str(e)
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    email_type = 'forgot_password'
 
 
 @method_decorator(csrf_exempt, name='dispatch')
 @method_decorator(ratelimit(key='ip', rate='30/m', method='POST'), name='post')
-class EmailVerificationView(APIView):
+class EmailVerificationView(EmailPipelineView):
     """
     API endpoint to send email verification with product branding
     POST /api/email/verification/
     """
-    permission_classes = [IsAuthenticated]
-
-    def post(self, request):
-        serializer = EmailVerificationSerializer(data=request.data)
-
-        if not serializer.is_valid():
-            return Response({
-                'success': False,
-                'message': 'Invalid request data',
-                'errors': serializer.errors
-            }, status=status.HTTP_400_BAD_REQUEST)
-
-        data = serializer.validated_data
+    email_type = 'verification'
 
-        # Get product from authenticated user
-        try:
-            product = request.user.product
-        except Product.DoesNotExist:
-            return Response({
-                'success': False,
-                'message': 'User is not associated with a product'
-            }, status=status.HTTP_403_FORBIDDEN)
-
-        environment = data['environment']
-        environment_label = "test environment" if environment == "test" else "production environment"
-
-        try:
-            # Get Firebase tenant ID
-            tenant_id = product.get_tenant_id(environment)
-
-            # Generate email verification link from Firebase
-            verification_link = FirebaseService.generate_email_verification_link(
-                email=data['email'],
-                tenant_id=tenant_id,
-                environment=environment
-            )
 
-            # Render email template with product branding
-            email_content = EmailTemplateRenderer.render_verification_email(
-                product_name=product.display_name,
-                verification_link=verification_link,
-                environment=environment,
-                user_name=data.get('user_name')
-            )
-
-            # Send email via Brevo
-            email_service = BrevoEmailService()
-            result = email_service.send_email(
-                to_email=data['email'],
-                subject=email_content['subject'],
-                html_content=email_content['html_content'],
-                text_content=email_content['text_content']
-            )
-
-            if result['success']:
-                logger.info(f"Verification email sent successfully to {data['email']} by {product.display_name}")
-                return Response({
-                    'success': True,
-                    'message': f'Verification email sent successfully to {environment_label}',
-                    'data': {
-                        'message_id': result.get('message_id'),
-                        'product_name': product.display_name,
-                        'environment': environment
-                    }
-                }, status=status.HTTP_200_OK)
-            else:
-                logger.warning(f"Failed to send verification email: {result.get('error')}")
-                return Response({
-                    'success': False,
-                    'message': f'Failed to send verification email in {environment_label}',
-                    'error': result.get('error')
-                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+@method_decorator(csrf_exempt, name='dispatch')
+@method_decorator(ratelimit(key='ip', rate='10/m', method='POST'), name='post')
+class BulkEmailView(APIView):
+    """
+    API endpoint to send one email per NDJSON line
+    POST /api/email/bulk/?type=generic
+    The body is application/x-ndjson (one request object per line, as for the
+    email type's own endpoint); one result line per recipient is streamed back
+    in input order, followed by the totals.
+    """
+    permission_classes = [IsAuthenticated]
 
-        except ValueError as e:
-            logger.warning(f"User not found for email verification: {e}")
-            return Response({
-                'success': False,
-                'message': str(e)
-            }, status=status.HTTP_404_NOT_FOUND)
+    def post(self, request):
+        from .services.bulk_send import BulkSend
 
-        except Exception as e:
-            logger.error(f"Error sending verification email: {e}", exc_info=True)
-            return Response({
-                'success': False,
-                'message': f'An error occurred while sending verification email in {environment_label}',
-                'error': str(e)
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return BulkSend.handle(request)
 
 
 @method_decorator(csrf_exempt, name='dispatch')
@@ -387,6 +106,8 @@ class VerifyEmailConfirmationView(APIView):
     permission_classes = []
 
     def get(self, request):
+        from .services.product_registry import ProductRegistry
+
         # Get token and environment from query parameters
         token = request.GET.get('token', '')
         environment = request.GET.get('environment', 'prod')
@@ -402,9 +123,10 @@ class VerifyEmailConfirmationView(APIView):
             # Note: Firebase automatically verifies the email when user clicks the link
             # This endpoint is just to show a branded success page
 
-            # Get dashboard link from settings or use default
-            # You can customize this per product in the future
-            dashboard_link = f"https://app.example.com/dashboard?environment={environment}"
+            # Get dashboard link from the product registry
+            dashboard_link = EmailTemplateRenderer.get_product_dashboard_link(
+                ProductRegistry.find(product_name), environment
+            )
 
             # Render success page
             success_html = EmailTemplateRenderer.render_verification_success(
@@ -425,102 +147,13 @@ class VerifyEmailConfirmationView(APIView):
 
 @method_decorator(csrf_exempt, name='dispatch')
 @method_decorator(ratelimit(key='ip', rate='30/m', method='POST'), name='post')
-class WelcomeEmailView(APIView):
+class WelcomeEmailView(EmailPipelineView):
     """
     API endpoint to send welcome email with product branding
     POST /api/email/welcome/
     Automatically adds user to HubSpot CRM for Beta Health
     """
-    permission_classes = [IsAuthenticated]
-
-    def post(self, request):
-        serializer = WelcomeEmailSerializer(data=request.data)
-
-        if not serializer.is_valid():
-            return Response({
-                'success': False,
-                'message': 'Invalid request data',
-                'errors': serializer.errors
-            }, status=status.HTTP_400_BAD_REQUEST)
-
-        data = serializer.validated_data
-
-        # Get product from authenticated user
-        try:
-            product = request.user.product
-        except Product.DoesNotExist:
-            return Response({
-                'success': False,
-                'message': 'User is not associated with a product'
-            }, status=status.HTTP_403_FORBIDDEN)
-
-        environment = data['environment']
-        environment_label = "test environment" if environment == "test" else "production environment"
-
-        try:
-            # Get dashboard link based on environment
-            # You can customize this per product from settings
-            dashboard_link = f"https://app.example.com/dashboard?environment={environment}"
-
-            # Render welcome email template with product branding
-            email_content = EmailTemplateRenderer.render_welcome_email(
-                product_name=product.display_name,
-                dashboard_link=dashboard_link,
-                environment=environment,
-                user_name=data.get('user_name')
-            )
-
-            # Get custom sender for Beta Health welcome emails
-            custom_sender = EmailTemplateRenderer.get_welcome_email_sender(product.display_name)
-
-            # Send email via Brevo
-            email_service = BrevoEmailService()
-            result = email_service.send_email(
-                to_email=data['email'],
-                subject=email_content['subject'],
-                html_content=email_content['html_content'],
-                text_content=email_content['text_content'],
-                sender=custom_sender
-            )
-
-            if result['success']:
-                logger.info(f"Welcome email sent successfully to {data['email']} by {product.display_name}")
-
-                # Add user to HubSpot CRM (Beta Health only)
-                from .services.hubspot_service import HubSpotService
-                hubspot_result = HubSpotService.create_or_update_contact(
-                    email=data['email'],
-                    name=data.get('user_name'),
-                    product_name=product.display_name
-                )
-
-                logger.info(f"HubSpot sync result: {hubspot_result}")
-
-                return Response({
-                    'success': True,
-                    'message': f'Welcome email sent successfully to {environment_label}',
-                    'data': {
-                        'message_id': result.get('message_id'),
-                        'product_name': product.display_name,
-                        'environment': environment,
-                        'hubspot_synced': hubspot_result.get('success', False)
-                    }
-                }, status=status.HTTP_200_OK)
-            else:
-                logger.warning(f"Failed to send welcome email: {result.get('error')}")
-                return Response({
-                    'success': False,
-                    'message': f'Failed to send welcome email in {environment_label}',
-                    'error': result.get('error')
-                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-        except Exception as e:
-            logger.error(f"Error sending welcome email: {e}", exc_info=True)
-            return Response({
-                'success': False,
-                'message': f'An error occurred while sending welcome email in {environment_label}',
-                'error': str(e)
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    email_type = 'welcome'
 
 
 @method_decorator(csrf_exempt, name='dispatch')
@@ -644,13 +277,8 @@ class PasswordResetCompleteView(APIView):
         environment = request.GET.get('environment', 'prod')
 
         try:
-            # Get dashboard link - customize per product
-            dashboard_links = {
-                'Beta Health': 'https://betahealth.oneclickmed.ng',
-                'EHR': 'https://ehr.oneclickmed.ng',
-                'Emergency Service': 'https://emergency.oneclickmed.ng',
-            }
-            dashboard_link = dashboard_links.get(product_name, 'https://oneclickmed.ng')
+            # Get dashboard link from the product registry
+            dashboard_link = EmailTemplateRenderer.get_dashboard_url(product_name)
 
             # Render password reset complete page
             complete_html = EmailTemplateRenderer.render_password_reset_complete(
@@ -669,6 +297,33 @@ class PasswordResetCompleteView(APIView):
             )
 
 
+@method_decorator(ratelimit(key='ip', rate='120/m', method='GET'), name='get')
+class FirebaseSessionView(APIView):
+    """
+    API endpoint for product backends to authenticate an end user
+    GET /api/auth/session/
+    Authorization: Bearer <Firebase ID token>
+    Verified locally (cached signing keys and revocation state).
+    """
+    authentication_classes = [FirebaseIdTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        user = request.user
+        return Response({
+            'success': True,
+            'data': {
+                'uid': user.uid,
+                'email': user.email,
+                'email_verified': user.email_verified,
+                'product': user.product.name,
+                'environment': user.environment,
+                'auth_time': user.claims.get('auth_time'),
+                'expires_at': user.claims.get('exp'),
+            }
+        }, status=status.HTTP_200_OK)
+
+
 class HealthCheckView(APIView):
     """
     API endpoint for health check
@@ -684,18 +339,253 @@ class HealthCheckView(APIView):
         }, status=status.HTTP_200_OK)
 
 
+class ReadinessView(APIView):
+    """
+    API endpoint for readiness checks
+    GET /api/ready/
+    Reports ready once the warm-up (Firebase apps, tokens, templates,
+    upstream connections) has completed in this process and the required
+    dependency probes pass. Probe results (database, Firebase tokens, Brevo,
+    HubSpot) are refreshed in the background and served from memory, with
+    their latency and age.
+    """
+    permission_classes = []
+    # Polled by load balancers; answering costs no upstream or DB call, so it is not throttled
+    throttle_classes = []
+
+    def get(self, request):
+        from django.conf import settings
+        from . import warmup
+        from .probes import ProbeRunner
+
+        if warmup.WarmupState.status == 'failed':
+            # Retry a failed warm-up in the background; stay not-ready meanwhile
+            warmup.start()
+
+        warm = warmup.is_ready()
+        response_data = {'warmup': warmup.WarmupState.as_dict()}
+
+        checks, failing_required, failing_optional = {}, [], []
+        if settings.READINESS_PROBES_ENABLED:
+            ProbeRunner.start()
+            checks, failing_required, failing_optional = ProbeRunner.snapshot()
+            response_data['checks'] = checks
+
+        if not warm or any(checks[name]['status'] == 'pending' for name in failing_required):
+            state = 'warming'
+        elif failing_required:
+            state = 'unavailable'
+        elif failing_optional:
+            state = 'degraded'
+        else:
+            state = 'ready'
+
+        ready = state in ('ready', 'degraded')
+        return Response(dict({
+            'success': ready,
+            'status': state,
+        }, **response_data), status=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+class EmailLaneStatsView(APIView):
+    """
+    API endpoint for email priority lane metrics
+    GET /api/email/lanes/
+    Queue depth, in-flight sends and admission wait times per lane, for the
+    worker process that answers (each process schedules its own sends).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        from .services.email_lanes import lane_stats
+
+        return Response({
+            'success': True,
+            'lanes': lane_stats()
+        }, status=status.HTTP_200_OK)
+
+
+class EmailProviderStatsView(APIView):
+    """
+    API endpoint for email provider health
+    GET /api/email/providers/
+    Rolling latency and error rate per provider as seen by the worker process
+    that answers, healthiest (next to be used) first.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        from .services.email_providers import EmailRouter
+
+        return Response({
+            'success': True,
+            'providers': EmailRouter.stats()
+        }, status=status.HTTP_200_OK)
+
+
+class SandboxEmailListView(APIView):
+    """
+    API endpoint for the product's captured test-environment emails
+    GET /api/sandbox/emails/?to_email=&email_type=&search=&since=&before_id=&limit=
+        Newest first, without their content; page with before_id=<next_before_id>
+    DELETE /api/sandbox/emails/
+        Clear the product's captured emails
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        from .models import CapturedEmail
+        from .serializers import CapturedEmailSummarySerializer, SandboxEmailQuerySerializer
+
+        product = _request_product(request)
+        if product is None:
+            return _no_product_response()
+
+        query = SandboxEmailQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response({
+                'success': False,
+                'message': 'Invalid query parameters',
+                'errors': query.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+        filters = query.validated_data
+
+        emails = CapturedEmail.objects.filter(product_name=product.name)
+        if filters.get('to_email'):
+            emails = emails.filter(to_email__iexact=filters['to_email'])
+        if filters.get('email_type'):
+            emails = emails.filter(email_type=filters['email_type'])
+        if filters.get('search'):
+            emails = emails.filter(subject__icontains=filters['search'])
+        if filters.get('since'):
+            emails = emails.filter(created_at__gte=filters['since'])
+        if filters.get('before_id'):
+            emails = emails.filter(pk__lt=filters['before_id'])
+        page = list(emails.order_by('-pk')[:filters['limit']])
+
+        return Response({
+            'success': True,
+            'sandbox': product.sandbox,
+            'emails': CapturedEmailSummarySerializer(page, many=True).data,
+            'next_before_id': page[-1].pk if len(page) == filters['limit'] else None
+        }, status=status.HTTP_200_OK)
+
+    def delete(self, request):
+        from .models import CapturedEmail
+
+        product = _request_product(request)
+        if product is None:
+            return _no_product_response()
+
+        deleted, _ = CapturedEmail.objects.filter(product_name=product.name).delete()
+        logger.info(f"Cleared {deleted} sandbox emails of {product.display_name}")
+        return Response({
+            'success': True,
+            'deleted': deleted
+        }, status=status.HTTP_200_OK)
+
+
+class SandboxEmailDetailView(APIView):
+    """
+    API endpoint for one captured test-environment email
+    GET /api/sandbox/emails/<id>/         JSON with the content
+    GET /api/sandbox/emails/<id>/html/    The HTML body, to view as the recipient would
+    """
+    permission_classes = [IsAuthenticated]
+    as_html = False
+
+    def get(self, request, pk):
+        from .models import CapturedEmail
+        from .serializers import CapturedEmailSerializer
+
+        product = _request_product(request)
+        if product is None:
+            return _no_product_response()
+
+        captured = CapturedEmail.objects.filter(product_name=product.name, pk=pk).first()
+        if captured is None:
+            return Response({
+                'success': False,
+                'message': 'Captured email not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        if self.as_html:
+            return HttpResponse(captured.html_content, content_type='text/html; charset=utf-8')
+        return Response({
+            'success': True,
+            'email': CapturedEmailSerializer(captured).data
+        }, status=status.HTTP_200_OK)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class BrevoWebhookView(APIView):
+    """
+    API endpoint for Brevo transactional webhooks (delivery events)
+    POST /api/webhooks/brevo/
+    One event object, or a JSON array of them (batched webhooks). Events are
+    buffered and written in bulk (services/email_events.py); a full buffer
+    answers 503 so Brevo delivers them again, and a request with more events
+    than the buffer holds answers 413.
+    """
+    authentication_classes = [BrevoWebhookAuthentication]
+    permission_classes = [IsAuthenticated]
+    # Brevo sends bursts from a few addresses; the buffer is the backpressure
+    throttle_classes = []
+
+    def post(self, request):
+        from .services.email_events import EmailEvents
+
+        events = request.data if isinstance(request.data, list) else [request.data]
+        if len(events) > EmailEvents.capacity():
+            # Would never fit, however long Brevo waits: a 503 would only be retried forever
+            return Response({
+                'success': False,
+                'message': f'At most {EmailEvents.capacity()} events per request'
+            }, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        accepted, invalid = EmailEvents.ingest(events)
+        if accepted is None:
+            response = Response({
+                'success': False,
+                'message': 'Too many events waiting to be stored, retry shortly'
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            response['Retry-After'] = '5'
+            return response
+
+        # Invalid events are reported but not refused: Brevo would only send them again
+        return Response({
+            'success': True,
+            'accepted': accepted,
+            'invalid': invalid
+        }, status=status.HTTP_200_OK)
+
+
+def _request_product(request):
+    from .services.product_registry import ProductRegistry
+
+    return ProductRegistry.get_by_user_id(request.user.id)
+
+
+def _no_product_response():
+    return Response({
+        'success': False,
+        'message': 'User is not associated with a product'
+    }, status=status.HTTP_403_FORBIDDEN)
+
+
 class PingDatabaseView(APIView):
     """
     API endpoint to ping database and keep it active
     GET /api/ping/
     This endpoint makes a simple database query to prevent Supabase from going inactive
+    Includes connection pool metrics when DATABASE_POOL is enabled.
     """
     permission_classes = []
 
     def get(self, request):
-        try:
-            from django.db import connection
+        from django.db import connection
+        from .db.pool import pool_stats
 
+        try:
             # Execute a simple query to wake up the database
             with connection.cursor() as cursor:
                 cursor.execute("SELECT 1")
@@ -704,7 +594,8 @@ class PingDatabaseView(APIView):
             return Response({
                 'success': True,
                 'message': 'Database is active',
-                'status': 'connected'
+                'status': 'connected',
+                'pool': pool_stats().get(connection.alias)
             }, status=status.HTTP_200_OK)
 
         except Exception as e:
@@ -712,5 +603,6 @@ class PingDatabaseView(APIView):
             return Response({
                 'success': False,
                 'message': 'Database connection failed',
-                'error': str(e)
+                'error': str(e),
+                'pool': pool_stats().get(connection.alias)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
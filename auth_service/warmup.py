@@ -0,0 +1,220 @@
+"""
+Warm-start support: do the expensive first-request work at boot instead.
+
+Imports the URLconf and views, initializes both Firebase apps and fetches
+their OAuth tokens, loads the product registry, compiles the email templates,
+opens pooled connections to Brevo and Google, and runs a synthetic render.
+ReadinessView reports ready only once this has completed.
+"""
+from django.conf import settings
+import logging
+import threading
+import time
+
+from . import lifecycle
+
+logger = logging.getLogger(__name__)
+
+EMAIL_TEMPLATES = [
+    'emails/verification_email.html',
+    'emails/welcome_email.html',
+    'emails/password_reset_email.html',
+    'emails/password_reset_form.html',
+    'emails/password_reset_complete.html',
+    'emails/password_reset_success.html',
+    'emails/verification_success.html',
+]
+
+
+class WarmupState:
+    """
+    Process-wide warm-up status: cold -> warming -> warm | failed
+    """
+    _lock = threading.Lock()
+    status = 'cold'
+    started_at = None
+    finished_at = None
+    steps = {}
+
+    @classmethod
+    def as_dict(cls):
+        duration_ms = None
+        if cls.started_at and cls.finished_at:
+            duration_ms = round((cls.finished_at - cls.started_at) * 1000, 1)
+        return {
+            'status': cls.status,
+            'duration_ms': duration_ms,
+            'steps': dict(cls.steps),
+        }
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls.status = 'cold'
+            cls.started_at = None
+            cls.finished_at = None
+            cls.steps = {}
+
+
+def _firebase_configured(environment):
+    config = settings.FIREBASE_PROD_CONFIG if environment == 'prod' else settings.FIREBASE_TEST_CONFIG
+    return all(config.get(f) for f in ['project_id', 'private_key', 'client_email'])
+
+
+def _warm_urlconf():
+    # Imports the URLconf and every view module (DRF, serializers, services)
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+
+
+def _warm_product_registry():
+    from .services.product_registry import ProductRegistry
+    ProductRegistry.load()
+
+
+def _warm_firebase(environment):
+    def step():
+        if not _firebase_configured(environment):
+            return 'skipped'
+        from .services.firebase_service import FirebaseService
+        # Initializes the app (parses the private key) and fetches an OAuth access token
+        FirebaseService._get_access_token(environment)
+    return step
+
+
+def _warm_templates():
+    from django.template.loader import get_template
+    for name in EMAIL_TEMPLATES:
+        get_template(name)
+
+
+def _warm_brevo():
+    if not settings.BREVO_API_KEY:
+        return 'skipped'
+    from .services.email_service import BrevoEmailService
+    service = BrevoEmailService.get_instance()
+    api_client = service.api_instance.api_client
+    # Any response keeps a TLS connection in the client's urllib3 pool
+    api_client.rest_client.pool_manager.request('HEAD', api_client.configuration.host, timeout=5)
+
+
+def _warm_google_connections():
+    from .services.http_client import prime
+    prime('identitytoolkit', 'https://identitytoolkit.googleapis.com/')
+    prime('identitytoolkit', 'https://oauth2.googleapis.com/')
+
+
+def _warm_render():
+    from .utils.email_templates import EmailTemplateRenderer
+    EmailTemplateRenderer.render_verification_email(
+        product_name='Warm-up',
+        verification_link='https://example.invalid/verify',
+        environment='test',
+        user_name='Warm-up'
+    )
+
+
+# (name, callable, required) - a failing required step leaves the process not ready
+WARMUP_STEPS = [
+    ('urlconf', _warm_urlconf, True),
+    ('product_registry', _warm_product_registry, True),
+    ('firebase_test', _warm_firebase('test'), False),
+    ('firebase_prod', _warm_firebase('prod'), False),
+    ('templates', _warm_templates, True),
+    ('brevo_connection', _warm_brevo, False),
+    ('google_connections', _warm_google_connections, False),
+    ('synthetic_render', _warm_render, True),
+]
+
+
+def warm_up():
+    """
+    Run every warm-up step, recording per-step timing and outcome
+
+    Returns:
+        bool: True if all required steps succeeded
+    """
+    with WarmupState._lock:
+        if WarmupState.status == 'warming':
+            return False
+        WarmupState.status = 'warming'
+        WarmupState.started_at = time.monotonic()
+        WarmupState.steps = {}
+
+    ok = True
+    for name, step, required in WARMUP_STEPS:
+        started = time.monotonic()
+        try:
+            outcome = step() or 'ok'
+            WarmupState.steps[name] = {'status': outcome, 'ms': round((time.monotonic() - started) * 1000, 1)}
+        except Exception as e:
+            logger.warning(f"Warm-up step {name} failed: {e}")
+            WarmupState.steps[name] = {
+                'status': 'failed',
+                'ms': round((time.monotonic() - started) * 1000, 1),
+                'error': str(e),
+            }
+            if required:
+                ok = False
+
+    with WarmupState._lock:
+        WarmupState.finished_at = time.monotonic()
+        WarmupState.status = 'warm' if ok else 'failed'
+
+    logger.info(f"Warm-up finished: {WarmupState.as_dict()}")
+    return ok
+
+
+_thread = None
+
+
+def start(background=True):
+    """
+    Start warm-up unless it is running or already done
+
+    Args:
+        background (bool): Run in a daemon thread so the server can accept probes meanwhile
+    """
+    global _thread
+
+    if WarmupState.status in ('warming', 'warm'):
+        return
+
+    if background:
+        _thread = threading.Thread(target=warm_up, name='warmup', daemon=True)
+        _thread.start()
+    else:
+        warm_up()
+
+
+def wait(timeout=None):
+    """
+    Block until a background warm-up finishes (e.g. in a preloading master before it forks)
+
+    Returns:
+        str: The warm-up status afterwards
+    """
+    if _thread is not None:
+        _thread.join(timeout)
+    return WarmupState.status
+
+
+def _reset_after_fork():
+    global _thread
+    WarmupState._lock = threading.Lock()
+    _thread = None
+    if WarmupState.status == 'warming':
+        # The warm-up thread did not survive the fork
+        WarmupState.status = 'cold'
+
+
+lifecycle.register('warmup', reset=_reset_after_fork)
+
+
+def is_ready():
+    """
+    True once warm-up has completed (or when warm-up is disabled)
+    """
+    if not getattr(settings, 'WARMUP_ON_STARTUP', False):
+        return True
+    return WarmupState.status == 'warm'
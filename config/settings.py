@@ -94,6 +94,28 @@ DATABASES = {
     )
 }
 
+# Process-level connection pool: each worker process holds at most DATABASE_POOL_MAX_SIZE
+# connections shared by its threads (instead of one persistent connection per thread);
+# requests wait up to DATABASE_POOL_TIMEOUT seconds for a free connection
+DATABASE_POOL = env.bool('DATABASE_POOL', default=False)
+POOLED_DATABASE_ENGINES = {
+    'django.db.backends.postgresql': 'auth_service.db.backends.postgresql',
+    'django.db.backends.sqlite3': 'auth_service.db.backends.sqlite3',
+}
+if DATABASE_POOL and DATABASES['default']['ENGINE'] in POOLED_DATABASE_ENGINES:
+    DATABASES['default'].update({
+        'ENGINE': POOLED_DATABASE_ENGINES[DATABASES['default']['ENGINE']],
+        # Release the connection back to the pool at the end of every request
+        'CONN_MAX_AGE': 0,
+        'CONN_HEALTH_CHECKS': False,
+        'POOL': {
+            'min_size': env.int('DATABASE_POOL_MIN_SIZE', default=1),
+            'max_size': env.int('DATABASE_POOL_MAX_SIZE', default=4),
+            'timeout': env.float('DATABASE_POOL_TIMEOUT', default=5.0),
+            'max_idle': env.float('DATABASE_POOL_MAX_IDLE', default=300.0),
+        },
+    })
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',},
@@ -118,7 +140,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # REST Framework
 REST_FRAMEWORK = {
-    'DEFAULT_AUTHENTICATION_CLASSES': ['rest_framework.authentication.TokenAuthentication',],
+    'DEFAULT_AUTHENTICATION_CLASSES': ['auth_service.authentication.ProductTokenAuthentication',],
     'DEFAULT_PERMISSION_CLASSES': ['rest_framework.permissions.IsAuthenticated',],
     'DEFAULT_RENDERER_CLASSES': ['rest_framework.renderers.JSONRenderer',],
     'DEFAULT_PARSER_CLASSES': ['rest_framework.parsers.JSONParser',],
@@ -133,6 +155,12 @@ REST_FRAMEWORK = {
     }
 }
 
+# django-ratelimit per-view limits (disable only for local benchmarks)
+RATELIMIT_ENABLE = env.bool('RATELIMIT_ENABLE', default=True)
+
+# DNS deliverability check for recipient addresses in request validation
+EMAIL_CHECK_DELIVERABILITY = env.bool('EMAIL_CHECK_DELIVERABILITY', default=True)
+
 # CORS
 CORS_ALLOWED_ORIGINS = env.list('CORS_ALLOWED_ORIGINS', default=[
     'https://oneclickmed.ng',
@@ -174,8 +202,196 @@ BACKEND_URL = env('BACKEND_URL', default='https://auth.oneclickmed.ng')
 BREVO_API_KEY = env('BREVO_API_KEY', default='')
 BREVO_SENDER_EMAIL = env('BREVO_SENDER_EMAIL', default='')
 BREVO_SENDER_NAME = env('BREVO_SENDER_NAME', default='OCM Services')
+# Override the Brevo API base URL (e.g. a local stub for benchmarks); empty uses the SDK default
+BREVO_API_URL = env('BREVO_API_URL', default='')
+# 'api' sends over HTTPS; 'smtp' sends emails without a Brevo template through Brevo's SMTP relay
+# over pooled, pipelined connections (EMAIL_SMTP_* below), for high-volume sends
+BREVO_TRANSPORT = env('BREVO_TRANSPORT', default='api')
+BREVO_SMTP_HOST = env('BREVO_SMTP_HOST', default='smtp-relay.brevo.com')
+BREVO_SMTP_PORT = env.int('BREVO_SMTP_PORT', default=587)
+BREVO_SMTP_LOGIN = env('BREVO_SMTP_LOGIN', default='')
+BREVO_SMTP_KEY = env('BREVO_SMTP_KEY', default='')
+BREVO_SMTP_USE_TLS = env.bool('BREVO_SMTP_USE_TLS', default=True)
+# Brevo delivery-event webhooks (POST /api/webhooks/brevo/): configure the webhook with this bearer token
+# (Brevo's webhook auth), or with basic auth credentials in its URL. Neither set: webhooks are refused
+BREVO_WEBHOOK_TOKEN = env('BREVO_WEBHOOK_TOKEN', default='')
+BREVO_WEBHOOK_USERNAME = env('BREVO_WEBHOOK_USERNAME', default='')
+BREVO_WEBHOOK_PASSWORD = env('BREVO_WEBHOOK_PASSWORD', default='')
 HUBSPOT_API_KEY = env('HUBSPOT_API_KEY', default='')
 
+# 'html' sends the rendered email; 'template' sends only template_id + params for emails whose
+# Brevo-managed template is in sync (manage.py sync_brevo_templates), falling back to html otherwise
+EMAIL_SEND_MODE = env('EMAIL_SEND_MODE', default='html')
+# Local mapping of product/template -> Brevo template id and synced version
+BREVO_TEMPLATE_MAP = env('BREVO_TEMPLATE_MAP', default=str(BASE_DIR / 'brevo_templates.json'))
+
+# Email providers in order of preference: 'brevo' and/or 'smtp' (the SMTP relay at EMAIL_HOST below).
+# With more than one, sends go to the healthiest by rolling latency / error rate and fail over;
+# auth emails move on to the next provider if the first cannot connect within EMAIL_ROUTER_HEDGE_MS
+EMAIL_PROVIDERS = env.list('EMAIL_PROVIDERS', default=['brevo'])
+EMAIL_ROUTER_WINDOW_SECONDS = env.int('EMAIL_ROUTER_WINDOW_SECONDS', default=60)
+EMAIL_ROUTER_MAX_ERROR_RATE = env.float('EMAIL_ROUTER_MAX_ERROR_RATE', default=0.5)
+EMAIL_ROUTER_LATENCY_BUCKET_MS = env.int('EMAIL_ROUTER_LATENCY_BUCKET_MS', default=250)
+EMAIL_ROUTER_HEDGE_MS = env.int('EMAIL_ROUTER_HEDGE_MS', default=1500)
+
+# SMTP provider
+EMAIL_HOST = env('EMAIL_HOST', default='localhost')
+EMAIL_PORT = env.int('EMAIL_PORT', default=25)
+EMAIL_HOST_USER = env('EMAIL_HOST_USER', default='')
+EMAIL_HOST_PASSWORD = env('EMAIL_HOST_PASSWORD', default='')
+EMAIL_USE_TLS = env.bool('EMAIL_USE_TLS', default=False)
+EMAIL_USE_SSL = env.bool('EMAIL_USE_SSL', default=False)
+EMAIL_TIMEOUT = env.int('EMAIL_TIMEOUT', default=10)
+
+# SMTP connection pool (per worker process and relay): connections are reused for up to
+# EMAIL_SMTP_MAX_MESSAGES messages and closed after EMAIL_SMTP_IDLE_SECONDS idle;
+# EMAIL_SMTP_PIPELINING sends the envelope in one round trip when the relay supports it
+EMAIL_SMTP_POOL_SIZE = env.int('EMAIL_SMTP_POOL_SIZE', default=4)
+EMAIL_SMTP_MAX_MESSAGES = env.int('EMAIL_SMTP_MAX_MESSAGES', default=100)
+EMAIL_SMTP_IDLE_SECONDS = env.int('EMAIL_SMTP_IDLE_SECONDS', default=30)
+EMAIL_SMTP_PIPELINING = env.bool('EMAIL_SMTP_PIPELINING', default=True)
+
+# Bulk campaign rendering (services/bulk_render.py): recipient contexts are rendered in chunks of
+# EMAIL_BULK_RENDER_CHUNK_SIZE across EMAIL_BULK_RENDER_WORKERS processes (0 = one per core, 1 = in-process)
+EMAIL_BULK_RENDER_WORKERS = env.int('EMAIL_BULK_RENDER_WORKERS', default=0)
+EMAIL_BULK_RENDER_CHUNK_SIZE = env.int('EMAIL_BULK_RENDER_CHUNK_SIZE', default=100)
+# forkserver (workers start clean) or fork (faster start, inherits the parent's memory)
+EMAIL_BULK_RENDER_START_METHOD = env('EMAIL_BULK_RENDER_START_METHOD', default='forkserver')
+
+# Streaming bulk sends (POST /api/email/bulk/, NDJSON): email types allowed in bulk, lines sent
+# concurrently per request (as many more are read ahead) and the longest accepted line
+EMAIL_BULK_TYPES = env.list('EMAIL_BULK_TYPES', default=['generic', 'welcome', 'verification'])
+EMAIL_BULK_IN_FLIGHT = env.int('EMAIL_BULK_IN_FLIGHT', default=8)
+EMAIL_BULK_MAX_LINE_BYTES = env.int('EMAIL_BULK_MAX_LINE_BYTES', default=65536)
+
+# Attachments on POST /api/email/generic/ (multipart/form-data 'attachments' files, services/email_attachments.py):
+# size caps per file and per email, files per email and allowed content types (checked against the file
+# extension and leading bytes). Uploads stay in memory up to EMAIL_ATTACHMENT_SPOOL_BYTES, then spill to a
+# temporary file; from EMAIL_ATTACHMENT_MMAP_BYTES they are memory-mapped while being base64-encoded
+EMAIL_ATTACHMENT_MAX_BYTES = env.int('EMAIL_ATTACHMENT_MAX_BYTES', default=10 * 1024 * 1024)
+EMAIL_ATTACHMENT_MAX_TOTAL_BYTES = env.int('EMAIL_ATTACHMENT_MAX_TOTAL_BYTES', default=20 * 1024 * 1024)
+EMAIL_ATTACHMENT_MAX_FILES = env.int('EMAIL_ATTACHMENT_MAX_FILES', default=10)
+EMAIL_ATTACHMENT_CONTENT_TYPES = env.list('EMAIL_ATTACHMENT_CONTENT_TYPES', default=[
+    'application/pdf',
+    'image/png',
+    'image/jpeg',
+    'image/gif',
+    'text/plain',
+    'text/csv',
+    'text/calendar',
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'application/vnd.openxmlformats-officedocument.presentationml.presentation',
+])
+EMAIL_ATTACHMENT_SPOOL_BYTES = env.int('EMAIL_ATTACHMENT_SPOOL_BYTES', default=256 * 1024)
+EMAIL_ATTACHMENT_MMAP_BYTES = env.int('EMAIL_ATTACHMENT_MMAP_BYTES', default=1024 * 1024)
+
+# Scheduled sends (send_at, services/email_scheduler.py): each gunicorn worker leases the pending sends due
+# within EMAIL_SCHEDULE_HORIZON_SECONDS into an in-process timing wheel every EMAIL_SCHEDULE_LOAD_INTERVAL
+# seconds (at most EMAIL_SCHEDULE_LOAD_LIMIT rows per query, EMAIL_SCHEDULE_MAX_LOADED held), and sends
+# them on EMAIL_SCHEDULE_WORKERS threads. A lease outlives the horizon by EMAIL_SCHEDULE_LEASE_SECONDS, after
+# which another worker takes the send over; failed sends are retried with backoff up to EMAIL_SCHEDULE_MAX_ATTEMPTS.
+# Off by default: the scheduler only runs in gunicorn workers, and a future send_at is refused (400) wherever
+# none is running
+EMAIL_SCHEDULE_ENABLED = env.bool('EMAIL_SCHEDULE_ENABLED', default=False)
+EMAIL_SCHEDULE_MAX_DAYS = env.int('EMAIL_SCHEDULE_MAX_DAYS', default=30)
+EMAIL_SCHEDULE_HORIZON_SECONDS = env.int('EMAIL_SCHEDULE_HORIZON_SECONDS', default=300)
+EMAIL_SCHEDULE_LOAD_INTERVAL = env.int('EMAIL_SCHEDULE_LOAD_INTERVAL', default=30)
+EMAIL_SCHEDULE_LOAD_LIMIT = env.int('EMAIL_SCHEDULE_LOAD_LIMIT', default=2000)
+EMAIL_SCHEDULE_MAX_LOADED = env.int('EMAIL_SCHEDULE_MAX_LOADED', default=20000)
+EMAIL_SCHEDULE_LEASE_SECONDS = env.int('EMAIL_SCHEDULE_LEASE_SECONDS', default=300)
+EMAIL_SCHEDULE_WORKERS = env.int('EMAIL_SCHEDULE_WORKERS', default=4)
+EMAIL_SCHEDULE_MAX_ATTEMPTS = env.int('EMAIL_SCHEDULE_MAX_ATTEMPTS', default=5)
+
+# Notification digests (services/email_digest.py): generic emails from a product with a digest window
+# (Product.digest_window_seconds) are stored, and those to the same recipient within the window go out as one
+# digest. Each worker tracks at most EMAIL_DIGEST_MAX_GROUPS open windows (beyond that, and for windows a dead
+# worker left behind, the sweep every EMAIL_DIGEST_SWEEP_INTERVAL seconds sends them); a digest is sent early
+# at EMAIL_DIGEST_MAX_ITEMS emails. Failed digests are retried with backoff up to EMAIL_DIGEST_MAX_ATTEMPTS.
+# Off by default: every generic email is sent right away, whatever the products' digest windows
+EMAIL_DIGEST_ENABLED = env.bool('EMAIL_DIGEST_ENABLED', default=False)
+EMAIL_DIGEST_MAX_GROUPS = env.int('EMAIL_DIGEST_MAX_GROUPS', default=10000)
+EMAIL_DIGEST_MAX_ITEMS = env.int('EMAIL_DIGEST_MAX_ITEMS', default=50)
+EMAIL_DIGEST_SWEEP_INTERVAL = env.int('EMAIL_DIGEST_SWEEP_INTERVAL', default=30)
+EMAIL_DIGEST_LEASE_SECONDS = env.int('EMAIL_DIGEST_LEASE_SECONDS', default=120)
+EMAIL_DIGEST_WORKERS = env.int('EMAIL_DIGEST_WORKERS', default=2)
+EMAIL_DIGEST_MAX_ATTEMPTS = env.int('EMAIL_DIGEST_MAX_ATTEMPTS', default=5)
+
+# Sandbox (services/email_sandbox.py): test-environment emails of products with sandbox_test_sends are stored
+# instead of sent. The newest EMAIL_SANDBOX_MAX_PER_PRODUCT are kept per product, pruned every
+# EMAIL_SANDBOX_PRUNE_EVERY captures (per worker)
+EMAIL_SANDBOX_MAX_PER_PRODUCT = env.int('EMAIL_SANDBOX_MAX_PER_PRODUCT', default=1000)
+EMAIL_SANDBOX_PRUNE_EVERY = env.int('EMAIL_SANDBOX_PRUNE_EVERY', default=100)
+
+# Delivery events (services/email_events.py): webhook events are appended to a per-worker ring buffer of
+# EMAIL_EVENTS_BUFFER_SIZE events (full: the webhook answers 503 and Brevo retries; a single request with more
+# events than that is refused with 413, so keep it above Brevo's webhook batch size) and written in bulk
+# (COPY on PostgreSQL) every EMAIL_EVENTS_FLUSH_INTERVAL seconds, or as soon as EMAIL_EVENTS_FLUSH_SIZE are waiting.
+# A batch whose write fails EMAIL_EVENTS_MAX_RETRIES flushes in a row is split in halves, one retry per flush,
+# until the events the database refuses on their own are dropped (logged)
+EMAIL_EVENTS_BUFFER_SIZE = env.int('EMAIL_EVENTS_BUFFER_SIZE', default=20000)
+EMAIL_EVENTS_FLUSH_SIZE = env.int('EMAIL_EVENTS_FLUSH_SIZE', default=2000)
+EMAIL_EVENTS_FLUSH_INTERVAL = env.float('EMAIL_EVENTS_FLUSH_INTERVAL', default=1.0)
+EMAIL_EVENTS_MAX_RETRIES = env.int('EMAIL_EVENTS_MAX_RETRIES', default=5)
+
+# Warm-start: initialize Firebase apps/tokens, templates and upstream connections when the WSGI app loads
+# (off by default: everything is initialized on first use, as before)
+WARMUP_ON_STARTUP = env.bool('WARMUP_ON_STARTUP', default=False)
+
+# Readiness probes (database, Firebase tokens, Brevo, HubSpot) run in the background every
+# READINESS_PROBE_INTERVAL seconds; /api/ready/ serves the cached results and treats results
+# older than READINESS_PROBE_MAX_AGE as stale. Off by default: /api/ready/ then reflects the warm-up only
+READINESS_PROBES_ENABLED = env.bool('READINESS_PROBES_ENABLED', default=False)
+READINESS_PROBE_INTERVAL = env.int('READINESS_PROBE_INTERVAL', default=30)
+READINESS_PROBE_TIMEOUT = env.int('READINESS_PROBE_TIMEOUT', default=5)
+READINESS_PROBE_MAX_AGE = env.int('READINESS_PROBE_MAX_AGE', default=90)
+
+# Cold-start import budget for `manage.py import_profile --check` (importing config.wsgi, ms)
+IMPORT_TIME_BUDGET_MS = env.int('IMPORT_TIME_BUDGET_MS', default=1200)
+# Heavy SDKs that must only be imported on first use
+IMPORT_DEFERRED_MODULES = ['firebase_admin', 'google.cloud.firestore', 'grpc', 'sib_api_v3_sdk']
+
+# Upstream HTTP: pooled keep-alive connections per worker and request timeout (seconds)
+HTTP_POOL_MAXSIZE = env.int('HTTP_POOL_MAXSIZE', default=10)
+FIREBASE_HTTP_TIMEOUT = env.int('FIREBASE_HTTP_TIMEOUT', default=10)
+
+# Email pipeline execution strategy: 'sync' (inline), 'threaded' (shared pool, waits) or 'queued' (202, background)
+EMAIL_PIPELINE_EXECUTION = env('EMAIL_PIPELINE_EXECUTION', default='sync')
+EMAIL_PIPELINE_WORKERS = env.int('EMAIL_PIPELINE_WORKERS', default=8)
+EMAIL_PIPELINE_TIMEOUT = env.int('EMAIL_PIPELINE_TIMEOUT', default=30)
+EMAIL_PIPELINE_QUEUE_SIZE = env.int('EMAIL_PIPELINE_QUEUE_SIZE', default=1000)
+
+# Priority lanes: sends are admitted per lane ('auth' resets/verifications, 'default', 'bulk' generic mail)
+# with weighted fair queuing across lanes and products, sharing EMAIL_LANE_CAPACITY concurrent sends
+# per process. Limits cap a lane's concurrent sends; waiters cap the request threads waiting for a slot
+# (beyond them the request is answered 503). Off by default: every send goes out at once, as before
+EMAIL_LANES_ENABLED = env.bool('EMAIL_LANES_ENABLED', default=False)
+EMAIL_LANE_CAPACITY = env.int('EMAIL_LANE_CAPACITY', default=8)
+EMAIL_LANE_WEIGHTS = env.dict('EMAIL_LANE_WEIGHTS', cast={'value': int}, default={'auth': 8, 'default': 4, 'bulk': 1})
+EMAIL_LANE_LIMITS = env.dict('EMAIL_LANE_LIMITS', cast={'value': int}, default={'auth': 8, 'default': 6, 'bulk': 3})
+EMAIL_LANE_WAITERS = env.dict('EMAIL_LANE_WAITERS', cast={'value': int}, default={'auth': 32, 'default': 8, 'bulk': 2})
+# Concurrent sends per product within a lane (0: only the lane limit applies)
+EMAIL_LANE_PRODUCT_LIMIT = env.int('EMAIL_LANE_PRODUCT_LIMIT', default=4)
+
+# Micro-batching: concurrent sends with the same content wait up to EMAIL_BATCH_WINDOW_MS
+# to share one Brevo call (messageVersions); sends with nothing to share go out directly
+EMAIL_BATCHING_ENABLED = env.bool('EMAIL_BATCHING_ENABLED', default=True)
+EMAIL_BATCH_WINDOW_MS = env.int('EMAIL_BATCH_WINDOW_MS', default=10)
+EMAIL_BATCH_MAX_SIZE = env.int('EMAIL_BATCH_MAX_SIZE', default=50)
+
+# Verification emails: answer "already verified" from the cached Firebase profile instead of sending
+# (per request: skip_if_verified)
+EMAIL_VERIFICATION_SKIP_VERIFIED = env.bool('EMAIL_VERIFICATION_SKIP_VERIFIED', default=False)
+
+# Resend cooldown (seconds): repeats of a password reset / verification email to the same recipient
+# within the window return the message already sent instead of sending again (0, the default, disables).
+# Per-type overrides, e.g. EMAIL_RESEND_COOLDOWNS=verification=120;password_reset=60
+EMAIL_RESEND_COOLDOWN = env.int('EMAIL_RESEND_COOLDOWN', default=0)
+EMAIL_RESEND_COOLDOWNS = env.dict('EMAIL_RESEND_COOLDOWNS', cast={'value': int}, default={})
+# Share cooldowns across workers/instances through the database (in-memory only when False)
+EMAIL_RESEND_COOLDOWN_SHARED = env.bool('EMAIL_RESEND_COOLDOWN_SHARED', default=True)
+EMAIL_RESEND_COOLDOWN_CACHE_SIZE = env.int('EMAIL_RESEND_COOLDOWN_CACHE_SIZE', default=10000)
+
 # Firebase configs (env variables)
 # Map environment variables to Firebase credential field names
 FIREBASE_TEST_CONFIG = {
@@ -204,13 +420,58 @@ FIREBASE_PROD_CONFIG = {
     'client_x509_cert_url': env('FIREBASE_PROD_CLIENT_CERT_URL', default=''),
 }
 
+# Firebase client on the request path: 'lean' (in-repo Identity Toolkit client, no firebase_admin import)
+# or 'admin' (firebase_admin credentials, the previous behaviour)
+FIREBASE_CLIENT = env('FIREBASE_CLIENT', default='lean')
+IDENTITY_TOOLKIT_URL = env('IDENTITY_TOOLKIT_URL', default='https://identitytoolkit.googleapis.com/v1')
+FIREBASE_ID_TOKEN_CERTS_URL = env(
+    'FIREBASE_ID_TOKEN_CERTS_URL',
+    default='https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com'
+)
+# ID token revocation state is cached per user instead of one accounts:lookup per verification;
+# a revoked/disabled user is rejected at most FIREBASE_REVOCATION_FRESHNESS seconds late
+FIREBASE_REVOCATION_FRESHNESS = env.int('FIREBASE_REVOCATION_FRESHNESS', default=300)
+FIREBASE_REVOCATION_REFRESH_INTERVAL = env.int('FIREBASE_REVOCATION_REFRESH_INTERVAL', default=30)
+FIREBASE_REVOCATION_CACHE_SIZE = env.int('FIREBASE_REVOCATION_CACHE_SIZE', default=10000)
+# User existence/profile cache per (tenant, email hash): short TTL for missing users, longer for existing ones
+FIREBASE_USER_CACHE_SIZE = env.int('FIREBASE_USER_CACHE_SIZE', default=10000)
+FIREBASE_USER_CACHE_NEGATIVE_TTL = env.int('FIREBASE_USER_CACHE_NEGATIVE_TTL', default=60)
+FIREBASE_USER_CACHE_POSITIVE_TTL = env.int('FIREBASE_USER_CACHE_POSITIVE_TTL', default=300)
+# Concurrent cache-missing profile lookups within this window share one accounts:lookup call
+FIREBASE_LOOKUP_BATCH_WINDOW_MS = env.int('FIREBASE_LOOKUP_BATCH_WINDOW_MS', default=5)
+
 # Products config
+# logo_url / dashboard_url / welcome_sender are defaults used when the Product row leaves them blank
 PRODUCTS_CONFIG = {
-    'beta_health': {'name': 'Beta Health', 'test_tenant_id': env('BETA_HEALTH_TEST_TENANT_ID', default=''), 'prod_tenant_id': env('BETA_HEALTH_PROD_TENANT_ID', default='')},
-    'ehr': {'name': 'EHR', 'test_tenant_id': env('EHR_TEST_TENANT_ID', default=''), 'prod_tenant_id': env('EHR_PROD_TENANT_ID', default='')},
-    'emergency_service': {'name': 'Emergency Service', 'test_tenant_id': env('EMERGENCY_SERVICE_TEST_TENANT_ID', default=''), 'prod_tenant_id': env('EMERGENCY_SERVICE_PROD_TENANT_ID', default='')},
+    'beta_health': {
+        'name': 'Beta Health',
+        'test_tenant_id': env('BETA_HEALTH_TEST_TENANT_ID', default=''),
+        'prod_tenant_id': env('BETA_HEALTH_PROD_TENANT_ID', default=''),
+        'logo_url': 'https://oneclickmed.ng/betahealth_logo.JPG',
+        'dashboard_url': 'https://betahealth.oneclickmed.ng',
+        'welcome_sender': {'email': 'Reagan@oneclickmed.ng', 'name': 'Reagan Rowland - OneClick-Med'},
+    },
+    'ehr': {
+        'name': 'EHR',
+        'test_tenant_id': env('EHR_TEST_TENANT_ID', default=''),
+        'prod_tenant_id': env('EHR_PROD_TENANT_ID', default=''),
+        'dashboard_url': 'https://ehr.oneclickmed.ng',
+    },
+    'emergency_service': {
+        'name': 'Emergency Service',
+        'test_tenant_id': env('EMERGENCY_SERVICE_TEST_TENANT_ID', default=''),
+        'prod_tenant_id': env('EMERGENCY_SERVICE_PROD_TENANT_ID', default=''),
+        'dashboard_url': 'https://emergency.oneclickmed.ng',
+    },
 }
 
+DEFAULT_PRODUCT_LOGO_URL = 'https://oneclickmed.ng/_next/image?url=%2Fassets%2Fimg%2Fonclickmedlogo.png&w=384&q=75'
+DEFAULT_DASHBOARD_URL = 'https://oneclickmed.ng'
+
+# In-process product registry: seconds between cheap DB version polls (0 disables polling). Changes made in
+# other processes, including rotated/deleted tokens and deactivated users, are seen at most this late
+PRODUCT_REGISTRY_POLL_INTERVAL = env.int('PRODUCT_REGISTRY_POLL_INTERVAL', default=10)
+
 # Logging - console only
 LOGGING = {
     'version': 1,
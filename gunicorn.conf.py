@@ -0,0 +1,197 @@
+"""
+Gunicorn configuration.
+
+The service is almost entirely upstream I/O (Firebase, Brevo, HubSpot), so
+concurrency comes mostly from threads (or greenlets / the event loop) rather
+than processes. Worker count is derived from the CPUs and memory actually
+available to the container (cgroup limits on Cloud Run / Docker), and every
+value can be overridden from the environment:
+
+    GUNICORN_WORKER_CLASS   gthread (default) | gevent | uvicorn
+    GUNICORN_WORKERS        (or WEB_CONCURRENCY) worker processes
+    GUNICORN_THREADS        threads per gthread worker
+    GUNICORN_WORKER_CONNECTIONS  concurrent requests per gevent worker
+    GUNICORN_WORKER_MEMORY_MB    RSS budget per worker used to cap the worker count
+    GUNICORN_PRELOAD        load the app once in the master and fork (shared memory)
+    GUNICORN_TIMEOUT / GUNICORN_KEEPALIVE / GUNICORN_MAX_REQUESTS / GUNICORN_MAX_REQUESTS_JITTER
+"""
+import importlib.util
+import logging
+import os
+
+
+def _env_int(name, default=None):
+    value = os.environ.get(name)
+    return int(value) if value not in (None, '') else default
+
+
+def _env_bool(name, default):
+    value = os.environ.get(name)
+    if value in (None, ''):
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def available_cpus():
+    """
+    CPUs usable by this container: cgroup v2/v1 quota if set, else the affinity mask
+    """
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()
+        if quota != 'max':
+            return max(1, int(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    try:
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as f:
+            quota = int(f.read())
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as f:
+            period = int(f.read())
+        if quota > 0:
+            return max(1, quota // period)
+    except (OSError, ValueError):
+        pass
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def available_memory_mb():
+    """
+    Memory limit of this container in MB: cgroup v2/v1 limit if set, else MemTotal
+    """
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+            if value != 'max' and int(value) < 1 << 60:
+                return int(value) // (1024 * 1024)
+        except (OSError, ValueError):
+            pass
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemTotal:'):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    return 1024
+
+
+WORKER_CLASSES = {
+    'gthread': ('gthread', None),
+    'gevent': ('gevent', 'gevent'),
+    'uvicorn': ('uvicorn.workers.UvicornWorker', 'uvicorn'),
+}
+
+_requested = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread').strip().lower()
+if _requested not in WORKER_CLASSES:
+    raise ValueError(f"GUNICORN_WORKER_CLASS must be one of {', '.join(WORKER_CLASSES)}, got {_requested!r}")
+worker_kind = _requested
+if WORKER_CLASSES[worker_kind][1] and importlib.util.find_spec(WORKER_CLASSES[worker_kind][1]) is None:
+    # Keep the service booting if the optional package is missing from the image
+    logging.getLogger('gunicorn.error').warning(f"{worker_kind} is not installed, falling back to gthread")
+    worker_kind = 'gthread'
+worker_class = WORKER_CLASSES[worker_kind][0]
+
+if worker_kind == 'gevent':
+    # Must happen before the app (and its ssl/socket users) is imported
+    from gevent import monkey
+    monkey.patch_all()
+
+cpus = available_cpus()
+memory_mb = available_memory_mb()
+worker_memory_mb = _env_int('GUNICORN_WORKER_MEMORY_MB', 160)
+# Leave room for the master process and page cache
+max_workers_by_memory = max(1, int(memory_mb * 0.8) // worker_memory_mb)
+
+if worker_kind == 'gthread':
+    default_workers = 2 * cpus + 1
+else:
+    # One event loop per CPU already multiplexes all upstream I/O
+    default_workers = cpus + 1
+
+workers = _env_int('GUNICORN_WORKERS') or _env_int('WEB_CONCURRENCY') or min(default_workers, max_workers_by_memory)
+threads = _env_int('GUNICORN_THREADS', 8) if worker_kind == 'gthread' else 1
+worker_connections = _env_int('GUNICORN_WORKER_CONNECTIONS', 200)
+
+wsgi_app = 'config.asgi:application' if worker_kind == 'uvicorn' else 'config.wsgi:application'
+bind = os.environ.get('GUNICORN_BIND') or f"0.0.0.0:{os.environ.get('PORT', '8080')}"
+
+# Opt-in: import Django, DRF and the SDKs once in the master; workers share those pages copy-on-write
+preload_app = _env_bool('GUNICORN_PRELOAD', False)
+
+timeout = _env_int('GUNICORN_TIMEOUT', 30)
+graceful_timeout = _env_int('GUNICORN_GRACEFUL_TIMEOUT', 30)
+# Longer than typical load balancer idle timeouts so the LB, not gunicorn, closes idle connections
+keepalive = _env_int('GUNICORN_KEEPALIVE', 75)
+# Opt-in: recycle workers periodically; jitter keeps them from all restarting at once (0: never)
+max_requests = _env_int('GUNICORN_MAX_REQUESTS', 0)
+max_requests_jitter = _env_int('GUNICORN_MAX_REQUESTS_JITTER', 200)
+
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+errorlog = '-'
+# Heartbeat files on tmpfs: a slow container disk must not get workers killed
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+
+def on_starting(server):
+    server.log.info(
+        f"{worker_class}: {workers} workers x {threads if worker_kind == 'gthread' else worker_connections} "
+        f"({cpus} CPUs, {memory_mb} MB, preload={preload_app})"
+    )
+
+
+def when_ready(server):
+    if preload_app:
+        # Let the master's warm-up finish so no thread is mid-flight when workers fork
+        from auth_service import warmup
+        status = warmup.wait(timeout=30)
+        server.log.info(f"Preloaded app warm-up: {status}")
+
+
+def pre_fork(server, worker):
+    # Nothing connection-like should be inherited: release the master's sockets and pools before forking
+    if not preload_app:
+        return
+    from auth_service import lifecycle
+    lifecycle.close_all()
+
+
+def post_fork(server, worker):
+    """
+    Start this worker's own background work. Inherited clients, caches, pools and
+    locks were already reset in the child by auth_service.lifecycle (os.register_at_fork);
+    without preload the app is only imported after the fork, so there is nothing to redo.
+    """
+    if not preload_app:
+        return
+    from django.conf import settings
+    from auth_service import warmup
+
+    # Re-prime this worker's own upstream connections (imports and templates are already shared)
+    if settings.WARMUP_ON_STARTUP:
+        warmup.WarmupState.reset()
+        warmup.start()
+    if settings.READINESS_PROBES_ENABLED:
+        from auth_service.probes import ProbeRunner
+        ProbeRunner.start()
+
+
+def post_worker_init(worker):
+    # Scheduled sends and digests run in every worker (with or without preload); rows are leased, never shared
+    from django.conf import settings
+    if settings.EMAIL_SCHEDULE_ENABLED:
+        from auth_service.services.email_scheduler import EmailScheduler
+        EmailScheduler.start()
+    if settings.EMAIL_DIGEST_ENABLED:
+        from auth_service.services.email_digest import EmailDigest
+        EmailDigest.start()
+
+
+def worker_exit(server, worker):
+    from auth_service import lifecycle
+    lifecycle.close_all()